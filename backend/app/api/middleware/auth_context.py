@@ -0,0 +1,74 @@
+"""Per-request authentication context shared by middleware and dependencies.
+
+The access token of a request is decoded once, by whichever component needs
+it first (normally ``RateLimitMiddleware``), and kept on
+``request.state.auth``. The sliding session middleware and the
+``get_current_user`` dependencies reuse those claims instead of decoding the
+JWT again; the dependency also stores the resolved user on
+``request.state.user``.
+"""
+
+from __future__ import annotations
+
+from dataclasses import dataclass
+from typing import Any, Dict, Optional
+
+from fastapi import Request
+
+from app.core.auth_utils import normalize_email
+from app.core.security import decode_access_token_and_check_expiry
+
+
+@dataclass(frozen=True)
+class AuthContext:
+    """The access token of a request and its verified claims."""
+
+    token: Optional[str] = None
+    # "cookie" or "bearer"; None without a token
+    source: Optional[str] = None
+    # None when there is no token or it is invalid / expired
+    claims: Optional[Dict[str, Any]] = None
+    expired: bool = False
+
+    @property
+    def subject(self) -> Optional[str]:
+        """Normalized ``sub`` claim of a valid token."""
+        sub = self.claims.get("sub") if self.claims else None
+        return normalize_email(sub) if isinstance(sub, str) and sub else None
+
+    @property
+    def role(self) -> Optional[str]:
+        return self.claims.get("role") if self.claims else None
+
+    @property
+    def school_id(self) -> Optional[int]:
+        return self.claims.get("school_id") if self.claims else None
+
+
+def _request_token(request: Request) -> tuple[Optional[str], Optional[str]]:
+    """Token and its source: the HttpOnly cookie first, then a Bearer header."""
+    token = request.cookies.get("access_token")
+    if token:
+        return token, "cookie"
+    auth_header = request.headers.get("authorization", "")
+    if auth_header.startswith("Bearer ") and auth_header[7:]:
+        return auth_header[7:], "bearer"
+    return None, None
+
+
+def get_auth_context(request: Request) -> AuthContext:
+    """The request's auth context, decoding the token on first use only."""
+    context = getattr(request.state, "auth", None)
+    if isinstance(context, AuthContext):
+        return context
+
+    token, source = _request_token(request)
+    if token is None:
+        context = AuthContext()
+    else:
+        claims, expired = decode_access_token_and_check_expiry(token)
+        context = AuthContext(
+            token=token, source=source, claims=claims, expired=expired
+        )
+    request.state.auth = context
+    return context
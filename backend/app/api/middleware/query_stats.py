@@ -0,0 +1,50 @@
+"""Per-request SQL statement counting middleware."""
+
+from __future__ import annotations
+
+from starlette.datastructures import MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.core.config import settings
+from app.infra.db import query_stats
+
+UNMATCHED_ROUTE = "<unmatched>"
+
+
+class QueryStatsMiddleware:
+    """
+    Count the SQL statements and DB time of each request.
+
+    Plain ASGI middleware. In development the counts so far are added to the
+    response as ``X-DB-Query-Count`` and ``X-DB-Query-Time-Ms``; after the
+    response, suspected N+1 patterns are logged and the totals are added to
+    the per-route metrics (see app/infra/db/query_stats.py).
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+        self.headers_enabled = settings.NODE_ENV == "development"
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        token = query_stats.start_request()
+        stats = query_stats.current_stats()
+
+        async def send_with_headers(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                headers = MutableHeaders(scope=message)
+                headers["X-DB-Query-Count"] = str(stats.count)
+                headers["X-DB-Query-Time-Ms"] = f"{stats.duration_ms:.1f}"
+            await send(message)
+
+        try:
+            await self.app(
+                scope, receive, send_with_headers if self.headers_enabled else send
+            )
+        finally:
+            # The router stores the matched route in the scope
+            route = getattr(scope.get("route"), "path", UNMATCHED_ROUTE)
+            query_stats.finish_request(token, route)
@@ -4,95 +4,143 @@ from __future__ import annotations
 
 import logging
 import re
-from typing import Callable, Optional
-from fastapi import Request, Response, status
+from collections import OrderedDict
+from typing import Optional
+from fastapi import Request, status
 from fastapi.responses import JSONResponse
-from starlette.middleware.base import BaseHTTPMiddleware
-from app.infra.services.rate_limiter import RateLimiter
-from app.core.security import decode_access_token
+from starlette.datastructures import MutableHeaders
+from starlette.routing import Match
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+from app.infra.services.rate_limiter import RateLimiter, get_rate_limiter
+from app.api.middleware.auth_context import get_auth_context
 from app.core.auth_utils import normalize_email
 from app.core.config import settings
 from app.infra.db.session import SessionLocal
 from app.infra.db.models import User
+from app.infra.metrics import RATE_LIMIT_DECISIONS
 
 logger = logging.getLogger(__name__)
 
+# Route template cache: request paths with their numeric segments replaced
+# (one entry per route shape, LRU-bounded against arbitrary token paths)
+ROUTE_TEMPLATE_CACHE_SIZE = 2048
+UNMATCHED_ROUTE = "<unmatched>"
+_NUMERIC_SEGMENT = re.compile(r"/\d+(?=/|$)")
+# Status of a queued job or batch, polled by the frontend while it runs
+_JOB_STATUS_PATH = re.compile(r"/(jobs|batches)/[^/]+/status$")
 
-class RateLimitMiddleware(BaseHTTPMiddleware):
+
+class RateLimitMiddleware:
     """
     Middleware for rate limiting API requests.
 
     Configuration:
     - API endpoints: 100 requests per minute per user
-    - Queue endpoints: 10 requests per minute per user
+    - Job status polling: 600 requests per minute per user
+    - Queue writes: 60 requests per minute per user
+
+    Plain ASGI middleware: the X-RateLimit-* headers are added to the
+    ``http.response.start`` message and the body is passed through untouched.
     """
 
-    def __init__(self, app, rate_limiter: RateLimiter = None):
+    def __init__(self, app: ASGIApp, rate_limiter: RateLimiter = None):
         """
         Initialize middleware.
 
         Args:
-            app: FastAPI application
-            rate_limiter: RateLimiter instance (optional)
+            app: ASGI application
+            rate_limiter: RateLimiter instance (defaults to the process-wide one)
         """
-        super().__init__(app)
-        self.rate_limiter = rate_limiter or RateLimiter()
-
-    async def dispatch(
-        self,
-        request: Request,
-        call_next: Callable,
-    ) -> Response:
+        self.app = app
+        self.rate_limiter = rate_limiter or get_rate_limiter()
+        self._route_templates: "OrderedDict[str, str]" = OrderedDict()
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
         """
         Process request with rate limiting.
 
         Args:
-            request: HTTP request
-            call_next: Next middleware/handler
-
-        Returns:
-            HTTP response
+            scope: ASGI connection scope
+            receive: ASGI receive channel
+            send: ASGI send channel
         """
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        request = Request(scope)
+
         # Skip rate limiting for certain paths
         if self._should_skip_rate_limit(request):
-            return await call_next(request)
+            RATE_LIMIT_DECISIONS.labels("exempt").inc()
+            await self.app(scope, receive, send)
+            return
 
         # Get user identifier (use IP if no user)
         user_id = self._get_user_identifier(request)
 
         # Determine rate limit based on endpoint
-        max_requests, window_seconds = self._get_rate_limit(request.url.path)
-
-        # Check rate limit
-        rate_key = f"{user_id}:{request.url.path}"
-        is_allowed, retry_after = self.rate_limiter.is_allowed(
-            rate_key,
-            max_requests,
-            window_seconds,
+        max_requests, window_seconds = self._get_rate_limit(
+            request.url.path, request.method
         )
 
-        if not is_allowed:
+        # Check rate limit (one Redis round trip), keyed on the route template
+        # so /evaluations/1/... and /evaluations/2/... share one counter
+        rate_key = f"{user_id}:{self._route_template(scope)}"
+        result = await self.rate_limiter.hit(rate_key, max_requests, window_seconds)
+
+        RATE_LIMIT_DECISIONS.labels("allowed" if result.allowed else "blocked").inc()
+        if not result.allowed:
             logger.warning(f"Rate limit exceeded for {rate_key}")
-            return JSONResponse(
+            response = JSONResponse(
                 status_code=status.HTTP_429_TOO_MANY_REQUESTS,
                 content={
-                    "detail": f"Rate limit exceeded. Retry after {retry_after} seconds."
+                    "detail": f"Rate limit exceeded. Retry after {result.retry_after} seconds."
                 },
-                headers={"Retry-After": str(retry_after)},
+                headers={"Retry-After": str(result.retry_after)},
             )
+            await response(scope, receive, send)
+            return
+
+        async def send_with_headers(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                # Add rate limit headers
+                headers = MutableHeaders(scope=message)
+                headers["X-RateLimit-Limit"] = str(result.limit)
+                headers["X-RateLimit-Remaining"] = str(result.remaining)
+                headers["X-RateLimit-Reset"] = str(result.reset_seconds)
+            await send(message)
 
         # Process request
-        response = await call_next(request)
+        await self.app(scope, receive, send_with_headers)
 
-        # Add rate limit headers
-        usage = self.rate_limiter.get_usage(rate_key, window_seconds)
-        response.headers["X-RateLimit-Limit"] = str(max_requests)
-        response.headers["X-RateLimit-Remaining"] = str(
-            max(0, max_requests - usage["current_count"])
-        )
-        response.headers["X-RateLimit-Reset"] = str(window_seconds)
+    def _route_template(self, scope: Scope) -> str:
+        """
+        Path template of the route that will handle the request
+        (e.g. ``/api/v1/evaluations/{evaluation_id}/grades``).
 
-        return response
+        Middleware runs before routing, so the app's routes are matched here;
+        the result is cached per path shape. Paths no route matches share one
+        template.
+        """
+        shape = _NUMERIC_SEGMENT.sub("/0", scope["path"])
+        template = self._route_templates.get(shape)
+        if template is not None:
+            self._route_templates.move_to_end(shape)
+            return template
+
+        template = UNMATCHED_ROUTE
+        router = getattr(scope.get("app"), "router", None)
+        for route in getattr(router, "routes", ()):
+            match, _ = route.matches(scope)
+            if match != Match.NONE:
+                template = getattr(route, "path", UNMATCHED_ROUTE)
+                break
+
+        self._route_templates[shape] = template
+        if len(self._route_templates) > ROUTE_TEMPLATE_CACHE_SIZE:
+            self._route_templates.popitem(last=False)
+        return template
 
     def _should_skip_rate_limit(self, request: Request) -> bool:
         """
@@ -112,6 +160,7 @@ class RateLimitMiddleware(BaseHTTPMiddleware):
             "/redoc",
             "/openapi.json",
             "/health",
+            "/metrics",
             "/api/v1/auth/azure",
         ]
         if any(path.startswith(skip_path) for skip_path in skip_paths):
@@ -121,7 +170,7 @@ class RateLimitMiddleware(BaseHTTPMiddleware):
         # Teachers need to make many rapid updates when filling in scores
         should_exempt = self._is_authenticated_teacher_scoring(request)
         if should_exempt:
-            logger.info(f"Rate limiting EXEMPTED for path: {path}")
+            logger.debug(f"Rate limiting EXEMPTED for path: {path}")
         return should_exempt
 
     def _is_authenticated_teacher_scoring(self, request: Request) -> bool:
@@ -156,7 +205,7 @@ class RateLimitMiddleware(BaseHTTPMiddleware):
             return False
 
         # Log that we found a scoring endpoint
-        logger.info(f"Scoring endpoint detected: {path}")
+        logger.debug(f"Scoring endpoint detected: {path}")
 
         # Check request.state.user first – this is set by the auth dependency or by
         # a middleware that runs before RateLimitMiddleware (common in tests and some
@@ -168,25 +217,25 @@ class RateLimitMiddleware(BaseHTTPMiddleware):
 
         if state_user is not None:
             user_role = getattr(state_user, "role", None)
-            logger.info(f"User role from request.state.user: {user_role}")
+            logger.debug(f"User role from request.state.user: {user_role}")
         else:
             # Fall back to extracting role from JWT token
             user_role = self._get_user_role_from_token(request)
-            logger.info(f"User role extracted from token: {user_role}")
+            logger.debug(f"User role extracted from token: {user_role}")
 
         if user_role in ("teacher", "admin"):
-            logger.info(f"Rate limiting exempted for {user_role} on {path}")
+            logger.debug(f"Rate limiting exempted for {user_role} on {path}")
             return True
 
-        logger.warning(f"Rate limiting NOT exempted for role={user_role} on {path}")
+        logger.debug(f"Rate limiting NOT exempted for role={user_role} on {path}")
         return False
 
     def _get_user_role_from_token(self, request: Request) -> Optional[str]:
         """
         Extract user role from authentication token in request.
 
-        This method decodes the JWT token from cookies or Authorization header
-        and extracts the role claim directly from the token payload.
+        The role claim comes from the request's auth context, so the token is
+        decoded at most once per request.
 
         Args:
             request: HTTP request
@@ -199,7 +248,7 @@ class RateLimitMiddleware(BaseHTTPMiddleware):
         if settings.ENABLE_DEV_LOGIN:
             x_user_email = request.headers.get("x-user-email")
             if x_user_email:
-                logger.info(f"Using X-User-Email header: {x_user_email}")
+                logger.debug(f"Using X-User-Email header: {x_user_email}")
                 try:
                     db = SessionLocal()
                     try:
@@ -211,7 +260,7 @@ class RateLimitMiddleware(BaseHTTPMiddleware):
                             .first()
                         )
                         if user and not user.archived:
-                            logger.info(
+                            logger.debug(
                                 f"User found via X-User-Email: role={user.role}"
                             )
                             return user.role
@@ -224,53 +273,21 @@ class RateLimitMiddleware(BaseHTTPMiddleware):
                 except Exception as e:
                     logger.error(f"Error getting user from X-User-Email: {e}")
 
-        # Try to get token from cookie (preferred method in production)
-        token = request.cookies.get("access_token")
-        if token:
-            logger.info(f"Token found in cookie: {token[:20]}...")
-
-        # Fallback to Authorization header
-        if not token:
-            auth_header = request.headers.get("authorization", "")
-            if auth_header.startswith("Bearer "):
-                token = auth_header[7:]  # Remove "Bearer " prefix
-                logger.info(f"Token found in Authorization header: {token[:20]}...")
-
-        if not token:
-            logger.warning("No authentication token found in request")
-            return None
-
-        # Decode JWT token and extract role claim
-        try:
-            payload = decode_access_token(token)
-            if not payload:
-                logger.warning("Failed to decode JWT token")
-                return None
-
-            logger.info(
-                f"JWT token decoded successfully. Payload keys: {list(payload.keys())}"
-            )
-
-            # Get role directly from token payload (no database query needed)
-            role = payload.get("role")
-            if role:
-                logger.info(f"Role found in JWT token: {role}")
-                return role
-            else:
-                logger.warning(
-                    f"No 'role' claim in JWT token. Available claims: {list(payload.keys())}"
-                )
-
-        except Exception as e:
-            logger.error(
-                f"Error decoding token for rate limit check: {e}", exc_info=True
-            )
-            return None
-
-        return None
+        # Role claim of the token decoded once for this request
+        role = get_auth_context(request).role
+        if role:
+            logger.debug(f"Role found in JWT token: {role}")
+        else:
+            logger.debug("No valid token with a 'role' claim in request")
+        return role
 
     def _get_user_identifier(self, request: Request) -> str:
-        """Get user identifier for rate limiting."""
+        """
+        Get user identifier for rate limiting.
+
+        Authenticated requests are limited per user (the ``sub`` claim of a
+        valid token), anonymous ones per client IP.
+        """
         # Try to get user ID from request state (set by auth middleware)
         if hasattr(request.state, "user") and request.state.user:
             user = request.state.user
@@ -279,6 +296,10 @@ class RateLimitMiddleware(BaseHTTPMiddleware):
             if user_id is not None:  # Handles user ID 0 correctly
                 return f"user:{user_id}"
 
+        subject = get_auth_context(request).subject
+        if subject:
+            return f"user:{subject}"
+
         # Use real client IP from proxy headers (nginx forwards X-Real-IP)
         real_ip = (
             request.headers.get("x-real-ip")
@@ -287,10 +308,13 @@ class RateLimitMiddleware(BaseHTTPMiddleware):
         )
         return f"ip:{real_ip}"
 
-    def _get_rate_limit(self, path: str) -> tuple[int, int]:
+    def _get_rate_limit(self, path: str, method: str = "GET") -> tuple[int, int]:
         """
         Get rate limit for endpoint.
 
+        Limits count per user and route template, so they cover all ids of a
+        route together (e.g. the status of every job a teacher is waiting on).
+
         Returns:
             Tuple of (max_requests, window_seconds)
         """
@@ -306,13 +330,20 @@ class RateLimitMiddleware(BaseHTTPMiddleware):
         ):
             return 10, 60
 
-        # Queue endpoints: 10 requests per minute
-        if "/queue" in path or "/jobs" in path:
-            return 10, 60
+        is_read = method in ("GET", "HEAD")
 
-        # Batch endpoints: 5 requests per minute
-        if "/batch" in path:
-            return 5, 60
+        # Job status polling: 600 requests per minute, for all jobs together
+        if is_read and _JOB_STATUS_PATH.search(path):
+            return 600, 60
+
+        # Queue endpoints: 60 writes per minute (one per student queued or
+        # cancelled); reads fall through to the default
+        if not is_read and ("/queue" in path or "/jobs" in path):
+            return 60, 60
+
+        # Batch endpoints: 10 writes per minute
+        if not is_read and "/batch" in path:
+            return 10, 60
 
         # File upload endpoints: 5 requests per minute (DoS prevention)
         if (
@@ -4,19 +4,23 @@ from __future__ import annotations
 
 import logging
 import re
-from typing import Callable
 from urllib.parse import urlparse
 from fastapi import Request, Response
-from starlette.middleware.base import BaseHTTPMiddleware
+from starlette.datastructures import MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
 from app.core.config import settings
 
 logger = logging.getLogger(__name__)
 
 
-class SecurityHeadersMiddleware(BaseHTTPMiddleware):
+class SecurityHeadersMiddleware:
     """
     Middleware to add security headers to all responses and perform CSRF validation.
 
+    Plain ASGI middleware: the headers are added to the ``http.response.start``
+    message, the response body is passed through untouched (streamed exports
+    are not buffered).
+
     In production, this middleware is disabled by default (ENABLE_BACKEND_SECURITY_HEADERS=false)
     because Nginx handles all security headers at the edge to avoid duplicates.
 
@@ -28,6 +32,7 @@ class SecurityHeadersMiddleware(BaseHTTPMiddleware):
        - Exempts OAuth callback routes (external redirects)
        - Exempts device-to-server API endpoints that use API key auth instead of cookies
          * /api/v1/attendance/scan - RFID scanner (Raspberry Pi) uses X-API-Key header
+         * /api/v1/attendance/scan/batch - buffered taps from the same scanner
          * These endpoints are NOT vulnerable to CSRF because:
            - They don't use session cookies for authentication
            - They use API keys which cannot be exploited via browser-based CSRF attacks
@@ -50,12 +55,16 @@ class SecurityHeadersMiddleware(BaseHTTPMiddleware):
         "/api/v1/auth/azure/callback",  # Azure AD OAuth callback
         "/api/v1/auth/azure",  # Azure AD OAuth initiation
         "/api/v1/attendance/scan",  # RFID scanner endpoint (device-to-server, no cookies)
+        "/api/v1/attendance/scan/batch",  # Buffered RFID taps (same scanner, API key)
     ]
 
     # Regex pattern to match any future OAuth callback routes
     # Matches: /api/v1/auth/*/callback
     CSRF_EXEMPT_PATTERN = re.compile(r"^/api/v1/auth/[^/]+/callback$")
 
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
     def _is_state_changing_request(self, request: Request) -> bool:
         """Check if request method is state-changing (requires CSRF protection)."""
         return request.method in ["POST", "PUT", "PATCH", "DELETE"]
@@ -154,17 +163,19 @@ class SecurityHeadersMiddleware(BaseHTTPMiddleware):
         )
         return False
 
-    async def dispatch(
-        self,
-        request: Request,
-        call_next: Callable,
-    ) -> Response:
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
         """
         Process request with CSRF validation and add security headers to response.
 
         CSRF validation happens BEFORE request is processed.
-        Security headers are added AFTER response is generated.
+        Security headers are added when the response starts.
         """
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        request = Request(scope)
+
         # CSRF Protection: Validate state-changing requests
         if self._is_state_changing_request(request):
             if not self._is_csrf_exempt_path(request.url.path):
@@ -174,37 +185,45 @@ class SecurityHeadersMiddleware(BaseHTTPMiddleware):
                         f"CSRF attack blocked: {request.method} {request.url.path} "
                         f"from {request.client.host if request.client else 'unknown'}"
                     )
-                    return Response(
+                    response = Response(
                         content="CSRF validation failed: Origin or Referer header does not match trusted origins",
                         status_code=403,
                     )
+                    await response(scope, receive, send)
+                    return
                 logger.debug(
                     f"CSRF validation passed for {request.method} {request.url.path}"
                 )
             else:
                 logger.debug(f"CSRF check skipped for exempt path: {request.url.path}")
 
-        # Process request
-        response = await call_next(request)
-
         # In production, nginx handles security headers to avoid duplicates
         if not settings.ENABLE_BACKEND_SECURITY_HEADERS:
-            return response
+            await self.app(scope, receive, send)
+            return
+
+        async def send_with_headers(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                self._add_security_headers(MutableHeaders(scope=message))
+            await send(message)
 
-        # Development mode: Add headers for testing without nginx
-        response.headers["X-Content-Type-Options"] = "nosniff"
-        response.headers["X-Frame-Options"] = "DENY"
-        response.headers["X-XSS-Protection"] = "1; mode=block"
-        response.headers["Referrer-Policy"] = "strict-origin-when-cross-origin"
+        await self.app(scope, receive, send_with_headers)
+
+    def _add_security_headers(self, headers: MutableHeaders) -> None:
+        """Development mode: Add headers for testing without nginx."""
+        headers["X-Content-Type-Options"] = "nosniff"
+        headers["X-Frame-Options"] = "DENY"
+        headers["X-XSS-Protection"] = "1; mode=block"
+        headers["Referrer-Policy"] = "strict-origin-when-cross-origin"
 
         # Content-Security-Policy for API
         # Note: Frontend (Next.js) should set its own CSP
-        response.headers["Content-Security-Policy"] = (
+        headers["Content-Security-Policy"] = (
             "default-src 'none'; frame-ancestors 'none'; base-uri 'self'"
         )
 
         # Permissions-Policy (formerly Feature-Policy)
-        response.headers["Permissions-Policy"] = (
+        headers["Permissions-Policy"] = (
             "geolocation=(), "
             "microphone=(), "
             "camera=(), "
@@ -220,8 +239,6 @@ class SecurityHeadersMiddleware(BaseHTTPMiddleware):
             # max-age=31536000 = 1 year
             # includeSubDomains: apply to all subdomains
             # preload: allow inclusion in browser HSTS preload lists
-            response.headers["Strict-Transport-Security"] = (
+            headers["Strict-Transport-Security"] = (
                 "max-age=31536000; includeSubDomains; preload"
             )
-
-        return response
@@ -21,45 +21,65 @@ from __future__ import annotations
 
 import logging
 from datetime import datetime, timedelta, timezone
-from typing import Callable
+from typing import Optional
 
-from fastapi import Request, Response
-from starlette.middleware.base import BaseHTTPMiddleware
+from fastapi import Request
+from starlette.datastructures import MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
 
 from app.core.config import settings
-from app.core.security import create_access_token, decode_access_token
+from app.api.middleware.auth_context import get_auth_context
+from app.core.security import create_access_token
 
 logger = logging.getLogger(__name__)
 
 
-class SlidingSessionMiddleware(BaseHTTPMiddleware):
-    """Renew the JWT cookie on each successful authenticated request."""
+class SlidingSessionMiddleware:
+    """
+    Renew the JWT cookie on each successful authenticated request.
 
-    async def dispatch(self, request: Request, call_next: Callable) -> Response:
-        response = await call_next(request)
+    Plain ASGI middleware: the ``Set-Cookie`` header is appended to the
+    ``http.response.start`` message, the body is passed through untouched.
+    """
 
-        # Only attempt renewal for successful responses to avoid renewing on
-        # 401/403 (which trigger the frontend logout flow) or 4xx/5xx errors.
-        if response.status_code >= 400:
-            return response
+    def __init__(self, app: ASGIApp):
+        self.app = app
 
-        token = request.cookies.get("access_token")
-        if not token:
-            return response
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
 
-        payload = decode_access_token(token)
-        if not payload:
-            return response
+        request = Request(scope)
+
+        async def send_with_cookie(message: Message) -> None:
+            # Only attempt renewal for successful responses to avoid renewing on
+            # 401/403 (which trigger the frontend logout flow) or 4xx/5xx errors.
+            if message["type"] == "http.response.start" and message["status"] < 400:
+                cookie = self._renewed_cookie(request)
+                if cookie:
+                    MutableHeaders(scope=message).append("Set-Cookie", cookie)
+            await send(message)
+
+        await self.app(scope, receive, send_with_cookie)
+
+    def _renewed_cookie(self, request: Request) -> Optional[str]:
+        """``Set-Cookie`` value with a fresh token, or None if no renewal is due."""
+        # Claims decoded earlier in this request (rate limiter or auth dependency)
+        auth = get_auth_context(request)
+        if auth.source != "cookie" or not auth.claims:
+            return None
+        payload = auth.claims
 
         exp = payload.get("exp")
         if not exp:
-            return response
+            return None
 
         try:
             expire_time = datetime.fromtimestamp(float(exp), tz=timezone.utc)
         except (TypeError, ValueError, OSError):
             # Malformed exp claim — skip renewal
-            return response
+            return None
 
         now = datetime.now(timezone.utc)
         remaining = expire_time - now
@@ -67,7 +87,7 @@ class SlidingSessionMiddleware(BaseHTTPMiddleware):
         threshold = timedelta(minutes=settings.SESSION_RENEW_IF_EXPIRES_WITHIN_MINUTES)
         if remaining > threshold:
             # Token still has plenty of time left — no renewal needed.
-            return response
+            return None
 
         # Recover the original session start time from the ss claim so that
         # the absolute max-session duration is preserved across renewals.
@@ -87,12 +107,12 @@ class SlidingSessionMiddleware(BaseHTTPMiddleware):
                     "Sliding session: max session age reached — "
                     "not renewing, token will expire naturally"
                 )
-                return response
+                return None
 
         # Token is within the renewal window; issue a fresh one.
         sub = payload.get("sub")
         if not sub:
-            return response
+            return None
 
         role = payload.get("role")
         school_id = payload.get("school_id")
@@ -118,10 +138,8 @@ class SlidingSessionMiddleware(BaseHTTPMiddleware):
         if getattr(settings, "COOKIE_DOMAIN", None):
             cookie_parts.append(f"Domain={settings.COOKIE_DOMAIN}")
 
-        response.headers.append("Set-Cookie", "; ".join(cookie_parts))
         logger.debug(
             f"Sliding session: renewed token "
             f"(was expiring in {int(remaining.total_seconds() // 60)} min)"
         )
-
-        return response
+        return "; ".join(cookie_parts)
@@ -2,11 +2,13 @@ from __future__ import annotations
 from fastapi import Header, HTTPException, status, Depends, Cookie, Request
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from sqlalchemy.orm import Session
-from app.infra.db.session import SessionLocal
+from app.infra.db.session import SessionLocal, open_read_session
 from app.infra.db.models import User
 from app.core.config import settings
 from app.core.auth_utils import normalize_email
 from app.core.security import decode_access_token_and_check_expiry
+from app.api.middleware.auth_context import get_auth_context
+from app.services.identity_cache import load_identity
 import logging
 
 logger = logging.getLogger(__name__)
@@ -23,7 +25,91 @@ def get_db():
         db.close()
 
 
-async def get_current_user_dev(
+def get_read_db(db: Session = Depends(get_db)):
+    """
+    Session for read-only (analytics and export) endpoints.
+
+    Uses the read replica (DATABASE_READ_URL) while it is reachable and not
+    lagging; otherwise the request's primary session from ``get_db``. Never
+    write through it.
+    """
+    replica = open_read_session()
+    if replica is None:
+        yield db
+        return
+    try:
+        yield replica
+    finally:
+        replica.close()
+
+
+def _user_from_token(db: Session, token: str, request: Request | None = None) -> User:
+    """
+    Validate a JWT and load its (non-archived) user.
+
+    With a request, the claims already decoded for it (see
+    app/api/middleware/auth_context.py) are reused and the user is stored on
+    ``request.state.user``.
+
+    Raises:
+        HTTPException 401: Invalid or expired token, unknown user
+        HTTPException 403: Archived user or school_id mismatch
+    """
+    # Decode and validate JWT (once per request)
+    auth = get_auth_context(request) if request is not None else None
+    if auth is not None and auth.token == token:
+        payload, is_expired = auth.claims, auth.expired
+    else:
+        payload, is_expired = decode_access_token_and_check_expiry(token)
+    if not payload:
+        detail = "Session expired" if is_expired else "Invalid or expired token"
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail=detail,
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+
+    # Extract user email from token
+    email = payload.get("sub")
+    if not email:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Invalid token payload",
+        )
+
+    # Resolve the (case-insensitive) email, from the identity cache if possible
+    token_school_id = payload.get("school_id")
+    user = load_identity(db, email, token_school_id)
+    if not user:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="User not found",
+        )
+
+    # Validate user is not archived
+    if user.archived:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="User account is archived",
+        )
+
+    # Validate school_id matches token claim (if present in token)
+    if token_school_id is not None and user.school_id != token_school_id:
+        logger.warning(
+            f"School ID mismatch for user {user.email}: "
+            f"token={token_school_id}, user={user.school_id}"
+        )
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="School ID mismatch",
+        )
+
+    if request is not None:
+        request.state.user = user
+    return user
+
+
+def get_current_user_dev(
     request: Request,
     db: Session = Depends(get_db),
     x_user_email: str | None = Header(default=None, alias="X-User-Email"),
@@ -45,6 +131,11 @@ async def get_current_user_dev(
     - JWT tokens are validated and decoded
     - User must not be archived (archived=False)
     - School ID must match the token claim
+
+    This is a plain (sync) function on purpose: the user lookup is a blocking
+    SQLAlchemy query, so FastAPI must run it in its threadpool instead of on
+    the event loop. Token users are resolved through the identity cache
+    (app/services/identity_cache.py), so most requests skip that query.
     """
 
     # DEVELOPMENT: Allow X-User-Email header ONLY when explicitly enabled
@@ -95,58 +186,10 @@ async def get_current_user_dev(
             headers={"WWW-Authenticate": "Bearer"},
         )
 
-    # Decode and validate JWT
-    payload, is_expired = decode_access_token_and_check_expiry(token)
-    if not payload:
-        detail = "Session expired" if is_expired else "Invalid or expired token"
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail=detail,
-            headers={"WWW-Authenticate": "Bearer"},
-        )
-
-    # Extract user email from token
-    email = payload.get("sub")
-    if not email:
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Invalid token payload",
-        )
+    return _user_from_token(db, token, request)
 
-    # Normalize email for case-insensitive lookup
-    normalized_email = normalize_email(email)
 
-    # Get user from database
-    user = db.query(User).filter(User.email == normalized_email).first()
-    if not user:
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="User not found",
-        )
-
-    # Validate user is not archived
-    if user.archived:
-        raise HTTPException(
-            status_code=status.HTTP_403_FORBIDDEN,
-            detail="User account is archived",
-        )
-
-    # Validate school_id matches token claim (if present in token)
-    token_school_id = payload.get("school_id")
-    if token_school_id is not None and user.school_id != token_school_id:
-        logger.warning(
-            f"School ID mismatch for user {user.email}: "
-            f"token={token_school_id}, user={user.school_id}"
-        )
-        raise HTTPException(
-            status_code=status.HTTP_403_FORBIDDEN,
-            detail="School ID mismatch",
-        )
-
-    return user
-
-
-async def get_current_user_prod(
+def get_current_user_prod(
     request: Request,
     db: Session = Depends(get_db),
     access_token_cookie: str | None = Cookie(default=None, alias="access_token"),
@@ -164,6 +207,9 @@ async def get_current_user_prod(
     - JWT tokens are validated and decoded
     - User must not be archived (archived=False)
     - School ID must match the token claim
+
+    Sync on purpose, like get_current_user_dev: FastAPI runs it in its
+    threadpool so the user query never blocks the event loop.
     """
 
     # PRODUCTION: Use cookie or bearer token ONLY
@@ -187,55 +233,7 @@ async def get_current_user_prod(
             headers={"WWW-Authenticate": "Bearer"},
         )
 
-    # Decode and validate JWT
-    payload, is_expired = decode_access_token_and_check_expiry(token)
-    if not payload:
-        detail = "Session expired" if is_expired else "Invalid or expired token"
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail=detail,
-            headers={"WWW-Authenticate": "Bearer"},
-        )
-
-    # Extract user email from token
-    email = payload.get("sub")
-    if not email:
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Invalid token payload",
-        )
-
-    # Normalize email for case-insensitive lookup
-    normalized_email = normalize_email(email)
-
-    # Get user from database
-    user = db.query(User).filter(User.email == normalized_email).first()
-    if not user:
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="User not found",
-        )
-
-    # Validate user is not archived
-    if user.archived:
-        raise HTTPException(
-            status_code=status.HTTP_403_FORBIDDEN,
-            detail="User account is archived",
-        )
-
-    # Validate school_id matches token claim (if present in token)
-    token_school_id = payload.get("school_id")
-    if token_school_id is not None and user.school_id != token_school_id:
-        logger.warning(
-            f"School ID mismatch for user {user.email}: "
-            f"token={token_school_id}, user={user.school_id}"
-        )
-        raise HTTPException(
-            status_code=status.HTTP_403_FORBIDDEN,
-            detail="School ID mismatch",
-        )
-
-    return user
+    return _user_from_token(db, token, request)
 
 
 async def verify_rfid_api_key(
@@ -11,7 +11,7 @@ from fastapi.responses import StreamingResponse
 from sqlalchemy import or_, func, asc, desc, literal
 from sqlalchemy.orm import Session
 
-from app.api.v1.deps import get_db, get_current_user
+from app.api.v1.deps import get_db, get_read_db, get_current_user
 from app.api.v1.utils.csv_sanitization import sanitize_csv_value
 from app.infra.db.models import (
     User,
@@ -22,6 +22,8 @@ from app.infra.db.models import (
     Course,
     Subject,
 )
+from app.services.identity_cache import invalidate_identity
+from app.services.rfid_card_cache import clear_rfid_card_cache, invalidate_rfid_user
 
 router = APIRouter(prefix="/admin/students", tags=["admin-students"])
 logger = logging.getLogger(__name__)
@@ -289,7 +291,7 @@ def list_admin_students(
 
 @router.get("/export.csv")
 def export_students_csv(
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
     current_user=Depends(get_current_user),
     q: Optional[str] = Query(None),
     status: Optional[str] = Query("active"),
@@ -534,6 +536,7 @@ def update_admin_student(
     )
     if not u:
         raise HTTPException(status_code=404, detail="Student niet gevonden")
+    old_email = u.email
 
     # unique email binnen school
     new_email = payload.get("email")
@@ -583,6 +586,8 @@ def update_admin_student(
 
     db.commit()
     db.refresh(u)
+    invalidate_rfid_user(u.id)
+    invalidate_identity(old_email, u.email)
 
     # course_name voor response
     csub = _course_name_subquery(db, current_user.school_id)
@@ -628,8 +633,11 @@ def delete_admin_student(
     if not u:
         raise HTTPException(status_code=404, detail="Student niet gevonden")
 
+    email = u.email
     db.delete(u)
     db.commit()
+    invalidate_rfid_user(student_id)
+    invalidate_identity(email)
     return Response(status_code=204)
 
 
@@ -685,6 +693,7 @@ def import_students_csv(
 
     created = 0
     updated = 0
+    updated_emails: List[str] = []
     errors: List[Dict[str, Any]] = []
 
     for i, row in enumerate(reader, start=2):  # start=2 vanwege header op regel 1
@@ -748,6 +757,7 @@ def import_students_csv(
                 if last_name is not None:
                     u.last_name = last_name
                 updated += 1
+                updated_emails.append(email)
             else:
                 u = User(
                     school_id=current_user.school_id,
@@ -778,6 +788,8 @@ def import_students_csv(
             continue
 
     db.commit()
+    clear_rfid_card_cache()
+    invalidate_identity(*updated_emails)
 
     return {
         "created": created,
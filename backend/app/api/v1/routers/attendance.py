@@ -4,17 +4,18 @@
 
 from __future__ import annotations
 from typing import Optional
-from datetime import datetime, timedelta, timezone
+from datetime import date, datetime, timedelta, timezone
 import logging
 from fastapi import APIRouter, Depends, HTTPException, Query, status
 from sqlalchemy.orm import Session
 from sqlalchemy import func, and_, or_, case
 
-from app.api.v1.deps import get_db, get_current_user, verify_rfid_api_key
+from app.api.v1.deps import get_db, get_read_db, get_current_user, verify_rfid_api_key
 from app.infra.db.models import (
     User,
     RFIDCard,
     AttendanceEvent,
+    AttendanceAggregate,
     Project,
     CourseEnrollment,
     Course,
@@ -22,6 +23,9 @@ from app.infra.db.models import (
 from app.api.v1.schemas.attendance import (
     RFIDScanRequest,
     RFIDScanResponse,
+    RFIDBatchScanRequest,
+    RFIDBatchScanResponse,
+    RFIDBatchTapResult,
     AttendanceEventOut,
     AttendanceEventUpdate,
     AttendanceEventListOut,
@@ -43,6 +47,32 @@ from app.api.v1.schemas.attendance import (
     EngagementStudent,
     ensure_aware_utc,
 )
+from app.services.attendance_aggregates import (
+    add_school_seconds,
+    counted_seconds_expr,
+    get_attendance_aggregate,
+    lesson_blocks_for,
+    sync_attendance_aggregates,
+)
+from app.services.attendance_rollups import (
+    attendance_signals,
+    daily_totals,
+    presence_hours,
+    refresh_attendance_rollups,
+    sync_attendance_rollups,
+    user_totals,
+)
+from app.services.attendance_sessions import (
+    CARD_NOT_FOUND_MESSAGE,
+    FORGOTTEN_CHECKOUT_SESSION_MINUTES,
+    FORGOTTEN_CHECKOUT_THRESHOLD_HOURS,
+    apply_rfid_taps,
+    cleanup_expired_sessions,
+)
+from app.services.rfid_card_cache import (
+    get_rfid_card_cache_stats,
+    resolve_rfid_card,
+)
 
 logger = logging.getLogger(__name__)
 router = APIRouter(prefix="/attendance", tags=["attendance"])
@@ -65,59 +95,38 @@ def apply_project_date_filter(query, project: Project):
     return query
 
 
-FORGOTTEN_CHECKOUT_THRESHOLD_HOURS = 12
-"""Sessions open longer than this many hours are treated as forgotten check-outs."""
-
-FORGOTTEN_CHECKOUT_SESSION_MINUTES = 15
-"""Duration (minutes) assigned to auto-closed sessions that exceeded the threshold."""
-
-
-def cleanup_expired_sessions(db: Session) -> int:
+def _attendance_totals_query(db: Session):
     """
-    Auto-checkout attendance sessions that have been open for more than
-    FORGOTTEN_CHECKOUT_THRESHOLD_HOURS hours.
-
-    When a student forgets to check out the session is closed with
-    check_out = check_in + FORGOTTEN_CHECKOUT_SESSION_MINUTES minutes so
-    that an unreasonably long session does not inflate their total hours.
-
-    Args:
-        db: SQLAlchemy database session.
-
-    Returns:
-        Number of sessions that were automatically closed.
+    Per-user sums of school, approved external and pending external seconds
+    over closed events (columns: user_id, school, approved, pending).
     """
-    threshold = datetime.now(timezone.utc) - timedelta(
-        hours=FORGOTTEN_CHECKOUT_THRESHOLD_HOURS
-    )
-
-    expired_sessions = (
-        db.query(AttendanceEvent)
-        .filter(
-            AttendanceEvent.is_external.is_(False),
-            AttendanceEvent.check_out.is_(None),
-            AttendanceEvent.check_in <= threshold,
-        )
-        .all()
+    duration = func.extract(
+        "epoch", AttendanceEvent.check_out - AttendanceEvent.check_in
     )
 
-    count = 0
-    for session in expired_sessions:
-        check_in_aware = ensure_aware_utc(session.check_in)
-        session.check_out = check_in_aware + timedelta(
-            minutes=FORGOTTEN_CHECKOUT_SESSION_MINUTES
-        )
-        session.updated_at = datetime.now(timezone.utc)
-        count += 1
+    def _sum_where(condition):
+        return func.coalesce(func.sum(case((condition, duration), else_=0)), 0)
 
-    if count:
-        db.commit()
-        logger.info(
-            f"Auto-checked out {count} expired session(s) "
-            f"(>{FORGOTTEN_CHECKOUT_THRESHOLD_HOURS}h open)"
+    return (
+        db.query(
+            AttendanceEvent.user_id.label("user_id"),
+            _sum_where(AttendanceEvent.is_external.is_(False)).label("school"),
+            _sum_where(
+                and_(
+                    AttendanceEvent.is_external.is_(True),
+                    AttendanceEvent.approval_status == "approved",
+                )
+            ).label("approved"),
+            _sum_where(
+                and_(
+                    AttendanceEvent.is_external.is_(True),
+                    AttendanceEvent.approval_status == "pending",
+                )
+            ).label("pending"),
         )
-
-    return count
+        .filter(AttendanceEvent.check_out.isnot(None))
+        .group_by(AttendanceEvent.user_id)
+    )
 
 
 # ============ RFID Scan Endpoint ============
@@ -135,36 +144,27 @@ def rfid_scan(
     Handles check-in/check-out logic:
     - If no open session: create new check-in
     - If open session exists: close it (check-out)
+    - If that session is open longer than FORGOTTEN_CHECKOUT_THRESHOLD_HOURS:
+      close it as a forgotten check-out and create a new check-in
+
+    Other users' forgotten check-outs are closed by the scheduler, not here, so a
+    scan only looks up the card and the user's open session. Card lookups are
+    cached per worker (see app.services.rfid_card_cache).
 
     Returns user info and action taken
     """
     try:
-        # Clean up any sessions that have been open longer than the threshold
-        cleanup_expired_sessions(db)
-
-        # Find RFID card
-        card = (
-            db.query(RFIDCard)
-            .filter(RFIDCard.uid == request.uid, RFIDCard.is_active.is_(True))
-            .first()
-        )
-
-        if not card:
-            return RFIDScanResponse(
-                status="not_found",
-                message="Geen gebruiker gevonden met deze kaart. Vraag een docent om de kaart te activeren.",
-            )
+        # Resolve card -> user (cached per worker)
+        user_info = resolve_rfid_card(db, request.uid)
 
-        # Get user
-        user = db.query(User).filter(User.id == card.user_id).first()
-        if not user:
-            return RFIDScanResponse(status="error", message="Gebruiker niet gevonden")
+        if not user_info:
+            return RFIDScanResponse(status="not_found", message=CARD_NOT_FOUND_MESSAGE)
 
         # Check for open session
         open_session = (
             db.query(AttendanceEvent)
             .filter(
-                AttendanceEvent.user_id == user.id,
+                AttendanceEvent.user_id == user_info["id"],
                 AttendanceEvent.is_external.is_(False),
                 AttendanceEvent.check_out.is_(None),
             )
@@ -172,68 +172,128 @@ def rfid_scan(
             .first()
         )
 
-        if open_session:
-            # Check-out: close the session
-            open_session.check_out = datetime.now(timezone.utc)
+        now = datetime.now(timezone.utc)
+        if open_session and now - ensure_aware_utc(open_session.check_in) > timedelta(
+            hours=FORGOTTEN_CHECKOUT_THRESHOLD_HOURS
+        ):
+            # Forgotten check-out: close it like the scheduler would and treat
+            # this tap as a new check-in
+            check_in_aware = ensure_aware_utc(open_session.check_in)
+            open_session.check_out = check_in_aware + timedelta(
+                minutes=FORGOTTEN_CHECKOUT_SESSION_MINUTES
+            )
+            open_session.updated_at = now
+            new_event = AttendanceEvent(
+                user_id=user_info["id"],
+                check_in=now,
+                is_external=False,
+                source="rfid",
+            )
+            db.add(new_event)
+            db.flush()
+            add_school_seconds(
+                db, user_info["id"], FORGOTTEN_CHECKOUT_SESSION_MINUTES * 60
+            )
+            event = {
+                "id": new_event.id,
+                "check_in": now.isoformat(),
+                "check_out": None,
+            }
+            refresh_attendance_rollups(db, [(user_info["id"], check_in_aware)])
             db.commit()
-            db.refresh(open_session)
 
-            # Ensure both datetimes are timezone-aware for duration calculation
+            return RFIDScanResponse(
+                status="ok", action="check_in", user=user_info, event=event
+            )
+        elif open_session:
+            # Check-out: close the session and add it to the user's totals
+            open_session.check_out = now
             check_in_aware = ensure_aware_utc(open_session.check_in)
-            check_out_aware = ensure_aware_utc(open_session.check_out)
-            duration_seconds = int((check_out_aware - check_in_aware).total_seconds())
+            duration_seconds = int((now - check_in_aware).total_seconds())
+            event = {
+                "id": open_session.id,
+                "check_in": open_session.check_in.isoformat(),
+                "check_out": now.isoformat(),
+                "duration_seconds": duration_seconds,
+            }
+            db.flush()
+            add_school_seconds(db, user_info["id"], duration_seconds)
+            # Only a session checked in before today touches a rolled-up day;
+            # refreshed in the same transaction, so a scan is stored entirely
+            # or not at all and a retried tap cannot turn into a check-in
+            refresh_attendance_rollups(db, [(user_info["id"], check_in_aware)])
+            db.commit()
 
             return RFIDScanResponse(
-                status="ok",
-                action="check_out",
-                user={
-                    "id": user.id,
-                    "name": user.name,
-                    "email": user.email,
-                    "class_name": user.class_name,
-                },
-                event={
-                    "id": open_session.id,
-                    "check_in": open_session.check_in.isoformat(),
-                    "check_out": open_session.check_out.isoformat(),
-                    "duration_seconds": duration_seconds,
-                },
+                status="ok", action="check_out", user=user_info, event=event
             )
         else:
             # Check-in: create new session
             new_event = AttendanceEvent(
-                user_id=user.id,
-                check_in=datetime.now(timezone.utc),
+                user_id=user_info["id"],
+                check_in=now,
                 is_external=False,
                 source="rfid",
             )
             db.add(new_event)
+            db.flush()
+            event = {
+                "id": new_event.id,
+                "check_in": now.isoformat(),
+                "check_out": None,
+            }
             db.commit()
-            db.refresh(new_event)
 
             return RFIDScanResponse(
-                status="ok",
-                action="check_in",
-                user={
-                    "id": user.id,
-                    "name": user.name,
-                    "email": user.email,
-                    "class_name": user.class_name,
-                },
-                event={
-                    "id": new_event.id,
-                    "check_in": new_event.check_in.isoformat(),
-                    "check_out": None,
-                },
+                status="ok", action="check_in", user=user_info, event=event
             )
 
     except Exception as e:
+        db.rollback()
         logger.error(f"Error in RFID scan: {str(e)}")
         return RFIDScanResponse(
             status="error", message="Er is een onverwachte fout opgetreden"
         )
 
 
+@router.post("/scan/batch", response_model=RFIDBatchScanResponse)
+def rfid_scan_batch(
+    request: RFIDBatchScanRequest,
+    db: Session = Depends(get_db),
+    _: None = Depends(verify_rfid_api_key),
+):
+    """
+    Batch RFID scan endpoint for readers that buffer taps (e.g. while offline)
+
+    Authentication: Requires X-API-Key header
+
+    Taps are paired into check-ins/check-outs per user in timestamp order and
+    written in one transaction. Every tap gets a result (same order as the
+    request): ok, duplicate (already processed, safe to drop), not_found or
+    rejected. If the transaction fails nothing is written and a 500 is
+    returned, so the reader can resend the whole batch.
+    """
+    try:
+        results = apply_rfid_taps(
+            db, [(tap.uid, tap.timestamp) for tap in request.taps]
+        )
+        db.commit()
+    except Exception as e:
+        db.rollback()
+        logger.error(f"Error in RFID batch scan: {str(e)}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Er is een onverwachte fout opgetreden",
+        )
+
+    return RFIDBatchScanResponse(
+        results=[
+            RFIDBatchTapResult(index=index, uid=tap.uid, **result)
+            for index, (tap, result) in enumerate(zip(request.taps, results))
+        ]
+    )
+
+
 # ============ Attendance Events ============
 
 
@@ -412,6 +472,7 @@ def update_attendance_event(
                     detail="check_out must be after check_in",
                 )
 
+    old_check_in = event.check_in
     for field, value in update_data.items():
         setattr(event, field, value)
 
@@ -428,6 +489,10 @@ def update_attendance_event(
             (check_out_aware - check_in_aware).total_seconds()
         )
 
+    sync_attendance_aggregates(db, [event_out.user_id])
+    sync_attendance_rollups(
+        db, [(event_out.user_id, old_check_in), (event_out.user_id, event_out.check_in)]
+    )
     return event_out
 
 
@@ -460,8 +525,11 @@ def delete_attendance_event(
             status_code=status.HTTP_404_NOT_FOUND, detail="Event not found"
         )
 
+    user_id, check_in = event.user_id, event.check_in
     db.delete(event)
     db.commit()
+    sync_attendance_aggregates(db, [user_id])
+    sync_attendance_rollups(db, [(user_id, check_in)])
 
 
 @router.post("/events/bulk-delete", status_code=status.HTTP_204_NO_CONTENT)
@@ -481,7 +549,7 @@ def bulk_delete_events(
 
     # First, get the valid event IDs that belong to users in the same school
     valid_event_ids = (
-        db.query(AttendanceEvent.id)
+        db.query(AttendanceEvent.id, AttendanceEvent.user_id, AttendanceEvent.check_in)
         .join(User, AttendanceEvent.user_id == User.id)
         .filter(
             AttendanceEvent.id.in_(request.event_ids),
@@ -492,6 +560,7 @@ def bulk_delete_events(
 
     # Extract the IDs from the result tuples
     valid_ids = [event_id[0] for event_id in valid_event_ids]
+    affected_user_ids = {event_id[1] for event_id in valid_event_ids}
 
     # Now delete without join
     if valid_ids:
@@ -502,6 +571,8 @@ def bulk_delete_events(
         )
 
         db.commit()
+        sync_attendance_aggregates(db, affected_user_ids)
+        sync_attendance_rollups(db, [(row[1], row[2]) for row in valid_event_ids])
 
         logger.info(
             f"Bulk deleted {deleted_count} attendance events by user {current_user.id}"
@@ -533,28 +604,35 @@ def checkout_all(
 
     now = datetime.now(timezone.utc)
 
-    # Get the IDs of open sessions in this school via a subquery
-    open_session_ids = (
-        db.query(AttendanceEvent.id)
+    # Get the open sessions in this school
+    open_sessions = (
+        db.query(AttendanceEvent.id, AttendanceEvent.user_id, AttendanceEvent.check_in)
         .join(User, AttendanceEvent.user_id == User.id)
         .filter(
             User.school_id == current_user.school_id,
             AttendanceEvent.is_external.is_(False),
             AttendanceEvent.check_out.is_(None),
         )
-        .subquery()
+        .all()
     )
+    open_session_ids = [session_id for session_id, _, _ in open_sessions]
 
-    updated_count = (
-        db.query(AttendanceEvent)
-        .filter(AttendanceEvent.id.in_(open_session_ids))
-        .update(
-            {"check_out": now, "updated_at": now},
-            synchronize_session=False,
+    updated_count = 0
+    if open_session_ids:
+        updated_count = (
+            db.query(AttendanceEvent)
+            .filter(AttendanceEvent.id.in_(open_session_ids))
+            .update(
+                {"check_out": now, "updated_at": now},
+                synchronize_session=False,
+            )
         )
-    )
 
     db.commit()
+    sync_attendance_aggregates(db, {user_id for _, user_id, _ in open_sessions})
+    sync_attendance_rollups(
+        db, [(user_id, check_in) for _, user_id, check_in in open_sessions]
+    )
 
     logger.info(f"Checked out {updated_count} open sessions by user {current_user.id}")
 
@@ -585,6 +663,23 @@ def cleanup_expired(
     return {"cleaned_up": count}
 
 
+@router.get("/scan/cache-stats")
+def rfid_card_cache_stats(
+    current_user: User = Depends(get_current_user),
+):
+    """
+    Hit rate and size of the RFID card lookup cache of this worker process
+    (teacher/admin only).
+    """
+    if current_user.role not in ["teacher", "admin"]:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Only teachers and admins can view scan cache metrics",
+        )
+
+    return get_rfid_card_cache_stats()
+
+
 # ============ External Work ============
 @router.post(
     "/external", response_model=AttendanceEventOut, status_code=status.HTTP_201_CREATED
@@ -627,6 +722,8 @@ def create_external_work(
     check_out_aware = ensure_aware_utc(new_event.check_out)
     event_out.duration_seconds = int((check_out_aware - check_in_aware).total_seconds())
 
+    sync_attendance_aggregates(db, [current_user.id])
+    sync_attendance_rollups(db, [(current_user.id, new_event.check_in)])
     return event_out
 
 
@@ -669,7 +766,10 @@ def approve_external_work(
     db.commit()
     db.refresh(event)
 
-    return AttendanceEventOut.model_validate(event)
+    event_out = AttendanceEventOut.model_validate(event)
+    sync_attendance_aggregates(db, [event_out.user_id])
+    sync_attendance_rollups(db, [(event_out.user_id, event_out.check_in)])
+    return event_out
 
 
 @router.patch("/external/{event_id}/reject", response_model=AttendanceEventOut)
@@ -716,7 +816,10 @@ def reject_external_work(
     db.commit()
     db.refresh(event)
 
-    return AttendanceEventOut.model_validate(event)
+    event_out = AttendanceEventOut.model_validate(event)
+    sync_attendance_aggregates(db, [event_out.user_id])
+    sync_attendance_rollups(db, [(event_out.user_id, event_out.check_in)])
+    return event_out
 
 
 @router.post("/external/bulk-approve", status_code=status.HTTP_204_NO_CONTENT)
@@ -736,7 +839,7 @@ def bulk_approve_external_work(
 
     # First, get the valid event IDs that belong to users in the same school
     valid_event_ids = (
-        db.query(AttendanceEvent.id)
+        db.query(AttendanceEvent.id, AttendanceEvent.user_id, AttendanceEvent.check_in)
         .join(User, AttendanceEvent.user_id == User.id)
         .filter(
             AttendanceEvent.id.in_(request.event_ids),
@@ -748,6 +851,7 @@ def bulk_approve_external_work(
 
     # Extract the IDs from the result tuples
     valid_ids = [event_id[0] for event_id in valid_event_ids]
+    affected_user_ids = {event_id[1] for event_id in valid_event_ids}
 
     # Now update without join
     if valid_ids:
@@ -766,6 +870,8 @@ def bulk_approve_external_work(
         )
 
         db.commit()
+        sync_attendance_aggregates(db, affected_user_ids)
+        sync_attendance_rollups(db, [(row[1], row[2]) for row in valid_event_ids])
 
         logger.info(
             f"Bulk approved {updated_count} external work events by user {current_user.id}"
@@ -802,62 +908,38 @@ def get_my_attendance(
                 status_code=status.HTTP_404_NOT_FOUND, detail="Project not found"
             )
 
-    # Calculate totals - build base queries
-    school_query = db.query(
-        func.sum(
-            func.extract("epoch", AttendanceEvent.check_out - AttendanceEvent.check_in)
-        )
-    ).filter(
-        AttendanceEvent.user_id == current_user.id,
-        AttendanceEvent.is_external.is_(False),
-        AttendanceEvent.check_out.isnot(None),
-    )
-
-    external_approved_query = db.query(
-        func.sum(
-            func.extract("epoch", AttendanceEvent.check_out - AttendanceEvent.check_in)
+    # Without a project the all-time totals come from the materialized aggregate
+    if project is None:
+        agg = get_attendance_aggregate(db, current_user.id)
+        school_seconds = agg.total_school_seconds if agg else 0
+        external_approved_seconds = agg.total_external_approved_seconds if agg else 0
+        external_pending_seconds = agg.total_external_pending_seconds if agg else 0
+        return AttendanceTotals(
+            user_id=current_user.id,
+            total_school_seconds=int(school_seconds),
+            total_external_approved_seconds=int(external_approved_seconds),
+            total_external_pending_seconds=int(external_pending_seconds),
+            lesson_blocks=lesson_blocks_for(
+                int(school_seconds) + int(external_approved_seconds)
+            ),
         )
-    ).filter(
-        AttendanceEvent.user_id == current_user.id,
-        AttendanceEvent.is_external.is_(True),
-        AttendanceEvent.approval_status == "approved",
-        AttendanceEvent.check_out.isnot(None),
-    )
 
-    external_pending_query = db.query(
-        func.sum(
-            func.extract("epoch", AttendanceEvent.check_out - AttendanceEvent.check_in)
-        )
-    ).filter(
-        AttendanceEvent.user_id == current_user.id,
-        AttendanceEvent.is_external.is_(True),
-        AttendanceEvent.approval_status == "pending",
-        AttendanceEvent.check_out.isnot(None),
+    # Project totals only count events within the project's date range
+    totals_query = apply_project_date_filter(
+        _attendance_totals_query(db).filter(AttendanceEvent.user_id == current_user.id),
+        project,
     )
-
-    # Apply project date range filter if project is provided
-    if project:
-        school_query = apply_project_date_filter(school_query, project)
-        external_approved_query = apply_project_date_filter(
-            external_approved_query, project
-        )
-        external_pending_query = apply_project_date_filter(
-            external_pending_query, project
-        )
-
-    school_seconds = school_query.scalar() or 0
-    external_approved_seconds = external_approved_query.scalar() or 0
-    external_pending_seconds = external_pending_query.scalar() or 0
-
-    total_seconds = int(school_seconds) + int(external_approved_seconds)
-    lesson_blocks = round(total_seconds / (75 * 60), 1)
+    row = totals_query.first()
+    school_seconds = int(row.school) if row else 0
+    external_approved_seconds = int(row.approved) if row else 0
+    external_pending_seconds = int(row.pending) if row else 0
 
     return AttendanceTotals(
         user_id=current_user.id,
-        total_school_seconds=int(school_seconds),
-        total_external_approved_seconds=int(external_approved_seconds),
-        total_external_pending_seconds=int(external_pending_seconds),
-        lesson_blocks=lesson_blocks,
+        total_school_seconds=school_seconds,
+        total_external_approved_seconds=external_approved_seconds,
+        total_external_pending_seconds=external_pending_seconds,
+        lesson_blocks=lesson_blocks_for(school_seconds + external_approved_seconds),
     )
 
 
@@ -920,7 +1002,7 @@ def get_current_presence(
 
 @router.get("/export")
 def export_attendance(
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
     current_user: User = Depends(get_current_user),
     start_date: Optional[datetime] = Query(None),
     end_date: Optional[datetime] = Query(None),
@@ -1043,8 +1125,8 @@ def get_attendance_overview(
     When project_id is provided, only counts events within the project's date range
     When course_id is provided, filters to students enrolled in that course
 
-    Note: Pagination happens after computing all aggregations to maintain
-    correct global ranking. For large datasets, consider using a materialized view.
+    All-time totals are read from AttendanceAggregate; ranking and pagination
+    happen in SQL.
     """
     if current_user.role not in ["teacher", "admin"]:
         raise HTTPException(
@@ -1067,9 +1149,38 @@ def get_attendance_overview(
                 status_code=status.HTTP_404_NOT_FOUND, detail="Project not found"
             )
 
+    # Totals per student: the materialized aggregate, or a live grouped query
+    # when only events within the project's date range may count
+    if project is None:
+        school_col = AttendanceAggregate.total_school_seconds
+        approved_col = AttendanceAggregate.total_external_approved_seconds
+        pending_col = AttendanceAggregate.total_external_pending_seconds
+        query = db.query(User, school_col, approved_col, pending_col).outerjoin(
+            AttendanceAggregate, AttendanceAggregate.user_id == User.id
+        )
+        counted = counted_seconds_expr()
+    else:
+        totals = apply_project_date_filter(
+            _attendance_totals_query(db), project
+        ).subquery()
+        school_col, approved_col, pending_col = (
+            totals.c.school,
+            totals.c.approved,
+            totals.c.pending,
+        )
+        query = db.query(User, school_col, approved_col, pending_col).outerjoin(
+            totals, totals.c.user_id == User.id
+        )
+        counted = func.coalesce(school_col, 0) + func.coalesce(approved_col, 0)
+
+    query = query.filter(
+        User.school_id == current_user.school_id,
+        User.role == "student",
+        User.archived.is_(False),
+    )
+
     # Get students based on course filter
     if course_id:
-        # Get students enrolled in the specified course
         student_ids = (
             db.query(CourseEnrollment.student_id)
             .filter(
@@ -1078,20 +1189,7 @@ def get_attendance_overview(
             )
             .subquery()
         )
-
-        query = db.query(User).filter(
-            User.id.in_(student_ids),
-            User.school_id == current_user.school_id,
-            User.role == "student",
-            User.archived.is_(False),
-        )
-    else:
-        # Get all students in school
-        query = db.query(User).filter(
-            User.school_id == current_user.school_id,
-            User.role == "student",
-            User.archived.is_(False),
-        )
+        query = query.filter(User.id.in_(student_ids))
 
     # Apply search filter
     if q:
@@ -1103,108 +1201,38 @@ def get_attendance_overview(
             )
         )
 
-    # Fetch all students (we need to compute aggregations for ranking)
-    # Note: For large datasets, this should be optimized with a materialized view
-    students = query.all()
-
-    result = []
-    for student in students:
-        # Build base query for school hours with optional date filter
-        school_query = db.query(
-            func.sum(
-                func.extract(
-                    "epoch", AttendanceEvent.check_out - AttendanceEvent.check_in
-                )
-            )
-        ).filter(
-            AttendanceEvent.user_id == student.id,
-            AttendanceEvent.is_external.is_(False),
-            AttendanceEvent.check_out.isnot(None),
-        )
-
-        # Apply project date range filter if project is provided
-        if project:
-            school_query = apply_project_date_filter(school_query, project)
-
-        school_seconds = float(school_query.scalar() or 0)
-
-        # Build base query for external approved hours with optional date filter
-        external_approved_query = db.query(
-            func.sum(
-                func.extract(
-                    "epoch", AttendanceEvent.check_out - AttendanceEvent.check_in
-                )
-            )
-        ).filter(
-            AttendanceEvent.user_id == student.id,
-            AttendanceEvent.is_external.is_(True),
-            AttendanceEvent.approval_status == "approved",
-            AttendanceEvent.check_out.isnot(None),
-        )
-
-        # Apply project date range filter if project is provided
-        if project:
-            external_approved_query = apply_project_date_filter(
-                external_approved_query, project
-            )
-
-        external_approved_seconds = float(external_approved_query.scalar() or 0)
-
-        # Build base query for external pending hours with optional date filter
-        external_pending_query = db.query(
-            func.sum(
-                func.extract(
-                    "epoch", AttendanceEvent.check_out - AttendanceEvent.check_in
-                )
-            )
-        ).filter(
-            AttendanceEvent.user_id == student.id,
-            AttendanceEvent.is_external.is_(True),
-            AttendanceEvent.approval_status == "pending",
-            AttendanceEvent.check_out.isnot(None),
-        )
-
-        # Apply project date range filter if project is provided
-        if project:
-            external_pending_query = apply_project_date_filter(
-                external_pending_query, project
-            )
-
-        external_pending_seconds = float(external_pending_query.scalar() or 0)
-
-        total_seconds = int(school_seconds) + int(external_approved_seconds)
-        lesson_blocks = round(total_seconds / (75 * 60), 1)
+    # Rank by counted time (descending) and paginate in SQL
+    total = query.order_by(None).count()
+    rows = (
+        query.order_by(counted.desc(), User.name.asc(), User.id.asc())
+        .offset((page - 1) * per_page)
+        .limit(per_page)
+        .all()
+    )
 
-        result.append(
+    items = []
+    for student, school_seconds, approved_seconds, pending_seconds in rows:
+        school_seconds = int(school_seconds or 0)
+        approved_seconds = int(approved_seconds or 0)
+        items.append(
             {
                 "user_id": student.id,
                 "user_name": student.name,
                 "user_email": student.email,
                 "class_name": student.class_name,
-                "total_school_seconds": int(school_seconds),
-                "total_external_approved_seconds": int(external_approved_seconds),
-                "total_external_pending_seconds": int(external_pending_seconds),
-                "lesson_blocks": lesson_blocks,
+                "total_school_seconds": school_seconds,
+                "total_external_approved_seconds": approved_seconds,
+                "total_external_pending_seconds": int(pending_seconds or 0),
+                "lesson_blocks": lesson_blocks_for(school_seconds + approved_seconds),
             }
         )
 
-    # Sort by lesson blocks descending
-    result.sort(key=lambda x: x["lesson_blocks"], reverse=True)
-
-    # Apply pagination after sorting (needed for correct global ranking)
-    # Note: total is len(result) because we want to show count AFTER filters,
-    # not the raw database count. This matches user expectations for filtered results.
-    total_pages = max(1, (len(result) + per_page - 1) // per_page)
-    start_idx = (page - 1) * per_page
-    end_idx = start_idx + per_page
-    paginated_result = result[start_idx:end_idx]
-
     return {
-        "items": paginated_result,
-        "total": len(result),
+        "items": items,
+        "total": total,
         "page": page,
         "page_size": per_page,
-        "total_pages": total_pages,
+        "total_pages": max(1, (total + per_page - 1) // per_page),
     }
 
 
@@ -1485,27 +1513,57 @@ def list_courses_for_filters(
     return courses
 
 
-def _parse_period(period: str) -> tuple[Optional[datetime], Optional[datetime]]:
-    """Parse period parameter to date range"""
-    now = datetime.now(timezone.utc)
+def _parse_period(period: str) -> tuple[Optional[date], Optional[date]]:
+    """Parse period parameter to a range of whole (UTC) days, including today"""
+    today = datetime.now(timezone.utc).date()
 
-    if period == "4w":
-        start_date = now - timedelta(weeks=4)
-        return start_date, now
-    elif period == "8w":
-        start_date = now - timedelta(weeks=8)
-        return start_date, now
+    if period == "8w":
+        return today - timedelta(weeks=8), today
     elif period == "all":
         return None, None
     else:
         # Default to 4 weeks
-        start_date = now - timedelta(weeks=4)
-        return start_date, now
+        return today - timedelta(weeks=4), today
+
+
+def _require_stats_access(current_user: User) -> None:
+    if current_user.role not in ["teacher", "admin"]:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Only teachers and admins can view statistics",
+        )
+
+
+def _blocks(seconds: float) -> float:
+    return round(seconds / (75 * 60), 2)
+
+
+def _course_names(db: Session, user_ids) -> dict[int, str]:
+    """Name of the (first) course of each student, in one query."""
+    if not user_ids:
+        return {}
+    rows = (
+        db.query(CourseEnrollment.student_id, Course.name)
+        .join(Course, CourseEnrollment.course_id == Course.id)
+        .filter(CourseEnrollment.student_id.in_(list(user_ids)))
+        .order_by(CourseEnrollment.id)
+        .all()
+    )
+    names: dict[int, str] = {}
+    for student_id, name in rows:
+        names.setdefault(student_id, name)
+    return names
+
+
+def _user_names(db: Session, user_ids) -> dict[int, str]:
+    if not user_ids:
+        return {}
+    return dict(db.query(User.id, User.name).filter(User.id.in_(list(user_ids))).all())
 
 
 @router.get("/stats/summary", response_model=StatsSummary)
 def get_stats_summary(
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
     current_user: User = Depends(get_current_user),
     period: str = Query("4w", pattern=r"^(4w|8w|all)$"),
     course_id: Optional[int] = Query(None),
@@ -1515,87 +1573,21 @@ def get_stats_summary(
     Get summary statistics: school vs external work breakdown.
     Returns minutes and blocks for each category.
     """
-    if current_user.role not in ["teacher", "admin"]:
-        raise HTTPException(
-            status_code=status.HTTP_403_FORBIDDEN,
-            detail="Only teachers and admins can view statistics",
-        )
+    _require_stats_access(current_user)
 
-    start_date, end_date = _parse_period(period)
-
-    # Base query for school work
-    school_query = (
-        db.query(
-            func.coalesce(
-                func.sum(
-                    func.extract(
-                        "epoch", AttendanceEvent.check_out - AttendanceEvent.check_in
-                    )
-                ),
-                0,
-            )
-        )
-        .select_from(AttendanceEvent)
-        .join(User, AttendanceEvent.user_id == User.id)
-        .filter(
-            User.school_id == current_user.school_id,
-            AttendanceEvent.is_external.is_(False),
-            AttendanceEvent.check_out.isnot(None),
-        )
+    start_day, end_day = _parse_period(period)
+    days = daily_totals(
+        db, current_user.school_id, start_day, end_day, course_id, project_id
     )
 
-    # Base query for external work (approved only)
-    external_query = (
-        db.query(
-            func.coalesce(
-                func.sum(
-                    func.extract(
-                        "epoch", AttendanceEvent.check_out - AttendanceEvent.check_in
-                    )
-                ),
-                0,
-            )
-        )
-        .select_from(AttendanceEvent)
-        .join(User, AttendanceEvent.user_id == User.id)
-        .filter(
-            User.school_id == current_user.school_id,
-            AttendanceEvent.is_external.is_(True),
-            AttendanceEvent.approval_status == "approved",
-            AttendanceEvent.check_out.isnot(None),
-        )
-    )
-
-    # Apply date filters
-    if start_date:
-        school_query = school_query.filter(AttendanceEvent.check_in >= start_date)
-        external_query = external_query.filter(AttendanceEvent.check_in >= start_date)
-    if end_date:
-        school_query = school_query.filter(AttendanceEvent.check_in <= end_date)
-        external_query = external_query.filter(AttendanceEvent.check_in <= end_date)
-
-    # Apply course filter
-    if course_id:
-        school_query = school_query.join(
-            CourseEnrollment, CourseEnrollment.student_id == AttendanceEvent.user_id
-        ).filter(CourseEnrollment.course_id == course_id)
-        external_query = external_query.join(
-            CourseEnrollment, CourseEnrollment.student_id == AttendanceEvent.user_id
-        ).filter(CourseEnrollment.course_id == course_id)
-
-    # Apply project filter
-    if project_id:
-        school_query = school_query.filter(AttendanceEvent.project_id == project_id)
-        external_query = external_query.filter(AttendanceEvent.project_id == project_id)
-
-    school_seconds = float(school_query.scalar() or 0)
-    external_seconds = float(external_query.scalar() or 0)
+    school_seconds = float(sum(d.school_seconds for d in days.values()))
+    external_seconds = float(sum(d.extern_seconds for d in days.values()))
 
     # Convert to minutes and blocks
     school_minutes = int(school_seconds / 60)
     extern_minutes = int(external_seconds / 60)
-    school_blocks = round(school_seconds / (75 * 60), 2)
-    extern_blocks = round(external_seconds / (75 * 60), 2)
+    school_blocks = _blocks(school_seconds)
+    extern_blocks = _blocks(external_seconds)
     total_blocks = school_blocks + extern_blocks
 
     # Calculate percentages
@@ -1619,7 +1611,7 @@ def get_stats_summary(
 
 @router.get("/stats/weekly", response_model=list[WeeklyStats])
 def get_stats_weekly(
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
     current_user: User = Depends(get_current_user),
     period: str = Query("4w", pattern=r"^(4w|8w|all)$"),
     course_id: Optional[int] = Query(None),
@@ -1629,85 +1621,29 @@ def get_stats_weekly(
     Get weekly attendance trend data.
     Returns total blocks per week (school + approved external).
     """
-    if current_user.role not in ["teacher", "admin"]:
-        raise HTTPException(
-            status_code=status.HTTP_403_FORBIDDEN,
-            detail="Only teachers and admins can view statistics",
-        )
-
-    start_date, end_date = _parse_period(period)
+    _require_stats_access(current_user)
 
-    # Query to get data grouped by week
-    # Using PostgreSQL date_trunc to group by week
-    query = (
-        db.query(
-            func.date_trunc("week", AttendanceEvent.check_in).label("week_start"),
-            func.sum(
-                case(
-                    (
-                        AttendanceEvent.is_external.is_(False),
-                        func.extract(
-                            "epoch",
-                            AttendanceEvent.check_out - AttendanceEvent.check_in,
-                        ),
-                    ),
-                    else_=0,
-                )
-            ).label("school_seconds"),
-            func.sum(
-                case(
-                    (
-                        and_(
-                            AttendanceEvent.is_external.is_(True),
-                            AttendanceEvent.approval_status == "approved",
-                        ),
-                        func.extract(
-                            "epoch",
-                            AttendanceEvent.check_out - AttendanceEvent.check_in,
-                        ),
-                    ),
-                    else_=0,
-                )
-            ).label("extern_seconds"),
-        )
-        .join(User, AttendanceEvent.user_id == User.id)
-        .filter(
-            User.school_id == current_user.school_id,
-            AttendanceEvent.check_out.isnot(None),
-        )
+    start_day, end_day = _parse_period(period)
+    days = daily_totals(
+        db, current_user.school_id, start_day, end_day, course_id, project_id
     )
 
-    # Apply date filters
-    if start_date:
-        query = query.filter(AttendanceEvent.check_in >= start_date)
-    if end_date:
-        query = query.filter(AttendanceEvent.check_in <= end_date)
-
-    # Apply course filter
-    if course_id:
-        query = query.join(
-            CourseEnrollment, CourseEnrollment.student_id == AttendanceEvent.user_id
-        ).filter(CourseEnrollment.course_id == course_id)
-
-    # Apply project filter
-    if project_id:
-        query = query.filter(AttendanceEvent.project_id == project_id)
-
-    query = query.group_by("week_start").order_by("week_start")
-
-    results = query.all()
+    # Group the days by the Monday of their week
+    weeks: dict[date, list[int]] = {}
+    for day, totals in days.items():
+        week = weeks.setdefault(day - timedelta(days=day.weekday()), [0, 0])
+        week[0] += totals.school_seconds
+        week[1] += totals.extern_seconds
 
     weekly_data = []
-    for row in results:
-        school_secs = float(row.school_seconds or 0)
-        extern_secs = float(row.extern_seconds or 0)
-        school_blocks = round(school_secs / (75 * 60), 2)
-        extern_blocks = round(extern_secs / (75 * 60), 2)
+    for week_start, (school_secs, extern_secs) in sorted(weeks.items()):
+        school_blocks = _blocks(school_secs)
+        extern_blocks = _blocks(extern_secs)
         total_blocks = school_blocks + extern_blocks
 
         weekly_data.append(
             WeeklyStats(
-                week_start=row.week_start.date().isoformat(),
+                week_start=week_start.isoformat(),
                 total_blocks=total_blocks,
                 school_blocks=school_blocks,
                 extern_blocks=extern_blocks,
@@ -1719,7 +1655,7 @@ def get_stats_weekly(
 
 @router.get("/stats/daily", response_model=list[DailyStats])
 def get_stats_daily(
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
     current_user: User = Depends(get_current_user),
     period: str = Query("4w", pattern=r"^(4w|8w|all)$"),
     course_id: Optional[int] = Query(None),
@@ -1729,62 +1665,23 @@ def get_stats_daily(
     Get daily unique student count.
     Only counts school check-ins (not external).
     """
-    if current_user.role not in ["teacher", "admin"]:
-        raise HTTPException(
-            status_code=status.HTTP_403_FORBIDDEN,
-            detail="Only teachers and admins can view statistics",
-        )
+    _require_stats_access(current_user)
 
-    start_date, end_date = _parse_period(period)
-
-    # Query to count unique students per day
-    query = (
-        db.query(
-            func.date(AttendanceEvent.check_in).label("date"),
-            func.count(func.distinct(AttendanceEvent.user_id)).label("unique_students"),
-        )
-        .join(User, AttendanceEvent.user_id == User.id)
-        .filter(
-            User.school_id == current_user.school_id,
-            AttendanceEvent.is_external.is_(False),
-        )
+    start_day, end_day = _parse_period(period)
+    days = daily_totals(
+        db, current_user.school_id, start_day, end_day, course_id, project_id
     )
 
-    # Apply date filters
-    if start_date:
-        query = query.filter(AttendanceEvent.check_in >= start_date)
-    if end_date:
-        query = query.filter(AttendanceEvent.check_in <= end_date)
-
-    # Apply course filter
-    if course_id:
-        query = query.join(
-            CourseEnrollment, CourseEnrollment.student_id == AttendanceEvent.user_id
-        ).filter(CourseEnrollment.course_id == course_id)
-
-    # Apply project filter
-    if project_id:
-        query = query.filter(AttendanceEvent.project_id == project_id)
-
-    query = query.group_by("date").order_by("date")
-
-    results = query.all()
-
-    daily_data = []
-    for row in results:
-        daily_data.append(
-            DailyStats(
-                date=row.date.isoformat(),
-                unique_students=row.unique_students,
-            )
-        )
-
-    return daily_data
+    return [
+        DailyStats(date=day.isoformat(), unique_students=totals.present_students)
+        for day, totals in days.items()
+        if totals.present_students
+    ]
 
 
 @router.get("/stats/heatmap", response_model=HeatmapData)
 def get_stats_heatmap(
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
     current_user: User = Depends(get_current_user),
     period: str = Query("4w", pattern=r"^(4w|8w|all)$"),
     course_id: Optional[int] = Query(None),
@@ -1795,81 +1692,35 @@ def get_stats_heatmap(
     Only uses school check-ins (not external).
     Hours: 8-18, Weekdays: Monday-Friday (0-4).
     """
-    if current_user.role not in ["teacher", "admin"]:
-        raise HTTPException(
-            status_code=status.HTTP_403_FORBIDDEN,
-            detail="Only teachers and admins can view statistics",
-        )
+    _require_stats_access(current_user)
 
-    start_date, end_date = _parse_period(period)
-
-    # Query to get data for heatmap
-    # We need to find all unique students present during each hour/weekday combo
-    # This requires checking if check_in <= hour_start AND (check_out IS NULL OR check_out > hour_start)
-
-    # For simplicity, we'll aggregate by extracting weekday and hour from check_in
-    # and count unique students, then average across the period
-    query = (
-        db.query(
-            func.extract("dow", AttendanceEvent.check_in).label(
-                "weekday"
-            ),  # 0=Sunday, 1=Monday, etc.
-            func.extract("hour", AttendanceEvent.check_in).label("hour"),
-            func.count(
-                func.distinct(
-                    func.concat(
-                        func.date(AttendanceEvent.check_in),
-                        "-",
-                        AttendanceEvent.user_id,
-                    )
-                )
-            ).label("student_hours"),
-            func.count(func.distinct(func.date(AttendanceEvent.check_in))).label(
-                "day_count"
-            ),
-        )
-        .join(User, AttendanceEvent.user_id == User.id)
-        .filter(
-            User.school_id == current_user.school_id,
-            AttendanceEvent.is_external.is_(False),
-            func.extract("dow", AttendanceEvent.check_in).between(
-                1, 5
-            ),  # Monday-Friday
-            func.extract("hour", AttendanceEvent.check_in).between(8, 18),
-        )
+    start_day, end_day = _parse_period(period)
+    hours = presence_hours(
+        db, current_user.school_id, start_day, end_day, course_id, project_id
     )
 
-    # Apply date filters
-    if start_date:
-        query = query.filter(AttendanceEvent.check_in >= start_date)
-    if end_date:
-        query = query.filter(AttendanceEvent.check_in <= end_date)
-
-    # Apply course filter
-    if course_id:
-        query = query.join(
-            CourseEnrollment, CourseEnrollment.student_id == AttendanceEvent.user_id
-        ).filter(CourseEnrollment.course_id == course_id)
-
-    # Apply project filter
-    if project_id:
-        query = query.filter(AttendanceEvent.project_id == project_id)
-
-    query = query.group_by("weekday", "hour")
-
-    results = query.all()
+    # Per weekday/hour: students that checked in during that hour (one per
+    # student per day) and the days on which anyone did
+    student_hours: dict[tuple[int, int], int] = {}
+    days: dict[tuple[int, int], set] = {}
+    for (_, day), mask in hours.items():
+        weekday = day.weekday()
+        if weekday > 4:
+            continue
+        for hour in range(8, 19):
+            if mask & (1 << hour):
+                student_hours[(weekday, hour)] = (
+                    student_hours.get((weekday, hour), 0) + 1
+                )
+                days.setdefault((weekday, hour), set()).add(day)
 
     # Process results into heatmap cells
     cells = []
     weekday_labels = ["ma", "di", "wo", "do", "vr"]
 
-    for row in results:
-        # Convert PostgreSQL dow (1=Monday, 5=Friday) to our 0-based index
-        weekday_idx = int(row.weekday) - 1  # 1->0, 2->1, etc.
-        hour = int(row.hour)
-
+    for (weekday_idx, hour), count in sorted(student_hours.items()):
         # Calculate average students per occurrence of this weekday/hour
-        avg_students = round(float(row.student_hours) / max(float(row.day_count), 1), 1)
+        avg_students = round(count / max(len(days[(weekday_idx, hour)]), 1), 1)
 
         cells.append(
             HeatmapCell(
@@ -1885,253 +1736,78 @@ def get_stats_heatmap(
 
 @router.get("/stats/signals", response_model=SignalsData)
 def get_stats_signals(
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
     current_user: User = Depends(get_current_user),
     period: str = Query("4w", pattern=r"^(4w|8w|all)$"),
     course_id: Optional[int] = Query(None),
     project_id: Optional[int] = Query(None),
+    min_extern_hours: float = Query(
+        4, ge=0, description="Extern/weinig school: minimaal aantal uren extern"
+    ),
+    max_school_blocks: float = Query(
+        2, ge=0, description="Extern/weinig school: maximaal aantal blokken op school"
+    ),
+    min_pending_count: int = Query(
+        3, ge=1, description="Minimaal aantal openstaande externe registraties"
+    ),
+    long_open_hours: float = Query(
+        12, gt=0, description="Check-in staat minimaal zoveel uren open"
+    ),
 ):
     """
     Get signals/anomalies for students that need attention.
     Returns three lists: extern_low_school, many_pending, long_open.
-    """
-    if current_user.role not in ["teacher", "admin"]:
-        raise HTTPException(
-            status_code=status.HTTP_403_FORBIDDEN,
-            detail="Only teachers and admins can view statistics",
-        )
-
-    start_date, end_date = _parse_period(period)
-
-    # Thresholds (constants)
-    MIN_EXTERN_HOURS = 4  # 4+ hours external
-    MAX_SCHOOL_BLOCKS = 2  # but <=2 blocks school
-    MIN_PENDING_COUNT = 3  # 3+ pending external registrations
-    LONG_OPEN_HOURS = 12  # Open session for 12+ hours
 
-    # Signal 1: High external, low school
-    extern_low_school = []
-
-    # Build subquery for external minutes
-    extern_subq = (
-        db.query(
-            User.id.label("user_id"),
-            func.sum(
-                func.extract(
-                    "epoch", AttendanceEvent.check_out - AttendanceEvent.check_in
-                )
-            ).label("extern_seconds"),
-        )
-        .join(AttendanceEvent, AttendanceEvent.user_id == User.id)
-        .filter(
-            User.school_id == current_user.school_id,
-            AttendanceEvent.is_external.is_(True),
-            AttendanceEvent.approval_status == "approved",
-            AttendanceEvent.check_out.isnot(None),
-        )
-    )
-
-    # Build subquery for school minutes
-    school_subq = (
-        db.query(
-            User.id.label("user_id"),
-            func.sum(
-                func.extract(
-                    "epoch", AttendanceEvent.check_out - AttendanceEvent.check_in
-                )
-            ).label("school_seconds"),
-        )
-        .join(AttendanceEvent, AttendanceEvent.user_id == User.id)
-        .filter(
-            User.school_id == current_user.school_id,
-            AttendanceEvent.is_external.is_(False),
-            AttendanceEvent.check_out.isnot(None),
-        )
-    )
-
-    # Apply filters to subqueries
-    if start_date:
-        extern_subq = extern_subq.filter(AttendanceEvent.check_in >= start_date)
-        school_subq = school_subq.filter(AttendanceEvent.check_in >= start_date)
-    if end_date:
-        extern_subq = extern_subq.filter(AttendanceEvent.check_in <= end_date)
-        school_subq = school_subq.filter(AttendanceEvent.check_in <= end_date)
-    if project_id:
-        extern_subq = extern_subq.filter(AttendanceEvent.project_id == project_id)
-        school_subq = school_subq.filter(AttendanceEvent.project_id == project_id)
-
-    extern_subq = extern_subq.group_by(User.id).subquery()
-    school_subq = school_subq.group_by(User.id).subquery()
-
-    # Main query joining subqueries
-    query = (
-        db.query(
-            User.id,
-            User.name,
-            extern_subq.c.extern_seconds,
-            school_subq.c.school_seconds,
-        )
-        .outerjoin(extern_subq, User.id == extern_subq.c.user_id)
-        .outerjoin(school_subq, User.id == school_subq.c.user_id)
-        .filter(User.school_id == current_user.school_id)
-    )
-
-    if course_id:
-        query = query.join(
-            CourseEnrollment, CourseEnrollment.student_id == User.id
-        ).filter(CourseEnrollment.course_id == course_id)
-
-    results = query.all()
-
-    for row in results:
-        extern_secs = float(row.extern_seconds or 0)
-        school_secs = float(row.school_seconds or 0)
-        extern_hours = extern_secs / 3600
-        school_blocks = school_secs / (75 * 60)
-
-        if extern_hours >= MIN_EXTERN_HOURS and school_blocks <= MAX_SCHOOL_BLOCKS:
-            # Get user's course
-            user_course = (
-                db.query(Course.name)
-                .join(CourseEnrollment, CourseEnrollment.course_id == Course.id)
-                .filter(CourseEnrollment.student_id == row.id)
-                .first()
-            )
-            course_name = user_course[0] if user_course else None
-
-            extern_low_school.append(
-                StudentSignal(
-                    student_id=row.id,
-                    student_name=row.name,
-                    course=course_name,
-                    value_text=f"extern {extern_hours:.1f}u / school {school_blocks:.1f} blok",
-                )
-            )
-
-    # Limit to top 5
-    extern_low_school = extern_low_school[:5]
-
-    # Signal 2: Many pending external work registrations
-    many_pending = []
-
-    pending_query = (
-        db.query(
-            User.id,
-            User.name,
-            func.count(AttendanceEvent.id).label("pending_count"),
-        )
-        .join(AttendanceEvent, AttendanceEvent.user_id == User.id)
-        .filter(
-            User.school_id == current_user.school_id,
-            AttendanceEvent.is_external.is_(True),
-            AttendanceEvent.approval_status == "pending",
-        )
-    )
-
-    if start_date:
-        pending_query = pending_query.filter(AttendanceEvent.check_in >= start_date)
-    if end_date:
-        pending_query = pending_query.filter(AttendanceEvent.check_in <= end_date)
-    if course_id:
-        pending_query = pending_query.join(
-            CourseEnrollment, CourseEnrollment.student_id == AttendanceEvent.user_id
-        ).filter(CourseEnrollment.course_id == course_id)
-    if project_id:
-        pending_query = pending_query.filter(AttendanceEvent.project_id == project_id)
-
-    pending_query = pending_query.group_by(User.id, User.name).having(
-        func.count(AttendanceEvent.id) >= MIN_PENDING_COUNT
-    )
-
-    pending_results = pending_query.all()
-
-    for row in pending_results:
-        # Get user's course
-        user_course = (
-            db.query(Course.name)
-            .join(CourseEnrollment, CourseEnrollment.course_id == Course.id)
-            .filter(CourseEnrollment.student_id == row.id)
-            .first()
-        )
-        course_name = user_course[0] if user_course else None
-
-        many_pending.append(
-            StudentSignal(
-                student_id=row.id,
-                student_name=row.name,
-                course=course_name,
-                value_text=f"pending {row.pending_count}",
-            )
-        )
-
-    # Limit to top 5
-    many_pending = many_pending[:5]
-
-    # Signal 3: Long open check-ins
-    long_open = []
-
-    now = datetime.now(timezone.utc)
-    threshold_time = now - timedelta(hours=LONG_OPEN_HOURS)
-
-    open_query = (
-        db.query(
-            User.id,
-            User.name,
-            AttendanceEvent.check_in,
-        )
-        .join(AttendanceEvent, AttendanceEvent.user_id == User.id)
-        .filter(
-            User.school_id == current_user.school_id,
-            AttendanceEvent.is_external.is_(False),
-            AttendanceEvent.check_out.is_(None),
-            AttendanceEvent.check_in <= threshold_time,
-        )
+    The thresholds are query parameters; all three lists come from one
+    analytic query (see attendance_signals).
+    """
+    _require_stats_access(current_user)
+
+    start_day, end_day = _parse_period(period)
+    signals = attendance_signals(
+        db,
+        current_user.school_id,
+        start_day,
+        end_day,
+        course_id,
+        project_id,
+        min_extern_hours=min_extern_hours,
+        max_school_blocks=max_school_blocks,
+        min_pending_count=min_pending_count,
+        long_open_hours=long_open_hours,
     )
 
-    if course_id:
-        open_query = open_query.join(
-            CourseEnrollment, CourseEnrollment.student_id == AttendanceEvent.user_id
-        ).filter(CourseEnrollment.course_id == course_id)
-    if project_id:
-        open_query = open_query.filter(AttendanceEvent.project_id == project_id)
-
-    open_results = open_query.all()
-
-    for row in open_results:
-        # Get user's course
-        user_course = (
-            db.query(Course.name)
-            .join(CourseEnrollment, CourseEnrollment.course_id == Course.id)
-            .filter(CourseEnrollment.student_id == row.id)
-            .first()
+    def _signal(row: dict, value_text: str) -> StudentSignal:
+        return StudentSignal(
+            student_id=row["user_id"],
+            student_name=row["name"],
+            course=row["course"],
+            value_text=value_text,
         )
-        course_name = user_course[0] if user_course else None
-
-        # Format check-in time
-        check_in_str = row.check_in.strftime("%d-%m %H:%M")
-
-        long_open.append(
-            StudentSignal(
-                student_id=row.id,
-                student_name=row.name,
-                course=course_name,
-                value_text=f"open sinds {check_in_str}",
-            )
-        )
-
-    # Limit to top 5
-    long_open = long_open[:5]
 
     return SignalsData(
-        extern_low_school=extern_low_school,
-        many_pending=many_pending,
-        long_open=long_open,
+        extern_low_school=[
+            _signal(
+                row,
+                f"extern {row['extern_seconds'] / 3600:.1f}u / "
+                f"school {row['school_seconds'] / (75 * 60):.1f} blok",
+            )
+            for row in signals["extern_low_school"]
+        ],
+        many_pending=[
+            _signal(row, f"pending {row['pending_count']}")
+            for row in signals["many_pending"]
+        ],
+        long_open=[
+            _signal(row, f"open sinds {row['check_in'].strftime('%d-%m %H:%M')}")
+            for row in signals["long_open"]
+        ],
     )
 
 
 @router.get("/stats/top-bottom", response_model=TopBottomData)
 def get_stats_top_bottom(
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
     current_user: User = Depends(get_current_user),
     period: str = Query("4w", pattern=r"^(4w|8w|all)$"),
     course_id: Optional[int] = Query(None),
@@ -2142,88 +1818,35 @@ def get_stats_top_bottom(
     Get top 5 and bottom 5 students by engagement (total blocks).
     Mode: '4w' always uses last 4 weeks, 'scope' uses the selected period.
     """
-    if current_user.role not in ["teacher", "admin"]:
-        raise HTTPException(
-            status_code=status.HTTP_403_FORBIDDEN,
-            detail="Only teachers and admins can view statistics",
-        )
+    _require_stats_access(current_user)
 
     # Determine date range based on mode
     if mode == "4w":
-        now = datetime.now(timezone.utc)
-        start_date = now - timedelta(weeks=4)
-        end_date = now
+        start_day, end_day = _parse_period("4w")
     else:  # scope
-        start_date, end_date = _parse_period(period)
+        start_day, end_day = _parse_period(period)
 
-    # Query to calculate total blocks per student
-    query = (
-        db.query(
-            User.id,
-            User.name,
-            func.sum(
-                func.extract(
-                    "epoch", AttendanceEvent.check_out - AttendanceEvent.check_in
-                )
-            ).label("total_seconds"),
-        )
-        .join(AttendanceEvent, AttendanceEvent.user_id == User.id)
-        .filter(
-            User.school_id == current_user.school_id,
-            AttendanceEvent.check_out.isnot(None),
-            or_(
-                AttendanceEvent.is_external.is_(False),
-                and_(
-                    AttendanceEvent.is_external.is_(True),
-                    AttendanceEvent.approval_status == "approved",
-                ),
-            ),
-        )
+    totals = user_totals(
+        db, current_user.school_id, start_day, end_day, course_id, project_id
     )
-
-    # Apply date filters
-    if start_date:
-        query = query.filter(AttendanceEvent.check_in >= start_date)
-    if end_date:
-        query = query.filter(AttendanceEvent.check_in <= end_date)
-
-    # Apply course filter
-    if course_id:
-        query = query.join(
-            CourseEnrollment, CourseEnrollment.student_id == AttendanceEvent.user_id
-        ).filter(CourseEnrollment.course_id == course_id)
-
-    # Apply project filter
-    if project_id:
-        query = query.filter(AttendanceEvent.project_id == project_id)
-
-    query = query.group_by(User.id, User.name)
-
-    results = query.all()
+    counted = {
+        user_id: t.school_seconds + t.extern_seconds
+        for user_id, t in totals.items()
+        if t.school_seconds + t.extern_seconds > 0
+    }
+    names = _user_names(db, counted)
+    courses = _course_names(db, counted)
 
     # Convert to engagement students with blocks
-    engagement_list = []
-    for row in results:
-        total_secs = float(row.total_seconds or 0)
-        total_blocks = round(total_secs / (75 * 60), 2)
-
-        # Get user's course
-        user_course = (
-            db.query(Course.name)
-            .join(CourseEnrollment, CourseEnrollment.course_id == Course.id)
-            .filter(CourseEnrollment.student_id == row.id)
-            .first()
-        )
-        course_name = user_course[0] if user_course else None
-
-        engagement_list.append(
-            EngagementStudent(
-                student_id=row.id,
-                student_name=row.name,
-                course=course_name,
-                total_blocks=total_blocks,
-            )
-        )
+    engagement_list = [
+        EngagementStudent(
+            student_id=user_id,
+            student_name=names.get(user_id, ""),
+            course=courses.get(user_id),
+            total_blocks=_blocks(seconds),
+        )
+        for user_id, seconds in counted.items()
+    ]
 
     # Sort by total_blocks
     engagement_list.sort(key=lambda x: x.total_blocks, reverse=True)
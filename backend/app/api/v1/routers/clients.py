@@ -12,7 +12,7 @@ from sqlalchemy.orm import Session
 from sqlalchemy import func, or_, desc
 from datetime import datetime, timedelta
 
-from app.api.v1.deps import get_db, get_current_user
+from app.api.v1.deps import get_db, get_read_db, get_current_user
 from app.infra.db.models import User, Client, ClientLog, ClientProjectLink, Project
 from app.api.v1.schemas.clients import (
     ClientCreate,
@@ -882,7 +882,7 @@ def delete_client(
 
 @router.get("/export/csv")
 def export_clients_csv(
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
     user: User = Depends(get_current_user),
     level: Optional[str] = None,
     status: Optional[str] = None,
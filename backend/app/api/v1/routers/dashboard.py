@@ -8,7 +8,7 @@ from io import StringIO
 import csv
 from datetime import datetime, timezone
 
-from app.api.v1.deps import get_db, get_current_user
+from app.api.v1.deps import get_db, get_read_db, get_current_user
 from app.core.config import settings
 from app.infra.db.models import (
     Evaluation,
@@ -22,6 +22,10 @@ from app.infra.db.models import (
     ProjectTeam,
     ProjectTeamMember,
 )
+from app.services.evaluation_aggregates import (
+    load_evaluation_aggregates,
+    load_evaluation_users,
+)
 from app.api.v1.schemas.dashboard import (
     DashboardResponse,
     DashboardRow,
@@ -61,7 +65,7 @@ def dashboard_evaluation(
     include_breakdown: bool = Query(
         False, description="Voeg per-criterium gemiddelden toe"
     ),
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
     user=Depends(get_current_user),
 ):
     # === 1) Basis ===
@@ -125,25 +129,19 @@ def dashboard_evaluation(
         )
         valid_student_ids = {s[0] for s in course_students}
 
-    # === 3) Filter allocations to only include students from the course ===
+    # === 3) All allocations + scores in one query, limited to course students ===
     if ev.course_id and not valid_student_ids:
         # No students in the course, return empty dashboard
-        allocations = []
+        aggregates = None
     else:
-        query = db.query(Allocation).filter(
-            Allocation.school_id == user.school_id, Allocation.evaluation_id == ev.id
+        aggregates = load_evaluation_aggregates(
+            db,
+            user.school_id,
+            ev.id,
+            student_ids=valid_student_ids or None,
         )
 
-        # Filter allocations at SQL level to only include valid students
-        if valid_student_ids:
-            query = query.filter(
-                Allocation.reviewee_id.in_(valid_student_ids),
-                Allocation.reviewer_id.in_(valid_student_ids),
-            )
-
-        allocations = query.all()
-
-    if not allocations:
+    if aggregates is None or not aggregates.allocations:
         return DashboardResponse(
             evaluation_id=ev.id,
             rubric_id=rubric.id,
@@ -153,69 +151,18 @@ def dashboard_evaluation(
             items=[],
         )
 
-    # Map voor user-info - only load valid students
-    if valid_student_ids:
-        users = {
-            u.id: u
-            for u in db.query(User)
-            .filter(User.school_id == user.school_id, User.id.in_(valid_student_ids))
-            .all()
-        }
-    else:
-        users = {}
+    # Map voor user-info - only the users that appear in this evaluation
+    users = load_evaluation_users(db, user.school_id, aggregates)
 
-    # Aggregatie-bakken
-    # - per reviewee: lijst van alloc_avg (alle scores op die allocatie gemiddeld)
-    # - per reviewee: self_avg indien self-alloc
-    # - per reviewee, per criterion: lijst met peer-scores en een optionele self-score
-    per_reviewee_alloc_avgs: dict[int, list[float]] = {}
-    per_reviewee_self_avg: dict[int, float] = {}
-    per_reviewee_crit_peers: dict[int, dict[int, list[float]]] = {}
-    per_reviewee_crit_self: dict[int, dict[int, float]] = {}
-
-    for alloc in allocations:
-        rows = (
-            db.query(Score)
-            .filter(Score.school_id == user.school_id, Score.allocation_id == alloc.id)
-            .all()
-        )
-
-        # Pak alleen scores met geldige criteria
-        valid_scores = [r for r in rows if r.criterion_id in crit_ids]
-        if not valid_scores:
-            continue
-
-        # 2a) overall alloc average (gemiddelde over criteria)
-        alloc_avg = _safe_mean([r.score for r in valid_scores])
-        per_reviewee_alloc_avgs.setdefault(alloc.reviewee_id, []).append(alloc_avg)
-
-        # 2b) per-criterium verdeling
-        for r in valid_scores:
-            if alloc.is_self:
-                per_reviewee_crit_self.setdefault(alloc.reviewee_id, {})[
-                    r.criterion_id
-                ] = float(r.score)
-            else:
-                per_reviewee_crit_peers.setdefault(alloc.reviewee_id, {}).setdefault(
-                    r.criterion_id, []
-                ).append(float(r.score))
-
-        # 2c) self-avg
-        if alloc.is_self:
-            per_reviewee_self_avg[alloc.reviewee_id] = alloc_avg
+    # Aggregatie per reviewee (alleen scores met geldige criteria):
+    # peer alloc-avgs, self_avg en per-criterium peer-scores / self-score
+    per_reviewee = aggregates.by_reviewee(crit_ids)
 
     # === 4) Calculate peer averages per reviewee for GCF calculation ===
-    peer_avg_by_reviewee: dict[int, float] = {}
-    for reviewee_id, alloc_avgs in per_reviewee_alloc_avgs.items():
-        self_avg = per_reviewee_self_avg.get(reviewee_id)
-        if self_avg is None:
-            peer_avgs_only = alloc_avgs  # geen zelf-score, alles peers
-        else:
-            # neem alle allocs en filter self er uit voor peer-avg
-            peer_avgs_only = (
-                [a for a in alloc_avgs if a != self_avg] if len(alloc_avgs) > 1 else []
-            )
-        peer_avg_by_reviewee[reviewee_id] = _safe_mean(peer_avgs_only)
+    peer_avg_by_reviewee: dict[int, float] = {
+        reviewee_id: _safe_mean(agg.peer_alloc_avgs)
+        for reviewee_id, agg in per_reviewee.items()
+    }
 
     # === 5) GCF: Calculate per-team means and ratios (matching grades.py logic) ===
     # Load GCF range from evaluation settings
@@ -255,21 +202,12 @@ def dashboard_evaluation(
 
     # === 6) Opbouw rows ===
     items: list[DashboardRow] = []
-    for reviewee_id, alloc_avgs in per_reviewee_alloc_avgs.items():
-        # splits peers vs self
-        self_avg = per_reviewee_self_avg.get(reviewee_id)
-        if self_avg is None:
-            peer_avgs_only = alloc_avgs  # geen zelf-score, alles peers
-        else:
-            # neem alle allocs en filter self er uit voor peer-avg
-            peer_avgs_only = (
-                [a for a in alloc_avgs if a != self_avg] if len(alloc_avgs) > 1 else []
-            )
-
-        peer_avg_overall = _safe_mean(peer_avgs_only)
+    for reviewee_id, agg in per_reviewee.items():
+        self_avg = agg.self_avg
+        peer_avg_overall = peer_avg_by_reviewee[reviewee_id]
 
         # reviewers count = aantal peer-allocaties die punten bevatten
-        reviewers_count = len(peer_avgs_only)
+        reviewers_count = agg.reviewers_count
 
         # GCF: from pre-calculated gcf_by_reviewee
         gcf = gcf_by_reviewee.get(reviewee_id, 1.0)
@@ -291,8 +229,8 @@ def dashboard_evaluation(
         # Per-criterium breakdown (optioneel)
         breakdown: list[CriterionBreakdown] = []
         if include_breakdown:
-            crit_peers = per_reviewee_crit_peers.get(reviewee_id, {})
-            crit_selfs = per_reviewee_crit_self.get(reviewee_id, {})
+            crit_peers = agg.crit_peers
+            crit_selfs = agg.crit_self
             for c in crit_rows:
                 peers = crit_peers.get(c.id, [])
                 breakdown.append(
@@ -307,8 +245,8 @@ def dashboard_evaluation(
         # Calculate category averages
         category_averages: list[CategoryAverage] = []
         if category_to_criteria:
-            crit_peers = per_reviewee_crit_peers.get(reviewee_id, {})
-            crit_selfs = per_reviewee_crit_self.get(reviewee_id, {})
+            crit_peers = agg.crit_peers
+            crit_selfs = agg.crit_self
             for cat, crit_ids_in_cat in category_to_criteria.items():
                 # Collect all peer scores for criteria in this category
                 cat_peer_scores = []
@@ -371,7 +309,7 @@ def dashboard_evaluation(
 @router.get("/evaluation/{evaluation_id}/export.csv")
 def dashboard_export_csv(
     evaluation_id: int,
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
     user=Depends(get_current_user),
 ):
     # Reuse JSON endpoint om dubbele logica te voorkomen
@@ -430,7 +368,7 @@ def dashboard_export_csv(
 )
 def get_student_progress(
     evaluation_id: int,
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
     user=Depends(get_current_user),
 ):
     """
@@ -737,7 +675,7 @@ def get_student_progress(
 @router.get("/evaluation/{evaluation_id}/kpis", response_model=StudentProgressKPIs)
 def get_dashboard_kpis(
     evaluation_id: int,
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
     user=Depends(get_current_user),
 ):
     """
@@ -842,7 +780,7 @@ def get_dashboard_kpis(
 @router.get("/evaluation/{evaluation_id}/progress/export.csv")
 def export_student_progress_csv(
     evaluation_id: int,
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
     user=Depends(get_current_user),
 ):
     """
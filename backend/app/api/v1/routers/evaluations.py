@@ -4,14 +4,13 @@ from typing import Optional, List, Dict, Any
 import io
 import csv
 import logging
-import time
 
 from fastapi import APIRouter, Depends, HTTPException, Query, status
 from sqlalchemy import select
 from sqlalchemy.orm import Session, aliased
 from starlette.responses import StreamingResponse
 
-from app.api.v1.deps import get_db, get_current_user
+from app.api.v1.deps import get_db, get_read_db, get_current_user
 from app.api.v1.utils import get_teacher_course_ids
 from app.infra.db.models import (
     Evaluation,
@@ -29,10 +28,8 @@ from app.infra.db.models import (
     Project,
     ProjectTeam,
     ProjectTeamMember,
-    SummaryGenerationJob,
 )
-from app.infra.queue.connection import get_queue
-from app.infra.queue.tasks import generate_ai_summary_task
+from app.infra.queue.tasks import queue_summary_batch
 from app.api.v1.schemas.evaluations import (
     EvaluationCreate,
     EvaluationOut,
@@ -342,8 +339,9 @@ def _trigger_batch_summary_generation(
     Automatically trigger batch AI summary generation for all students in an evaluation
     when the evaluation is published (status set to 'closed').
 
-    Creates SummaryGenerationJob records and enqueues generate_ai_summary_task jobs
-    for each student that does not already have a queued, processing, or completed job.
+    Creates SummaryGenerationJob records for each student that does not already have
+    a queued, processing, or completed job, and enqueues one batch_generate_summaries_task
+    that generates them all.
     """
     # Get all unique reviewee_ids from allocations (excluding self-evaluations)
     reviewee_ids = (
@@ -363,62 +361,19 @@ def _trigger_batch_summary_generation(
         )
         return
 
-    queue = get_queue("ai-summaries")
-    enqueued_count = 0
-    batch_ts = int(time.time())
-
-    for student_id in student_ids:
-        # Idempotency: skip if a job already exists for this student/evaluation
-        existing_job = (
-            db.query(SummaryGenerationJob)
-            .filter(
-                SummaryGenerationJob.evaluation_id == evaluation_id,
-                SummaryGenerationJob.student_id == student_id,
-                SummaryGenerationJob.status.in_(["queued", "processing", "completed"]),
-            )
-            .order_by(SummaryGenerationJob.created_at.desc())
-            .first()
-        )
-        if existing_job:
-            continue
-
-        job_id = f"summary-{evaluation_id}-{student_id}-{batch_ts}"
-
-        new_job_record = SummaryGenerationJob(
-            school_id=school_id,
-            evaluation_id=evaluation_id,
-            student_id=student_id,
-            job_id=job_id,
-            status="queued",
-            priority="normal",
-            queue_name="ai-summaries",
-        )
-        db.add(new_job_record)
-
-        try:
-            queue.enqueue(
-                generate_ai_summary_task,
-                school_id=school_id,
-                evaluation_id=evaluation_id,
-                student_id=student_id,
-                job_id=job_id,
-                job_timeout="10m",
-                result_ttl=86400,
-                failure_ttl=86400,
-            )
-            enqueued_count += 1
-        except Exception as e:
-            logger.error(
-                f"Auto batch summary: failed to enqueue job {job_id} for student {student_id}: {e}"
-            )
-            new_job_record.status = "failed"
-            new_job_record.error_message = f"Failed to queue: {str(e)}"
-
-    db.commit()
+    batch = queue_summary_batch(
+        db,
+        school_id=school_id,
+        evaluation_id=evaluation_id,
+        student_ids=student_ids,
+        queue_name="ai-summaries",
+    )
+    enqueued_count = sum(1 for r in batch["results"] if r["status"] == "queued")
 
     logger.info(
         f"Auto batch summary: triggered for evaluation {evaluation_id} — "
-        f"{enqueued_count} of {len(student_ids)} student(s) enqueued."
+        f"{enqueued_count} of {len(student_ids)} student(s) enqueued "
+        f"(batch {batch['batch_job_id']})."
     )
 
 
@@ -608,7 +563,7 @@ def get_reflections_by_evaluation(
 @router.get("/{evaluation_id}/feedback/export.csv")
 def export_feedback_csv(
     evaluation_id: int,
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
     user=Depends(get_current_user),
 ):
     ev = (
@@ -697,7 +652,7 @@ def export_feedback_csv(
 @router.get("/{evaluation_id}/reflections/export.csv")
 def export_reflections_csv(
     evaluation_id: int,
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
     user=Depends(get_current_user),
 ):
     ev = (
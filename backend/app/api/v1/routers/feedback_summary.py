@@ -4,9 +4,12 @@ import logging
 import time
 from typing import Optional, List
 from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import JSONResponse
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session, aliased
 from sqlalchemy import text
 from pydantic import BaseModel
+from redis.exceptions import RedisError
 
 from app.api.v1.deps import get_db, get_current_user
 from app.infra.db.models import (
@@ -17,10 +20,14 @@ from app.infra.db.models import (
     FeedbackSummary,
     SummaryGenerationJob,
 )
-from app.infra.services.ollama_service import OllamaService
 from app.infra.services.anonymization_service import AnonymizationService
 from app.infra.queue.connection import get_queue
-from app.infra.queue.tasks import generate_ai_summary_task
+from app.infra.queue.progress import (
+    get_job_progress_store,
+    job_state,
+    publish_job_state,
+)
+from app.infra.queue.tasks import generate_ai_summary_task, queue_summary_batch
 
 router = APIRouter(prefix="/feedback-summaries", tags=["feedback-summaries"])
 logger = logging.getLogger(__name__)
@@ -62,6 +69,9 @@ class JobStatusResponse(BaseModel):
     retry_count: int = 0
     max_retries: int = 3
     webhook_delivered: bool = False
+    # Step of a running job and what it is doing, from Redis
+    stage: Optional[str] = None
+    message: Optional[str] = None
 
 
 class QueueJobRequest(BaseModel):
@@ -107,6 +117,8 @@ class QueueStatsResponse(BaseModel):
     failed_count: int
     cancelled_count: int
     workers_count: int
+    # Hits and misses of the LLM result cache per stage (None when disabled)
+    llm_cache: Optional[dict] = None
 
 
 def _compute_feedback_hash(comments: List[str]) -> str:
@@ -115,9 +127,120 @@ def _compute_feedback_hash(comments: List[str]) -> str:
     return hashlib.sha256(content.encode()).hexdigest()
 
 
+def _job_status_response(job: SummaryGenerationJob) -> JobStatusResponse:
+    return JobStatusResponse(**job_state(job))
+
+
+def _enqueue_summary_job(
+    db: Session,
+    school_id: int,
+    evaluation_id: int,
+    student_id: int,
+    feedback_hash: str,
+) -> SummaryGenerationJob:
+    """
+    Queue generation of the summary of the current feedback, at most once.
+
+    A queued or processing job of the student, including one of a batch
+    (``queue_summary_batch``, job id ``summary-{eval}-{student}-{batch_ts}``),
+    is returned as is: it already generates the summary. Otherwise the job id
+    is derived from ``feedback_hash``, so requests for the same feedback share
+    one job: a finished one (e.g. after a regenerate) is queued again, and of
+    two concurrent requests the second finds the row the first inserted.
+    """
+    active_job = (
+        db.query(SummaryGenerationJob)
+        .filter(
+            SummaryGenerationJob.school_id == school_id,
+            SummaryGenerationJob.evaluation_id == evaluation_id,
+            SummaryGenerationJob.student_id == student_id,
+            SummaryGenerationJob.status.in_(["queued", "processing"]),
+        )
+        .order_by(SummaryGenerationJob.created_at.desc())
+        .first()
+    )
+    if active_job:
+        return active_job
+
+    job_id = f"summary-{evaluation_id}-{student_id}-{feedback_hash[:16]}"
+
+    job = (
+        db.query(SummaryGenerationJob)
+        .filter(
+            SummaryGenerationJob.job_id == job_id,
+            SummaryGenerationJob.school_id == school_id,
+        )
+        .first()
+    )
+    if job:
+        job.status = "queued"
+        job.progress = 0
+        job.retry_count = 0
+        job.next_retry_at = None
+        job.started_at = None
+        job.completed_at = None
+        job.cancelled_at = None
+        job.cancelled_by = None
+        job.result = None
+        job.error_message = None
+        db.commit()
+    else:
+        job = SummaryGenerationJob(
+            school_id=school_id,
+            evaluation_id=evaluation_id,
+            student_id=student_id,
+            job_id=job_id,
+            status="queued",
+            priority=PRIORITY_HIGH,
+            queue_name=QUEUE_AI_SUMMARIES_HIGH,
+        )
+        db.add(job)
+        try:
+            db.commit()
+        except IntegrityError:
+            # Another request queued the same feedback first
+            db.rollback()
+            return (
+                db.query(SummaryGenerationJob)
+                .filter(SummaryGenerationJob.job_id == job_id)
+                .one()
+            )
+    db.refresh(job)
+    publish_job_state(job)
+
+    try:
+        queue = get_queue(job.queue_name)
+        queue.enqueue(
+            generate_ai_summary_task,
+            school_id=school_id,
+            evaluation_id=evaluation_id,
+            student_id=student_id,
+            job_id=job_id,
+            job_timeout="10m",
+            result_ttl=86400,
+            failure_ttl=86400,
+        )
+        logger.info(
+            f"Enqueued job {job_id} to queue '{job.queue_name}' "
+            f"(student: {student_id}, evaluation: {evaluation_id})"
+        )
+    except Exception as e:
+        job.status = "failed"
+        job.error_message = f"Failed to queue job: {str(e)}"
+        db.commit()
+        publish_job_state(job)
+        logger.error(f"Failed to enqueue job {job_id}: {e}", exc_info=True)
+        raise HTTPException(
+            status_code=503, detail="Samenvatting kan nu niet worden gegenereerd"
+        )
+
+    return job
+
+
 @router.get(
     "/evaluation/{evaluation_id}/student/{student_id}",
     response_model=FeedbackSummaryResponse,
+    responses={202: {"model": JobStatusResponse}},
 )
 def get_student_feedback_summary(
     evaluation_id: int,
@@ -125,7 +248,14 @@ def get_student_feedback_summary(
     db: Session = Depends(get_db),
     user=Depends(get_current_user),
 ):
-    """Get or generate AI summary of peer feedback for a student."""
+    """
+    Get the AI summary of peer feedback for a student.
+
+    Returns the stored summary when it matches the current feedback. Otherwise
+    generation is queued and a 202 with the job status is returned right away;
+    poll ``/jobs/{job_id}/status`` for the result. The request never waits on
+    Ollama.
+    """
 
     # Verify evaluation exists and user has access
     ev = (
@@ -165,8 +295,8 @@ def get_student_feedback_summary(
         .all()
     )
 
+    # Same query as generate_ai_summary_task, so both compute the same hash
     comments = [row.comment for row in feedback_rows if row.comment]
-    reviewer_names = [row.name for row in feedback_rows if row.name]
 
     if not comments:
         # No feedback yet
@@ -204,74 +334,17 @@ def get_student_feedback_summary(
             cached=True,
         )
 
-    # Generate new summary
-    # First anonymize the comments
-    all_names = reviewer_names + [student.name]
-    anonymizer = AnonymizationService()
-    anonymized_comments = anonymizer.anonymize_comments(comments, all_names)
-
-    if not anonymized_comments:
-        anonymized_comments = comments  # Fallback if anonymization removed everything
-
-    # Try AI generation
-    ollama = OllamaService()
-    start_time = time.time()
-
-    try:
-        ai_summary = ollama.generate_summary(
-            feedback_comments=anonymized_comments,
-            student_name=student.name,
-            context=f"Evaluatie: {ev.title}",
-        )
-    except Exception as e:
-        import logging
-
-        logger = logging.getLogger(__name__)
-        logger.error(f"Exception during AI generation: {type(e).__name__}: {e}")
-        ai_summary = None
-
-    duration_ms = int((time.time() - start_time) * 1000)
-
-    if ai_summary:
-        summary_text = ai_summary
-        method = "ai"
-    else:
-        # Fallback to rule-based summary
-        summary_text = ollama.create_fallback_summary(anonymized_comments)
-        method = "fallback"
-
-    # Cache the summary
-    # Delete old summary if exists
-    db.query(FeedbackSummary).filter(
-        FeedbackSummary.evaluation_id == evaluation_id,
-        FeedbackSummary.student_id == student_id,
-    ).delete()
-
-    new_summary = FeedbackSummary(
-        school_id=user.school_id,
-        evaluation_id=evaluation_id,
-        student_id=student_id,
-        summary_text=summary_text,
-        feedback_hash=feedback_hash,
-        generation_method=method,
-        generation_duration_ms=duration_ms,
-    )
-    db.add(new_summary)
-    db.commit()
-
-    return FeedbackSummaryResponse(
-        student_id=student_id,
-        student_name=student.name,
-        summary_text=summary_text,
-        generation_method=method,
-        feedback_count=len(comments),
-        cached=False,
+    # Generation runs on the RQ worker; the client polls the job status
+    job = _enqueue_summary_job(
+        db, user.school_id, evaluation_id, student_id, feedback_hash
     )
+    return JSONResponse(status_code=202, content=_job_status_response(job).model_dump())
 
 
 @router.post(
     "/evaluation/{evaluation_id}/student/{student_id}/regenerate",
     response_model=FeedbackSummaryResponse,
+    responses={202: {"model": JobStatusResponse}},
 )
 def regenerate_student_feedback_summary(
     evaluation_id: int,
@@ -280,7 +353,7 @@ def regenerate_student_feedback_summary(
     db: Session = Depends(get_db),
     user=Depends(get_current_user),
 ):
-    """Force regeneration of AI summary, bypassing cache."""
+    """Force regeneration of AI summary, bypassing cache (queued, see the GET)."""
 
     # Delete existing cache
     db.query(FeedbackSummary).filter(
@@ -289,7 +362,7 @@ def regenerate_student_feedback_summary(
     ).delete()
     db.commit()
 
-    # Call get endpoint to generate new summary
+    # Call get endpoint to queue a new summary
     return get_student_feedback_summary(evaluation_id, student_id, db, user)
 
 
@@ -471,6 +544,7 @@ def queue_summary_generation(
     db.add(new_job_record)
     db.commit()
     db.refresh(new_job_record)
+    publish_job_state(new_job_record)
 
     # Queue the job
     try:
@@ -494,6 +568,7 @@ def queue_summary_generation(
         new_job_record.status = "failed"
         new_job_record.error_message = f"Failed to queue job: {str(e)}"
         db.commit()
+        publish_job_state(new_job_record)
         logger.error(f"Failed to enqueue job {job_id}: {e}", exc_info=True)
         raise HTTPException(status_code=500, detail=f"Failed to queue job: {str(e)}")
 
@@ -517,7 +592,28 @@ def get_job_status(
     db: Session = Depends(get_db),
     user=Depends(get_current_user),
 ):
-    """Get status of a queued summary generation job."""
+    """
+    Get status of a queued summary generation job.
+
+    Served from Redis (see app/infra/queue/progress.py) while it has a fresh
+    state for the job; Postgres is only read when it has not.
+    """
+    store = get_job_progress_store()
+    progress = store.read(job_id)
+    if (
+        progress
+        and progress["school_id"] == user.school_id
+        and store.is_fresh(progress)
+    ):
+        return JobStatusResponse(
+            **{
+                **progress["state"],
+                "progress": progress["progress"],
+                "stage": progress["stage"],
+                "message": progress["message"],
+            }
+        )
+
     job = (
         db.query(SummaryGenerationJob)
         .filter(
@@ -530,23 +626,17 @@ def get_job_status(
     if not job:
         raise HTTPException(status_code=404, detail="Job not found")
 
-    return JobStatusResponse(
-        job_id=job.job_id,
-        status=job.status,
-        student_id=job.student_id,
-        evaluation_id=job.evaluation_id,
-        created_at=job.created_at.isoformat(),
-        started_at=job.started_at.isoformat() if job.started_at else None,
-        completed_at=job.completed_at.isoformat() if job.completed_at else None,
-        cancelled_at=job.cancelled_at.isoformat() if job.cancelled_at else None,
-        result=job.result,
-        error_message=job.error_message,
-        progress=job.progress,
-        priority=job.priority,
-        retry_count=job.retry_count,
-        max_retries=job.max_retries,
-        webhook_delivered=job.webhook_delivered,
-    )
+    response = _job_status_response(job)
+    if not progress or progress["school_id"] != user.school_id:
+        return response
+    if progress["state"] and progress["state"]["status"] == job.status:
+        # Postgres agrees: serve Redis again for the next polls
+        store.touch(job_id)
+    if job.status == "processing":
+        response.progress = progress["progress"]
+        response.stage = progress["stage"]
+        response.message = progress["message"]
+    return response
 
 
 @router.post("/jobs/{job_id}/cancel")
@@ -583,6 +673,7 @@ def cancel_job(
     job.cancelled_at = db.execute(text("SELECT NOW()")).scalar()
     job.cancelled_by = user.id
     db.commit()
+    publish_job_state(job)
 
     return {
         "message": "Job cancelled successfully",
@@ -602,6 +693,10 @@ def batch_queue_summaries(
     Queue summary generation for multiple students in an evaluation.
     Useful for teachers to pre-generate summaries for all students.
 
+    The students are generated by one batch job; each still gets its own job
+    status, and the batch reports aggregated progress at
+    /batches/{batch_job_id}/status.
+
     Supports:
     - Priority levels
     - Webhook notifications
@@ -635,92 +730,21 @@ def batch_queue_summaries(
     elif payload.priority == PRIORITY_LOW:
         queue_name = QUEUE_AI_SUMMARIES_LOW
 
-    # Queue jobs for each student
-    queue = get_queue(queue_name)
-    results = []
-
-    for student_id in payload.student_ids:
-        # Check if job already queued or completed
-        existing_job = (
-            db.query(SummaryGenerationJob)
-            .filter(
-                SummaryGenerationJob.evaluation_id == evaluation_id,
-                SummaryGenerationJob.student_id == student_id,
-                SummaryGenerationJob.status.in_(["queued", "processing", "completed"]),
-            )
-            .order_by(SummaryGenerationJob.created_at.desc())
-            .first()
-        )
-
-        if existing_job:
-            results.append(
-                {
-                    "student_id": student_id,
-                    "job_id": existing_job.job_id,
-                    "status": (
-                        "already_exists"
-                        if existing_job.status == "completed"
-                        else "already_queued"
-                    ),
-                }
-            )
-            continue
-
-        # Create and queue new job
-        job_id = f"summary-{evaluation_id}-{student_id}-{int(time.time())}"
-
-        new_job_record = SummaryGenerationJob(
-            school_id=user.school_id,
-            evaluation_id=evaluation_id,
-            student_id=student_id,
-            job_id=job_id,
-            status="queued",
-            priority=payload.priority,
-            webhook_url=payload.webhook_url,
-            queue_name=queue_name,
-        )
-        db.add(new_job_record)
-
-        try:
-            rq_job = queue.enqueue(
-                generate_ai_summary_task,
-                school_id=user.school_id,
-                evaluation_id=evaluation_id,
-                student_id=student_id,
-                job_id=job_id,
-                job_timeout="10m",
-                result_ttl=86400,
-                failure_ttl=86400,
-            )
-            logger.info(
-                f"Batch: enqueued job {job_id} to queue '{queue_name}' "
-                f"(RQ job ID: {rq_job.id}, student: {student_id})"
-            )
-            results.append(
-                {
-                    "student_id": student_id,
-                    "job_id": job_id,
-                    "status": "queued",
-                }
-            )
-        except Exception as e:
-            logger.error(
-                f"Batch: failed to enqueue job {job_id} for student {student_id}: {e}"
-            )
-            new_job_record.status = "failed"
-            new_job_record.error_message = f"Failed to queue: {str(e)}"
-            results.append(
-                {
-                    "student_id": student_id,
-                    "status": "failed",
-                    "error": str(e),
-                }
-            )
-
-    db.commit()
+    # One batch job for the students without a job
+    batch = queue_summary_batch(
+        db,
+        school_id=user.school_id,
+        evaluation_id=evaluation_id,
+        student_ids=payload.student_ids,
+        queue_name=queue_name,
+        priority=payload.priority,
+        webhook_url=payload.webhook_url,
+    )
+    results = batch["results"]
 
     return {
         "evaluation_id": evaluation_id,
+        "batch_job_id": batch["batch_job_id"],
         "total_students": len(payload.student_ids),
         "queued": sum(1 for r in results if r["status"] == "queued"),
         "already_queued": sum(1 for r in results if r["status"] == "already_queued"),
@@ -729,6 +753,39 @@ def batch_queue_summaries(
     }
 
 
+@router.get("/batches/{batch_job_id}/status")
+def get_batch_status(
+    batch_job_id: str,
+    user=Depends(get_current_user),
+):
+    """Aggregated progress of a batch summary job."""
+    from rq.exceptions import NoSuchJobError
+    from rq.job import Job
+    from app.infra.queue.connection import RedisConnection
+
+    try:
+        job = Job.fetch(batch_job_id, connection=RedisConnection.get_connection())
+    except NoSuchJobError:
+        raise HTTPException(status_code=404, detail="Batch not found")
+    except (RedisError, OSError) as e:
+        logger.error(f"Failed to fetch batch {batch_job_id}: {e}")
+        raise HTTPException(status_code=503, detail="Queue unavailable")
+
+    if job.meta.get("school_id") != user.school_id:
+        raise HTTPException(status_code=404, detail="Batch not found")
+
+    return {
+        "batch_job_id": batch_job_id,
+        "evaluation_id": job.meta.get("evaluation_id"),
+        "status": job.get_status(),
+        "total": job.meta.get("total", 0),
+        "completed": job.meta.get("completed", 0),
+        "failed": job.meta.get("failed", 0),
+        "cancelled": job.meta.get("cancelled", 0),
+        "progress": job.meta.get("progress", 0),
+    }
+
+
 @router.get("/evaluation/{evaluation_id}/jobs")
 def list_evaluation_jobs(
     evaluation_id: int,
@@ -786,6 +843,7 @@ def get_queue_stats(
     """
     from rq import Worker
     from app.infra.queue.connection import RedisConnection
+    from app.infra.services.llm_cache import get_llm_cache_stats
 
     # Count jobs by status
     queued_count = (
@@ -849,6 +907,7 @@ def get_queue_stats(
         failed_count=failed_count,
         cancelled_count=cancelled_count,
         workers_count=workers_count,
+        llm_cache=get_llm_cache_stats(),
     )
 
 
@@ -7,9 +7,13 @@ from io import StringIO
 import csv
 from typing import Dict, List
 
-from app.api.v1.deps import get_db, get_current_user
-from app.infra.db.models import Evaluation, Allocation, Score, User, Rubric
+from app.api.v1.deps import get_read_db, get_current_user
+from app.infra.db.models import Evaluation, User, Rubric
 from app.api.v1.schemas.flags import FlagsResponse, FlagRow, Flag
+from app.services.evaluation_aggregates import (
+    load_evaluation_aggregates,
+    load_evaluation_users,
+)
 
 router = APIRouter(prefix="/flags", tags=["flags"])
 
@@ -31,7 +35,7 @@ def flags_evaluation(
     gcf_low: float = Query(0.70, description="GCF drempel voor LOW_GCF"),
     min_reviewers: int = Query(2, description="Minimum aantal peer-reviewers"),
     zscore_abs: float = Query(2.0, description="|z|-drempel voor OUTLIER_ZSCORE"),
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
     user=Depends(get_current_user),
 ):
     # === 1) Basis: evaluatie + rubric ophalen
@@ -51,45 +55,28 @@ def flags_evaluation(
     if not rubric:
         raise HTTPException(status_code=404, detail="Rubric not found")
 
-    # === 2) Data vergaren: allocations + scores
-    allocations = (
-        db.query(Allocation)
-        .filter(
-            Allocation.school_id == user.school_id, Allocation.evaluation_id == ev.id
-        )
-        .all()
-    )
-    if not allocations:
+    # === 2) Data vergaren: allocations + scores in één query
+    aggregates = load_evaluation_aggregates(db, user.school_id, ev.id)
+    if not aggregates.allocations:
         return FlagsResponse(evaluation_id=ev.id, items=[])
 
-    users: Dict[int, User] = {
-        u.id: u for u in db.query(User).filter(User.school_id == user.school_id).all()
-    }
+    users: Dict[int, User] = load_evaluation_users(db, user.school_id, aggregates)
 
     # per reviewee alles aggregeren
-    per_reviewee_peer_alloc_avgs: Dict[int, List[float]] = {}
-    per_reviewee_self_avg: Dict[int, float] = {}
-    per_reviewee_reviewers_count: Dict[int, int] = {}
-
-    for alloc in allocations:
-        rows = (
-            db.query(Score)
-            .filter(Score.school_id == user.school_id, Score.allocation_id == alloc.id)
-            .all()
-        )
-        if not rows:
-            continue
-        alloc_avg = _safe_mean([float(r.score) for r in rows])
-        if alloc.is_self:
-            per_reviewee_self_avg[alloc.reviewee_id] = alloc_avg
-        else:
-            per_reviewee_peer_alloc_avgs.setdefault(alloc.reviewee_id, []).append(
-                alloc_avg
-            )
-
-    # reviewers count (alleen peers)
-    for uid, peer_avgs in per_reviewee_peer_alloc_avgs.items():
-        per_reviewee_reviewers_count[uid] = len(peer_avgs)
+    per_reviewee = aggregates.by_reviewee()
+    per_reviewee_peer_alloc_avgs: Dict[int, List[float]] = {
+        uid: agg.peer_alloc_avgs
+        for uid, agg in per_reviewee.items()
+        if agg.peer_alloc_avgs
+    }
+    per_reviewee_self_avg: Dict[int, float] = {
+        uid: agg.self_avg
+        for uid, agg in per_reviewee.items()
+        if agg.self_avg is not None
+    }
+    per_reviewee_reviewers_count: Dict[int, int] = {
+        uid: agg.reviewers_count for uid, agg in per_reviewee.items()
+    }
 
     # globale statistiek voor z-score
     cohort_peer_means = [
@@ -214,7 +201,7 @@ def flags_export_csv(
     gcf_low: float = Query(0.70),
     min_reviewers: int = Query(2),
     zscore_abs: float = Query(2.0),
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
     user=Depends(get_current_user),
 ):
     data: FlagsResponse = flags_evaluation(  # type: ignore
@@ -11,27 +11,16 @@ from app.api.v1.schemas.grades import (
     GradePublishRequest,
     PublishedGradeOut,
 )
+from app.services.grade_preview import get_grade_preview_rows
 
 router = APIRouter()
 
 
-def clamp(x: float, lo: float, hi: float) -> float:
-    return max(lo, min(hi, x))
-
-
 # Import models, with fallback for compatibility
 try:
-    from app.infra.db.models import (
-        CourseEnrollment,
-        Evaluation,
-        ProjectTeam,
-        ProjectTeamMember,
-    )
-
-    HAS_MODELS = True
+    from app.infra.db.models import Evaluation
 except Exception:
-    CourseEnrollment = Evaluation = ProjectTeam = ProjectTeamMember = None  # type: ignore
-    HAS_MODELS = False
+    Evaluation = None  # type: ignore
 
 
 # ------------------------------------------------------------
@@ -81,312 +70,22 @@ def preview_grades(
       (group_members.active = true) en zelf niet gearchiveerd zijn (users.archived = false).
     - Nummer teams 1..N binnen de cluster (course) op basis van alle groups(course_id).
     - Géén fallback die inactieven terugbrengt.
-    """
-    course = resolve_course_id(db, evaluation_id, course_id)
-
-    # 1) Get ALL students in this course with active enrollment (and not archived)
-    students: List[User] = []
-    team_gid_by_uid: Dict[int, Optional[int]] = {}
-    if HAS_MODELS and course is not None:
-        try:
-            # Get all enrollments for this course
-            enrollment_rows = (
-                db.query(CourseEnrollment.student_id, CourseEnrollment.active)
-                .filter(CourseEnrollment.course_id == course)
-                .all()
-            )
-            active_uid_set = {uid for uid, ce_active in enrollment_rows if ce_active}
-
-            if active_uid_set:
-                students = (
-                    db.query(User)
-                    .filter(
-                        User.role == "student",
-                        User.archived.is_(False),  # uitsluitend niet-gearchiveerd
-                        User.id.in_(active_uid_set),
-                    )
-                    .order_by(User.name.asc())
-                    .all()
-                )
-        except Exception as e:
-            print(f"[grades.preview] course-membership join failed: {e!r}")
-
-    # 3) Laatste fallback (geen course of geen actieve memberships): leeg of alle niet-archived studenten
-    if not students:
-        # We kiezen hier voor: géén willekeurige fallback die inactieven of buiten-cluster terugbrengt.
-        # Wil je hier wél "alle niet-archived studenten" tonen, haal dan het comment-blok hieronder weg.
-        #
-        # students = (
-        #     db.query(User)
-        #     .filter(User.role == "student", User.archived.is_(False))
-        #     .order_by(User.name.asc())
-        #     .all()
-        # )
-        students = []
-
-    # 3.5) Fetch evaluation and build project team mapping if evaluation has a project
-    evaluation = None
-    project_team_map: Dict[int, int] = {}
-    if Evaluation and ProjectTeam and ProjectTeamMember:
-        try:
-            evaluation = db.get(Evaluation, evaluation_id)
-            if evaluation and getattr(evaluation, "project_id", None):
-                project_teams = (
-                    db.query(ProjectTeam)
-                    .filter(
-                        ProjectTeam.project_id == evaluation.project_id,
-                        ProjectTeam.school_id == getattr(evaluation, "school_id", None),
-                    )
-                    .all()
-                )
-
-                for team in project_teams:
-                    members = (
-                        db.query(ProjectTeamMember)
-                        .filter(ProjectTeamMember.project_team_id == team.id)
-                        .all()
-                    )
-                    for member in members:
-                        project_team_map[member.user_id] = team.team_number
-        except Exception as e:
-            print(f"[grades.preview] project teams mapping failed: {e!r}")
-            project_team_map = {}
-
-    # ---- Scores ophalen per student ----
-    from statistics import mean
-
-    try:
-        from app.infra.db.models import Allocation, Score, Rubric, RubricCriterion
-    except Exception:
-        Allocation = Score = Rubric = RubricCriterion = None  # type: ignore
-
-    # rubricschaal
-    scale_min = 1
-    scale_max = 5
-    crit_weights: dict[int, float] = {}
-    # GCF range from evaluation settings
-    min_cf = 0.85
-    max_cf = 1.5
-    if Evaluation and Rubric and RubricCriterion:
-        ev = db.get(Evaluation, evaluation_id)
-        if ev:
-            # Load GCF range from evaluation settings
-            settings = getattr(ev, "settings", {}) or {}
-            if isinstance(settings, dict):
-                min_cf = float(settings.get("min_cf", 0.85))
-                max_cf = float(settings.get("max_cf", 1.5))
-
-            rub = db.get(Rubric, getattr(ev, "rubric_id", None))
-            if rub:
-                if hasattr(rub, "scale_min"):
-                    scale_min = getattr(rub, "scale_min") or 1
-                if hasattr(rub, "scale_max"):
-                    scale_max = getattr(rub, "scale_max") or 5
-            # criteria + gewichten
-            if getattr(ev, "rubric_id", None) is not None:
-                rows = (
-                    db.query(RubricCriterion)
-                    .filter(
-                        RubricCriterion.school_id == getattr(ev, "school_id", None),
-                        RubricCriterion.rubric_id == ev.rubric_id,
-                    )
-                    .all()
-                )
-                for rc in rows:
-                    crit_weights[getattr(rc, "id")] = float(getattr(rc, "weight", 1.0))
-
-    def alloc_percent(alloc_id: int) -> float | None:
-        if not Score:
-            return None
-        rows = db.query(Score).filter(Score.allocation_id == alloc_id).all()
-        if not rows:
-            return None
-        num = 0.0
-        den = 0.0
-        rng = max(1, (scale_max - scale_min))
-        for r in rows:
-            w = crit_weights.get(getattr(r, "criterion_id"), 1.0)
-            s = float(getattr(r, "score", 0))
-            norm = (s - scale_min) / rng
-            num += w * norm
-            den += w
-        if den <= 0:
-            return None
-        return 100.0 * (num / den)
-
-    # Bereken per student: peer_avg_pct, self_pct, given_avg_pct en team_id
-    peer_pct_by_uid: dict[int, float] = {}
-    self_pct_by_uid: dict[int, float] = {}
-    given_avg_pct_by_uid: dict[int, float] = {}
-    teamid_by_uid: dict[int, int | None] = {}
-
-    has_project = bool(evaluation and getattr(evaluation, "project_id", None))
-    if Allocation:
-        for u in students:
-            if has_project:
-                raw_gid = project_team_map.get(u.id)
-            else:
-                raw_gid = getattr(u, "team_number", None)
-            teamid_by_uid[u.id] = raw_gid
-
-            allocs = (
-                db.query(Allocation)
-                .filter(
-                    Allocation.reviewee_id == u.id,
-                    # als je een evaluation_id veld hebt op Allocation, filter:
-                    *(
-                        [getattr(Allocation, "evaluation_id") == evaluation_id]
-                        if hasattr(Allocation, "evaluation_id")
-                        else []
-                    ),
-                )
-                .all()
-            )
-            if not allocs:
-                continue
-            peer_vals = []
-            self_vals = []
-            for a in allocs:
-                pct = alloc_percent(getattr(a, "id"))
-                if pct is None:
-                    continue
-                is_self = False
-                if hasattr(a, "is_self"):
-                    is_self = bool(getattr(a, "is_self"))
-                elif hasattr(a, "reviewer_id"):
-                    is_self = getattr(a, "reviewer_id") == u.id
-                if is_self:
-                    self_vals.append(pct)
-                else:
-                    peer_vals.append(pct)
-            if peer_vals:
-                peer_pct_by_uid[u.id] = mean(peer_vals)
-            if self_vals:
-                self_pct_by_uid[u.id] = mean(self_vals)
-
-        # Bereken given_avg_pct: gemiddelde % die student aan peers geeft
-        for u in students:
-            given_allocs = (
-                db.query(Allocation)
-                .filter(
-                    Allocation.reviewer_id == u.id,
-                    *(
-                        [getattr(Allocation, "evaluation_id") == evaluation_id]
-                        if hasattr(Allocation, "evaluation_id")
-                        else []
-                    ),
-                )
-                .all()
-            )
-            given_vals = []
-            for a in given_allocs:
-                is_self = False
-                if hasattr(a, "is_self"):
-                    is_self = bool(getattr(a, "is_self"))
-                elif hasattr(a, "reviewer_id") and hasattr(a, "reviewee_id"):
-                    is_self = getattr(a, "reviewer_id") == getattr(a, "reviewee_id")
-                if is_self:
-                    continue
-                pct = alloc_percent(getattr(a, "id"))
-                if pct is not None:
-                    given_vals.append(pct)
-            if given_vals:
-                given_avg_pct_by_uid[u.id] = mean(given_vals)
-
-    # GCF: normaliseer peer_avg binnen team naar mean==1.0, clamp to min_cf..max_cf
-    gcf_by_uid: dict[int, float] = {}
-    # verzamel per raw group id
-    by_team: dict[int | None, list[float]] = {}
-    for uid, pct in peer_pct_by_uid.items():
-        by_team.setdefault(teamid_by_uid.get(uid), []).append(pct)
-    team_mean: dict[int | None, float] = {
-        tid: mean(vals) for tid, vals in by_team.items() if vals
-    }
-    for uid, pct in peer_pct_by_uid.items():
-        t = teamid_by_uid.get(uid)
-        m = team_mean.get(t)
-        raw_gcf = (pct / m) if (m and m > 0) else 1.0
-        # Clamp GCF to the evaluation's correction factor range
-        gcf_by_uid[uid] = clamp(raw_gcf, min_cf, max_cf)
-
-    items: List[GradePreviewItem] = []
-    for u in students:
-        avg_score = float(peer_pct_by_uid.get(u.id, 0.0))  # 0..100
-        gcf = float(gcf_by_uid.get(u.id, 1.0))
-        # SPR = self% / peer%
-        self_pct = self_pct_by_uid.get(u.id)
-        spr = (
-            float(self_pct / avg_score)
-            if (self_pct is not None and avg_score > 0)
-            else 0.0
-        )
 
-        # --- Suggestie puur op basis van peer-scores (1–10 schaal) ---
-        # Formule: (percentage / 100) * 8 + 2
-        # Dit geeft realistischere cijfers: 50% → 6.0, 75% → 8.0, 100% → 10.0
-        # SPR wordt als informatief signaal berekend maar telt NIET mee in het cijfer
-        P = ((avg_score / 100.0) * 8 + 2) if avg_score > 0 else None
-        S = (
-            ((self_pct / 100.0) * 8 + 2)
-            if (self_pct is not None and self_pct > 0)
-            else None
-        )
-
-        if P is not None:
-            # Suggestie is puur gebaseerd op peer-scores
-            suggested_val = P
-        elif S is not None:
-            # Geen peer-scores maar wel self: gebruik self als fallback
-            suggested_val = S
-        else:
-            # Geen peer en geen self evaluaties: geen voorstel
-            suggested_val = None
-
-        # afronden en begrenzen (alleen als er een waarde is)
-        suggested = (
-            clamp(round(suggested_val, 1), 1.0, 10.0)
-            if suggested_val is not None
-            else None
-        )
-
-        # If evaluation has a project, only use project teams (don't fallback to user.team_number)
-        # If no project, use user.team_number
-        if evaluation and getattr(evaluation, "project_id", None):
-            team_num = project_team_map.get(u.id, None)
-        else:
-            team_num = getattr(u, "team_number", None)
-
-        given_avg = given_avg_pct_by_uid.get(u.id)
-
-        items.append(
-            GradePreviewItem(
-                user_id=u.id,
-                user_name=u.name,
-                avg_score=avg_score,
-                gcf=gcf,
-                spr=spr,
-                suggested_grade=suggested,  # 1–10
-                team_number=team_num,
-                class_name=getattr(u, "class_name", None),
-                student_number=getattr(u, "student_number", None),
-                first_name=getattr(u, "first_name", None),
-                prefix=getattr(u, "prefix", None),
-                last_name=getattr(u, "last_name", None),
-                given_avg_pct=given_avg,
-            )
-        )
+    Het resultaat wordt kort gecachet (zie app.services.grade_preview), zodat
+    herhaalde previews en opslaan/publiceren direct daarna niet opnieuw rekenen.
+    """
+    return _build_preview(db, evaluation_id, course_id)
 
-    # Bereken team_given_avg: per team het gemiddelde van given_avg_pct
-    by_team_given: dict[int | None, list[float]] = {}
-    for item in items:
-        if item.given_avg_pct is not None:
-            by_team_given.setdefault(item.team_number, []).append(item.given_avg_pct)
-    team_given_avg_map: dict[int | None, float] = {
-        tid: mean(vals) for tid, vals in by_team_given.items() if vals
-    }
-    for item in items:
-        item.team_given_avg = team_given_avg_map.get(item.team_number)
 
+def _build_preview(
+    db: Session,
+    evaluation_id: int,
+    course_id: Optional[int],
+) -> GradePreviewResponse:
+    # Een gecachete preview wordt alleen hergebruikt als de invoer ongewijzigd is
+    course = resolve_course_id(db, evaluation_id, course_id)
+    rows = get_grade_preview_rows(db, evaluation_id, course)
+    items = [GradePreviewItem(**row) for row in rows]
     return GradePreviewResponse(evaluation_id=evaluation_id, items=items)
 
 
@@ -395,12 +94,8 @@ def preview_grades(
 # ------------------------------------------------------------
 @router.post("/grades/draft")
 def save_draft(payload: GradeDraftRequest, db: Session = Depends(get_db)):
-    preview = preview_grades(
-        evaluation_id=payload.evaluation_id,
-        group_grade=payload.group_grade,
-        course_id=None,  # evaluatie bepaalt course; je mag hier ook een course_id doorgeven
-        db=db,
-    )
+    # evaluatie bepaalt course; hergebruikt de preview als die nog klopt
+    preview = _build_preview(db, payload.evaluation_id, None)
     preview_by_uid: Dict[int, GradePreviewItem] = {i.user_id: i for i in preview.items}
 
     for uid, ov in payload.overrides.items():
@@ -449,12 +144,7 @@ def save_draft(payload: GradeDraftRequest, db: Session = Depends(get_db)):
 # ------------------------------------------------------------
 @router.post("/grades/publish")
 def publish_grades(payload: GradePublishRequest, db: Session = Depends(get_db)):
-    preview = preview_grades(
-        evaluation_id=payload.evaluation_id,
-        group_grade=payload.group_grade,
-        course_id=None,
-        db=db,
-    )
+    preview = _build_preview(db, payload.evaluation_id, None)
     preview_by_uid: Dict[int, GradePreviewItem] = {i.user_id: i for i in preview.items}
 
     for uid, ov in payload.overrides.items():
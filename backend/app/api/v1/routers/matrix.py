@@ -7,9 +7,13 @@ from io import StringIO
 import csv
 from typing import Dict, List, Tuple
 
-from app.api.v1.deps import get_db, get_current_user
-from app.infra.db.models import Evaluation, Allocation, Score, User, RubricCriterion
+from app.api.v1.deps import get_read_db, get_current_user
+from app.infra.db.models import Evaluation, User, RubricCriterion
 from app.api.v1.schemas.matrix import MatrixResponse, MatrixUser, MatrixCell
+from app.services.evaluation_aggregates import (
+    load_evaluation_aggregates,
+    load_evaluation_users,
+)
 
 router = APIRouter(prefix="/dashboard", tags=["dashboard"])
 
@@ -30,7 +34,7 @@ def matrix_evaluation(
         default=None, description="Beperk naar één rubric-criterium"
     ),
     include_self: bool = Query(default=True, description="Neem self-reviews mee"),
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
     user=Depends(get_current_user),
 ):
     # 1) eval check
@@ -60,14 +64,11 @@ def matrix_evaluation(
             )
         valid_crit_id = criterion_id
 
-    # 3) alle allocations voor deze evaluatie (optioneel zonder self)
-    alloc_q = db.query(Allocation).filter(
-        Allocation.school_id == user.school_id, Allocation.evaluation_id == ev.id
+    # 3) alle allocations + scores in één query (optioneel zonder self)
+    aggregates = load_evaluation_aggregates(
+        db, user.school_id, ev.id, include_self=include_self
     )
-    if not include_self:
-        alloc_q = alloc_q.filter(Allocation.is_self.is_(False))
-    allocations = alloc_q.all()
-    if not allocations:
+    if not aggregates.allocations:
         return MatrixResponse(
             evaluation_id=ev.id,
             criterion_id=valid_crit_id,
@@ -76,44 +77,13 @@ def matrix_evaluation(
             cells=[],
         )
 
-    # 4) users map (mypy-veilig)
-    users: Dict[int, User] = {
-        u.id: u for u in db.query(User).filter(User.school_id == user.school_id).all()
-    }
-
-    # 5) per koppel (reviewer, reviewee) verzamel scores
-    #    - als criterion_id is gezet: lijst met die ene score per allocation (0..n)
-    #    - anders: lijst met alloc-avg over alle criteria
-    pair_scores: Dict[Tuple[int, int], List[float]] = {}
+    # 4) users map: alleen gebruikers die in deze evaluatie voorkomen
+    users: Dict[int, User] = load_evaluation_users(db, user.school_id, aggregates)
 
-    for alloc in allocations:
-        rows = (
-            db.query(Score)
-            .filter(Score.school_id == user.school_id, Score.allocation_id == alloc.id)
-            .all()
-        )
-        if not rows:
-            continue
-
-        if valid_crit_id is not None:
-            vals = [float(r.score) for r in rows if r.criterion_id == valid_crit_id]
-            if not vals:
-                continue
-            # op 1 allocation kan je meerdere ingevulde scores voor hetzelfde criterium hebben
-            # (bijv. updates). We nemen de laatste of het gemiddelde; hier gemiddelde:
-            value = _safe_mean(vals)
-            pair_scores.setdefault((alloc.reviewer_id, alloc.reviewee_id), []).append(
-                value
-            )
-        else:
-            # gemiddeld over alle criteria in deze allocation
-            crit_vals = [float(r.score) for r in rows]
-            if not crit_vals:
-                continue
-            value = _safe_mean(crit_vals)
-            pair_scores.setdefault((alloc.reviewer_id, alloc.reviewee_id), []).append(
-                value
-            )
+    # 5) per koppel (reviewer, reviewee) de allocation-gemiddelden
+    #    - als criterion_id is gezet: gemiddelde van dat criterium per allocation
+    #    - anders: alloc-avg over alle criteria
+    pair_scores: Dict[Tuple[int, int], List[float]] = aggregates.by_pair(valid_crit_id)
 
     # 6) bepaal rijen/kolommen (gesorteerd op naam)
     reviewer_ids = sorted(
@@ -158,7 +128,7 @@ def matrix_evaluation_csv(
     evaluation_id: int,
     criterion_id: int | None = Query(default=None),
     include_self: bool = Query(default=True),
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
     user=Depends(get_current_user),
 ):
     # hergebruik JSON-endpoint om logica te delen
@@ -10,9 +10,9 @@ from typing import Optional
 import logging
 from collections import defaultdict, Counter
 
-from app.api.v1.deps import get_db, get_current_user
+from app.api.v1.deps import get_read_db, get_current_user
 from app.core.grading import score_to_grade as _score_to_grade
-from app.core.constants import MAX_REASONABLE_GCF, get_category_abbrev
+from app.core.constants import get_category_abbrev
 from app.infra.db.models import (
     User,
     Course,
@@ -20,13 +20,8 @@ from app.infra.db.models import (
     ProjectAssessmentScore,
     ProjectAssessmentTeam,
     Evaluation,
-    CompetencyWindow,
-    CompetencySelfScore,
-    CourseEnrollment,
     Rubric,
     RubricCriterion,
-    Grade,
-    PublishedGrade,
     Allocation,
     Project,
     Client,
@@ -38,6 +33,8 @@ from app.infra.db.models import (
     ProjectTeamMember,
 )
 from app.services.omza_weighted_scores import compute_weighted_omza_scores_batch
+from app.services.overview_items import OverviewItemFilters, query_overview_items
+from app.services.overview_matrix import build_overview_matrix, iter_matrix_csv_rows
 from app.api.v1.schemas.overview import (
     OverviewItemOut,
     OverviewListResponse,
@@ -131,217 +128,6 @@ def _calculate_statistics(values: list[float]) -> CategoryStatistics:
     )
 
 
-def _calculate_project_score(
-    db: Session,
-    assessment_id: int,
-    rubric_id: int,
-    team_number: int,
-    student_id: Optional[int] = None,
-) -> Optional[float]:
-    """
-    Calculate final grade for a project assessment for a specific team.
-    When *student_id* is provided, individual score overrides for that student
-    are applied on top of the base team scores so that the returned grade
-    reflects the student's personal result rather than the plain team average.
-    Uses weighted average based on criterion weights, then normalizes to 1-10
-    scale using curved mapping.
-    """
-    # Get rubric scale
-    rubric = db.query(Rubric).filter(Rubric.id == rubric_id).first()
-    if not rubric:
-        return None
-
-    # Get all criteria for this rubric
-    criteria = (
-        db.query(RubricCriterion).filter(RubricCriterion.rubric_id == rubric_id).all()
-    )
-
-    if not criteria:
-        return None
-
-    # Build the score filter: always include team scores (student_id IS NULL);
-    # when a student_id is provided, also fetch that student's overrides.
-    score_filter = [
-        ProjectAssessmentScore.assessment_id == assessment_id,
-        ProjectAssessmentScore.team_number == team_number,
-        (
-            or_(
-                ProjectAssessmentScore.student_id.is_(None),
-                ProjectAssessmentScore.student_id == student_id,
-            )
-            if student_id is not None
-            else ProjectAssessmentScore.student_id.is_(None)
-        ),
-    ]
-
-    scores = db.query(ProjectAssessmentScore).filter(*score_filter).all()
-
-    if not scores:
-        return None
-
-    # Build score map: start with team scores, then apply the student's own
-    # overrides (if any) on top so they take precedence.
-    score_map: dict[int, float] = {
-        s.criterion_id: s.score for s in scores if s.student_id is None
-    }
-    if student_id is not None:
-        for s in scores:
-            if s.student_id == student_id:
-                score_map[s.criterion_id] = s.score
-
-    # Calculate weighted average
-    total_weighted_score = 0.0
-    total_weight = 0.0
-
-    for criterion in criteria:
-        if criterion.id in score_map:
-            total_weighted_score += score_map[criterion.id] * criterion.weight
-            total_weight += criterion.weight
-
-    if total_weight == 0:
-        return None
-
-    avg_score = total_weighted_score / total_weight
-
-    # Normalize to 1-10 scale using curved mapping
-    return _score_to_grade(avg_score, rubric.scale_min, rubric.scale_max)
-
-
-def _get_grade_value(
-    grade: Grade, field_name: str, meta_key: str = None
-) -> Optional[float]:
-    """
-    Helper to get a grade value from either direct field or meta dictionary.
-
-    Args:
-        grade: Grade object
-        field_name: Name of the direct field attribute
-        meta_key: Key in the meta dictionary (defaults to field_name if not provided)
-
-    Returns:
-        Float value or None
-    """
-    if meta_key is None:
-        meta_key = field_name
-
-    # Try direct field first
-    value = getattr(grade, field_name, None)
-
-    # Fallback to meta dictionary for backwards compatibility
-    if value is None and grade.meta and isinstance(grade.meta, dict):
-        value = grade.meta.get(meta_key)
-
-    return value
-
-
-def _calculate_peer_score(
-    db: Session, evaluation_id: int, user_id: int
-) -> Optional[float]:
-    """
-    Get final peer evaluation grade for a student (Eindcijfer)
-    Priority order:
-    1. Direct override from Grade.grade field (cell override)
-    2. Group grade × GCF (Grade.group_grade × Grade.gcf)
-    3. Suggested grade (Grade.suggested_grade or from meta)
-    """
-    # Try to get from PublishedGrade table first (published grades take precedence)
-    published = (
-        db.query(PublishedGrade)
-        .filter(
-            PublishedGrade.evaluation_id == evaluation_id,
-            PublishedGrade.user_id == user_id,
-        )
-        .first()
-    )
-
-    if published and published.grade is not None:
-        return round(float(published.grade), 1)
-
-    # Get grade record from Grade table
-    grade = (
-        db.query(Grade)
-        .filter(Grade.evaluation_id == evaluation_id, Grade.user_id == user_id)
-        .first()
-    )
-
-    if grade:
-        # Priority 1: Direct override in cell (Grade.grade)
-        if grade.grade is not None:
-            return round(float(grade.grade), 1)
-
-        # Priority 2: Group grade × GCF
-        group_grade = _get_grade_value(grade, "group_grade")
-        gcf = _get_grade_value(grade, "gcf")
-
-        if group_grade is not None and gcf is not None:
-            try:
-                group_grade_float = float(group_grade)
-                gcf_float = float(gcf)
-
-                # Validate that values are reasonable for grade calculations
-                # Group grades typically range from 1 to 10, GCF from 0.5 to 1.5
-                if group_grade_float <= 0 or gcf_float <= 0:
-                    logger.warning(
-                        f"Non-positive group_grade ({group_grade_float}) or gcf ({gcf_float}) for "
-                        f"evaluation_id={evaluation_id}, user_id={user_id}"
-                    )
-                    # Continue to next priority instead of returning invalid grade
-                else:
-                    # Log suspiciously high GCF (> 2.0) but still use it to preserve teacher flexibility
-                    # Teachers may have valid reasons for exceptional GCF values
-                    if gcf_float > MAX_REASONABLE_GCF:
-                        logger.warning(
-                            f"Unusually high gcf ({gcf_float}) for "
-                            f"evaluation_id={evaluation_id}, user_id={user_id}"
-                        )
-                    final_grade = group_grade_float * gcf_float
-                    return round(final_grade, 1)
-            except (ValueError, TypeError) as e:
-                logger.warning(
-                    f"Invalid group_grade ({group_grade}) or gcf ({gcf}) for "
-                    f"evaluation_id={evaluation_id}, user_id={user_id}: {e}"
-                )
-
-        # Priority 3: Suggested grade
-        suggested_grade = _get_grade_value(grade, "suggested_grade", "suggested")
-        if suggested_grade is not None:
-            try:
-                return round(float(suggested_grade), 1)
-            except (ValueError, TypeError) as e:
-                logger.warning(
-                    f"Invalid suggested_grade ({suggested_grade}) for "
-                    f"evaluation_id={evaluation_id}, user_id={user_id}: {e}"
-                )
-
-    return None
-
-
-def _calculate_competency_score(
-    db: Session, window_id: int, user_id: int
-) -> Optional[float]:
-    """
-    Calculate average competency score for a student in a window
-    Converts from 1-5 scale to 1-10 scale (grade)
-    """
-    scores = (
-        db.query(func.avg(CompetencySelfScore.score))
-        .filter(
-            CompetencySelfScore.window_id == window_id,
-            CompetencySelfScore.user_id == user_id,
-        )
-        .scalar()
-    )
-
-    if not scores:
-        return None
-
-    # Convert from 1-5 scale to 1-10 scale
-    avg_score = float(scores)
-    grade = 1 + ((avg_score - 1) / 4) * 9  # Maps 1-5 to 1-10
-
-    return round(grade, 1)
-
-
 @router.get("/all-items", response_model=OverviewListResponse)
 def get_overview_all_items(
     student_id: Optional[int] = Query(None),
@@ -357,277 +143,54 @@ def get_overview_all_items(
     sort_order: str = Query("desc"),
     page: int = Query(1, ge=1),
     limit: int = Query(50, ge=1, le=100),
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
     current_user: User = Depends(get_current_user),
 ):
     """
     Get all overview items (projects, peer evaluations, competency windows) combined
-    """
-    school_id = current_user.school_id
-    items = []
-
-    # Parse date filters
-    date_from_dt = datetime.fromisoformat(date_from) if date_from else None
-    date_to_dt = datetime.fromisoformat(date_to) if date_to else None
-
-    # ==================== PROJECT ASSESSMENTS ====================
-    if not type_filter or type_filter == "project":
-        # Query project assessments with student data via project teams
-        # Join through ProjectAssessmentTeam junction table to match new data model
-        project_query = (
-            db.query(
-                ProjectAssessment,
-                User,
-                Course,
-                ProjectTeam,
-            )
-            .join(
-                ProjectAssessmentTeam,
-                ProjectAssessmentTeam.project_assessment_id == ProjectAssessment.id,
-            )
-            .join(ProjectTeam, ProjectTeam.id == ProjectAssessmentTeam.project_team_id)
-            .join(User, User.id == ProjectAssessment.teacher_id)  # Teacher as creator
-            .join(Project, ProjectTeam.project_id == Project.id)
-            .outerjoin(Course, Project.course_id == Course.id)
-            .filter(ProjectAssessment.school_id == school_id)
-        )
 
-        # Apply filters
-        if course_id:
-            project_query = project_query.filter(Project.course_id == course_id)
-        if teacher_id:
-            project_query = project_query.filter(
-                ProjectAssessment.teacher_id == teacher_id
-            )
-        if status:
-            project_query = project_query.filter(ProjectAssessment.status == status)
-        if date_from_dt:
-            project_query = project_query.filter(
-                ProjectAssessment.published_at >= date_from_dt
-            )
-        if date_to_dt:
-            project_query = project_query.filter(
-                ProjectAssessment.published_at <= date_to_dt
-            )
-        if team_number:
-            project_query = project_query.filter(ProjectTeam.team_number == team_number)
-        if search:
-            search_pattern = f"%{search}%"
-            project_query = project_query.filter(
-                or_(
-                    ProjectAssessment.title.ilike(search_pattern),
-                    ProjectTeam.display_name_at_time.ilike(search_pattern),
-                )
-            )
-
-        # Get results and create items for each team member
-        for assessment, teacher, course, project_team in project_query.all():
-            # Get all project team members
-            members = (
-                db.query(User)
-                .join(ProjectTeamMember, ProjectTeamMember.user_id == User.id)
-                .filter(ProjectTeamMember.project_team_id == project_team.id)
-                .all()
-            )
-
-            # Filter by student_id if specified
-            if student_id:
-                members = [m for m in members if m.id == student_id]
-
-            # Create an item for each student in the group
-            for member in members:
-                score = _calculate_project_score(
-                    db,
-                    assessment.id,
-                    assessment.rubric_id,
-                    project_team.team_number,
-                    student_id=member.id,
-                )
-
-                items.append(
-                    {
-                        "id": assessment.id,
-                        "type": "project",
-                        "student_id": member.id,
-                        "student_name": member.name,
-                        "student_class": member.class_name,
-                        "title": assessment.title,
-                        "course_name": course.name if course else None,
-                        "course_id": course.id if course else None,
-                        "teacher_name": teacher.name,
-                        "teacher_id": teacher.id,
-                        "date": assessment.published_at,
-                        "score": score,
-                        "score_label": f"{score:.1f}" if score else "—",
-                        "status": assessment.status,
-                        "detail_url": f"/teacher/project-assessments/{assessment.id}/overview",
-                        "team_number": project_team.team_number,
-                        "team_name": project_team.name,
-                    }
-                )
-
-    # ==================== PEER EVALUATIONS ====================
-    if not type_filter or type_filter == "peer":
-        # Query evaluations
-        eval_query = (
-            db.query(
-                Evaluation,
-                Course,
-            )
-            .outerjoin(Course, Evaluation.course_id == Course.id)
-            .filter(Evaluation.school_id == school_id)
-        )
-
-        # Apply filters
-        if course_id:
-            eval_query = eval_query.filter(Evaluation.course_id == course_id)
-        if status:
-            eval_query = eval_query.filter(Evaluation.status == status)
-        if search:
-            search_pattern = f"%{search}%"
-            eval_query = eval_query.filter(Evaluation.title.ilike(search_pattern))
-
-        # Get all students who participated in evaluations
-        for evaluation, course in eval_query.all():
-            # Get all students in this evaluation (via allocations or class)
-            students = db.query(User).filter(
-                User.school_id == school_id, User.role == "student"
-            )
-
-            # Filter by student_id if specified
-            if student_id:
-                students = students.filter(User.id == student_id)
-
-            # For now, we'll get all students - in a real implementation,
-            # you'd filter by students who actually participated in the evaluation
-            students = students.limit(100).all()  # Limit to avoid huge result sets
-
-            for student in students:
-                score = _calculate_peer_score(db, evaluation.id, student.id)
-
-                items.append(
-                    {
-                        "id": evaluation.id,
-                        "type": "peer",
-                        "student_id": student.id,
-                        "student_name": student.name,
-                        "student_class": student.class_name,
-                        "title": evaluation.title,
-                        "course_name": course.name if course else None,
-                        "course_id": course.id if course else None,
-                        "teacher_name": None,  # Could be enriched if you track this
-                        "teacher_id": None,
-                        "date": None,  # Could use evaluation creation date or deadline
-                        "score": score,
-                        "score_label": f"{score:.1f}" if score else "—",
-                        "status": evaluation.status,
-                        "detail_url": f"/teacher/evaluations/{evaluation.id}/dashboard",
-                        "team_number": student.team_number,
-                        "team_name": None,
-                    }
-                )
-
-    # ==================== COMPETENCY WINDOWS ====================
-    if not type_filter or type_filter == "competency":
-        # Query competency windows
-        window_query = (
-            db.query(
-                CompetencyWindow,
-                Course,
-            )
-            .outerjoin(Course, CompetencyWindow.course_id == Course.id)
-            .filter(CompetencyWindow.school_id == school_id)
-        )
-
-        # Apply filters
-        if course_id:
-            window_query = window_query.filter(CompetencyWindow.course_id == course_id)
-        if status:
-            window_query = window_query.filter(CompetencyWindow.status == status)
-        if date_from_dt:
-            window_query = window_query.filter(
-                CompetencyWindow.end_date >= date_from_dt
-            )
-        if date_to_dt:
-            window_query = window_query.filter(
-                CompetencyWindow.start_date <= date_to_dt
-            )
-        if search:
-            search_pattern = f"%{search}%"
-            window_query = window_query.filter(
-                CompetencyWindow.title.ilike(search_pattern)
-            )
-
-        for window, course in window_query.all():
-            # Get students who have self-scores in this window
-            students_with_scores = (
-                db.query(User)
-                .join(CompetencySelfScore, CompetencySelfScore.user_id == User.id)
-                .filter(CompetencySelfScore.window_id == window.id)
-                .distinct()
-            )
-
-            # Filter by student_id if specified
-            if student_id:
-                students_with_scores = students_with_scores.filter(
-                    User.id == student_id
-                )
-
-            for student in students_with_scores.all():
-                score = _calculate_competency_score(db, window.id, student.id)
-
-                items.append(
-                    {
-                        "id": window.id,
-                        "type": "competency",
-                        "student_id": student.id,
-                        "student_name": student.name,
-                        "student_class": student.class_name,
-                        "title": window.title,
-                        "course_name": course.name if course else None,
-                        "course_id": course.id if course else None,
-                        "teacher_name": None,
-                        "teacher_id": None,
-                        "date": window.end_date,
-                        "score": score,
-                        "score_label": f"{score:.1f}" if score else "—",
-                        "status": window.status,
-                        "detail_url": f"/teacher/competencies/windows/{window.id}",
-                        "team_number": student.team_number,
-                        "team_name": None,
-                    }
-                )
-
-    # ==================== SORT & PAGINATE ====================
-    # Sort items
-    if sort_by == "date":
-        items.sort(
-            key=lambda x: x["date"] or datetime.min, reverse=(sort_order == "desc")
-        )
-    elif sort_by == "student":
-        items.sort(key=lambda x: x["student_name"], reverse=(sort_order == "desc"))
-    elif sort_by == "score":
-        items.sort(key=lambda x: x["score"] or 0, reverse=(sort_order == "desc"))
-
-    # Calculate totals
-    total = len(items)
-    total_projects = sum(1 for item in items if item["type"] == "project")
-    total_peers = sum(1 for item in items if item["type"] == "peer")
-    total_competencies = sum(1 for item in items if item["type"] == "competency")
-
-    # Paginate
-    start = (page - 1) * limit
-    end = start + limit
-    paginated_items = items[start:end]
+    Filtering, sorting and pagination are done in SQL by the set-based engine
+    in ``app.services.overview_items``; scores are resolved in bulk.
+    """
+    page_result = query_overview_items(
+        db,
+        current_user.school_id,
+        _overview_item_filters(
+            student_id=student_id,
+            course_id=course_id,
+            teacher_id=teacher_id,
+            type_filter=type_filter,
+            status=status,
+            date_from=date_from,
+            date_to=date_to,
+            team_number=team_number,
+            search=search,
+        ),
+        sort_by=sort_by,
+        sort_order=sort_order,
+        offset=(page - 1) * limit,
+        limit=limit,
+    )
 
     return OverviewListResponse(
-        items=[OverviewItemOut(**item) for item in paginated_items],
-        total=total,
+        items=[OverviewItemOut(**item) for item in page_result.items],
+        total=page_result.total,
         page=page,
         limit=limit,
-        total_projects=total_projects,
-        total_peers=total_peers,
-        total_competencies=total_competencies,
+        total_projects=page_result.total_by_type["project"],
+        total_peers=page_result.total_by_type["peer"],
+        total_competencies=page_result.total_by_type["competency"],
+    )
+
+
+def _overview_item_filters(
+    date_from: Optional[str] = None, date_to: Optional[str] = None, **kwargs
+) -> OverviewItemFilters:
+    """Build engine filters from the query parameters (parsing the ISO dates)."""
+    return OverviewItemFilters(
+        date_from=datetime.fromisoformat(date_from) if date_from else None,
+        date_to=datetime.fromisoformat(date_to) if date_to else None,
+        **kwargs,
     )
 
 
@@ -642,29 +205,29 @@ def export_overview_csv(
     date_to: Optional[str] = Query(None),
     team_number: Optional[int] = Query(None),
     search: Optional[str] = Query(None),
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
     current_user: User = Depends(get_current_user),
 ):
     """
     Export overview items to CSV with applied filters
     """
-    # Get all items with filters (no pagination)
-    result = get_overview_all_items(
-        student_id=student_id,
-        course_id=course_id,
-        teacher_id=teacher_id,
-        type_filter=type_filter,
-        status=status,
-        date_from=date_from,
-        date_to=date_to,
-        team_number=team_number,
-        search=search,
+    # Same engine as the list endpoint, without pagination
+    result = query_overview_items(
+        db,
+        current_user.school_id,
+        _overview_item_filters(
+            student_id=student_id,
+            course_id=course_id,
+            teacher_id=teacher_id,
+            type_filter=type_filter,
+            status=status,
+            date_from=date_from,
+            date_to=date_to,
+            team_number=team_number,
+            search=search,
+        ),
         sort_by="date",
         sort_order="desc",
-        page=1,
-        limit=10000,  # High limit to get all items
-        db=db,
-        current_user=current_user,
     )
 
     # Create CSV
@@ -691,16 +254,16 @@ def export_overview_csv(
     for item in result.items:
         writer.writerow(
             [
-                item.student_name,
-                item.student_class or "",
-                item.type,
-                item.title,
-                item.course_name or "",
-                item.teacher_name or "",
-                item.date.strftime("%Y-%m-%d") if item.date else "",
-                item.score_label,
-                item.status,
-                item.team_name or item.team_number or "",
+                item["student_name"],
+                item["student_class"] or "",
+                item["type"],
+                item["title"],
+                item["course_name"] or "",
+                item["teacher_name"] or "",
+                item["date"].strftime("%Y-%m-%d") if item["date"] else "",
+                item["score_label"],
+                item["status"],
+                item["team_name"] or item["team_number"] or "",
             ]
         )
 
@@ -726,7 +289,7 @@ def get_overview_matrix(
     date_to: Optional[str] = Query(None),
     sort_by: Optional[str] = Query(None),  # Column key to sort by
     sort_order: str = Query("asc", pattern="^(asc|desc)$"),
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
     current_user: User = Depends(get_current_user),
 ):
     """
@@ -765,415 +328,65 @@ def get_overview_matrix(
     date_to_dt = datetime.fromisoformat(date_to) if date_to else None
 
     try:
-        # If course_id is specified, get all student IDs enrolled in that course
-        allowed_student_ids = None
-        if course_id:
-            student_ids_query = (
-                db.query(User.id)
-                .join(CourseEnrollment, CourseEnrollment.student_id == User.id)
-                .filter(
-                    CourseEnrollment.course_id == course_id,
-                    CourseEnrollment.active.is_(True),
-                    ~User.archived,
-                    User.role == "student",
-                )
-                .distinct()
-            )
-            allowed_student_ids = set(sid for (sid,) in student_ids_query.all())
-
-        # Dictionary to store all evaluations with metadata
-        evaluations = []  # List of (key, type, title, date, evaluation_id)
-
-        # Dictionary to store student data: student_id -> {evaluation_key -> cell_data}
-        student_data = {}
-
-        # ==================== COLLECT PROJECT ASSESSMENTS ====================
-        # Join through ProjectAssessmentTeam junction table to match new data model
-        project_query = (
-            db.query(
-                ProjectAssessment,
-                Course,
-                ProjectTeam,
-            )
-            .join(
-                ProjectAssessmentTeam,
-                ProjectAssessmentTeam.project_assessment_id == ProjectAssessment.id,
-            )
-            .join(ProjectTeam, ProjectTeam.id == ProjectAssessmentTeam.project_team_id)
-            .join(Project, ProjectTeam.project_id == Project.id)
-            .outerjoin(Course, Project.course_id == Course.id)
-            .filter(
-                ProjectAssessment.school_id == school_id,
-                ProjectAssessment.status == "published",  # Only published projects
-                ProjectAssessment.is_advisory.is_(
-                    False
-                ),  # Exclude external assessments
-            )
+        grid = build_overview_matrix(
+            db,
+            school_id,
+            course_id=course_id,
+            class_name=class_name,
+            student_name=student_name,
+            date_from=date_from_dt,
+            date_to=date_to_dt,
         )
 
-        if course_id:
-            project_query = project_query.filter(Project.course_id == course_id)
-        if date_from_dt:
-            project_query = project_query.filter(
-                ProjectAssessment.published_at >= date_from_dt
-            )
-        if date_to_dt:
-            project_query = project_query.filter(
-                ProjectAssessment.published_at <= date_to_dt
-            )
-
-        # Track which assessments we've already added to avoid duplicate column keys
-        seen_assessments = set()
-
-        for assessment, course, team in project_query.all():
-            eval_key = f"project_{assessment.id}"
-
-            # Only add each assessment once to the evaluations list (for columns)
-            if assessment.id not in seen_assessments:
-                evaluations.append(
-                    {
-                        "key": eval_key,
-                        "type": "project",
-                        "title": assessment.title,
-                        "date": assessment.published_at,
-                        "evaluation_id": assessment.id,
-                    }
-                )
-                seen_assessments.add(assessment.id)
-
-            # Get teacher for this assessment
-            teacher = db.query(User).filter(User.id == assessment.teacher_id).first()
-            teacher_name = teacher.name if teacher else None
-
-            # Get all team members and their scores (only active students)
-            members = (
-                db.query(User)
-                .join(ProjectTeamMember, ProjectTeamMember.user_id == User.id)
-                .filter(
-                    ProjectTeamMember.project_team_id == team.id,
-                    ~User.archived,
-                    User.role == "student",
-                )
-                .all()
+        columns = [
+            MatrixColumnOut(
+                key=col.key,
+                type=col.type,
+                title=col.title,
+                date=col.date,
+                order=idx,
             )
+            for idx, col in enumerate(grid.columns)
+        ]
 
-            # Filter by class if specified
-            if class_name:
-                members = [m for m in members if m.class_name == class_name]
-
-            # Filter by student name if specified
-            if student_name:
-                members = [m for m in members if student_name.lower() in m.name.lower()]
-
-            # Filter by allowed students (if course filter is active)
-            if allowed_student_ids is not None:
-                members = [m for m in members if m.id in allowed_student_ids]
-
-            for member in members:
-                if member.id not in student_data:
-                    sn = getattr(member, "student_number", None)
-                    student_data[member.id] = {
-                        "name": member.name,
-                        "class": member.class_name,
-                        "student_number": sn if isinstance(sn, str) else None,
-                        "cells": {},
-                    }
-
-                # Calculate score for this team member, applying their individual
-                # overrides when present (use ProjectTeam.team_number, not User.team_number)
-                score = (
-                    _calculate_project_score(
-                        db,
-                        assessment.id,
-                        assessment.rubric_id,
-                        team.team_number,
-                        student_id=member.id,
+        # Cell metadata is shared per column; only the score differs per student
+        rows = []
+        for i in grid.row_order(sort_by, sort_order):
+            student = grid.students[i]
+            cells = {}
+            for j, col in enumerate(grid.columns):
+                cells[col.key] = (
+                    MatrixCellOut(
+                        evaluation_id=col.evaluation_id,
+                        type=col.type,
+                        title=col.title,
+                        score=grid.scores[i][j],
+                        status=col.status,
+                        date=col.date,
+                        teacher_name=col.teacher_name,
+                        detail_url=col.detail_url,
                     )
-                    if team.team_number is not None
+                    if grid.present[i][j]
                     else None
                 )
 
-                student_data[member.id]["cells"][eval_key] = {
-                    "evaluation_id": assessment.id,
-                    "type": "project",
-                    "title": assessment.title,
-                    "score": score,
-                    "status": assessment.status,
-                    "date": assessment.published_at,
-                    "teacher_name": teacher_name,
-                    "detail_url": f"/teacher/project-assessments/{assessment.id}/overview",
-                }
-
-        # ==================== COLLECT PEER EVALUATIONS ====================
-        eval_query = (
-            db.query(
-                Evaluation,
-                Course,
-            )
-            .outerjoin(Course, Evaluation.course_id == Course.id)
-            .filter(
-                Evaluation.school_id == school_id,
-                or_(Evaluation.status == "open", Evaluation.status == "closed"),
-            )
-        )
-
-        if course_id:
-            eval_query = eval_query.filter(Evaluation.course_id == course_id)
-
-        for evaluation, course in eval_query.all():
-            eval_key = f"peer_{evaluation.id}"
-
-            # Use settings deadline or created_at as date
-            eval_date = None
-            if evaluation.settings and evaluation.settings.get("deadlines"):
-                deadline = evaluation.settings["deadlines"].get("review")
-                if deadline:
-                    try:
-                        eval_date = datetime.fromisoformat(deadline)
-                    except (ValueError, TypeError):
-                        pass
-
-            evaluations.append(
-                {
-                    "key": eval_key,
-                    "type": "peer",
-                    "title": evaluation.title,
-                    "date": eval_date,
-                    "evaluation_id": evaluation.id,
-                }
-            )
-
-            # Get all students who have allocations in this evaluation (as reviewees, only active students)
-            students_in_eval = (
-                db.query(User)
-                .join(Allocation, Allocation.reviewee_id == User.id)
-                .filter(
-                    Allocation.evaluation_id == evaluation.id,
-                    ~User.archived,
-                    User.role == "student",
-                )
-                .distinct()
-                .all()
-            )
-
-            # Filter by class if specified
-            if class_name:
-                students_in_eval = [
-                    s for s in students_in_eval if s.class_name == class_name
-                ]
-
-            # Filter by student name if specified
-            if student_name:
-                students_in_eval = [
-                    s
-                    for s in students_in_eval
-                    if student_name.lower() in s.name.lower()
-                ]
-
-            # Filter by allowed students (if course filter is active)
-            if allowed_student_ids is not None:
-                students_in_eval = [
-                    s for s in students_in_eval if s.id in allowed_student_ids
-                ]
-
-            for student in students_in_eval:
-                if student.id not in student_data:
-                    sn = getattr(student, "student_number", None)
-                    student_data[student.id] = {
-                        "name": student.name,
-                        "class": student.class_name,
-                        "student_number": sn if isinstance(sn, str) else None,
-                        "cells": {},
-                    }
-
-                score = _calculate_peer_score(db, evaluation.id, student.id)
-
-                student_data[student.id]["cells"][eval_key] = {
-                    "evaluation_id": evaluation.id,
-                    "type": "peer",
-                    "title": evaluation.title,
-                    "score": score,
-                    "status": evaluation.status,
-                    "date": eval_date,
-                    "teacher_name": None,
-                    "detail_url": f"/teacher/evaluations/{evaluation.id}/dashboard",
-                }
-
-        # ==================== COLLECT COMPETENCY WINDOWS ====================
-        window_query = (
-            db.query(
-                CompetencyWindow,
-                Course,
-            )
-            .outerjoin(Course, CompetencyWindow.course_id == Course.id)
-            .filter(CompetencyWindow.school_id == school_id)
-        )
-
-        if course_id:
-            window_query = window_query.filter(CompetencyWindow.course_id == course_id)
-        if date_from_dt:
-            window_query = window_query.filter(
-                CompetencyWindow.end_date >= date_from_dt
-            )
-        if date_to_dt:
-            window_query = window_query.filter(
-                CompetencyWindow.start_date <= date_to_dt
-            )
-
-        for window, course in window_query.all():
-            eval_key = f"competency_{window.id}"
-            evaluations.append(
-                {
-                    "key": eval_key,
-                    "type": "competency",
-                    "title": window.title,
-                    "date": window.end_date,
-                    "evaluation_id": window.id,
-                }
-            )
-
-            # Get students who have self-scores in this window (only active students)
-            students_with_scores = (
-                db.query(User)
-                .join(CompetencySelfScore, CompetencySelfScore.user_id == User.id)
-                .filter(
-                    CompetencySelfScore.window_id == window.id,
-                    ~User.archived,
-                    User.role == "student",
-                )
-                .distinct()
-                .all()
-            )
-
-            # Filter by class if specified
-            if class_name:
-                students_with_scores = [
-                    s for s in students_with_scores if s.class_name == class_name
-                ]
-
-            # Filter by student name if specified
-            if student_name:
-                students_with_scores = [
-                    s
-                    for s in students_with_scores
-                    if student_name.lower() in s.name.lower()
-                ]
-
-            # Filter by allowed students (if course filter is active)
-            if allowed_student_ids is not None:
-                students_with_scores = [
-                    s for s in students_with_scores if s.id in allowed_student_ids
-                ]
-
-            for student in students_with_scores:
-                if student.id not in student_data:
-                    sn = getattr(student, "student_number", None)
-                    student_data[student.id] = {
-                        "name": student.name,
-                        "class": student.class_name,
-                        "student_number": sn if isinstance(sn, str) else None,
-                        "cells": {},
-                    }
-
-                score = _calculate_competency_score(db, window.id, student.id)
-
-                student_data[student.id]["cells"][eval_key] = {
-                    "evaluation_id": window.id,
-                    "type": "competency",
-                    "title": window.title,
-                    "score": score,
-                    "status": window.status,
-                    "date": window.end_date,
-                    "teacher_name": None,
-                    "detail_url": f"/teacher/competencies/windows/{window.id}",
-                }
-
-        # ==================== SORT EVALUATIONS CHRONOLOGICALLY ====================
-        # Sort by date (None dates go to the end)
-        evaluations.sort(
-            key=lambda x: (x["date"] is None, x["date"] if x["date"] else datetime.max)
-        )
-
-        # Create column headers with order
-        columns = []
-        for idx, eval_info in enumerate(evaluations):
-            columns.append(
-                MatrixColumnOut(
-                    key=eval_info["key"],
-                    type=eval_info["type"],
-                    title=eval_info["title"],
-                    date=eval_info["date"],
-                    order=idx,
-                )
-            )
-
-        # ==================== BUILD STUDENT ROWS ====================
-        rows = []
-        for student_id, data in student_data.items():
-            # Build cells dict with all columns (None for missing data)
-            cells = {}
-            scores_for_avg = []
-
-            for col in columns:
-                if col.key in data["cells"]:
-                    cell_data = data["cells"][col.key]
-                    cells[col.key] = MatrixCellOut(**cell_data)
-                    if cell_data["score"] is not None:
-                        scores_for_avg.append(cell_data["score"])
-                else:
-                    cells[col.key] = None
-
-            # Calculate average
-            average = (
-                round(sum(scores_for_avg) / len(scores_for_avg), 2)
-                if scores_for_avg
-                else None
-            )
-
             rows.append(
                 StudentMatrixRowOut(
-                    student_id=student_id,
-                    student_name=data["name"],
-                    student_class=data["class"],
-                    student_number=data.get("student_number"),
+                    student_id=student.id,
+                    student_name=student.name,
+                    student_class=student.class_name,
+                    student_number=student.student_number,
                     cells=cells,
-                    average=average,
+                    average=grid.row_averages[i],
                 )
             )
 
-        # ==================== SORT ROWS ====================
-        # Sort by specified column or default to student name
-        if sort_by and sort_by != "student":
-            # Sort by a specific evaluation column
-            def get_sort_key(row):
-                cell = row.cells.get(sort_by)
-                if cell and cell.score is not None:
-                    return cell.score
-                # Put rows without data at the end
-                return -999999 if sort_order == "desc" else 999999
-
-            rows.sort(key=get_sort_key, reverse=(sort_order == "desc"))
-        else:
-            # Sort by student name (default)
-            rows.sort(key=lambda x: x.student_name, reverse=(sort_order == "desc"))
-
-        # ==================== CALCULATE COLUMN AVERAGES ====================
-        column_averages = {}
-        for col in columns:
-            scores = []
-            for row in rows:
-                cell = row.cells.get(col.key)
-                if cell and cell.score is not None:
-                    scores.append(cell.score)
-
-            column_averages[col.key] = (
-                round(sum(scores) / len(scores), 2) if scores else None
-            )
+        column_averages = {
+            col.key: grid.column_averages[j] for j, col in enumerate(grid.columns)
+        }
 
-        # ==================== RETURN MATRIX ====================
         logger.info(
-            f"get_overview_matrix completed: {len(columns)} columns, {len(rows)} rows, "
-            f"{len(evaluations)} evaluations"
+            f"get_overview_matrix completed: {len(columns)} columns, {len(rows)} rows"
         )
 
         return OverviewMatrixResponse(
@@ -1203,49 +416,46 @@ def export_matrix_csv(
     date_to: Optional[str] = Query(None),
     sort_by: Optional[str] = Query(None),
     sort_order: str = Query("asc", pattern="^(asc|desc)$"),
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
     current_user: User = Depends(get_current_user),
 ):
     """
     Export matrix view to CSV
+
+    Rows are streamed straight from the matrix grid, one CSV line at a time.
     """
-    # Get matrix data with filters
-    matrix_data = get_overview_matrix(
+    school_id = current_user.school_id
+
+    if course_id is not None:
+        course = (
+            db.query(Course)
+            .filter(Course.id == course_id, Course.school_id == school_id)
+            .first()
+        )
+        if not course:
+            raise HTTPException(status_code=404, detail=f"Course {course_id} not found")
+
+    grid = build_overview_matrix(
+        db,
+        school_id,
         course_id=course_id,
         class_name=class_name,
         student_name=student_name,
-        date_from=date_from,
-        date_to=date_to,
-        sort_by=sort_by,
-        sort_order=sort_order,
-        db=db,
-        current_user=current_user,
+        date_from=datetime.fromisoformat(date_from) if date_from else None,
+        date_to=datetime.fromisoformat(date_to) if date_to else None,
     )
 
-    # Create CSV
-    output = StringIO()
-    writer = csv.writer(output)
-
-    # Header row
-    header = ["Leerlingnummer", "Leerling", "Klas"]
-    for col in matrix_data.columns:
-        header.append(f"{col.title} ({col.type})")
-    writer.writerow(header)
-
-    # Data rows
-    for row in matrix_data.rows:
-        csv_row = [row.student_number or "", row.student_name, row.student_class or ""]
-        for col in matrix_data.columns:
-            cell = row.cells.get(col.key)
-            if cell and cell.score is not None:
-                csv_row.append(f"{cell.score:.1f}")
-            else:
-                csv_row.append("")
-        writer.writerow(csv_row)
+    def generate():
+        output = StringIO()
+        writer = csv.writer(output)
+        for csv_row in iter_matrix_csv_rows(grid, grid.row_order(sort_by, sort_order)):
+            writer.writerow(csv_row)
+            yield output.getvalue()
+            output.seek(0)
+            output.truncate(0)
 
-    output.seek(0)
     return StreamingResponse(
-        iter([output.getvalue()]),
+        generate(),
         media_type="text/csv",
         headers={
             "Content-Disposition": f"attachment; filename=overzicht-matrix-{datetime.now().strftime('%Y%m%d')}.csv"
@@ -1263,7 +473,7 @@ def get_project_overview(
     period: Optional[str] = Query(None),  # e.g., "Q1", "Q2"
     status_filter: Optional[str] = Query(None),  # "all", "active", "completed"
     search_query: Optional[str] = Query(None),
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
     current_user: User = Depends(get_current_user),
 ):
     """
@@ -1517,7 +727,7 @@ def get_project_overview(
 def get_project_trends(
     school_year: Optional[str] = Query(None),
     course_id: Optional[int] = Query(None),
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
     current_user: User = Depends(get_current_user),
 ):
     """
@@ -1722,7 +932,7 @@ def get_project_trends(
 def get_project_teams(
     project_id: int,
     student_id: Optional[int] = Query(None),
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
     current_user: User = Depends(get_current_user),
 ):
     """
@@ -1889,7 +1099,7 @@ def get_project_teams(
 
 @router.get("/academic-years")
 def get_academic_years(
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
     current_user: User = Depends(get_current_user),
 ):
     """
@@ -1911,7 +1121,7 @@ def get_academic_years(
 
 @router.get("/courses")
 def get_courses_for_overview(
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
     current_user: User = Depends(get_current_user),
 ):
     """
@@ -1936,7 +1146,7 @@ def get_peer_evaluation_dashboard(
     period: str = Query("6months"),  # "3months" | "6months" | "year"
     student_name: Optional[str] = Query(None),
     student_id: Optional[int] = Query(None),
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
     current_user: User = Depends(get_current_user),
 ):
     """
@@ -2438,7 +1648,7 @@ def get_peer_evaluation_feedback(
     sentiment: Optional[str] = Query(None),  # sentiment filter
     search_text: Optional[str] = Query(None),
     risk_only: bool = Query(False),
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
     current_user: User = Depends(get_current_user),
 ):
     """
@@ -2632,7 +1842,7 @@ def get_aggregated_peer_feedback(
     course_id: Optional[int] = Query(None),
     project_id: Optional[int] = Query(None),
     evaluation_id: Optional[int] = Query(None),
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
     current_user: User = Depends(get_current_user),
 ):
     """
@@ -2845,7 +2055,7 @@ def get_aggregated_peer_feedback(
 def get_teacher_feedback(
     course_id: Optional[int] = None,
     project_id: Optional[int] = None,
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
     current_user: User = Depends(get_current_user),
 ):
     """
@@ -2953,7 +2163,7 @@ def get_peer_evaluation_reflections(
     course_id: Optional[int] = Query(None),
     project_id: Optional[int] = Query(None),
     student_name: Optional[str] = Query(None),
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
     current_user: User = Depends(get_current_user),
 ):
     """
@@ -9,7 +9,7 @@ from fastapi.responses import StreamingResponse
 from sqlalchemy import select, func
 from sqlalchemy.orm import Session
 
-from app.api.v1.deps import get_db, get_current_user
+from app.api.v1.deps import get_db, get_read_db, get_current_user
 from app.api.v1.utils import get_teacher_course_ids
 from app.core.grading import score_to_grade as _score_to_grade
 from app.infra.db.models import (
@@ -2601,7 +2601,7 @@ def _build_rubric_export_data_for_team(
 def export_team_rubric(
     assessment_id: int,
     team_number: int = Query(..., description="Team number to export rubric for"),
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
     user=Depends(get_current_user),
 ):
     """Export rubric for a single team as a Word document (teacher/admin only)"""
@@ -2654,7 +2654,7 @@ def export_team_rubric(
 @router.get("/{assessment_id}/export-rubric-all", response_class=StreamingResponse)
 def export_all_team_rubrics(
     assessment_id: int,
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
     user=Depends(get_current_user),
 ):
     """Export rubrics for all teams as a single Word document (teacher/admin only)"""
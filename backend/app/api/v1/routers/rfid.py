@@ -15,6 +15,7 @@ from app.api.v1.schemas.attendance import (
     RFIDCardCreate,
     RFIDCardUpdate,
 )
+from app.services.rfid_card_cache import invalidate_rfid_card
 
 logger = logging.getLogger(__name__)
 router = APIRouter(prefix="/rfid", tags=["rfid"])
@@ -101,6 +102,7 @@ def create_rfid_card(
     db.add(new_card)
     db.commit()
     db.refresh(new_card)
+    invalidate_rfid_card(new_card.uid)
 
     return RFIDCardOut.model_validate(new_card)
 
@@ -141,6 +143,7 @@ def update_rfid_card(
 
     db.commit()
     db.refresh(card)
+    invalidate_rfid_card(card.uid)
 
     return RFIDCardOut.model_validate(card)
 
@@ -173,5 +176,7 @@ def delete_rfid_card(
             status_code=status.HTTP_404_NOT_FOUND, detail="RFID card not found"
         )
 
+    uid = card.uid
     db.delete(card)
     db.commit()
+    invalidate_rfid_card(uid)
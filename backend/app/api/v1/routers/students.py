@@ -12,9 +12,11 @@ from fastapi.responses import PlainTextResponse
 from sqlalchemy import select, and_, or_
 from sqlalchemy.orm import Session
 
-from app.api.v1.deps import get_db, get_current_user
+from app.api.v1.deps import get_db, get_read_db, get_current_user
 from app.api.v1.schemas.students import StudentCreate, StudentUpdate, StudentOut
 from app.infra.db.models import User, CourseEnrollment, Course, ProjectTeam, Project
+from app.services.identity_cache import invalidate_identity
+from app.services.rfid_card_cache import invalidate_rfid_user
 
 router = APIRouter(prefix="/students", tags=["students"])
 
@@ -229,6 +231,7 @@ def update_student(
     )
     if not u:
         raise HTTPException(status_code=404, detail="Student not found")
+    old_email = u.email
 
     if payload.email and payload.email != u.email:
         if (
@@ -268,6 +271,8 @@ def update_student(
     db.add(u)
     db.commit()
     db.refresh(u)
+    invalidate_rfid_user(u.id)
+    invalidate_identity(old_email, u.email)
 
     course_id = None
     course_name = None
@@ -309,7 +314,7 @@ def update_student(
 
 @router.get("/export.csv", response_class=PlainTextResponse)
 def export_students_csv(
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
     current_user=Depends(get_current_user),
 ):
     items = list_students(db=db, current_user=current_user, limit=10_000)
@@ -13,10 +13,12 @@ import csv
 from io import StringIO
 from passlib.context import CryptContext
 
-from app.api.v1.deps import get_db, get_current_user
+from app.api.v1.deps import get_db, get_read_db, get_current_user
 from app.infra.db.models import User, TeacherCourse, Course
 from app.core.rbac import require_role
 from app.api.v1.utils.csv_sanitization import sanitize_csv_value
+from app.services.identity_cache import invalidate_identity
+from app.services.rfid_card_cache import clear_rfid_card_cache, invalidate_rfid_user
 from app.api.v1.schemas.teachers import (
     TeacherOut,
     TeacherCreate,
@@ -200,7 +202,7 @@ def create_teacher(
 
 @router.get("/export-csv", response_class=StreamingResponse)
 def export_teachers_csv(
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
     user: User = Depends(get_current_user),
     status: Optional[str] = Query(
         None, description="Filter by status: active, inactive"
@@ -326,6 +328,8 @@ def update_teacher(
             status_code=http_status.HTTP_404_NOT_FOUND, detail="Teacher not found"
         )
 
+    old_email = teacher.email
+
     # Update fields
     if teacher_data.name is not None:
         teacher.name = teacher_data.name
@@ -358,6 +362,8 @@ def update_teacher(
 
     db.commit()
     db.refresh(teacher)
+    invalidate_rfid_user(teacher.id)
+    invalidate_identity(old_email, teacher.email)
 
     # Get courses
     teacher_courses = (
@@ -411,6 +417,8 @@ def delete_teacher(
 
     teacher.archived = True
     db.commit()
+    invalidate_rfid_user(teacher.id)
+    invalidate_identity(teacher.email)
 
 
 @router.post("/{teacher_id}/courses", response_model=TeacherOut)
@@ -569,6 +577,7 @@ async def import_teachers_csv(
     result = CSVImportResult(
         success_count=0, error_count=0, errors=[], created=[], updated=[]
     )
+    updated_emails: list[str] = []
 
     try:
         # Read CSV content
@@ -626,6 +635,7 @@ async def import_teachers_csv(
                     existing.role = role
                     existing.archived = False
                     result.updated.append(existing.id)
+                    updated_emails.append(email)
                     result.success_count += 1
                 else:
                     # Create new teacher
@@ -646,6 +656,8 @@ async def import_teachers_csv(
                 result.error_count += 1
 
         db.commit()
+        clear_rfid_card_cache()
+        invalidate_identity(*updated_emails)
 
     except UnicodeDecodeError:
         raise HTTPException(
@@ -10,8 +10,13 @@ from sqlalchemy.orm import Session
 
 from app.api.v1.deps import get_db, get_current_user
 from app.infra.db.models import User
+from app.infra.db.query_stats import get_query_metrics
+from app.infra.db.session import get_pool_stats
 from app.api.v1.schemas.users import UserOut, UserUpdateRole
 from app.core.rbac import require_role
+from app.infra.services.ollama_client import get_ollama_client_stats
+from app.infra.services.rate_limiter import get_rate_limiter
+from app.services.identity_cache import get_identity_cache_stats, invalidate_identity
 
 logger = logging.getLogger(__name__)
 router = APIRouter(prefix="/users", tags=["users"])
@@ -61,6 +66,56 @@ def search_users(
     return [UserOut.model_validate(u) for u in users]
 
 
+@router.get("/identity-cache-stats")
+def identity_cache_stats(current_user: User = Depends(get_current_user)):
+    """
+    Hit rate and size of the authentication identity cache of this worker
+    process (teacher/admin only).
+    """
+    require_role(current_user, ["teacher", "admin"])
+    return get_identity_cache_stats()
+
+
+@router.get("/rate-limit-stats")
+def rate_limit_stats(current_user: User = Depends(get_current_user)):
+    """
+    Circuit breaker state and in-process fallback usage of the rate limiter of
+    this worker process (teacher/admin only).
+    """
+    require_role(current_user, ["teacher", "admin"])
+    return get_rate_limiter().stats()
+
+
+@router.get("/db-pool-stats")
+def db_pool_stats(current_user: User = Depends(get_current_user)):
+    """
+    Connection-pool gauges (checked out, overflow, checkout wait times) of this
+    worker process (teacher/admin only).
+    """
+    require_role(current_user, ["teacher", "admin"])
+    return get_pool_stats()
+
+
+@router.get("/query-stats")
+def query_stats(current_user: User = Depends(get_current_user)):
+    """
+    SQL statement counts, DB time and suspected N+1 requests per route of this
+    worker process (teacher/admin only).
+    """
+    require_role(current_user, ["teacher", "admin"])
+    return get_query_metrics()
+
+
+@router.get("/ollama-stats")
+def ollama_stats(current_user: User = Depends(get_current_user)):
+    """
+    Calls, retries, refusals, slot waits and breaker state of the Ollama
+    client of this worker process (teacher/admin only).
+    """
+    require_role(current_user, ["teacher", "admin"])
+    return get_ollama_client_stats()
+
+
 @router.patch("/{user_id}/role", response_model=UserOut)
 def update_user_role(
     user_id: int,
@@ -109,6 +164,7 @@ def update_user_role(
 
     db.commit()
     db.refresh(target_user)
+    invalidate_identity(target_user.email)
 
     # Log the change
     logger.info(
@@ -3,7 +3,7 @@ Pydantic schemas for 3de Blok RFID Attendance module
 """
 
 from datetime import datetime, timezone
-from typing import Optional
+from typing import List, Optional
 from pydantic import BaseModel, Field, model_validator
 
 # ============ Timezone Policy Configuration ============
@@ -240,6 +240,39 @@ class RFIDScanResponse(BaseModel):
     message: Optional[str] = Field(None, description="Error message")
 
 
+RFID_BATCH_MAX_TAPS = 500
+
+
+class RFIDBatchTap(BaseModel):
+    """One tap buffered by an RFID reader"""
+
+    uid: str = Field(..., max_length=50, description="RFID card UID")
+    timestamp: datetime = Field(..., description="Moment of the tap on the reader")
+
+
+class RFIDBatchScanRequest(BaseModel):
+    """Buffered taps from a Raspberry Pi RFID reader, oldest first"""
+
+    taps: List[RFIDBatchTap] = Field(..., min_length=1, max_length=RFID_BATCH_MAX_TAPS)
+    device_id: Optional[str] = Field(
+        None, max_length=50, description="Device identifier"
+    )
+
+
+class RFIDBatchTapResult(RFIDScanResponse):
+    """Result of one tap of a batch"""
+
+    status: str = Field(..., description="ok | duplicate | not_found | rejected")
+    index: int = Field(..., description="Position of the tap in the request")
+    uid: str
+
+
+class RFIDBatchScanResponse(BaseModel):
+    """Per-tap results, in request order"""
+
+    results: List[RFIDBatchTapResult]
+
+
 # ============ Stats & Overview Schemas ============
 
 
@@ -20,10 +20,11 @@ All models are organized by domain:
 - clients: Client, ClientLog, ClientProjectLink
 - notes: ProjectNotesContext, ProjectNote
 - skills: SkillTraining, SkillTrainingProgress, Task
-- attendance: AttendanceEvent, AttendanceAggregate
+- attendance: AttendanceEvent, AttendanceAggregate, AttendanceDailyRollup,
+  AttendanceRollupState
 - submissions: AssignmentSubmission, SubmissionEvent
 - external: ExternalEvaluator
-- system: FeedbackSummary, SummaryGenerationJob, ScheduledJob, Notification, AuditLog
+- system: FeedbackSummary, SummaryGenerationJob, LLMCacheEntry, ScheduledJob, Notification, AuditLog
 """
 
 from __future__ import annotations
@@ -128,7 +129,12 @@ from .notes import ProjectNotesContext, ProjectNote
 from .skills import SkillTraining, SkillTrainingProgress, Task
 
 # Attendance
-from .attendance import AttendanceEvent, AttendanceAggregate
+from .attendance import (
+    AttendanceEvent,
+    AttendanceAggregate,
+    AttendanceDailyRollup,
+    AttendanceRollupState,
+)
 
 # Submissions
 from .submissions import AssignmentSubmission, SubmissionEvent
@@ -148,6 +154,7 @@ from .project_feedback import (
 from .system import (
     FeedbackSummary,
     SummaryGenerationJob,
+    LLMCacheEntry,
     ScheduledJob,
     Notification,
     AuditLog,
@@ -239,6 +246,8 @@ __all__ = [
     # Attendance
     "AttendanceEvent",
     "AttendanceAggregate",
+    "AttendanceDailyRollup",
+    "AttendanceRollupState",
     # Submissions
     "AssignmentSubmission",
     "SubmissionEvent",
@@ -252,6 +261,7 @@ __all__ = [
     # System
     "FeedbackSummary",
     "SummaryGenerationJob",
+    "LLMCacheEntry",
     "ScheduledJob",
     "Notification",
     "AuditLog",
@@ -1,13 +1,27 @@
 from __future__ import annotations
 from typing import Optional
-from datetime import datetime
-from sqlalchemy import String, ForeignKey, Boolean, Integer, Text, DateTime, Index
+from datetime import date, datetime
+from sqlalchemy import (
+    String,
+    ForeignKey,
+    Boolean,
+    Integer,
+    Text,
+    Date,
+    DateTime,
+    Index,
+)
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 import sqlalchemy as sa
 from datetime import timezone
 from .base import Base, id_pk
 
-__all__ = ["AttendanceEvent", "AttendanceAggregate"]
+__all__ = [
+    "AttendanceEvent",
+    "AttendanceAggregate",
+    "AttendanceDailyRollup",
+    "AttendanceRollupState",
+]
 
 
 class AttendanceEvent(Base):
@@ -141,6 +155,9 @@ class AttendanceAggregate(Base):
     total_external_approved_seconds: Mapped[int] = mapped_column(
         Integer, default=0, nullable=False
     )
+    total_external_pending_seconds: Mapped[int] = mapped_column(
+        Integer, default=0, server_default="0", nullable=False
+    )
     lesson_blocks: Mapped[float] = mapped_column(
         sa.Numeric(precision=10, scale=1), default=0, nullable=False
     )
@@ -153,3 +170,64 @@ class AttendanceAggregate(Base):
     user: Mapped["User"] = relationship()
 
     __table_args__ = (Index("ix_attendance_aggregates_user_id", "user_id"),)
+
+
+class AttendanceDailyRollup(Base):
+    """
+    Attendance of one user on one (UTC) day, per project, for the statistics
+
+    Rows only exist for closed days (up to AttendanceRollupState.rolled_up_through);
+    the current day is always computed from attendance_events.
+    """
+
+    __tablename__ = "attendance_daily_rollups"
+
+    id: Mapped[int] = id_pk()
+    school_id: Mapped[int] = mapped_column(
+        ForeignKey("schools.id", ondelete="CASCADE"), nullable=False
+    )
+    user_id: Mapped[int] = mapped_column(
+        ForeignKey("users.id", ondelete="CASCADE"), nullable=False
+    )
+    day: Mapped[date] = mapped_column(Date, nullable=False)
+    project_id: Mapped[Optional[int]] = mapped_column(
+        ForeignKey("projects.id", ondelete="SET NULL"), nullable=True
+    )
+
+    # Closed school sessions and approved external work checked in on this day
+    school_seconds: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
+    extern_approved_seconds: Mapped[int] = mapped_column(
+        Integer, default=0, nullable=False
+    )
+    # External registrations still awaiting approval
+    pending_count: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
+    # School check-ins (open or closed) and the UTC hours they fall in
+    school_check_ins: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
+    check_in_hours: Mapped[int] = mapped_column(
+        Integer, default=0, nullable=False
+    )  # bit h set = a check-in during hour h
+
+    __table_args__ = (
+        Index("ix_attendance_daily_rollups_school_day", "school_id", "day"),
+        Index("ix_attendance_daily_rollups_user_day", "user_id", "day"),
+        # One row per user, day and project (no project counts as 0)
+        Index(
+            "uq_attendance_daily_rollups_user_day_project",
+            "user_id",
+            "day",
+            sa.text("COALESCE(project_id, 0)"),
+            unique=True,
+        ),
+    )
+
+
+class AttendanceRollupState(Base):
+    """
+    Watermark of the daily rollups: every day up to and including
+    rolled_up_through has its AttendanceDailyRollup rows.
+    """
+
+    __tablename__ = "attendance_rollup_state"
+
+    id: Mapped[int] = id_pk()
+    rolled_up_through: Mapped[Optional[date]] = mapped_column(Date, nullable=True)
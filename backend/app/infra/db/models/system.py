@@ -9,6 +9,7 @@ from sqlalchemy import (
     UniqueConstraint,
     Index,
     Text,
+    DateTime,
 )
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 from sqlalchemy.dialects.postgresql import JSONB
@@ -18,6 +19,7 @@ from .base import Base, id_pk, tenant_fk
 __all__ = [
     "FeedbackSummary",
     "SummaryGenerationJob",
+    "LLMCacheEntry",
     "ScheduledJob",
     "Notification",
     "AuditLog",
@@ -141,6 +143,33 @@ class SummaryGenerationJob(Base):
     )
 
 
+class LLMCacheEntry(Base):
+    """
+    Ollama results by content: the Postgres tier of the LLM cache
+    (app/infra/services/llm_cache.py).
+
+    Not tenant-scoped: the key hashes the model, the prompt version and the
+    anonymized prompt, so equal feedback gets the same result in any school.
+    """
+
+    __tablename__ = "llm_cache_entries"
+
+    id: Mapped[int] = id_pk()
+    cache_key: Mapped[str] = mapped_column(String(64), unique=True, nullable=False)
+    stage: Mapped[str] = mapped_column(
+        String(20), nullable=False
+    )  # "extract" | "summary"
+    model: Mapped[str] = mapped_column(String(100), nullable=False)
+    prompt_version: Mapped[str] = mapped_column(String(50), nullable=False)
+    response: Mapped[str] = mapped_column(Text, nullable=False)
+    hit_count: Mapped[int] = mapped_column(default=0, nullable=False)
+    last_used_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True), nullable=False
+    )
+
+    __table_args__ = (Index("ix_llm_cache_entries_last_used", "last_used_at"),)
+
+
 class ScheduledJob(Base):
     """
     Scheduled jobs for cron-like recurring tasks.
@@ -0,0 +1,179 @@
+"""
+Per-request SQL statement counting and N+1 detection.
+
+``instrument_engine`` hooks SQLAlchemy's cursor events on an engine. Every
+statement is recorded in the ``QueryStats`` of the current request (set by
+``QueryStatsMiddleware`` through a context variable, which FastAPI carries into
+the threadpool that runs sync endpoints and dependencies) and in any active
+``capture_queries()`` block.
+
+Statements are counted per shape: the SQL text with its bound-parameter
+placeholders, so the same query run in a loop for different ids has one shape.
+A request that runs one shape more than ``DB_N_PLUS_ONE_THRESHOLD`` times is
+logged as a suspected N+1. Per-route totals are kept in-process and served by
+``get_query_metrics``, and exported as Prometheus metrics (app/infra/metrics.py).
+"""
+
+from __future__ import annotations
+
+import contextvars
+import logging
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterator, List, Optional
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from app.core.config import settings
+from app.infra.metrics import observe_db_request
+
+logger = logging.getLogger(__name__)
+
+# Characters of a statement shown in the N+1 warning
+STATEMENT_PREVIEW_CHARS = 200
+
+
+@dataclass
+class QueryStats:
+    """Statements run by one request (or one ``capture_queries`` block)."""
+
+    count: int = 0
+    duration_ms: float = 0.0
+    shapes: Counter = field(default_factory=Counter)
+
+    def record(self, statement: str, duration_ms: float) -> None:
+        self.count += 1
+        self.duration_ms += duration_ms
+        self.shapes[statement] += 1
+
+    def repeated_shapes(self, threshold: int) -> List[tuple]:
+        """(statement, count) of the shapes run more than ``threshold`` times."""
+        return [
+            (statement, count)
+            for statement, count in self.shapes.most_common()
+            if count > threshold
+        ]
+
+
+_current: contextvars.ContextVar[Optional[QueryStats]] = contextvars.ContextVar(
+    "query_stats", default=None
+)
+_captures: List[QueryStats] = []
+_captures_lock = threading.Lock()
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if context is not None:
+        context._query_stats_started = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = getattr(context, "_query_stats_started", None)
+    duration_ms = (time.perf_counter() - started) * 1000 if started else 0.0
+
+    stats = _current.get()
+    if stats is not None:
+        stats.record(statement, duration_ms)
+    if _captures:
+        with _captures_lock:
+            for capture in _captures:
+                capture.record(statement, duration_ms)
+
+
+def instrument_engine(engine: Engine) -> None:
+    """Count the statements run through ``engine``."""
+    if not event.contains(engine, "after_cursor_execute", _after_cursor_execute):
+        event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+        event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+
+
+def start_request() -> contextvars.Token:
+    """Start counting the statements of the current request."""
+    return _current.set(QueryStats())
+
+
+def current_stats() -> Optional[QueryStats]:
+    return _current.get()
+
+
+def finish_request(token: contextvars.Token, route: str) -> Optional[QueryStats]:
+    """Stop counting, flag suspected N+1 patterns and add to the route totals."""
+    stats = _current.get()
+    _current.reset(token)
+    if stats is None:
+        return None
+
+    threshold = settings.DB_N_PLUS_ONE_THRESHOLD
+    repeated = stats.repeated_shapes(threshold) if threshold else []
+    for statement, count in repeated:
+        preview = " ".join(statement.split())[:STATEMENT_PREVIEW_CHARS]
+        logger.warning(
+            f"Suspected N+1 on {route}: statement ran {count} times "
+            f"({stats.count} statements in total): {preview}"
+        )
+    _record_route(route, stats, bool(repeated))
+    observe_db_request(route, stats.count, stats.duration_ms, bool(repeated))
+    return stats
+
+
+@contextmanager
+def capture_queries() -> Iterator[QueryStats]:
+    """
+    Count every statement run in this process while the block is active, in any
+    thread (e.g. by a TestClient request).
+    """
+    stats = QueryStats()
+    with _captures_lock:
+        _captures.append(stats)
+    try:
+        yield stats
+    finally:
+        with _captures_lock:
+            _captures.remove(stats)
+
+
+# ── Per-route totals ────────────────────────────────────────────────────────────
+
+_route_totals: Dict[str, Dict[str, Any]] = {}
+_route_totals_lock = threading.Lock()
+
+
+def _record_route(route: str, stats: QueryStats, n_plus_one: bool) -> None:
+    with _route_totals_lock:
+        totals = _route_totals.setdefault(
+            route,
+            {
+                "requests": 0,
+                "queries": 0,
+                "db_time_ms": 0.0,
+                "max_queries": 0,
+                "n_plus_one": 0,
+            },
+        )
+        totals["requests"] += 1
+        totals["queries"] += stats.count
+        totals["db_time_ms"] += stats.duration_ms
+        totals["max_queries"] = max(totals["max_queries"], stats.count)
+        totals["n_plus_one"] += int(n_plus_one)
+
+
+def get_query_metrics() -> Dict[str, Dict[str, Any]]:
+    """Statement totals per route template of this process."""
+    with _route_totals_lock:
+        return {
+            route: {
+                **totals,
+                "db_time_ms": round(totals["db_time_ms"], 2),
+                "avg_queries": round(totals["queries"] / totals["requests"], 2),
+            }
+            for route, totals in sorted(_route_totals.items())
+        }
+
+
+def reset_query_metrics() -> None:
+    with _route_totals_lock:
+        _route_totals.clear()
@@ -1,11 +1,317 @@
+"""
+Database engine and sessions.
+
+The connection pool is sized per process: every gunicorn worker gets its own
+pool (``DB_POOL_SIZE`` + ``DB_MAX_OVERFLOW``), while the RQ worker and the
+scheduler run with ``DB_PROCESS_ROLE=worker`` and the smaller
+``DB_WORKER_*`` profile. Checkouts are timed; waits longer than
+``DB_POOL_SLOW_CHECKOUT_MS`` are logged, and ``get_pool_stats`` reports the
+live pool gauges (also exported to Prometheus, see app/infra/metrics.py).
+Statements are counted per request (see query_stats.py).
+
+With ``DATABASE_READ_URL`` set there is a second engine for a read replica.
+``open_read_session`` hands out replica sessions for read-only endpoints (see
+``get_read_db`` in app/api/v1/deps.py) as long as ``ReplicaMonitor`` finds the
+replica reachable and less than ``DATABASE_READ_MAX_LAG_SECONDS`` behind;
+otherwise reads go to the primary.
+"""
+
 from __future__ import annotations
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
+
+import logging
+import threading
+import time
+from typing import Any, Dict, Optional
+
+from sqlalchemy import create_engine, text
+from sqlalchemy.engine import Engine, make_url
+from sqlalchemy.exc import SQLAlchemyError, TimeoutError as PoolTimeoutError
+from sqlalchemy.orm import Session, sessionmaker
+from sqlalchemy.pool import QueuePool
+
 from app.core.config import settings
+from app.infra.db.query_stats import instrument_engine
+from app.infra.metrics import (
+    DB_POOL_CHECKOUT_WAIT,
+    DB_POOL_CONNECTIONS,
+    DB_POOL_TIMEOUTS,
+)
+
+logger = logging.getLogger(__name__)
+
+
+class TimedQueuePool(QueuePool):
+    """QueuePool that records how long each checkout waited for a connection."""
+
+    def __init__(self, *args, slow_checkout_ms: float = 0.0, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.slow_checkout_ms = slow_checkout_ms
+        # Prometheus "engine" label; None keeps the pool out of the metrics
+        self.metrics_label: Optional[str] = None
+        self._wait_lock = threading.Lock()
+        self.checkouts = 0
+        self.slow_checkouts = 0
+        self.timeouts = 0
+        self.wait_ms_total = 0.0
+        self.wait_ms_max = 0.0
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            return super()._do_get()
+        except PoolTimeoutError:
+            with self._wait_lock:
+                self.timeouts += 1
+            if self.metrics_label:
+                DB_POOL_TIMEOUTS.labels(self.metrics_label).inc()
+            raise
+        finally:
+            self._record_wait((time.perf_counter() - started) * 1000)
+            self._export_gauges()
+
+    def _do_return_conn(self, record):
+        super()._do_return_conn(record)
+        self._export_gauges()
+
+    def _export_gauges(self) -> None:
+        if self.metrics_label:
+            DB_POOL_CONNECTIONS.labels(self.metrics_label, "checked_out").set(
+                self.checkedout()
+            )
+            DB_POOL_CONNECTIONS.labels(self.metrics_label, "overflow").set(
+                max(0, self.overflow())
+            )
+
+    def _record_wait(self, wait_ms: float) -> None:
+        with self._wait_lock:
+            self.checkouts += 1
+            self.wait_ms_total += wait_ms
+            self.wait_ms_max = max(self.wait_ms_max, wait_ms)
+            slow = self.slow_checkout_ms and wait_ms >= self.slow_checkout_ms
+            if slow:
+                self.slow_checkouts += 1
+        if self.metrics_label:
+            DB_POOL_CHECKOUT_WAIT.labels(self.metrics_label).observe(wait_ms / 1000)
+        if slow:
+            logger.warning(
+                f"DB pool checkout waited {wait_ms:.0f} ms "
+                f"({self.checkedout()} checked out, overflow {self.overflow()}, "
+                f"size {self.size()})"
+            )
+
+    def recreate(self):
+        # Engine.dispose() recreates the pool; keep the timing settings
+        pool = super().recreate()
+        pool.slow_checkout_ms = self.slow_checkout_ms
+        pool.metrics_label = self.metrics_label
+        return pool
+
+    def stats(self) -> Dict[str, Any]:
+        with self._wait_lock:
+            checkouts = self.checkouts
+            wait_ms_avg = self.wait_ms_total / checkouts if checkouts else 0.0
+            return {
+                "size": self.size(),
+                "checked_in": self.checkedin(),
+                "checked_out": self.checkedout(),
+                "overflow": self.overflow(),
+                "max_overflow": self._max_overflow,
+                "checkouts": checkouts,
+                "slow_checkouts": self.slow_checkouts,
+                "timeouts": self.timeouts,
+                "wait_ms_avg": round(wait_ms_avg, 2),
+                "wait_ms_max": round(self.wait_ms_max, 2),
+            }
+
+
+def pool_options(url: str, role: str) -> Dict[str, Any]:
+    """create_engine() pool arguments for a process role ("api" or "worker")."""
+    if role == "worker":
+        pool_size = settings.DB_WORKER_POOL_SIZE
+        max_overflow = settings.DB_WORKER_MAX_OVERFLOW
+        statement_timeout_ms = settings.DB_WORKER_STATEMENT_TIMEOUT_MS
+    else:
+        pool_size = settings.DB_POOL_SIZE
+        max_overflow = settings.DB_MAX_OVERFLOW
+        statement_timeout_ms = settings.DB_STATEMENT_TIMEOUT_MS
+
+    options: Dict[str, Any] = {
+        "poolclass": TimedQueuePool,
+        "pool_size": pool_size,
+        "max_overflow": max_overflow,
+        "pool_timeout": settings.DB_POOL_TIMEOUT,
+        "pool_recycle": settings.DB_POOL_RECYCLE,
+        "pool_pre_ping": True,
+    }
+    # statement_timeout is a PostgreSQL session setting
+    backend = make_url(url).get_backend_name()
+    if statement_timeout_ms and backend == "postgresql":
+        options["connect_args"] = {
+            "options": f"-c statement_timeout={int(statement_timeout_ms)}"
+        }
+    return options
 
-engine = create_engine(settings.DATABASE_URL, pool_pre_ping=True, future=True)
+
+def _create_engine(
+    url: str, role: str, name: str, connect_timeout: Optional[int] = None
+):
+    options = pool_options(url, role)
+    if connect_timeout and make_url(url).get_backend_name() == "postgresql":
+        options.setdefault("connect_args", {})["connect_timeout"] = connect_timeout
+    engine = create_engine(url, future=True, **options)
+    engine.pool.slow_checkout_ms = settings.DB_POOL_SLOW_CHECKOUT_MS
+    # Pool gauges are summed over live processes: only the API workers report
+    # them (RQ work-horses exit without being marked dead)
+    if role == "api":
+        engine.pool.metrics_label = name
+        DB_POOL_CONNECTIONS.labels(name, "size").set(engine.pool.size())
+    instrument_engine(engine)
+    return engine
+
+
+# Seconds the replica is behind the primary; 0 when it has replayed all WAL it
+# received, or when the URL points at a primary (e.g. the same database)
+REPLICA_LAG_SQL = text("""
+    SELECT CASE
+        WHEN NOT pg_is_in_recovery() THEN 0
+        WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+        ELSE COALESCE(
+            EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0
+        )
+    END
+    """)
+
+
+class ReplicaMonitor:
+    """
+    Tells whether reads may go to the replica.
+
+    The replica's lag is measured at most every ``check_interval_seconds``; in
+    between, the last verdict is reused. An unreachable replica, or one more
+    than ``max_lag_seconds`` behind, sends reads to the primary until the next
+    check.
+    """
+
+    def __init__(
+        self,
+        read_engine: Engine,
+        max_lag_seconds: float,
+        check_interval_seconds: float,
+    ):
+        self.read_engine = read_engine
+        self.max_lag_seconds = max_lag_seconds
+        self.check_interval_seconds = check_interval_seconds
+        self.healthy = False
+        self.lag_seconds: Optional[float] = None
+        self.last_error: Optional[str] = None
+        self.replica_reads = 0
+        self.primary_reads = 0
+        self._next_check = 0.0
+        self._lock = threading.Lock()
+        self._check_lock = threading.Lock()
+
+    def use_replica(self) -> bool:
+        """Whether the next read-only session should use the replica."""
+        if time.monotonic() >= self._next_check and self._check_lock.acquire(
+            blocking=False
+        ):
+            # One thread measures; the others keep using the last verdict
+            try:
+                self._check()
+            finally:
+                self._check_lock.release()
+        with self._lock:
+            if self.healthy:
+                self.replica_reads += 1
+            else:
+                self.primary_reads += 1
+            return self.healthy
+
+    def _check(self) -> None:
+        try:
+            lag = self._measure_lag()
+            error = None
+        except (SQLAlchemyError, OSError) as exc:
+            lag, error = None, str(exc)
+        healthy = lag is not None and lag <= self.max_lag_seconds
+
+        with self._lock:
+            if healthy != self.healthy:
+                if healthy:
+                    logger.info(f"Read replica in use (lag {lag:.1f}s)")
+                elif error:
+                    logger.warning(f"Read replica unavailable, using primary: {error}")
+                else:
+                    logger.warning(
+                        f"Read replica lags {lag:.1f}s "
+                        f"(max {self.max_lag_seconds:.1f}s), using primary"
+                    )
+            self.healthy = healthy
+            self.lag_seconds = lag
+            self.last_error = error
+            self._next_check = time.monotonic() + self.check_interval_seconds
+
+    def _measure_lag(self) -> float:
+        if self.read_engine.url.get_backend_name() != "postgresql":
+            return 0.0
+        with self.read_engine.connect() as conn:
+            return float(conn.execute(REPLICA_LAG_SQL).scalar() or 0)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "healthy": self.healthy,
+                "lag_seconds": self.lag_seconds,
+                "max_lag_seconds": self.max_lag_seconds,
+                "last_error": self.last_error,
+                "replica_reads": self.replica_reads,
+                "primary_reads": self.primary_reads,
+            }
+
+
+engine = _create_engine(settings.DATABASE_URL, settings.DB_PROCESS_ROLE, "primary")
 SessionLocal = sessionmaker(bind=engine, autoflush=False, autocommit=False, future=True)
 
+read_engine: Optional[Engine] = None
+ReadSessionLocal: Optional[sessionmaker] = None
+replica_monitor: Optional[ReplicaMonitor] = None
+if settings.DATABASE_READ_URL:
+    read_engine = _create_engine(
+        settings.DATABASE_READ_URL,
+        settings.DB_PROCESS_ROLE,
+        "replica",
+        connect_timeout=settings.DATABASE_READ_CONNECT_TIMEOUT,
+    )
+    ReadSessionLocal = sessionmaker(
+        bind=read_engine, autoflush=False, autocommit=False, future=True
+    )
+    replica_monitor = ReplicaMonitor(
+        read_engine,
+        max_lag_seconds=settings.DATABASE_READ_MAX_LAG_SECONDS,
+        check_interval_seconds=settings.DATABASE_READ_CHECK_INTERVAL_SECONDS,
+    )
+
+
+def open_read_session() -> Optional[Session]:
+    """
+    A session on the read replica, or None when reads should use the primary
+    (no replica configured, unreachable or lagging).
+    """
+    if replica_monitor is None or not replica_monitor.use_replica():
+        return None
+    return ReadSessionLocal()
+
+
+def get_pool_stats() -> Dict[str, Any]:
+    """Live connection-pool gauges of this process."""
+    stats: Dict[str, Any] = {"role": settings.DB_PROCESS_ROLE, **engine.pool.stats()}
+    if replica_monitor is not None:
+        stats["read_replica"] = {
+            **replica_monitor.stats(),
+            "pool": read_engine.pool.stats(),
+        }
+    return stats
+
 
 def get_db():
     db = SessionLocal()
@@ -0,0 +1,230 @@
+"""
+Prometheus metrics.
+
+The metrics below are updated where things happen (HTTP middleware, the DB
+pool and statement counter, Redis clients, the Ollama client, the LLM cache).
+Values that live elsewhere are read when the metrics are scraped by
+``RuntimeCollector``: RQ queue depths of the ai-summaries queues and
+``SummaryGenerationJob`` status counts.
+
+Multi-process: with ``PROMETHEUS_MULTIPROC_DIR`` set (gunicorn.conf.py does
+this for the API workers, worker.py for the RQ worker and its work-horses)
+every process writes its values to that directory and ``render_metrics``
+aggregates them, so a scrape of any worker reports all of them. Without it
+the metrics of the current process are reported.
+"""
+
+from __future__ import annotations
+
+import logging
+import os
+import time
+from contextlib import contextmanager
+from typing import Iterator, Optional, Tuple
+
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    REGISTRY,
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    generate_latest,
+)
+from prometheus_client.core import GaugeMetricFamily
+from prometheus_client.multiprocess import MultiProcessCollector
+
+logger = logging.getLogger(__name__)
+
+SUMMARY_QUEUES = ("ai-summaries-high", "ai-summaries", "ai-summaries-low")
+
+# ── HTTP ───────────────────────────────────────────────────────────────────────
+
+HTTP_REQUEST_DURATION = Histogram(
+    "tea_http_request_duration_seconds",
+    "HTTP request latency per route template",
+    ["method", "route", "status"],
+    buckets=(0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30),
+)
+HTTP_REQUESTS_IN_PROGRESS = Gauge(
+    "tea_http_requests_in_progress",
+    "HTTP requests being handled",
+    multiprocess_mode="livesum",
+)
+RATE_LIMIT_DECISIONS = Counter(
+    "tea_rate_limit_decisions_total",
+    "Rate limiter decisions (allowed, blocked, exempt, fallback)",
+    ["outcome"],
+)
+
+# ── Database ───────────────────────────────────────────────────────────────────
+
+DB_POOL_CONNECTIONS = Gauge(
+    "tea_db_pool_connections",
+    "Connections of the SQLAlchemy pools of the API workers",
+    ["engine", "state"],
+    multiprocess_mode="livesum",
+)
+DB_POOL_CHECKOUT_WAIT = Histogram(
+    "tea_db_pool_checkout_wait_seconds",
+    "Time spent waiting for a pooled connection",
+    ["engine"],
+    buckets=(0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1, 5, 10),
+)
+DB_POOL_TIMEOUTS = Counter(
+    "tea_db_pool_timeouts_total",
+    "Checkouts that gave up waiting for a pooled connection",
+    ["engine"],
+)
+DB_QUERIES_PER_REQUEST = Histogram(
+    "tea_db_queries_per_request",
+    "SQL statements run by one request",
+    ["route"],
+    buckets=(1, 2, 5, 10, 20, 50, 100, 200, 500),
+)
+DB_QUERY_SECONDS = Counter(
+    "tea_db_query_seconds_total",
+    "Time spent in SQL statements per route template",
+    ["route"],
+)
+DB_N_PLUS_ONE = Counter(
+    "tea_db_n_plus_one_total",
+    "Requests with a suspected N+1 statement pattern",
+    ["route"],
+)
+
+# ── Redis and Ollama ───────────────────────────────────────────────────────────
+
+REDIS_COMMAND_DURATION = Histogram(
+    "tea_redis_command_duration_seconds",
+    "Redis command latency per client",
+    ["client", "command"],
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1),
+)
+OLLAMA_REQUEST_DURATION = Histogram(
+    "tea_ollama_request_duration_seconds",
+    "Ollama generate calls",
+    ["outcome"],
+    buckets=(0.5, 1, 2.5, 5, 10, 20, 30, 60, 120, 300),
+)
+LLM_CACHE_LOOKUPS = Counter(
+    "tea_llm_cache_lookups_total",
+    "LLM result cache lookups per stage (redis_hit, db_hit, miss)",
+    ["stage", "result"],
+)
+
+
+@contextmanager
+def observe_redis(client: str, command: str) -> Iterator[None]:
+    """Time a Redis command (errors included)."""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        REDIS_COMMAND_DURATION.labels(client, command).observe(
+            time.perf_counter() - started
+        )
+
+
+def observe_db_request(
+    route: str, queries: int, duration_ms: float, n_plus_one: bool
+) -> None:
+    DB_QUERIES_PER_REQUEST.labels(route).observe(queries)
+    DB_QUERY_SECONDS.labels(route).inc(duration_ms / 1000)
+    if n_plus_one:
+        DB_N_PLUS_ONE.labels(route).inc()
+
+
+# ── Scrape-time values ─────────────────────────────────────────────────────────
+
+
+class RuntimeCollector:
+    """RQ queue depths and summary job status counts, read at scrape time."""
+
+    def collect(self):
+        depths = GaugeMetricFamily(
+            "tea_rq_queue_jobs",
+            "Jobs per RQ queue and registry",
+            labels=["queue", "state"],
+        )
+        try:
+            for queue, state, count in self._queue_depths():
+                depths.add_metric([queue, state], count)
+        except Exception as exc:
+            logger.warning(f"Metrics: RQ queue depths unavailable: {exc}")
+        yield depths
+
+        jobs = GaugeMetricFamily(
+            "tea_summary_generation_jobs",
+            "SummaryGenerationJob rows per status",
+            labels=["status"],
+        )
+        try:
+            for status, count in self._summary_job_counts():
+                jobs.add_metric([status], count)
+        except Exception as exc:
+            logger.warning(f"Metrics: summary job counts unavailable: {exc}")
+        yield jobs
+
+    @staticmethod
+    def _queue_depths() -> Iterator[Tuple[str, str, int]]:
+        from app.infra.queue.connection import get_queue
+
+        for name in SUMMARY_QUEUES:
+            queue = get_queue(name)
+            yield name, "queued", queue.count
+            yield name, "started", queue.started_job_registry.count
+            yield name, "failed", queue.failed_job_registry.count
+
+    @staticmethod
+    def _summary_job_counts() -> Iterator[Tuple[str, int]]:
+        from sqlalchemy import func
+
+        from app.infra.db.models import SummaryGenerationJob
+        from app.infra.db.session import SessionLocal
+
+        db = SessionLocal()
+        try:
+            rows = (
+                db.query(SummaryGenerationJob.status, func.count())
+                .group_by(SummaryGenerationJob.status)
+                .all()
+            )
+        finally:
+            db.close()
+        yield from rows
+
+
+def multiprocess_dir() -> Optional[str]:
+    return os.environ.get("PROMETHEUS_MULTIPROC_DIR") or None
+
+
+def metrics_registry(include_runtime: bool = True) -> CollectorRegistry:
+    """Registry to scrape: all processes' values plus the scrape-time ones."""
+    if multiprocess_dir():
+        registry = CollectorRegistry()
+        MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    if include_runtime:
+        runtime = CollectorRegistry()
+        runtime.register(RuntimeCollector())
+        return _Combined(registry, runtime)
+    return registry
+
+
+class _Combined(CollectorRegistry):
+    """Read-only view over several registries."""
+
+    def __init__(self, *registries: CollectorRegistry):
+        super().__init__(auto_describe=False)
+        self._registries = registries
+
+    def collect(self):
+        for registry in self._registries:
+            yield from registry.collect()
+
+
+def render_metrics() -> Tuple[bytes, str]:
+    """Exposition text and content type for a /metrics response."""
+    return generate_latest(metrics_registry()), CONTENT_TYPE_LATEST
@@ -0,0 +1,238 @@
+"""
+Progress of summary generation jobs in Redis.
+
+Postgres (``SummaryGenerationJob``) is only written when a job changes state:
+queued, processing, completed, failed or cancelled. Whoever makes that change
+also stores the job's new state here (``publish_job_state``). While a job
+runs, the task reports its progress (percent, stage, message) only here
+(``report_progress``). Both go to the hash ``job_progress:<job_id>`` with a
+TTL of ``JOB_PROGRESS_TTL_SECONDS``, and are published on the channel of the
+same name so a listener sees every step without polling.
+
+The status endpoint reads this hash first and falls back to Postgres when
+Redis has no state for the job, or when the state of an unfinished job has
+not changed for ``JOB_PROGRESS_STALE_SECONDS`` (a write that was lost while
+Redis was unavailable must not be served for long). Redis calls use short
+timeouts behind a circuit breaker; failures are logged and skipped.
+"""
+
+from __future__ import annotations
+
+import json
+import logging
+import threading
+import time
+from typing import Any, Dict, Optional
+
+from redis import Redis
+from redis.exceptions import RedisError
+
+from app.core.config import settings
+from app.infra.db.models import SummaryGenerationJob
+from app.infra.metrics import observe_redis
+from app.infra.services.rate_limiter import CircuitBreaker
+
+logger = logging.getLogger(__name__)
+
+PROGRESS_KEY_PREFIX = "job_progress:"
+# Progress calls run inside requests and tasks: never wait long for Redis
+JOB_PROGRESS_REDIS_TIMEOUT_SECONDS = 0.25
+FINISHED_STATUSES = ("completed", "failed", "cancelled")
+
+
+def _iso(value) -> Optional[str]:
+    return value.isoformat() if value else None
+
+
+def job_state(job: SummaryGenerationJob) -> Dict[str, Any]:
+    """The status of a job as the status endpoint returns it."""
+    return {
+        "job_id": job.job_id,
+        "status": job.status,
+        "student_id": job.student_id,
+        "evaluation_id": job.evaluation_id,
+        "created_at": _iso(job.created_at),
+        "started_at": _iso(job.started_at),
+        "completed_at": _iso(job.completed_at),
+        "cancelled_at": _iso(job.cancelled_at),
+        "result": job.result,
+        "error_message": job.error_message,
+        "progress": job.progress,
+        "priority": job.priority,
+        "retry_count": job.retry_count,
+        "max_retries": job.max_retries,
+        "webhook_delivered": job.webhook_delivered,
+    }
+
+
+def _text(value: Any) -> str:
+    return value.decode() if isinstance(value, bytes) else value
+
+
+class JobProgressStore:
+    """Job states and progress in Redis hashes, published over pub/sub."""
+
+    def __init__(
+        self,
+        redis_conn: Optional[Redis] = None,
+        ttl_seconds: Optional[int] = None,
+    ):
+        self.ttl_seconds = ttl_seconds or settings.JOB_PROGRESS_TTL_SECONDS
+        self.breaker = CircuitBreaker(name="Job progress: Redis")
+        self._redis = redis_conn
+
+    @property
+    def redis(self) -> Redis:
+        if self._redis is None:
+            self._redis = Redis.from_url(
+                settings.REDIS_URL,
+                socket_connect_timeout=JOB_PROGRESS_REDIS_TIMEOUT_SECONDS,
+                socket_timeout=JOB_PROGRESS_REDIS_TIMEOUT_SECONDS,
+            )
+        return self._redis
+
+    def _write(self, command: str, updates: list[tuple[str, dict, dict]]) -> None:
+        """HSET each (key, fields) with the TTL and publish its message."""
+        if not updates or not self.breaker.allow():
+            return
+        try:
+            pipe = self.redis.pipeline(transaction=False)
+            for key, fields, message in updates:
+                pipe.hset(key, mapping=fields)
+                pipe.expire(key, self.ttl_seconds)
+                pipe.publish(key, json.dumps(message))
+            with observe_redis("job_progress", command):
+                pipe.execute()
+        except (RedisError, OSError) as exc:
+            self.breaker.record_failure(exc)
+            logger.warning(f"Job progress: {command} failed: {exc}")
+            return
+        self.breaker.record_success()
+
+    def publish_state(self, *jobs: SummaryGenerationJob) -> None:
+        """Store the state of jobs that just changed it (after the commit)."""
+        now = time.time()
+        updates = []
+        for job in jobs:
+            state = job_state(job)
+            updates.append(
+                (
+                    PROGRESS_KEY_PREFIX + job.job_id,
+                    {
+                        "school_id": job.school_id,
+                        "state": json.dumps(state),
+                        "progress": job.progress,
+                        "stage": job.status,
+                        "message": "",
+                        "updated_at": now,
+                    },
+                    state,
+                )
+            )
+        self._write("publish_state", updates)
+
+    def report(
+        self, job_id: str, progress: int, stage: str, message: Optional[str] = None
+    ) -> None:
+        """Progress of a running job; not written to Postgres."""
+        fields = {
+            "progress": progress,
+            "stage": stage,
+            "message": message or "",
+            "updated_at": time.time(),
+        }
+        self._write(
+            "report",
+            [
+                (
+                    PROGRESS_KEY_PREFIX + job_id,
+                    fields,
+                    {
+                        "job_id": job_id,
+                        "progress": progress,
+                        "stage": stage,
+                        "message": message,
+                    },
+                )
+            ],
+        )
+
+    def read(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """
+        What Redis has for a job: school_id, state (None when only progress
+        was reported), progress, stage, message and updated_at. None when
+        there is nothing or Redis is unavailable.
+        """
+        if not self.breaker.allow():
+            return None
+        try:
+            with observe_redis("job_progress", "hgetall"):
+                raw = self.redis.hgetall(PROGRESS_KEY_PREFIX + job_id)
+        except (RedisError, OSError) as exc:
+            self.breaker.record_failure(exc)
+            return None
+        self.breaker.record_success()
+        if not raw:
+            return None
+
+        raw = {_text(k): _text(v) for k, v in raw.items()}
+        return {
+            "school_id": int(raw["school_id"]) if raw.get("school_id") else None,
+            "state": json.loads(raw["state"]) if raw.get("state") else None,
+            "progress": int(raw.get("progress") or 0),
+            "stage": raw.get("stage") or None,
+            "message": raw.get("message") or None,
+            "updated_at": float(raw.get("updated_at") or 0),
+        }
+
+    def touch(self, job_id: str) -> None:
+        """Mark the stored state as confirmed by Postgres just now."""
+        if not self.breaker.allow():
+            return
+        try:
+            with observe_redis("job_progress", "hset"):
+                self.redis.hset(PROGRESS_KEY_PREFIX + job_id, "updated_at", time.time())
+        except (RedisError, OSError) as exc:
+            self.breaker.record_failure(exc)
+            return
+        self.breaker.record_success()
+
+    def is_fresh(self, progress: Dict[str, Any]) -> bool:
+        """Whether a state read from Redis may be served without Postgres."""
+        state = progress.get("state")
+        if not state:
+            return False
+        if state["status"] in FINISHED_STATUSES:
+            return True
+        age = time.time() - progress["updated_at"]
+        return age < settings.JOB_PROGRESS_STALE_SECONDS
+
+
+_store: Optional[JobProgressStore] = None
+_store_lock = threading.Lock()
+
+
+def get_job_progress_store() -> JobProgressStore:
+    """The shared store of this process."""
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = JobProgressStore()
+        return _store
+
+
+def publish_job_state(*jobs: SummaryGenerationJob) -> None:
+    get_job_progress_store().publish_state(*jobs)
+
+
+def report_progress(
+    job_id: str, progress: int, stage: str, message: Optional[str] = None
+) -> None:
+    get_job_progress_store().report(job_id, progress, stage, message)
+
+
+def reset_job_progress_store() -> None:
+    """Forget the shared store (its connection and breaker)."""
+    global _store
+    with _store_lock:
+        _store = None
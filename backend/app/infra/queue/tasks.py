@@ -4,11 +4,13 @@ from __future__ import annotations
 
 import logging
 import time
-from datetime import datetime, timedelta
+from concurrent.futures import Future, ThreadPoolExecutor, as_completed
+from datetime import datetime, timedelta, timezone
+from typing import Optional
 from sqlalchemy.orm import Session, aliased
-from sqlalchemy import text
 from rq import get_current_job
 
+from app.core.config import settings
 from app.infra.db.session import SessionLocal
 from app.infra.db.models import (
     Evaluation,
@@ -18,6 +20,7 @@ from app.infra.db.models import (
     FeedbackSummary,
     SummaryGenerationJob,
 )
+from app.infra.queue.progress import publish_job_state, report_progress
 from app.infra.services.ollama_service import OllamaService
 from app.infra.services.anonymization_service import AnonymizationService
 from app.infra.services.webhook_service import WebhookService
@@ -25,6 +28,14 @@ import hashlib
 
 logger = logging.getLogger(__name__)
 
+EMPTY_SUMMARY_TEXT = (
+    "Je hebt nog geen peer-feedback ontvangen. Zodra je teamgenoten hun "
+    "beoordelingen hebben ingeleverd, verschijnt hier een samenvatting."
+)
+# A batch job may run for its setup plus about a minute per student
+BATCH_JOB_TIMEOUT_SECONDS = 600
+BATCH_JOB_TIMEOUT_PER_STUDENT_SECONDS = 60
+
 
 def _compute_feedback_hash(comments: list[str]) -> str:
     """Compute a hash of feedback comments for cache invalidation."""
@@ -32,11 +43,37 @@ def _compute_feedback_hash(comments: list[str]) -> str:
     return hashlib.sha256(content.encode()).hexdigest()
 
 
-def _update_job_progress(db: Session, job: SummaryGenerationJob, progress: int):
-    """Update job progress."""
-    if job and 0 <= progress <= 100:
-        job.progress = progress
-        db.commit()
+def _summarize_feedback(
+    ollama: OllamaService,
+    comments: list[str],
+    reviewer_names: list[str],
+    student_name: str,
+    evaluation_title: str,
+) -> tuple[str, str]:
+    """
+    Anonymize the comments and summarize them with Ollama, or with the
+    rule-based fallback when that fails. Returns (summary_text, method).
+    """
+    anonymizer = AnonymizationService()
+    anonymized_comments = anonymizer.anonymize_comments(
+        comments, reviewer_names + [student_name]
+    )
+    if not anonymized_comments:
+        anonymized_comments = comments
+
+    try:
+        ai_summary = ollama.generate_summary(
+            feedback_comments=anonymized_comments,
+            student_name=student_name,
+            context=f"Evaluatie: {evaluation_title}",
+        )
+    except Exception as e:
+        logger.error(f"Exception during AI generation: {type(e).__name__}: {e}")
+        ai_summary = None
+
+    if ai_summary:
+        return ai_summary, "ai"
+    return ollama.create_fallback_summary(anonymized_comments), "fallback"
 
 
 def generate_ai_summary_task(
@@ -59,7 +96,9 @@ def generate_ai_summary_task(
         The job_id is retrieved from RQ's current job context, not passed as a parameter.
         This is because RQ's enqueue() pops job_id from kwargs to use it for the RQ Job ID.
     """
-    db = SessionLocal()
+    # Postgres is only written on state changes (progress goes to Redis);
+    # publishing the new state after a commit must not reload the job
+    db = SessionLocal(expire_on_commit=False)
     start_time = time.time()
 
     # Get job_id from RQ job context
@@ -96,9 +135,10 @@ def generate_ai_summary_task(
             }
 
         job.status = "processing"
-        job.started_at = db.execute(text("SELECT NOW()")).scalar()
+        job.started_at = datetime.now(timezone.utc)
         job.progress = 10
         db.commit()
+        publish_job_state(job)
 
         # Verify evaluation exists
         ev = (
@@ -109,7 +149,7 @@ def generate_ai_summary_task(
         if not ev:
             raise ValueError(f"Evaluation {evaluation_id} not found")
 
-        _update_job_progress(db, job, 20)
+        report_progress(job_id, 20, "loading", "Evaluatie geladen")
 
         # Verify student exists
         student = (
@@ -120,7 +160,7 @@ def generate_ai_summary_task(
         if not student:
             raise ValueError(f"Student {student_id} not found")
 
-        _update_job_progress(db, job, 30)
+        report_progress(job_id, 30, "loading", "Student geladen")
 
         # Get peer feedback comments
         U_from = aliased(User)
@@ -142,49 +182,23 @@ def generate_ai_summary_task(
             .all()
         )
 
-        _update_job_progress(db, job, 40)
-
         comments = [row.comment for row in feedback_rows if row.comment]
         reviewer_names = [row.name for row in feedback_rows if row.name]
+        report_progress(job_id, 40, "loading", f"{len(comments)} opmerkingen geladen")
 
         if not comments:
             # No feedback yet
-            summary_text = "Je hebt nog geen peer-feedback ontvangen. Zodra je teamgenoten hun beoordelingen hebben ingeleverd, verschijnt hier een samenvatting."
+            summary_text = EMPTY_SUMMARY_TEXT
             method = "empty"
         else:
-            # Anonymize comments
-            _update_job_progress(db, job, 50)
-
-            all_names = reviewer_names + [student.name]
-            anonymizer = AnonymizationService()
-            anonymized_comments = anonymizer.anonymize_comments(comments, all_names)
-
-            if not anonymized_comments:
-                anonymized_comments = comments
-
-            _update_job_progress(db, job, 60)
-
-            # Try AI generation
-            ollama = OllamaService()
-            try:
-                ai_summary = ollama.generate_summary(
-                    feedback_comments=anonymized_comments,
-                    student_name=student.name,
-                    context=f"Evaluatie: {ev.title}",
-                )
-            except Exception as e:
-                logger.error(f"Exception during AI generation: {type(e).__name__}: {e}")
-                ai_summary = None
+            report_progress(job_id, 50, "generating", "Samenvatting genereren")
 
-            _update_job_progress(db, job, 80)
+            # Anonymize, then AI generation or the rule-based fallback
+            summary_text, method = _summarize_feedback(
+                OllamaService(), comments, reviewer_names, student.name, ev.title
+            )
 
-            if ai_summary:
-                summary_text = ai_summary
-                method = "ai"
-            else:
-                # Fallback to rule-based summary
-                summary_text = ollama.create_fallback_summary(anonymized_comments)
-                method = "fallback"
+            report_progress(job_id, 80, "saving", "Samenvatting opslaan")
 
             # Compute hash and cache the summary
             feedback_hash = _compute_feedback_hash(comments)
@@ -195,8 +209,6 @@ def generate_ai_summary_task(
                 FeedbackSummary.student_id == student_id,
             ).delete()
 
-            _update_job_progress(db, job, 90)
-
             duration_ms = int((time.time() - start_time) * 1000)
 
             new_summary = FeedbackSummary(
@@ -209,11 +221,10 @@ def generate_ai_summary_task(
                 generation_duration_ms=duration_ms,
             )
             db.add(new_summary)
-            db.commit()
 
-        # Update job status to completed
+        # Update job status to completed, in the transaction of the summary
         job.status = "completed"
-        job.completed_at = db.execute(text("SELECT NOW()")).scalar()
+        job.completed_at = datetime.now(timezone.utc)
         job.progress = 100
         job.result = {
             "summary_text": summary_text,
@@ -236,6 +247,7 @@ def generate_ai_summary_task(
             job.webhook_delivered = success
             job.webhook_attempts += 1
             db.commit()
+        publish_job_state(job)
 
         duration = time.time() - start_time
         logger.info(
@@ -258,6 +270,8 @@ def generate_ai_summary_task(
             f"[Job {job_id}] Failed to generate AI summary for student {student_id}: {e}",
             exc_info=True,
         )
+        # Drop the unfinished summary write, if any
+        db.rollback()
 
         # Check if we should retry
         if job and job.retry_count < job.max_retries:
@@ -273,6 +287,7 @@ def generate_ai_summary_task(
             job.status = "queued"  # Back to queued for retry
             job.error_message = f"Retry {job.retry_count}/{job.max_retries}: {str(e)}"
             db.commit()
+            publish_job_state(job)
 
             logger.info(
                 f"[Job {job_id}] Scheduling retry {job.retry_count}/{job.max_retries} in {backoff_seconds}s"
@@ -303,7 +318,7 @@ def generate_ai_summary_task(
         # Update job status to failed
         if job:
             job.status = "failed"
-            job.completed_at = db.execute(text("SELECT NOW()")).scalar()
+            job.completed_at = datetime.now(timezone.utc)
             job.error_message = str(e)
             db.commit()
 
@@ -321,6 +336,7 @@ def generate_ai_summary_task(
                 job.webhook_delivered = success
                 job.webhook_attempts += 1
                 db.commit()
+            publish_job_state(job)
 
         return {
             "status": "failed",
@@ -334,66 +350,454 @@ def generate_ai_summary_task(
         db.close()
 
 
-def batch_generate_summaries_task(
+def queue_summary_batch(
+    db: Session,
     school_id: int,
     evaluation_id: int,
     student_ids: list[int],
+    queue_name: str = "ai-summaries",
+    priority: str = "normal",
+    webhook_url: Optional[str] = None,
 ) -> dict:
     """
-    Generate summaries for multiple students in batch.
-
-    This is a coordinator task that enqueues individual jobs for each student.
-    It doesn't track itself in the database, so it doesn't need to retrieve
-    its own job_id from RQ context.
+    Queue summary generation for students of an evaluation as one batch job.
 
-    Args:
-        school_id: School ID
-        evaluation_id: Evaluation ID
-        student_ids: List of student IDs
+    Students with a queued, processing or completed job are skipped. The
+    others get a SummaryGenerationJob each, so their status can be polled as
+    before, and are all handled by a single batch_generate_summaries_task.
 
     Returns:
-        dict with batch processing results
+        dict with the RQ id of the batch job (None when nothing was queued)
+        and a result per student
     """
     from app.infra.queue.connection import get_queue
 
-    queue = get_queue("ai-summaries")
-    results = []
+    existing_jobs = (
+        db.query(SummaryGenerationJob)
+        .filter(
+            SummaryGenerationJob.school_id == school_id,
+            SummaryGenerationJob.evaluation_id == evaluation_id,
+            SummaryGenerationJob.student_id.in_(student_ids),
+            SummaryGenerationJob.status.in_(["queued", "processing", "completed"]),
+        )
+        .order_by(SummaryGenerationJob.created_at)
+        .all()
+    )
+    # The latest job of a student wins
+    existing = {job.student_id: job for job in existing_jobs}
 
-    for student_id in student_ids:
-        try:
-            # Queue individual job for each student
-            job = queue.enqueue(
-                generate_ai_summary_task,
-                school_id=school_id,
-                evaluation_id=evaluation_id,
-                student_id=student_id,
-                job_id=f"summary-{evaluation_id}-{student_id}-{int(time.time())}",
-                job_timeout="10m",
-                result_ttl=86400,  # Keep results for 24 hours
-                failure_ttl=86400,
-            )
-            results.append(
-                {
-                    "student_id": student_id,
-                    "job_id": job.id,
-                    "status": "queued",
-                }
-            )
-        except Exception as e:
-            logger.error(f"Failed to queue job for student {student_id}: {e}")
+    results = []
+    new_jobs = []
+    batch_ts = int(time.time())
+    for student_id in dict.fromkeys(student_ids):
+        existing_job = existing.get(student_id)
+        if existing_job:
             results.append(
                 {
                     "student_id": student_id,
-                    "status": "failed",
-                    "error": str(e),
+                    "job_id": existing_job.job_id,
+                    "status": (
+                        "already_exists"
+                        if existing_job.status == "completed"
+                        else "already_queued"
+                    ),
                 }
             )
+            continue
+
+        new_job = SummaryGenerationJob(
+            school_id=school_id,
+            evaluation_id=evaluation_id,
+            student_id=student_id,
+            job_id=f"summary-{evaluation_id}-{student_id}-{batch_ts}",
+            status="queued",
+            priority=priority,
+            webhook_url=webhook_url,
+            queue_name=queue_name,
+            task_type="batch_summary",
+        )
+        db.add(new_job)
+        new_jobs.append(new_job)
+
+    if not new_jobs:
+        return {"batch_job_id": None, "results": results}
+
+    # The worker must find the job rows
+    db.commit()
+    publish_job_state(*new_jobs)
+
+    batch_job_id = f"summary-batch-{evaluation_id}-{batch_ts}"
+    job_ids = [job.job_id for job in new_jobs]
+    error = None
+    try:
+        get_queue(queue_name).enqueue(
+            batch_generate_summaries_task,
+            school_id=school_id,
+            evaluation_id=evaluation_id,
+            job_ids=job_ids,
+            job_id=batch_job_id,
+            job_timeout=BATCH_JOB_TIMEOUT_SECONDS
+            + BATCH_JOB_TIMEOUT_PER_STUDENT_SECONDS * len(job_ids),
+            result_ttl=86400,
+            failure_ttl=86400,
+            meta={
+                "school_id": school_id,
+                "evaluation_id": evaluation_id,
+                **_batch_progress(len(job_ids), {}),
+            },
+        )
+        logger.info(
+            f"Batch {batch_job_id}: enqueued {len(job_ids)} students to queue '{queue_name}'"
+        )
+    except Exception as e:
+        logger.error(f"Batch {batch_job_id}: failed to enqueue: {e}")
+        error = str(e)
+        batch_job_id = None
+        for job in new_jobs:
+            job.status = "failed"
+            job.error_message = f"Failed to queue: {error}"
+        db.commit()
+        publish_job_state(*new_jobs)
+
+    for job in new_jobs:
+        result = {
+            "student_id": job.student_id,
+            "job_id": job.job_id,
+            "status": "failed" if error else "queued",
+        }
+        if error:
+            result["error"] = error
+        results.append(result)
+
+    return {"batch_job_id": batch_job_id, "results": results}
+
+
+def _fetch_feedback(
+    db: Session, school_id: int, evaluation_id: int, student_ids: list[int]
+) -> dict[int, list[tuple[str, Optional[str]]]]:
+    """Peer comments with the reviewer's name per student, in one query."""
+    U_from = aliased(User)
+
+    rows = (
+        db.query(Allocation.reviewee_id, Score.comment, U_from.name)
+        .select_from(Score)
+        .join(Allocation, Allocation.id == Score.allocation_id)
+        .join(U_from, U_from.id == Allocation.reviewer_id)
+        .filter(
+            Allocation.school_id == school_id,
+            Allocation.evaluation_id == evaluation_id,
+            Allocation.reviewee_id.in_(student_ids),
+            Allocation.is_self.is_(False),
+            Score.comment.isnot(None),
+            Score.comment != "",
+        )
+        .order_by(Score.id)
+        .all()
+    )
+
+    feedback: dict[int, list[tuple[str, Optional[str]]]] = {}
+    for reviewee_id, comment, reviewer_name in rows:
+        feedback.setdefault(reviewee_id, []).append((comment, reviewer_name))
+    return feedback
+
 
+def _batch_progress(total: int, counts: dict) -> dict:
+    done = sum(counts.values())
     return {
-        "status": "completed",
-        "evaluation_id": evaluation_id,
-        "total_students": len(student_ids),
-        "queued": sum(1 for r in results if r["status"] == "queued"),
-        "failed": sum(1 for r in results if r["status"] == "failed"),
-        "results": results,
+        "total": total,
+        "completed": counts.get("completed", 0),
+        "failed": counts.get("failed", 0),
+        "cancelled": counts.get("cancelled", 0),
+        "progress": int(done * 100 / total) if total else 100,
     }
+
+
+def _report_batch_progress(rq_job, total: int, counts: dict) -> None:
+    """Aggregated progress of a batch, in the meta of its RQ job."""
+    if rq_job is None:
+        return
+    rq_job.meta.update(_batch_progress(total, counts))
+    try:
+        rq_job.save_meta()
+    except Exception as e:
+        logger.warning(f"Batch {rq_job.id}: could not save progress: {e}")
+
+
+def _send_job_webhook(job: SummaryGenerationJob) -> None:
+    webhook_service = WebhookService()
+    payload = webhook_service.create_job_payload(
+        job_id=job.job_id,
+        status=job.status,
+        student_id=job.student_id,
+        evaluation_id=job.evaluation_id,
+        result=job.result,
+        error_message=job.error_message,
+    )
+    success, error = webhook_service.send_webhook(job.webhook_url, payload)
+    job.webhook_delivered = success
+    job.webhook_attempts += 1
+
+
+def _write_summary_chunk(
+    db: Session,
+    school_id: int,
+    evaluation_id: int,
+    jobs: dict[int, SummaryGenerationJob],
+    chunk: list[tuple[int, Future]],
+    counts: dict,
+) -> None:
+    """Store the summaries and job results of a chunk of students in one commit."""
+    now = datetime.now(timezone.utc)
+    cancelled = {
+        job_id
+        for (job_id,) in db.query(SummaryGenerationJob.job_id).filter(
+            SummaryGenerationJob.job_id.in_(
+                [jobs[student_id].job_id for student_id, _ in chunk]
+            ),
+            SummaryGenerationJob.status == "cancelled",
+        )
+    }
+    summaries = []
+    for student_id, future in chunk:
+        job = jobs[student_id]
+        if job.job_id in cancelled:
+            job.status = "cancelled"
+            counts["cancelled"] += 1
+            continue
+
+        job.completed_at = now
+        try:
+            summary_text, method, comments, duration_ms = future.result()
+        except Exception as e:
+            logger.error(
+                f"[Job {job.job_id}] Failed to generate AI summary for student {student_id}: {e}"
+            )
+            job.status = "failed"
+            job.error_message = str(e)
+            counts["failed"] += 1
+            continue
+
+        if comments:
+            summaries.append(
+                FeedbackSummary(
+                    school_id=school_id,
+                    evaluation_id=evaluation_id,
+                    student_id=student_id,
+                    summary_text=summary_text,
+                    feedback_hash=_compute_feedback_hash(comments),
+                    generation_method=method,
+                    generation_duration_ms=duration_ms,
+                )
+            )
+        job.status = "completed"
+        job.progress = 100
+        job.result = {
+            "summary_text": summary_text,
+            "generation_method": method,
+            "feedback_count": len(comments),
+        }
+        counts["completed"] += 1
+
+    if summaries:
+        # Replace old summaries
+        db.query(FeedbackSummary).filter(
+            FeedbackSummary.evaluation_id == evaluation_id,
+            FeedbackSummary.student_id.in_([s.student_id for s in summaries]),
+        ).delete(synchronize_session=False)
+        db.add_all(summaries)
+    db.commit()
+
+    notify = [
+        jobs[student_id]
+        for student_id, _ in chunk
+        if jobs[student_id].webhook_url
+        and jobs[student_id].status in ("completed", "failed")
+    ]
+    for job in notify:
+        _send_job_webhook(job)
+    if notify:
+        db.commit()
+    # Cancelled jobs were published by whoever cancelled them
+    publish_job_state(
+        *(
+            jobs[student_id]
+            for student_id, _ in chunk
+            if jobs[student_id].status != "cancelled"
+        )
+    )
+
+
+def batch_generate_summaries_task(
+    school_id: int,
+    evaluation_id: int,
+    job_ids: list[str],
+) -> dict:
+    """
+    Generate the summaries of a batch of students of one evaluation.
+
+    Queued by ``queue_summary_batch``, with a SummaryGenerationJob per
+    student. The evaluation, the students and all peer comments are loaded
+    once; the students then go through Ollama ``SUMMARY_BATCH_CONCURRENCY``
+    at a time, and their summaries and job results are written in chunks of
+    ``SUMMARY_BATCH_CHUNK_SIZE`` with one commit per chunk. Aggregated
+    progress is kept in the meta of the RQ job, the progress of each student
+    in Redis (app/infra/queue/progress.py).
+
+    A single student is still regenerated with generate_ai_summary_task.
+
+    Args:
+        school_id: School ID
+        evaluation_id: Evaluation ID
+        job_ids: SummaryGenerationJob ids of the students
+
+    Returns:
+        dict with batch processing results
+    """
+    # Publishing job states after a commit must not reload every job
+    db = SessionLocal(expire_on_commit=False)
+    start_time = time.time()
+    rq_job = get_current_job()
+    total = len(job_ids)
+    counts = {"completed": 0, "failed": 0, "cancelled": 0}
+    jobs: dict[int, SummaryGenerationJob] = {}
+    pool = None
+
+    try:
+        for job in (
+            db.query(SummaryGenerationJob)
+            .filter(
+                SummaryGenerationJob.job_id.in_(job_ids),
+                SummaryGenerationJob.school_id == school_id,
+            )
+            .all()
+        ):
+            if job.status == "cancelled":
+                counts["cancelled"] += 1
+            else:
+                jobs[job.student_id] = job
+        # Job rows that are gone count as failed
+        counts["failed"] += total - counts["cancelled"] - len(jobs)
+
+        logger.info(
+            f"[Batch {rq_job.id if rq_job else '-'}] Generating {len(jobs)} summaries "
+            f"for evaluation {evaluation_id}"
+        )
+
+        ev = (
+            db.query(Evaluation)
+            .filter(Evaluation.id == evaluation_id, Evaluation.school_id == school_id)
+            .first()
+        )
+        if not ev:
+            raise ValueError(f"Evaluation {evaluation_id} not found")
+        evaluation_title = ev.title
+
+        now = datetime.now(timezone.utc)
+        for job in jobs.values():
+            job.status = "processing"
+            job.started_at = now
+            job.progress = 10
+        db.commit()
+        publish_job_state(*jobs.values())
+        _report_batch_progress(rq_job, total, counts)
+
+        # Plain values: the pool threads must not touch the session
+        job_id_of = {student_id: job.job_id for student_id, job in jobs.items()}
+        student_names = dict(
+            db.query(User.id, User.name).filter(
+                User.id.in_(list(jobs)), User.school_id == school_id
+            )
+        )
+        feedback = _fetch_feedback(db, school_id, evaluation_id, list(jobs))
+        ollama = OllamaService()
+
+        def summarize(student_id: int) -> tuple[str, str, list[str], int]:
+            started = time.time()
+            if student_id not in student_names:
+                raise ValueError(f"Student {student_id} not found")
+            rows = feedback.get(student_id, [])
+            comments = [comment for comment, _ in rows]
+            if not comments:
+                return EMPTY_SUMMARY_TEXT, "empty", comments, 0
+            reviewer_names = [name for _, name in rows if name]
+            report_progress(
+                job_id_of[student_id], 50, "generating", "Samenvatting genereren"
+            )
+            summary_text, method = _summarize_feedback(
+                ollama,
+                comments,
+                reviewer_names,
+                student_names[student_id],
+                evaluation_title,
+            )
+            report_progress(job_id_of[student_id], 80, "saving", "Samenvatting opslaan")
+            return summary_text, method, comments, int((time.time() - started) * 1000)
+
+        # Only the Ollama step runs in the pool; all writes stay on this thread
+        pool = ThreadPoolExecutor(
+            max_workers=max(1, settings.SUMMARY_BATCH_CONCURRENCY)
+        )
+        futures = {
+            pool.submit(summarize, student_id): student_id for student_id in jobs
+        }
+        chunk_size = max(1, settings.SUMMARY_BATCH_CHUNK_SIZE)
+        chunk: list[tuple[int, Future]] = []
+        for future in as_completed(futures):
+            chunk.append((futures[future], future))
+            if len(chunk) >= chunk_size:
+                _write_summary_chunk(db, school_id, evaluation_id, jobs, chunk, counts)
+                _report_batch_progress(rq_job, total, counts)
+                chunk = []
+        if chunk:
+            _write_summary_chunk(db, school_id, evaluation_id, jobs, chunk, counts)
+            _report_batch_progress(rq_job, total, counts)
+
+        duration = time.time() - start_time
+        logger.info(
+            f"[Batch {rq_job.id if rq_job else '-'}] {counts['completed']} summaries "
+            f"generated in {duration:.2f}s for evaluation {evaluation_id}"
+        )
+        return {
+            "status": "completed",
+            "evaluation_id": evaluation_id,
+            "total_students": total,
+            **counts,
+            "duration_ms": int(duration * 1000),
+        }
+
+    except Exception as e:
+        duration = time.time() - start_time
+        logger.error(
+            f"[Batch {rq_job.id if rq_job else '-'}] Failed to generate summaries "
+            f"for evaluation {evaluation_id}: {e}",
+            exc_info=True,
+        )
+        db.rollback()
+
+        # Students not written yet fail; they can be regenerated one by one
+        unfinished = [
+            job for job in jobs.values() if job.status in ("queued", "processing")
+        ]
+        now = datetime.now(timezone.utc)
+        for job in unfinished:
+            job.status = "failed"
+            job.completed_at = now
+            job.error_message = str(e)
+        db.commit()
+        publish_job_state(*unfinished)
+        counts["failed"] += len(unfinished)
+        _report_batch_progress(rq_job, total, counts)
+
+        return {
+            "status": "failed",
+            "evaluation_id": evaluation_id,
+            "total_students": total,
+            **counts,
+            "error": str(e),
+            "duration_ms": int(duration * 1000),
+        }
+
+    finally:
+        if pool is not None:
+            pool.shutdown(wait=True, cancel_futures=True)
+        db.close()
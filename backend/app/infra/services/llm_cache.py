@@ -0,0 +1,357 @@
+"""
+Content-addressed cache of Ollama results.
+
+``OllamaService`` asks this cache before every extract and summary request.
+The key is a SHA-256 of the stage, the model, the prompt version and the
+rendered prompt with its options. The prompt only holds anonymized feedback,
+so a regeneration, a retried job or another student with the same feedback
+reuses the result instead of calling Ollama again.
+
+Two tiers:
+
+- Redis: ``llm_cache:v:<key>`` values with a TTL of ``LLM_CACHE_TTL_SECONDS``
+  and ``llm_cache:lru``, the keys sorted by last use. A write evicts the least
+  recently used keys beyond ``LLM_CACHE_MAX_ENTRIES``. Short timeouts and a
+  circuit breaker: an unavailable Redis never delays a generation.
+- Postgres (``llm_cache_entries``): read on a Redis miss or while Redis is
+  unavailable, and copied back to Redis on a hit. Pruned to the
+  ``LLM_CACHE_DB_MAX_ENTRIES`` most recently used every ``DB_PRUNE_EVERY``
+  writes of a process.
+
+Lookups are counted per stage in the Redis hash ``llm_cache:stats`` (all
+processes together) and in this process; ``get_llm_cache_stats`` reports them
+with the hit ratios.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Any, Callable, Dict, Optional
+
+from redis import Redis
+from redis.exceptions import RedisError
+from sqlalchemy.exc import IntegrityError, SQLAlchemyError
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.infra.metrics import LLM_CACHE_LOOKUPS, observe_redis
+from app.infra.services.rate_limiter import CircuitBreaker
+
+logger = logging.getLogger(__name__)
+
+VALUE_KEY_PREFIX = "llm_cache:v:"
+LRU_KEY = "llm_cache:lru"
+STATS_KEY = "llm_cache:stats"
+# Lookups run before every generation: never wait long for Redis
+LLM_CACHE_REDIS_TIMEOUT_SECONDS = 0.25
+DB_PRUNE_EVERY = 100
+STAGES = ("extract", "summary")
+RESULT_LABELS = {"redis_hits": "redis_hit", "db_hits": "db_hit", "misses": "miss"}
+
+# KEYS[1]: value key, KEYS[2]: sorted set of keys by last use.
+# ARGV: value, ttl, now, key, max entries, value key prefix.
+# Returns the number of evicted keys.
+SET_ENTRY_LUA = """
+redis.call('SET', KEYS[1], ARGV[1], 'EX', ARGV[2])
+redis.call('ZADD', KEYS[2], ARGV[3], ARGV[4])
+redis.call('ZREMRANGEBYSCORE', KEYS[2], '-inf', ARGV[3] - ARGV[2])
+local excess = redis.call('ZCARD', KEYS[2]) - tonumber(ARGV[5])
+if excess <= 0 then
+    return 0
+end
+local evicted = redis.call('ZPOPMIN', KEYS[2], excess)
+for i = 1, #evicted, 2 do
+    redis.call('DEL', ARGV[6] .. evicted[i])
+end
+return excess
+"""
+
+
+def _text(value: Any) -> str:
+    return value.decode() if isinstance(value, bytes) else value
+
+
+def _default_session_factory() -> Session:
+    from app.infra.db.session import SessionLocal
+
+    return SessionLocal()
+
+
+class LLMCache:
+    """Two-tier (Redis, Postgres) cache of Ollama responses by content."""
+
+    def __init__(
+        self,
+        redis_conn: Optional[Redis] = None,
+        use_redis: bool = True,
+        use_db: Optional[bool] = None,
+        session_factory: Optional[Callable[[], Session]] = None,
+        max_entries: Optional[int] = None,
+        db_max_entries: Optional[int] = None,
+        ttl_seconds: Optional[int] = None,
+    ):
+        self.use_redis = use_redis
+        self.use_db = settings.LLM_CACHE_DB_ENABLED if use_db is None else use_db
+        self.session_factory = session_factory or _default_session_factory
+        self.max_entries = max_entries or settings.LLM_CACHE_MAX_ENTRIES
+        self.db_max_entries = db_max_entries or settings.LLM_CACHE_DB_MAX_ENTRIES
+        self.ttl_seconds = ttl_seconds or settings.LLM_CACHE_TTL_SECONDS
+        self.breaker = CircuitBreaker(name="LLM cache: Redis")
+        self._redis = redis_conn
+        self._script = None
+        self._lock = threading.Lock()
+        self._counts = {stage: dict.fromkeys(RESULT_LABELS, 0) for stage in STAGES}
+        self._db_writes = 0
+
+    @property
+    def redis(self) -> Redis:
+        if self._redis is None:
+            self._redis = Redis.from_url(
+                settings.REDIS_URL,
+                socket_connect_timeout=LLM_CACHE_REDIS_TIMEOUT_SECONDS,
+                socket_timeout=LLM_CACHE_REDIS_TIMEOUT_SECONDS,
+            )
+        return self._redis
+
+    @staticmethod
+    def make_key(
+        stage: str, model: str, prompt_version: str, prompt: str, options: dict
+    ) -> str:
+        """Content address of one Ollama request."""
+        payload = json.dumps(
+            [stage, model, prompt_version, prompt, options],
+            ensure_ascii=False,
+            sort_keys=True,
+        )
+        return hashlib.sha256(payload.encode()).hexdigest()
+
+    # ---------- Public API ----------
+    def get(self, stage: str, key: str) -> Optional[str]:
+        """The cached response for ``key``, or None."""
+        value = self._redis_get(key)
+        result = "redis_hits"
+        if value is None and self.use_db:
+            value = self._db_get(key)
+            result = "db_hits"
+            if value is not None:
+                self._redis_set(key, value)
+        if value is None:
+            result = "misses"
+        self._record(stage, result)
+        return value
+
+    def set(
+        self, stage: str, key: str, value: str, model: str, prompt_version: str
+    ) -> None:
+        """Store a response; only call this for usable output."""
+        self._redis_set(key, value)
+        if self.use_db:
+            self._db_set(stage, key, value, model, prompt_version)
+
+    def stats(self) -> Dict[str, Any]:
+        """Lookups per stage with hit ratios: of all processes when Redis is up."""
+        source = "process"
+        entries = None
+        with self._lock:
+            counts = {stage: dict(c) for stage, c in self._counts.items()}
+        if self._redis_allowed():
+            try:
+                with observe_redis("llm_cache", "hgetall"):
+                    raw = self.redis.hgetall(STATS_KEY)
+                with observe_redis("llm_cache", "zcard"):
+                    entries = self.redis.zcard(LRU_KEY)
+                self.breaker.record_success()
+                raw = {_text(k): int(v) for k, v in raw.items()}
+                counts = {
+                    stage: {
+                        name: raw.get(f"{stage}:{name}", 0) for name in RESULT_LABELS
+                    }
+                    for stage in STAGES
+                }
+                source = "redis"
+            except (RedisError, OSError) as exc:
+                self.breaker.record_failure(exc)
+
+        stages = {}
+        for stage, c in counts.items():
+            hits = c["redis_hits"] + c["db_hits"]
+            lookups = hits + c["misses"]
+            stages[stage] = {
+                **c,
+                "hits": hits,
+                "hit_ratio": round(hits / lookups, 3) if lookups else None,
+            }
+        return {
+            "source": source,
+            "stages": stages,
+            "redis_entries": entries,
+            "max_entries": self.max_entries,
+            "db": self.use_db,
+            "breaker": self.breaker.stats(),
+        }
+
+    # ---------- Redis tier ----------
+    def _redis_allowed(self) -> bool:
+        return self.use_redis and self.breaker.allow()
+
+    def _redis_get(self, key: str) -> Optional[str]:
+        if not self._redis_allowed():
+            return None
+        try:
+            pipe = self.redis.pipeline(transaction=False)
+            pipe.get(VALUE_KEY_PREFIX + key)
+            # Refresh the last use; XX: never re-add an evicted key
+            pipe.zadd(LRU_KEY, {key: time.time()}, xx=True)
+            with observe_redis("llm_cache", "get"):
+                value, _ = pipe.execute()
+        except (RedisError, OSError) as exc:
+            self.breaker.record_failure(exc)
+            return None
+        self.breaker.record_success()
+        return _text(value) if value is not None else None
+
+    def _redis_set(self, key: str, value: str) -> None:
+        if not self._redis_allowed():
+            return
+        try:
+            if self._script is None:
+                self._script = self.redis.register_script(SET_ENTRY_LUA)
+            with observe_redis("llm_cache", "evalsha"):
+                evicted = self._script(
+                    keys=[VALUE_KEY_PREFIX + key, LRU_KEY],
+                    args=[
+                        value,
+                        self.ttl_seconds,
+                        time.time(),
+                        key,
+                        self.max_entries,
+                        VALUE_KEY_PREFIX,
+                    ],
+                )
+        except (RedisError, OSError) as exc:
+            self.breaker.record_failure(exc)
+            return
+        self.breaker.record_success()
+        if evicted:
+            logger.debug(f"LLM cache: evicted {evicted} least recently used entries")
+
+    def _record(self, stage: str, result: str) -> None:
+        LLM_CACHE_LOOKUPS.labels(stage, RESULT_LABELS[result]).inc()
+        with self._lock:
+            self._counts.setdefault(stage, dict.fromkeys(RESULT_LABELS, 0))[result] += 1
+        if not self._redis_allowed():
+            return
+        try:
+            with observe_redis("llm_cache", "hincrby"):
+                self.redis.hincrby(STATS_KEY, f"{stage}:{result}", 1)
+        except (RedisError, OSError) as exc:
+            self.breaker.record_failure(exc)
+
+    # ---------- Postgres tier ----------
+    def _db_get(self, key: str) -> Optional[str]:
+        from app.infra.db.models import LLMCacheEntry
+
+        try:
+            with self.session_factory() as db:
+                entry = (
+                    db.query(LLMCacheEntry)
+                    .filter(LLMCacheEntry.cache_key == key)
+                    .one_or_none()
+                )
+                if entry is None:
+                    return None
+                response = entry.response
+                entry.hit_count += 1
+                entry.last_used_at = datetime.now(timezone.utc)
+                db.commit()
+                return response
+        except SQLAlchemyError as exc:
+            logger.warning(f"LLM cache: database lookup failed: {exc}")
+            return None
+
+    def _db_set(
+        self, stage: str, key: str, value: str, model: str, prompt_version: str
+    ) -> None:
+        from app.infra.db.models import LLMCacheEntry
+
+        with self._lock:
+            self._db_writes += 1
+            prune = self._db_writes % DB_PRUNE_EVERY == 0
+        try:
+            with self.session_factory() as db:
+                db.add(
+                    LLMCacheEntry(
+                        cache_key=key,
+                        stage=stage,
+                        model=model,
+                        prompt_version=prompt_version,
+                        response=value,
+                        hit_count=0,
+                        last_used_at=datetime.now(timezone.utc),
+                    )
+                )
+                try:
+                    db.commit()
+                except IntegrityError:
+                    # Another process stored the same content first
+                    db.rollback()
+                if prune:
+                    self._db_prune(db)
+        except SQLAlchemyError as exc:
+            logger.warning(f"LLM cache: database write failed: {exc}")
+
+    def _db_prune(self, db: Session) -> int:
+        """Delete expired entries and all but the most recently used."""
+        from app.infra.db.models import LLMCacheEntry
+
+        cutoff = datetime.now(timezone.utc) - timedelta(seconds=self.ttl_seconds)
+        oldest_kept = (
+            db.query(LLMCacheEntry.last_used_at)
+            .order_by(LLMCacheEntry.last_used_at.desc())
+            .offset(self.db_max_entries - 1)
+            .limit(1)
+            .scalar()
+        )
+        query = db.query(LLMCacheEntry).filter(LLMCacheEntry.last_used_at < cutoff)
+        if oldest_kept is not None:
+            query = db.query(LLMCacheEntry).filter(
+                (LLMCacheEntry.last_used_at < cutoff)
+                | (LLMCacheEntry.last_used_at < oldest_kept)
+            )
+        deleted = query.delete(synchronize_session=False)
+        db.commit()
+        if deleted:
+            logger.info(f"LLM cache: pruned {deleted} database entries")
+        return deleted
+
+
+_cache: Optional[LLMCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_llm_cache() -> Optional[LLMCache]:
+    """The shared cache of this process; None when ``LLM_CACHE_ENABLED`` is off."""
+    global _cache
+    if not settings.LLM_CACHE_ENABLED:
+        return None
+    with _cache_lock:
+        if _cache is None:
+            _cache = LLMCache()
+        return _cache
+
+
+def get_llm_cache_stats() -> Optional[Dict[str, Any]]:
+    cache = get_llm_cache()
+    return cache.stats() if cache is not None else None
+
+
+def reset_llm_cache() -> None:
+    """Forget the shared cache (its breaker and counters)."""
+    global _cache
+    with _cache_lock:
+        _cache = None
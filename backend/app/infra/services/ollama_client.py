@@ -0,0 +1,359 @@
+"""
+Shared HTTP client for Ollama.
+
+Every Ollama call of a process goes through one ``OllamaClient`` per base URL
+(``get_ollama_client``), which adds:
+
+- connection reuse: one ``requests.Session`` with a keep-alive pool, instead
+  of a new TCP connection per extract/summarize step and per retry;
+- a concurrency limit shared by all processes (API workers and the RQ
+  worker): ``OLLAMA_MAX_CONCURRENCY`` slots in a Redis sorted set. A call
+  waits up to ``OLLAMA_SLOT_TIMEOUT`` for a slot and is refused after that.
+  Slots expire on their own, so a crashed process cannot leak them. While
+  Redis is unavailable every process limits itself with a local semaphore;
+- retries of transient failures (connection errors, 429 and 502-504) with
+  full-jitter exponential backoff, limited by a retry budget: each call adds
+  ``OLLAMA_RETRY_BUDGET_RATIO`` of a token and each retry spends one, so a
+  struggling Ollama gets at most that fraction of extra requests;
+- a circuit breaker: after ``OLLAMA_BREAKER_FAILURES`` failed calls in a row
+  calls are refused without a request until a trial call after
+  ``OLLAMA_BREAKER_RESET_SECONDS``. Callers then use the rule-based fallback
+  right away.
+
+Refused calls raise ``OllamaUnavailable``.
+"""
+
+from __future__ import annotations
+
+import logging
+import random
+import threading
+import time
+import uuid
+from typing import Any, Dict, Optional
+
+import requests
+from redis import Redis
+from redis.exceptions import RedisError
+from requests.adapters import HTTPAdapter
+
+from app.core.config import settings
+from app.infra.metrics import observe_redis
+from app.infra.services.rate_limiter import CircuitBreaker
+
+logger = logging.getLogger(__name__)
+
+OLLAMA_SLOTS_KEY = "ollama:slots"
+# Slot calls run before every generation: never wait long for Redis
+OLLAMA_SLOTS_REDIS_TIMEOUT_SECONDS = 0.25
+SLOT_POLL_SECONDS = 0.05
+RETRYABLE_STATUS = frozenset({429, 502, 503, 504})
+BACKOFF_BASE_SECONDS = 0.5
+BACKOFF_MAX_SECONDS = 8.0
+RETRY_BUDGET_MAX_TOKENS = 10.0
+
+# KEYS[1]: sorted set of slot holders, scored by expiry time.
+# ARGV: now, limit, holder, expires_at. Returns 1 when the slot is taken.
+ACQUIRE_SLOT_LUA = """
+redis.call('ZREMRANGEBYSCORE', KEYS[1], '-inf', ARGV[1])
+if redis.call('ZCARD', KEYS[1]) < tonumber(ARGV[2]) then
+    redis.call('ZADD', KEYS[1], ARGV[4], ARGV[3])
+    redis.call('EXPIRE', KEYS[1], math.ceil(ARGV[4] - ARGV[1]) + 1)
+    return 1
+end
+return 0
+"""
+
+
+class OllamaUnavailable(Exception):
+    """The call was refused without a request (breaker open or no free slot)."""
+
+
+class RetryBudget:
+    """Token bucket of retries, refilled by a fraction of a token per call."""
+
+    def __init__(self, ratio: float, max_tokens: float = RETRY_BUDGET_MAX_TOKENS):
+        self.ratio = ratio
+        self.max_tokens = max_tokens
+        self.tokens = max_tokens
+        self._lock = threading.Lock()
+
+    def record_call(self) -> None:
+        with self._lock:
+            self.tokens = min(self.max_tokens, self.tokens + self.ratio)
+
+    def try_spend(self) -> bool:
+        with self._lock:
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return True
+            return False
+
+
+class OllamaSlots:
+    """
+    Cross-process concurrency limit for Ollama calls.
+
+    Holders are kept in a Redis sorted set, scored by when their slot expires
+    (``hold_seconds`` after taking it). Behind its own circuit breaker: while
+    Redis is unavailable a per-process semaphore of the same size is used.
+    """
+
+    def __init__(
+        self,
+        limit: int,
+        hold_seconds: float,
+        redis_conn: Optional[Redis] = None,
+        use_redis: bool = True,
+    ):
+        self.limit = limit
+        self.hold_seconds = hold_seconds
+        self.use_redis = use_redis
+        self.breaker = CircuitBreaker(name="Ollama slots: Redis")
+        self._redis = redis_conn
+        self._script = None
+        self._local = threading.BoundedSemaphore(limit)
+        self._lock = threading.Lock()
+        self.in_use = 0
+        self.waits = 0
+        self.timeouts = 0
+
+    @property
+    def redis(self) -> Redis:
+        if self._redis is None:
+            self._redis = Redis.from_url(
+                settings.REDIS_URL,
+                socket_connect_timeout=OLLAMA_SLOTS_REDIS_TIMEOUT_SECONDS,
+                socket_timeout=OLLAMA_SLOTS_REDIS_TIMEOUT_SECONDS,
+            )
+        return self._redis
+
+    def _try_redis(self, holder: str) -> Optional[bool]:
+        """Take a Redis slot; None when Redis is unavailable."""
+        if not self.use_redis or not self.breaker.allow():
+            return None
+        now = time.time()
+        try:
+            if self._script is None:
+                self._script = self.redis.register_script(ACQUIRE_SLOT_LUA)
+            with observe_redis("ollama_slots", "evalsha"):
+                taken = self._script(
+                    keys=[OLLAMA_SLOTS_KEY],
+                    args=[now, self.limit, holder, now + self.hold_seconds],
+                )
+        except (RedisError, OSError) as exc:
+            self.breaker.record_failure(exc)
+            return None
+        self.breaker.record_success()
+        return bool(taken)
+
+    def acquire(self, timeout: float) -> Optional[str]:
+        """Wait up to ``timeout`` seconds for a slot; its holder id or None."""
+        deadline = time.monotonic() + timeout
+        holder = uuid.uuid4().hex
+        waited = False
+        while True:
+            taken = self._try_redis(holder)
+            if taken is None:
+                # Redis unavailable: limit this process only. Wait on the
+                # local semaphore; in short steps when Redis may come back
+                remaining = max(0.0, deadline - time.monotonic())
+                if self.use_redis:
+                    remaining = min(remaining, SLOT_POLL_SECONDS)
+                got = self._local.acquire(blocking=False)
+                if not got:
+                    waited = True
+                    got = self._local.acquire(timeout=remaining)
+                if got:
+                    holder = f"local:{holder}"
+                    taken = True
+                elif time.monotonic() < deadline:
+                    continue
+            if taken:
+                with self._lock:
+                    self.in_use += 1
+                    self.waits += int(waited)
+                return holder
+            if time.monotonic() >= deadline:
+                with self._lock:
+                    self.timeouts += 1
+                return None
+            waited = True
+            time.sleep(SLOT_POLL_SECONDS)
+
+    def release(self, holder: str) -> None:
+        with self._lock:
+            self.in_use -= 1
+        if holder.startswith("local:"):
+            self._local.release()
+            return
+        try:
+            with observe_redis("ollama_slots", "zrem"):
+                self.redis.zrem(OLLAMA_SLOTS_KEY, holder)
+        except (RedisError, OSError) as exc:
+            # The slot expires after hold_seconds
+            logger.warning(f"Ollama slots: could not release slot: {exc}")
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "limit": self.limit,
+                "in_use_here": self.in_use,
+                "waited": self.waits,
+                "timeouts": self.timeouts,
+                "redis": self.use_redis,
+                "breaker": self.breaker.stats(),
+            }
+
+
+class OllamaClient:
+    """Pooled, concurrency-limited HTTP client for one Ollama server."""
+
+    def __init__(
+        self,
+        base_url: str,
+        slots: Optional[OllamaSlots] = None,
+        breaker: Optional[CircuitBreaker] = None,
+        retry_budget: Optional[RetryBudget] = None,
+        max_retries: Optional[int] = None,
+        slot_timeout: Optional[float] = None,
+    ):
+        self.base_url = base_url.rstrip("/")
+        self.max_retries = (
+            settings.OLLAMA_MAX_RETRIES if max_retries is None else max_retries
+        )
+        self.slot_timeout = (
+            settings.OLLAMA_SLOT_TIMEOUT if slot_timeout is None else slot_timeout
+        )
+        self.slots = slots or OllamaSlots(
+            settings.OLLAMA_MAX_CONCURRENCY,
+            # A slot outlives the longest possible request
+            hold_seconds=settings.OLLAMA_TIMEOUT + 10,
+            use_redis=settings.OLLAMA_SLOTS_REDIS_ENABLED,
+        )
+        self.breaker = breaker or CircuitBreaker(
+            failure_threshold=settings.OLLAMA_BREAKER_FAILURES,
+            reset_seconds=settings.OLLAMA_BREAKER_RESET_SECONDS,
+            name="Ollama",
+        )
+        self.retry_budget = retry_budget or RetryBudget(
+            settings.OLLAMA_RETRY_BUDGET_RATIO
+        )
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(
+            pool_connections=1, pool_maxsize=max(self.slots.limit, 1) * 2
+        )
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+        self._lock = threading.Lock()
+        self._counts = {"calls": 0, "retries": 0, "refused": 0, "saturated": 0}
+
+    def _count(self, name: str) -> None:
+        with self._lock:
+            self._counts[name] += 1
+
+    def available(self) -> bool:
+        """False while the breaker refuses calls."""
+        return not self.breaker.is_open()
+
+    def post(self, path: str, json: dict, timeout: Any) -> requests.Response:
+        """
+        POST to Ollama. Returns the last response (any status); raises
+        ``OllamaUnavailable`` when refused and the ``requests`` error of the
+        last attempt when there was no response.
+        """
+        if not self.breaker.allow():
+            self._count("refused")
+            raise OllamaUnavailable("circuit breaker open")
+        self._count("calls")
+        self.retry_budget.record_call()
+
+        attempt = 0
+        while True:
+            holder = self.slots.acquire(self.slot_timeout)
+            if holder is None:
+                self._count("saturated")
+                raise OllamaUnavailable(f"no free slot within {self.slot_timeout:.0f}s")
+            response = None
+            error: Optional[Exception] = None
+            try:
+                response = self.session.post(
+                    f"{self.base_url}{path}", json=json, timeout=timeout
+                )
+            except requests.Timeout as exc:
+                # Not retried: the call already took the whole timeout
+                self.breaker.record_failure(exc)
+                raise
+            except requests.RequestException as exc:
+                error = exc
+            finally:
+                self.slots.release(holder)
+
+            if response is not None and response.status_code < 500:
+                if response.status_code != 429:
+                    self.breaker.record_success()
+                    return response
+            self.breaker.record_failure(
+                error or RuntimeError(f"HTTP {response.status_code}")
+            )
+
+            retryable = error is not None or response.status_code in RETRYABLE_STATUS
+            if (
+                not retryable
+                or attempt >= self.max_retries
+                or self.breaker.is_open()
+                or not self.retry_budget.try_spend()
+            ):
+                if response is not None:
+                    return response
+                raise error
+
+            self._count("retries")
+            backoff = random.uniform(
+                0, min(BACKOFF_MAX_SECONDS, BACKOFF_BASE_SECONDS * 2**attempt)
+            )
+            attempt += 1
+            logger.warning(
+                f"Ollama call failed ({error or response.status_code}), "
+                f"retry {attempt}/{self.max_retries} in {backoff:.2f}s"
+            )
+            time.sleep(backoff)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            counts = dict(self._counts)
+        return {
+            **counts,
+            "retry_budget_tokens": round(self.retry_budget.tokens, 2),
+            "breaker": self.breaker.stats(),
+            "slots": self.slots.stats(),
+        }
+
+
+_clients: Dict[str, OllamaClient] = {}
+_clients_lock = threading.Lock()
+
+
+def get_ollama_client(base_url: str) -> OllamaClient:
+    """The shared client of this process for ``base_url``."""
+    with _clients_lock:
+        client = _clients.get(base_url)
+        if client is None:
+            client = _clients[base_url] = OllamaClient(base_url)
+        return client
+
+
+def get_ollama_client_stats() -> Dict[str, Dict[str, Any]]:
+    with _clients_lock:
+        clients = dict(_clients)
+    return {url: client.stats() for url, client in clients.items()}
+
+
+def reset_ollama_clients() -> None:
+    """Forget the shared clients (their breakers and budgets)."""
+    with _clients_lock:
+        for client in _clients.values():
+            client.session.close()
+        _clients.clear()
@@ -10,6 +10,13 @@ from urllib.parse import urlparse
 
 import requests
 from app.core.config import settings
+from app.infra.metrics import OLLAMA_REQUEST_DURATION
+from app.infra.services.llm_cache import LLMCache, get_llm_cache
+from app.infra.services.ollama_client import (
+    OllamaClient,
+    OllamaUnavailable,
+    get_ollama_client,
+)
 
 logger = logging.getLogger(__name__)
 
@@ -21,6 +28,15 @@ logger = logging.getLogger(__name__)
 #   weaken the SSRF protection for external requests.
 ALLOWED_OLLAMA_HOSTS = ["localhost", "127.0.0.1", "::1", "ollama"]
 
+# Version of each prompt, part of the LLM cache key. Bump it when a prompt,
+# its options or the handling of its output change, so results of the old
+# prompt are no longer served from the cache.
+PROMPT_VERSIONS = {
+    "extract": "extract-v1",
+    "summarize": "summarize-v1",
+    "single_pass": "single-pass-v1",
+}
+
 
 class OllamaService:
     """Service for interacting with Ollama LLM for generating feedback summaries."""
@@ -30,6 +46,8 @@ class OllamaService:
         base_url: str | None = None,
         model: str | None = None,
         timeout: float | None = None,
+        client: OllamaClient | None = None,
+        cache: LLMCache | None = None,
     ):
         # Haal uit Pydantic settings (die .env leest)
         raw_url = base_url or str(settings.OLLAMA_BASE_URL)
@@ -38,6 +56,10 @@ class OllamaService:
         self.timeout = float(
             timeout if timeout is not None else settings.OLLAMA_TIMEOUT
         )
+        # Gedeelde client: keep-alive, concurrency limit, retries, breaker
+        self.client = client or get_ollama_client(self.base_url)
+        # Resultaten per prompt-inhoud (None: LLM_CACHE_ENABLED staat uit)
+        self.cache = cache or get_llm_cache()
 
         logger.info(
             f"OllamaService: url={self.base_url}, model={self.model}, timeout={self.timeout}s"
@@ -99,6 +121,12 @@ class OllamaService:
             logger.info("No feedback comments provided")
             return None
 
+        if not self.client.available():
+            logger.warning(
+                "Ollama circuit breaker open; caller should use rule-based fallback"
+            )
+            return None
+
         logger.info(
             f"Generating structured+summary for {len(feedback_comments)} comments"
         )
@@ -130,7 +158,7 @@ class OllamaService:
 
         # 2) Summarize from the extracted JSON
         text = self._summarize_from_struct(struct, context)
-        if text and not self._is_refusal(text) and len(text) > 20:
+        if self._is_usable_summary(text):
             logger.info(
                 f"Successfully generated AI summary from struct ({len(text)} chars)"
             )
@@ -138,7 +166,7 @@ class OllamaService:
 
         # 3) One retry with softer framing
         text2 = self._summarize_from_struct(struct, context, retry=True)
-        if text2 and not self._is_refusal(text2) and len(text2) > 20:
+        if self._is_usable_summary(text2):
             logger.info(
                 f"Successfully generated AI summary from struct (retry) ({len(text2)} chars)"
             )
@@ -208,10 +236,11 @@ class OllamaService:
     # ----------------------------
     def _request_ollama(self, prompt: str, options: dict) -> Optional[str]:
         """Low-level request helper with tuple timeout + elapsed logging."""
+        start = time.perf_counter()
+        outcome = "error"
         try:
-            start = time.perf_counter()
-            resp = requests.post(
-                f"{self.base_url}/api/generate",
+            resp = self.client.post(
+                "/api/generate",
                 json={
                     "model": self.model,
                     "prompt": prompt,
@@ -228,13 +257,21 @@ class OllamaService:
                 logger.error(f"Ollama API error: {resp.status_code} - {resp.text}")
                 return None
             data = resp.json()
+            outcome = "ok"
             return (data.get("response") or "").strip()
         except requests.Timeout:
+            outcome = "timeout"
             logger.error("Ollama request timed out")
             return None
+        except OllamaUnavailable as e:
+            outcome = "refused"
+            logger.warning(f"Ollama request skipped: {e}")
+            return None
         except Exception as e:
             logger.error(f"Ollama request error: {e}")
             return None
+        finally:
+            OLLAMA_REQUEST_DURATION.labels(outcome).observe(time.perf_counter() - start)
 
     def _is_refusal(self, text: str) -> bool:
         phrases = [
@@ -252,6 +289,29 @@ class OllamaService:
         t = (text or "").lower()
         return any(p in t for p in phrases)
 
+    def _is_usable_summary(self, text: Optional[str]) -> bool:
+        return bool(text) and not self._is_refusal(text) and len(text) > 20
+
+    def _cache_lookup(
+        self, stage: str, template: str, prompt: str, options: dict
+    ) -> tuple[Optional[str], Optional[str]]:
+        """Cache key and cached response (None, None without a cache)."""
+        if self.cache is None:
+            return None, None
+        key = self.cache.make_key(
+            stage, self.model, PROMPT_VERSIONS[template], prompt, options
+        )
+        cached = self.cache.get(stage, key)
+        if cached is not None:
+            logger.info(f"LLM cache hit for {template} prompt")
+        return key, cached
+
+    def _cache_store(
+        self, stage: str, template: str, key: Optional[str], value: str
+    ) -> None:
+        if self.cache is not None and key is not None:
+            self.cache.set(stage, key, value, self.model, PROMPT_VERSIONS[template])
+
     # ---------- STEP 1: EXTRACT ----------
     def _extract_structured(
         self, feedback_comments: list[str], context: Optional[str]
@@ -282,15 +342,17 @@ class OllamaService:
         )
 
         prompt = f"{sys}\n\n{user}"
+        options = {
+            "temperature": 0.1,
+            "top_p": 0.9,
+            "num_predict": 220,
+        }
 
-        text = self._request_ollama(
-            prompt,
-            {
-                "temperature": 0.1,
-                "top_p": 0.9,
-                "num_predict": 220,
-            },
-        )
+        key, cached = self._cache_lookup("extract", "extract", prompt, options)
+        if cached is not None:
+            return json.loads(cached)
+
+        text = self._request_ollama(prompt, options)
         if not text or self._is_refusal(text):
             return None
 
@@ -314,6 +376,9 @@ class OllamaService:
                 for p in data["positives"]
                 if " ok" not in p.lower() and p.strip().lower() != "ok"
             ]
+            self._cache_store(
+                "extract", "extract", key, json.dumps(data, ensure_ascii=False)
+            )
             return data
         except Exception as e:
             logger.error(f"Failed to parse extract JSON: {e} :: {json_str[:200]}")
@@ -352,14 +417,19 @@ class OllamaService:
         )
 
         prompt = f"{sys}\nBelangrijk:\n{rules}\n\n{user}"
-        text = self._request_ollama(
-            prompt,
-            {
-                "temperature": 0.1,
-                "top_p": 0.9,
-                "num_predict": 200,
-            },
-        )
+        options = {
+            "temperature": 0.1,
+            "top_p": 0.9,
+            "num_predict": 200,
+        }
+
+        key, cached = self._cache_lookup("summary", "summarize", prompt, options)
+        if cached is not None:
+            return cached
+
+        text = self._request_ollama(prompt, options)
+        if self._is_usable_summary(text):
+            self._cache_store("summary", "summarize", key, text)
         return text
 
     # ---------- Single-pass (fallback-to-AI) ----------
@@ -391,14 +461,20 @@ class OllamaService:
         )
 
         prompt = f"{system_prompt}\n\n{user_message}"
-        return self._request_ollama(
-            prompt,
-            {
-                "temperature": 0.2,
-                "top_p": 0.9,
-                "num_predict": 220,
-            },
-        )
+        options = {
+            "temperature": 0.2,
+            "top_p": 0.9,
+            "num_predict": 220,
+        }
+
+        key, cached = self._cache_lookup("summary", "single_pass", prompt, options)
+        if cached is not None:
+            return cached
+
+        text = self._request_ollama(prompt, options)
+        if self._is_usable_summary(text):
+            self._cache_store("summary", "single_pass", key, text)
+        return text
 
     # ---------- Utils ----------
     @staticmethod
@@ -1,152 +1,373 @@
-"""Rate limiting service using Redis."""
+"""Rate limiting service using Redis.
+
+Redis is the shared source of truth for the limits. The limiter talks to it
+over its own connection with a short timeout, behind a circuit breaker: after
+``BREAKER_FAILURE_THRESHOLD`` consecutive Redis errors or timeouts the breaker
+opens and requests are limited by an in-process token-bucket table instead,
+without touching Redis, until a trial request after ``BREAKER_RESET_SECONDS``
+succeeds. During an outage every worker enforces the limits on its own, so
+they stay roughly enforced (up to one budget per worker) at no extra latency.
+"""
 
 from __future__ import annotations
 
 import logging
+import math
+import threading
 import time
-from typing import Optional
-from redis import Redis
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Dict, Optional
+
+from redis.asyncio import Redis
 from redis.exceptions import RedisError
-from app.infra.queue.connection import RedisConnection
+
+from app.core.config import settings
+from app.infra.metrics import RATE_LIMIT_DECISIONS, observe_redis
 
 logger = logging.getLogger(__name__)
 
+# Rate limiting runs on every request: never wait long for Redis
+RATE_LIMIT_REDIS_TIMEOUT_SECONDS = 0.1
+BREAKER_FAILURE_THRESHOLD = 5
+BREAKER_RESET_SECONDS = 30.0
+LOCAL_BUCKETS_MAX_ENTRIES = 10_000
+
+
+@dataclass(frozen=True)
+class RateLimitResult:
+    """Outcome of one rate-limited request."""
+
+    allowed: bool
+    limit: int
+    remaining: int
+    # Seconds until the current window ends
+    reset_seconds: int
+    # Seconds to wait before retrying; only set when blocked
+    retry_after: Optional[int] = None
+
+
+# Sliding window counter. KEYS[1] counts the current fixed window, KEYS[2] the
+# previous one; the previous count is weighted by how much of it still
+# overlaps the sliding window. Checks and increments atomically and returns
+# {allowed, remaining, reset_or_retry_after_seconds}.
+SLIDING_WINDOW_LUA = """
+local limit = tonumber(ARGV[1])
+local window = tonumber(ARGV[2])
+local elapsed = tonumber(ARGV[3])
+local current = tonumber(redis.call('GET', KEYS[1]) or '0')
+local previous = tonumber(redis.call('GET', KEYS[2]) or '0')
+local estimated = previous * (window - elapsed) / window + current
+
+if estimated + 1 > limit then
+    local retry = window - elapsed
+    if current + 1 <= limit and previous > 0 then
+        retry = retry - (limit - 1 - current) * window / previous
+    end
+    return {0, 0, math.max(1, math.ceil(retry))}
+end
+
+redis.call('INCR', KEYS[1])
+redis.call('EXPIRE', KEYS[1], window * 2)
+return {1, math.floor(limit - estimated - 1), math.max(1, math.ceil(window - elapsed))}
+"""
+
+
+class CircuitBreaker:
+    """
+    Consecutive-failure circuit breaker.
+
+    closed: calls go through. open: calls are skipped until ``reset_seconds``
+    have passed, then one trial call is let through (half-open); its success
+    closes the breaker, its failure opens it again.
+    """
+
+    def __init__(
+        self,
+        failure_threshold: int = BREAKER_FAILURE_THRESHOLD,
+        reset_seconds: float = BREAKER_RESET_SECONDS,
+        name: str = "Rate limiter: Redis",
+    ):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self.state = "closed"
+        self.failures = 0
+        self.trips = 0
+        self.opened_at = 0.0
+        self.last_error: Optional[str] = None
+        self._lock = threading.Lock()
+
+    def allow(self) -> bool:
+        """Whether the next call may go through."""
+        with self._lock:
+            if self.state == "closed":
+                return True
+            if (
+                self.state == "open"
+                and time.monotonic() - self.opened_at >= self.reset_seconds
+            ):
+                self.state = "half_open"
+                return True
+            return False
+
+    def is_open(self) -> bool:
+        """Whether calls are refused right now (no state change)."""
+        with self._lock:
+            return (
+                self.state == "open"
+                and time.monotonic() - self.opened_at < self.reset_seconds
+            )
+
+    def record_success(self) -> None:
+        with self._lock:
+            if self.state != "closed":
+                logger.info(f"{self.name} reachable again, breaker closed")
+            self.state = "closed"
+            self.failures = 0
+
+    def record_failure(self, error: Exception) -> None:
+        with self._lock:
+            self.failures += 1
+            self.last_error = str(error)
+            if self.state == "half_open" or (
+                self.state == "closed" and self.failures >= self.failure_threshold
+            ):
+                if self.state == "closed":
+                    self.trips += 1
+                    logger.warning(
+                        f"{self.name}: {self.failures} failures ({error}), "
+                        f"breaker open for {self.reset_seconds:.0f}s"
+                    )
+                self.state = "open"
+                self.opened_at = time.monotonic()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "state": self.state,
+                "consecutive_failures": self.failures,
+                "trips": self.trips,
+                "last_error": self.last_error,
+            }
+
+
+@dataclass
+class _Bucket:
+    tokens: float
+    updated_at: float
+
+
+class LocalTokenBuckets:
+    """
+    In-process token buckets, used while Redis is unavailable.
+
+    A bucket holds up to ``max_requests`` tokens and refills at
+    ``max_requests / window_seconds`` per second. The table keeps at most
+    ``max_entries`` keys and evicts the least recently used one.
+    """
+
+    def __init__(self, max_entries: int = LOCAL_BUCKETS_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._buckets: "OrderedDict[str, _Bucket]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def take(self, key: str, max_requests: int, window_seconds: int) -> RateLimitResult:
+        now = time.monotonic()
+        rate = max_requests / window_seconds
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                bucket = _Bucket(tokens=float(max_requests), updated_at=now)
+                self._buckets[key] = bucket
+                if len(self._buckets) > self.max_entries:
+                    self._buckets.popitem(last=False)
+            else:
+                self._buckets.move_to_end(key)
+                bucket.tokens = min(
+                    float(max_requests),
+                    bucket.tokens + (now - bucket.updated_at) * rate,
+                )
+                bucket.updated_at = now
+
+            if bucket.tokens >= 1:
+                bucket.tokens -= 1
+                return RateLimitResult(
+                    allowed=True,
+                    limit=max_requests,
+                    remaining=int(bucket.tokens),
+                    reset_seconds=math.ceil((max_requests - bucket.tokens) / rate),
+                )
+            retry_after = max(1, math.ceil((1 - bucket.tokens) / rate))
+            return RateLimitResult(
+                allowed=False,
+                limit=max_requests,
+                remaining=0,
+                reset_seconds=retry_after,
+                retry_after=retry_after,
+            )
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._buckets)
+
 
 class RateLimiter:
-    """Rate limiter using Redis with sliding window algorithm."""
+    """
+    Rate limiter using Redis with a sliding window counter.
+
+    Every request costs one round trip: a Lua script (EVALSHA) that reads the
+    two window counters, decides and increments atomically. Keys expire after
+    two windows, so there are at most two counters per limited key. While the
+    circuit breaker is open, ``LocalTokenBuckets`` decides instead.
+    """
 
-    def __init__(self, redis_conn: Optional[Redis] = None):
+    def __init__(
+        self,
+        redis_conn: Optional[Redis] = None,
+        breaker: Optional[CircuitBreaker] = None,
+        local_buckets: Optional[LocalTokenBuckets] = None,
+    ):
         """
         Initialize rate limiter.
 
         Args:
-            redis_conn: Redis connection (defaults to shared connection)
+            redis_conn: Async Redis connection (defaults to a short-timeout
+                connection to REDIS_URL, created on first use)
+            breaker: Circuit breaker for Redis (optional)
+            local_buckets: In-process fallback limiter (optional)
         """
-        self.redis = redis_conn or RedisConnection.get_connection()
+        self._redis = redis_conn
+        self._script = None
+        self.breaker = breaker or CircuitBreaker()
+        self.local_buckets = local_buckets or LocalTokenBuckets()
+        self.fallback_requests = 0
+
+    @property
+    def redis(self) -> Redis:
+        if self._redis is None:
+            # Not the shared queue connection: its 600s socket timeout is
+            # meant for RQ jobs, a hung Redis must not stall requests
+            self._redis = Redis.from_url(
+                settings.REDIS_URL,
+                socket_connect_timeout=RATE_LIMIT_REDIS_TIMEOUT_SECONDS,
+                socket_timeout=RATE_LIMIT_REDIS_TIMEOUT_SECONDS,
+            )
+        return self._redis
+
+    @staticmethod
+    def _window_keys(key: str, window_seconds: int, now: float) -> tuple:
+        index = int(now // window_seconds)
+        return (
+            f"rate_limit:{key}:{index}",
+            f"rate_limit:{key}:{index - 1}",
+            now - index * window_seconds,
+        )
 
-    def is_allowed(
+    async def hit(
         self,
         key: str,
         max_requests: int,
         window_seconds: int,
-    ) -> tuple[bool, Optional[int]]:
+    ) -> RateLimitResult:
         """
-        Check if request is allowed under rate limit.
-
-        Uses sliding window algorithm for accurate rate limiting:
-        - Stores timestamps in Redis sorted set (score = timestamp)
-        - Removes entries outside the time window
-        - Counts remaining entries in window
-        - Compares count against max_requests
+        Count a request against ``key`` and tell whether it is allowed.
 
         Args:
-            key: Unique identifier for rate limit (e.g., "user:123:api_call")
+            key: Unique identifier for rate limit (e.g., "user:123:/api/v1/x/{id}")
             max_requests: Maximum number of requests allowed in window
             window_seconds: Time window in seconds
 
         Returns:
-            Tuple of (is_allowed, retry_after_seconds)
-            - is_allowed: True if request should be allowed, False if rate limit exceeded
-            - retry_after_seconds: None if allowed, positive integer (seconds to wait) if blocked
+            RateLimitResult with the remaining budget and reset / retry time.
+            Decided by the in-process token buckets when Redis is unavailable.
         """
-        now = time.time()
-        window_start = now - window_seconds
-
-        # Use Redis sorted set with timestamps as scores
-        rate_key = f"rate_limit:{key}"
-
-        pipe = self.redis.pipeline()
-
-        # Remove old entries outside the window
-        pipe.zremrangebyscore(rate_key, 0, window_start)
+        if not self.breaker.allow():
+            return self._local_hit(key, max_requests, window_seconds)
 
-        # Count current requests in window
-        pipe.zcard(rate_key)
+        current_key, previous_key, elapsed = self._window_keys(
+            key, window_seconds, time.time()
+        )
+        try:
+            if self._script is None:
+                self._script = self.redis.register_script(SLIDING_WINDOW_LUA)
+            with observe_redis("rate_limiter", "evalsha"):
+                allowed, remaining, seconds = await self._script(
+                    keys=[current_key, previous_key],
+                    args=[max_requests, window_seconds, elapsed],
+                )
+        except (RedisError, OSError) as exc:
+            # Logged by the breaker when it opens, not once per request
+            self.breaker.record_failure(exc)
+            return self._local_hit(key, max_requests, window_seconds)
+        self.breaker.record_success()
 
-        # Add current request
-        pipe.zadd(rate_key, {str(now): now})
+        if allowed:
+            return RateLimitResult(
+                allowed=True,
+                limit=max_requests,
+                remaining=max(0, int(remaining)),
+                reset_seconds=int(seconds),
+            )
+        return RateLimitResult(
+            allowed=False,
+            limit=max_requests,
+            remaining=0,
+            reset_seconds=math.ceil(window_seconds - elapsed),
+            retry_after=int(seconds),
+        )
 
-        # Set expiration to cleanup old keys
-        pipe.expire(rate_key, window_seconds + 60)
+    def _local_hit(
+        self, key: str, max_requests: int, window_seconds: int
+    ) -> RateLimitResult:
+        self.fallback_requests += 1
+        RATE_LIMIT_DECISIONS.labels("fallback").inc()
+        return self.local_buckets.take(key, max_requests, window_seconds)
 
-        try:
-            results = pipe.execute()
-            current_count = results[1]
-        except RedisError as exc:
-            logger.warning(
-                f"Redis unavailable during rate-limit check for key '{key}': {exc}. "
-                "Failing open (allowing request)."
-            )
-            return True, None
-
-        if current_count < max_requests:
-            # Request allowed
-            return True, None
-        else:
-            # Request blocked - calculate retry time
-            # Get oldest request in window
-            try:
-                oldest_requests = self.redis.zrange(rate_key, 0, 0, withscores=True)
-            except RedisError:
-                return False, window_seconds
-            if oldest_requests:
-                oldest_time = oldest_requests[0][1]
-                retry_after = int(oldest_time + window_seconds - now) + 1
-                return False, max(1, retry_after)  # Ensure at least 1 second
-            else:
-                return False, window_seconds
+    def stats(self) -> Dict[str, Any]:
+        """Circuit breaker state and fallback usage of this process."""
+        return {
+            "breaker": self.breaker.stats(),
+            "fallback_requests": self.fallback_requests,
+            "local_buckets": len(self.local_buckets),
+            "local_buckets_max": self.local_buckets.max_entries,
+        }
 
-    def reset(self, key: str):
+    async def reset(self, key: str, window_seconds: int):
         """
         Reset rate limit for a key.
 
         Args:
             key: Rate limit key to reset
+            window_seconds: Time window the key is limited with
         """
-        rate_key = f"rate_limit:{key}"
-        self.redis.delete(rate_key)
+        current_key, previous_key, _ = self._window_keys(
+            key, window_seconds, time.time()
+        )
+        await self.redis.delete(current_key, previous_key)
         logger.info(f"Rate limit reset for key: {key}")
 
-    def get_usage(self, key: str, window_seconds: int) -> dict:
-        """
-        Get current rate limit usage.
 
-        Args:
-            key: Rate limit key
-            window_seconds: Time window in seconds
+_default_limiter: Optional[RateLimiter] = None
 
-        Returns:
-            Dictionary with usage information
-        """
-        now = time.time()
-        window_start = now - window_seconds
-        rate_key = f"rate_limit:{key}"
 
-        try:
-            # Count requests in current window
-            count = self.redis.zcount(rate_key, window_start, now)
-
-            # Get oldest and newest timestamps
-            oldest_requests = self.redis.zrange(rate_key, 0, 0, withscores=True)
-            newest_requests = self.redis.zrange(rate_key, -1, -1, withscores=True)
-        except RedisError as exc:
-            logger.warning(
-                f"Redis unavailable during get_usage for key '{key}': {exc}. "
-                "Returning zero usage."
-            )
-            return {
-                "current_count": 0,
-                "window_seconds": window_seconds,
-                "oldest_request": None,
-                "newest_request": None,
-            }
+def get_rate_limiter() -> RateLimiter:
+    """The process-wide limiter used by RateLimitMiddleware."""
+    global _default_limiter
+    if _default_limiter is None:
+        _default_limiter = RateLimiter()
+    return _default_limiter
 
-        oldest_time = oldest_requests[0][1] if oldest_requests else None
-        newest_time = newest_requests[0][1] if newest_requests else None
 
-        return {
-            "current_count": count,
-            "window_seconds": window_seconds,
-            "oldest_request": oldest_time,
-            "newest_request": newest_time,
-        }
+def reset_rate_limiter() -> None:
+    """
+    Start the process-wide limiter over with empty local buckets.
+
+    Reset in place: RateLimitMiddleware keeps the instance it was built with.
+    """
+    if _default_limiter is None:
+        return
+    _default_limiter.local_buckets = LocalTokenBuckets(
+        _default_limiter.local_buckets.max_entries
+    )
+    _default_limiter.fallback_requests = 0
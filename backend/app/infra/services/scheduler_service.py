@@ -237,6 +237,25 @@ class SchedulerService:
 
         return generate_ai_summary_task
 
+    def run_maintenance(self) -> dict[str, int]:
+        """
+        Run built-in system maintenance that is not tied to a ScheduledJob.
+
+        Should be called on every scheduler tick. Closes attendance sessions
+        whose check-out was forgotten, which used to happen on every RFID scan,
+        and rolls up the attendance statistics of days that have ended.
+
+        Returns:
+            Number of affected records per maintenance task
+        """
+        from app.services.attendance_rollups import rollup_closed_days
+        from app.services.attendance_sessions import cleanup_expired_sessions
+
+        return {
+            "expired_attendance_sessions": cleanup_expired_sessions(self.db),
+            "attendance_rollup_days": rollup_closed_days(self.db),
+        }
+
     def run_scheduler_tick(self) -> int:
         """
         Run one scheduler tick - execute all due jobs.
@@ -1,10 +1,15 @@
-from fastapi import FastAPI
+import hmac
+
+from fastapi import FastAPI, HTTPException, Request, Response, status
 from fastapi.middleware.cors import CORSMiddleware
 from app.core.config import settings
 from fastapi import APIRouter
 from app.api.middleware.security_headers import SecurityHeadersMiddleware
 from app.api.middleware.rate_limit import RateLimitMiddleware
 from app.api.middleware.sliding_session import SlidingSessionMiddleware
+from app.api.middleware.query_stats import QueryStatsMiddleware
+from app.api.middleware.metrics import MetricsMiddleware
+from app.infra.metrics import render_metrics
 import logging
 
 from app.api.v1.routers import rubric_import as rubric_import_router
@@ -94,15 +99,38 @@ app.add_middleware(
         "X-RateLimit-Limit",
         "X-RateLimit-Remaining",
         "X-RateLimit-Reset",
+        "X-DB-Query-Count",
+        "X-DB-Query-Time-Ms",
     ],
 )
 
+# SQL statement counting per request (outside the other middleware, so their
+# queries are counted too)
+app.add_middleware(QueryStatsMiddleware)
+
+# Request latency and in-flight requests (outermost)
+app.add_middleware(MetricsMiddleware)
+
 
 @app.get("/health")
 def health():
     return {"status": "ok"}
 
 
+@app.get("/metrics", include_in_schema=False)
+def metrics(request: Request):
+    """
+    Prometheus metrics of all API workers. Internal only: nginx does not proxy
+    it; with METRICS_TOKEN set, scrapers must also send it as a Bearer token.
+    """
+    if settings.METRICS_TOKEN:
+        supplied = request.headers.get("authorization", "").removeprefix("Bearer ")
+        if not hmac.compare_digest(supplied, settings.METRICS_TOKEN):
+            raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED)
+    body, content_type = render_metrics()
+    return Response(content=body, media_type=content_type)
+
+
 # Mount v1
 api_v1 = APIRouter(prefix=settings.API_V1_PREFIX)
 api_v1.include_router(rubric_import_router.router)  # VOOR rubrics_router!
@@ -0,0 +1,211 @@
+"""
+Materialized attendance totals per user.
+
+``AttendanceAggregate`` holds the all-time school, approved external and
+pending external seconds of every user. The rows are kept up to date by
+calling ``sync_attendance_aggregates`` after every change to a user's
+attendance events (approval, rejection, edit, delete, automatic cleanup). Only
+the affected users are recomputed, each from their own events. RFID check-outs
+use ``add_school_seconds``, a single UPDATE in the check-out's own transaction.
+
+The aggregate is a cache: a failed refresh never breaks the request that
+triggered it, and ``rebuild_attendance_aggregates`` (see
+``scripts/rebuild_attendance_aggregates.py``) repairs any drift.
+"""
+
+from __future__ import annotations
+
+import logging
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional
+
+from sqlalchemy import Numeric, cast, func, select, union
+from sqlalchemy.orm import Session
+
+from app.api.v1.schemas.attendance import ensure_aware_utc
+from app.infra.db.models import AttendanceAggregate, AttendanceEvent
+
+logger = logging.getLogger(__name__)
+
+LESSON_BLOCK_SECONDS = 75 * 60
+"""One lesson block is 75 minutes."""
+
+
+def lesson_blocks_for(total_seconds: int) -> float:
+    """Lesson blocks (1 decimal) for a number of counted seconds."""
+    return round(total_seconds / LESSON_BLOCK_SECONDS, 1)
+
+
+def _compute_totals(db: Session, user_ids: List[int]) -> Dict[int, Dict[str, int]]:
+    """School / approved / pending seconds per user from the closed events."""
+    sums: Dict[int, Dict[str, float]] = {
+        uid: {"school": 0.0, "approved": 0.0, "pending": 0.0} for uid in user_ids
+    }
+    rows = (
+        db.query(
+            AttendanceEvent.user_id,
+            AttendanceEvent.is_external,
+            AttendanceEvent.approval_status,
+            AttendanceEvent.check_in,
+            AttendanceEvent.check_out,
+        )
+        .filter(
+            AttendanceEvent.user_id.in_(user_ids),
+            AttendanceEvent.check_out.isnot(None),
+        )
+        .all()
+    )
+    for user_id, is_external, approval_status, check_in, check_out in rows:
+        if is_external:
+            if approval_status == "approved":
+                kind = "approved"
+            elif approval_status == "pending":
+                kind = "pending"
+            else:
+                continue
+        else:
+            kind = "school"
+        duration = ensure_aware_utc(check_out) - ensure_aware_utc(check_in)
+        sums[user_id][kind] += duration.total_seconds()
+
+    return {
+        uid: {kind: int(seconds) for kind, seconds in totals.items()}
+        for uid, totals in sums.items()
+    }
+
+
+def refresh_attendance_aggregates(db: Session, user_ids: Iterable[int]) -> int:
+    """
+    Recompute the aggregate rows of the given users (without committing).
+
+    Returns:
+        Number of users refreshed
+    """
+    ids = sorted({uid for uid in user_ids if uid is not None})
+    if not ids:
+        return 0
+
+    totals = _compute_totals(db, ids)
+    existing = {
+        agg.user_id: agg
+        for agg in db.query(AttendanceAggregate)
+        .filter(AttendanceAggregate.user_id.in_(ids))
+        .all()
+    }
+
+    now = datetime.utcnow()
+    for uid in ids:
+        t = totals[uid]
+        agg = existing.get(uid)
+        if agg is None:
+            agg = AttendanceAggregate(user_id=uid)
+            db.add(agg)
+        agg.total_school_seconds = t["school"]
+        agg.total_external_approved_seconds = t["approved"]
+        agg.total_external_pending_seconds = t["pending"]
+        agg.lesson_blocks = lesson_blocks_for(t["school"] + t["approved"])
+        agg.last_recomputed_at = now
+    return len(ids)
+
+
+def add_school_seconds(db: Session, user_id: int, seconds: int) -> None:
+    """
+    Add a closed school session to a user's aggregate (without committing).
+
+    This is a single UPDATE, so a check-out can be written together with its
+    aggregate in one transaction. Users without an aggregate row yet are
+    recomputed from their events instead.
+    """
+    counted = (
+        AttendanceAggregate.total_school_seconds
+        + seconds
+        + AttendanceAggregate.total_external_approved_seconds
+    )
+    updated = (
+        db.query(AttendanceAggregate)
+        .filter(AttendanceAggregate.user_id == user_id)
+        .update(
+            {
+                AttendanceAggregate.total_school_seconds: (
+                    AttendanceAggregate.total_school_seconds + seconds
+                ),
+                AttendanceAggregate.lesson_blocks: func.round(
+                    cast(counted, Numeric(14, 2)) / LESSON_BLOCK_SECONDS, 1
+                ),
+                AttendanceAggregate.last_recomputed_at: datetime.utcnow(),
+            },
+            synchronize_session=False,
+        )
+    )
+    if not updated:
+        refresh_attendance_aggregates(db, [user_id])
+
+
+def sync_attendance_aggregates(db: Session, user_ids: Iterable[int]) -> None:
+    """
+    Refresh and commit the aggregates of the given users.
+
+    Call this after the attendance change itself has been committed. Errors are
+    logged and rolled back; the next change or a rebuild repairs the row.
+    """
+    try:
+        if refresh_attendance_aggregates(db, user_ids):
+            db.commit()
+    except Exception as e:
+        db.rollback()
+        logger.warning(f"Failed to refresh attendance aggregates: {e!r}")
+
+
+def rebuild_attendance_aggregates(db: Session, batch_size: int = 500) -> int:
+    """
+    Recompute the aggregates of every user with events or an aggregate row.
+
+    Commits per batch. Rows of users that no longer have events are reset to
+    zero by the same recomputation.
+
+    Returns:
+        Number of users rebuilt
+    """
+    user_ids = [
+        uid
+        for (uid,) in db.execute(
+            union(
+                select(AttendanceEvent.user_id),
+                select(AttendanceAggregate.user_id),
+            )
+        ).all()
+    ]
+    user_ids.sort()
+
+    for start in range(0, len(user_ids), batch_size):
+        refresh_attendance_aggregates(db, user_ids[start : start + batch_size])
+        db.commit()
+
+    logger.info(f"Rebuilt attendance aggregates for {len(user_ids)} user(s)")
+    return len(user_ids)
+
+
+def get_attendance_aggregate(
+    db: Session, user_id: int
+) -> Optional[AttendanceAggregate]:
+    """The aggregate row of a user, created on first access."""
+    agg = (
+        db.query(AttendanceAggregate)
+        .filter(AttendanceAggregate.user_id == user_id)
+        .first()
+    )
+    if agg is None:
+        sync_attendance_aggregates(db, [user_id])
+        agg = (
+            db.query(AttendanceAggregate)
+            .filter(AttendanceAggregate.user_id == user_id)
+            .first()
+        )
+    return agg
+
+
+def counted_seconds_expr():
+    """SQL expression for school + approved external seconds of an aggregate."""
+    return func.coalesce(AttendanceAggregate.total_school_seconds, 0) + func.coalesce(
+        AttendanceAggregate.total_external_approved_seconds, 0
+    )
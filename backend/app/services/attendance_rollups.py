@@ -0,0 +1,772 @@
+"""
+Daily attendance rollups for the teacher statistics.
+
+``AttendanceDailyRollup`` holds, per user, (UTC) day and project, the closed
+school seconds, approved external seconds, pending external registrations and
+the hours of the school check-ins of that day. The ``/attendance/stats/*``
+endpoints read these rows instead of rescanning ``attendance_events``.
+
+Days are rolled up once they are over: ``rollup_closed_days`` (run by the
+scheduler, see ``SchedulerService.run_maintenance``) writes the rows of every
+day up to yesterday and moves the watermark in ``AttendanceRollupState``.
+Rolled-up days are not recomputed after that, except for the user-days whose
+events are changed afterwards (a late check-out, an approval, an edit), which
+``sync_attendance_rollups`` refreshes. Days after the watermark, normally only
+today, are computed from ``attendance_events`` on every read.
+``attendance_signals`` combines both in a single analytic query.
+
+``scripts/rebuild_attendance_rollups.py`` recomputes all rows from scratch.
+"""
+
+from __future__ import annotations
+
+import logging
+from collections import defaultdict
+from dataclasses import dataclass
+from datetime import date, datetime, time, timedelta, timezone
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+from sqlalchemy import (
+    Integer,
+    and_,
+    case,
+    cast,
+    distinct,
+    func,
+    literal,
+    null,
+    select,
+    union_all,
+)
+from sqlalchemy.orm import Session
+
+from app.api.v1.schemas.attendance import ensure_aware_utc
+from app.infra.db.models import (
+    AttendanceDailyRollup,
+    AttendanceEvent,
+    AttendanceRollupState,
+    Course,
+    CourseEnrollment,
+    User,
+)
+
+logger = logging.getLogger(__name__)
+
+ROLLUP_WINDOW_DAYS = 31
+"""Days rolled up per transaction when catching up on closed days."""
+
+ROLLUP_LOCK_CLASS = 9009
+"""First key of the advisory locks on rollup rows; the second is the user id."""
+
+
+@dataclass
+class DayTotals:
+    school_seconds: int = 0
+    extern_seconds: int = 0
+    present_students: int = 0
+
+
+@dataclass
+class UserTotals:
+    school_seconds: int = 0
+    extern_seconds: int = 0
+    pending_count: int = 0
+
+
+def _today() -> date:
+    return datetime.now(timezone.utc).date()
+
+
+def _day_start(day: date) -> datetime:
+    return datetime.combine(day, time.min, tzinfo=timezone.utc)
+
+
+def get_rolled_up_through(db: Session) -> Optional[date]:
+    """Last day that has its rollup rows, or None before the first rollup."""
+    row = (
+        db.query(AttendanceRollupState.rolled_up_through)
+        .order_by(AttendanceRollupState.id)
+        .first()
+    )
+    return row[0] if row else None
+
+
+# ============ Computing rollups ============
+
+
+def _event_rows(
+    db: Session,
+    start_day: Optional[date] = None,
+    end_day: Optional[date] = None,
+    user_ids: Optional[Iterable[int]] = None,
+    school_id: Optional[int] = None,
+    course_id: Optional[int] = None,
+    project_id: Optional[int] = None,
+) -> List[Tuple[Any, ...]]:
+    """Events checked in on start_day..end_day (inclusive), with the user's school."""
+    query = db.query(
+        AttendanceEvent.user_id,
+        User.school_id,
+        AttendanceEvent.project_id,
+        AttendanceEvent.is_external,
+        AttendanceEvent.approval_status,
+        AttendanceEvent.check_in,
+        AttendanceEvent.check_out,
+    ).filter(User.id == AttendanceEvent.user_id)
+    if start_day is not None:
+        query = query.filter(AttendanceEvent.check_in >= _day_start(start_day))
+    if end_day is not None:
+        query = query.filter(
+            AttendanceEvent.check_in < _day_start(end_day + timedelta(days=1))
+        )
+    if user_ids is not None:
+        query = query.filter(AttendanceEvent.user_id.in_(list(user_ids)))
+    if school_id is not None:
+        query = query.filter(User.school_id == school_id)
+    if course_id:
+        query = query.filter(
+            AttendanceEvent.user_id.in_(_course_students(db, course_id))
+        )
+    if project_id:
+        query = query.filter(AttendanceEvent.project_id == project_id)
+    return query.all()
+
+
+def _summarize(rows) -> Dict[Tuple[int, date, Optional[int]], Dict[str, int]]:
+    """Rollup values per (user, day, project) for the given event rows."""
+    rollups: Dict[Tuple[int, date, Optional[int]], Dict[str, int]] = {}
+    for (
+        user_id,
+        school_id,
+        project_id,
+        is_external,
+        status,
+        check_in,
+        check_out,
+    ) in rows:
+        check_in = ensure_aware_utc(check_in)
+        key = (user_id, check_in.date(), project_id)
+        values = rollups.get(key)
+        if values is None:
+            values = rollups[key] = {
+                "school_id": school_id,
+                "school_seconds": 0,
+                "extern_approved_seconds": 0,
+                "pending_count": 0,
+                "school_check_ins": 0,
+                "check_in_hours": 0,
+            }
+        seconds = 0
+        if check_out is not None:
+            seconds = int((ensure_aware_utc(check_out) - check_in).total_seconds())
+
+        if not is_external:
+            values["school_seconds"] += seconds
+            values["school_check_ins"] += 1
+            values["check_in_hours"] |= 1 << check_in.hour
+        elif status == "approved":
+            values["extern_approved_seconds"] += seconds
+        elif status == "pending":
+            values["pending_count"] += 1
+    return rollups
+
+
+def _lock_rollups(db: Session, user_ids: Optional[List[int]]) -> None:
+    """
+    Serialize rewrites of the same rollup rows until the transaction ends.
+
+    On Postgres, takes a transaction advisory lock per user (in id order, so
+    two refreshes cannot deadlock), or a single one for a rewrite of all
+    users (a catch-up only writes days after the watermark, refreshes only
+    days up to it). Two requests refreshing the same user-day then no longer
+    both delete and both insert its rows.
+    """
+    if db.get_bind().dialect.name != "postgresql":
+        return
+    for key in sorted(set(user_ids)) if user_ids is not None else [0]:
+        db.execute(select(func.pg_advisory_xact_lock(ROLLUP_LOCK_CLASS, key)))
+
+
+def _replace_rollups(
+    db: Session,
+    start_day: date,
+    end_day: date,
+    user_ids: Optional[Iterable[int]] = None,
+) -> int:
+    """Rewrite the rollup rows of start_day..end_day (optionally of some users)."""
+    if user_ids is not None:
+        user_ids = list(user_ids)
+    _lock_rollups(db, user_ids)
+
+    delete = db.query(AttendanceDailyRollup).filter(
+        AttendanceDailyRollup.day >= start_day, AttendanceDailyRollup.day <= end_day
+    )
+    if user_ids is not None:
+        delete = delete.filter(AttendanceDailyRollup.user_id.in_(user_ids))
+    delete.delete(synchronize_session=False)
+
+    rollups = _summarize(_event_rows(db, start_day, end_day, user_ids=user_ids))
+    db.add_all(
+        AttendanceDailyRollup(user_id=user_id, day=day, project_id=project_id, **values)
+        for (user_id, day, project_id), values in rollups.items()
+    )
+    db.flush()
+    return len(rollups)
+
+
+def refresh_attendance_rollups(
+    db: Session, keys: Iterable[Tuple[int, Optional[datetime]]]
+) -> int:
+    """
+    Recompute the rolled-up days touched by changed events (without committing).
+
+    Args:
+        db: SQLAlchemy database session.
+        keys: (user_id, check_in) of every changed event; for an edit that
+            moves an event, pass both the old and the new check_in.
+
+    Returns:
+        Number of user-days recomputed. Days that are not rolled up yet
+        (always including today) are skipped without querying.
+    """
+    today = _today()
+    pairs = {
+        (user_id, ensure_aware_utc(check_in).date())
+        for user_id, check_in in keys
+        if user_id is not None and check_in is not None
+    }
+    pairs = {(user_id, day) for user_id, day in pairs if day < today}
+    if not pairs:
+        return 0
+
+    rolled_up_through = get_rolled_up_through(db)
+    if rolled_up_through is None:
+        return 0
+
+    users_per_day: Dict[date, Set[int]] = defaultdict(set)
+    for user_id, day in pairs:
+        if day <= rolled_up_through:
+            users_per_day[day].add(user_id)
+    for day, user_ids in sorted(users_per_day.items()):
+        _replace_rollups(db, day, day, user_ids=sorted(user_ids))
+    return sum(len(user_ids) for user_ids in users_per_day.values())
+
+
+def sync_attendance_rollups(
+    db: Session, keys: Iterable[Tuple[int, Optional[datetime]]]
+) -> None:
+    """
+    Refresh and commit the rollups touched by changed events.
+
+    Call this after the attendance change itself has been committed. Errors are
+    logged and rolled back; a rebuild repairs the rows.
+    """
+    try:
+        if refresh_attendance_rollups(db, keys):
+            db.commit()
+    except Exception as e:
+        db.rollback()
+        logger.warning(f"Failed to refresh attendance rollups: {e!r}")
+
+
+def rollup_closed_days(db: Session, window_days: int = ROLLUP_WINDOW_DAYS) -> int:
+    """
+    Roll up every day after the watermark up to and including yesterday.
+
+    Commits per window of ``window_days`` days, so an interrupted catch-up
+    resumes where it stopped. Before the first rollup it starts at the first
+    recorded check-in.
+
+    Returns:
+        Number of days rolled up
+    """
+    target = _today() - timedelta(days=1)
+    state = db.query(AttendanceRollupState).order_by(AttendanceRollupState.id).first()
+    if state is None:
+        state = AttendanceRollupState()
+        db.add(state)
+
+    if state.rolled_up_through is not None:
+        start = state.rolled_up_through + timedelta(days=1)
+    else:
+        first_check_in = db.query(func.min(AttendanceEvent.check_in)).scalar()
+        start = ensure_aware_utc(first_check_in).date() if first_check_in else None
+        if start is None or start > target:
+            state.rolled_up_through = target
+            db.commit()
+            return 0
+
+    days = 0
+    while start <= target:
+        end = min(start + timedelta(days=window_days - 1), target)
+        _replace_rollups(db, start, end)
+        state.rolled_up_through = end
+        db.commit()
+        days += (end - start).days + 1
+        start = end + timedelta(days=1)
+
+    if days:
+        logger.info(
+            f"Rolled up attendance through {target.isoformat()} ({days} day(s))"
+        )
+    return days
+
+
+def rebuild_attendance_rollups(
+    db: Session, window_days: int = ROLLUP_WINDOW_DAYS
+) -> int:
+    """
+    Drop all rollup rows and the watermark and roll up every closed day again.
+
+    Returns:
+        Number of days rolled up
+    """
+    db.query(AttendanceDailyRollup).delete(synchronize_session=False)
+    db.query(AttendanceRollupState).update(
+        {AttendanceRollupState.rolled_up_through: None}, synchronize_session=False
+    )
+    db.commit()
+    return rollup_closed_days(db, window_days=window_days)
+
+
+# ============ Reading rollups ============
+
+
+def _course_students(db: Session, course_id: int):
+    return (
+        db.query(CourseEnrollment.student_id)
+        .filter(CourseEnrollment.course_id == course_id)
+        .scalar_subquery()
+    )
+
+
+def _split_period(
+    db: Session, start_day: Optional[date], end_day: Optional[date]
+) -> Tuple[Optional[Tuple[Optional[date], date]], Optional[Tuple[date, date]]]:
+    """
+    Split start_day..end_day into the rolled-up part (read from the rollups)
+    and the rest (computed from the events). None means no such part.
+    """
+    rolled_up_through = get_rolled_up_through(db)
+    end = end_day if end_day is not None else _today()
+
+    stored = None
+    live_start = start_day
+    if rolled_up_through is not None and (
+        start_day is None or start_day <= rolled_up_through
+    ):
+        stored = (start_day, min(end, rolled_up_through))
+        live_start = rolled_up_through + timedelta(days=1)
+
+    live = None
+    if live_start is None or live_start <= end:
+        live = (live_start, end)
+    return stored, live
+
+
+def _rollup_query(db: Session, columns, period, school_id, course_id, project_id):
+    start_day, end_day = period
+    query = db.query(*columns).filter(
+        AttendanceDailyRollup.school_id == school_id,
+        AttendanceDailyRollup.day <= end_day,
+    )
+    if start_day is not None:
+        query = query.filter(AttendanceDailyRollup.day >= start_day)
+    if course_id:
+        query = query.filter(
+            AttendanceDailyRollup.user_id.in_(_course_students(db, course_id))
+        )
+    if project_id:
+        query = query.filter(AttendanceDailyRollup.project_id == project_id)
+    return query
+
+
+def _live_rollups(db: Session, period, school_id, course_id, project_id):
+    start_day, end_day = period
+    return _summarize(
+        _event_rows(
+            db,
+            start_day,
+            end_day,
+            school_id=school_id,
+            course_id=course_id,
+            project_id=project_id,
+        )
+    )
+
+
+def daily_totals(
+    db: Session,
+    school_id: int,
+    start_day: Optional[date] = None,
+    end_day: Optional[date] = None,
+    course_id: Optional[int] = None,
+    project_id: Optional[int] = None,
+) -> Dict[date, DayTotals]:
+    """
+    School seconds, approved external seconds and the number of students with
+    a school check-in, per day with any attendance.
+    """
+    stored, live = _split_period(db, start_day, end_day)
+    totals: Dict[date, DayTotals] = {}
+
+    if stored is not None:
+        rows = (
+            _rollup_query(
+                db,
+                (
+                    AttendanceDailyRollup.day,
+                    func.sum(AttendanceDailyRollup.school_seconds),
+                    func.sum(AttendanceDailyRollup.extern_approved_seconds),
+                    func.count(
+                        distinct(
+                            case(
+                                (
+                                    AttendanceDailyRollup.school_check_ins > 0,
+                                    AttendanceDailyRollup.user_id,
+                                )
+                            )
+                        )
+                    ),
+                ),
+                stored,
+                school_id,
+                course_id,
+                project_id,
+            )
+            .group_by(AttendanceDailyRollup.day)
+            .all()
+        )
+        for day, school, extern, present in rows:
+            totals[day] = DayTotals(int(school or 0), int(extern or 0), int(present))
+
+    if live is not None:
+        present: Dict[date, Set[int]] = defaultdict(set)
+        for (user_id, day, _), values in _live_rollups(
+            db, live, school_id, course_id, project_id
+        ).items():
+            day_totals = totals.setdefault(day, DayTotals())
+            day_totals.school_seconds += values["school_seconds"]
+            day_totals.extern_seconds += values["extern_approved_seconds"]
+            if values["school_check_ins"]:
+                present[day].add(user_id)
+        for day, user_ids in present.items():
+            totals[day].present_students = len(user_ids)
+
+    return dict(sorted(totals.items()))
+
+
+def user_totals(
+    db: Session,
+    school_id: int,
+    start_day: Optional[date] = None,
+    end_day: Optional[date] = None,
+    course_id: Optional[int] = None,
+    project_id: Optional[int] = None,
+) -> Dict[int, UserTotals]:
+    """School seconds, approved external seconds and pending registrations per user."""
+    stored, live = _split_period(db, start_day, end_day)
+    totals: Dict[int, UserTotals] = defaultdict(UserTotals)
+
+    if stored is not None:
+        rows = (
+            _rollup_query(
+                db,
+                (
+                    AttendanceDailyRollup.user_id,
+                    func.sum(AttendanceDailyRollup.school_seconds),
+                    func.sum(AttendanceDailyRollup.extern_approved_seconds),
+                    func.sum(AttendanceDailyRollup.pending_count),
+                ),
+                stored,
+                school_id,
+                course_id,
+                project_id,
+            )
+            .group_by(AttendanceDailyRollup.user_id)
+            .all()
+        )
+        for user_id, school, extern, pending in rows:
+            totals[user_id] = UserTotals(
+                int(school or 0), int(extern or 0), int(pending or 0)
+            )
+
+    if live is not None:
+        for (user_id, _, _), values in _live_rollups(
+            db, live, school_id, course_id, project_id
+        ).items():
+            user = totals[user_id]
+            user.school_seconds += values["school_seconds"]
+            user.extern_seconds += values["extern_approved_seconds"]
+            user.pending_count += values["pending_count"]
+
+    return dict(totals)
+
+
+def presence_hours(
+    db: Session,
+    school_id: int,
+    start_day: Optional[date] = None,
+    end_day: Optional[date] = None,
+    course_id: Optional[int] = None,
+    project_id: Optional[int] = None,
+) -> Dict[Tuple[int, date], int]:
+    """Per (user, day) with a school check-in: bitmask of the check-in hours (UTC)."""
+    stored, live = _split_period(db, start_day, end_day)
+    hours: Dict[Tuple[int, date], int] = defaultdict(int)
+
+    if stored is not None:
+        rows = (
+            _rollup_query(
+                db,
+                (
+                    AttendanceDailyRollup.user_id,
+                    AttendanceDailyRollup.day,
+                    AttendanceDailyRollup.check_in_hours,
+                ),
+                stored,
+                school_id,
+                course_id,
+                project_id,
+            )
+            .filter(AttendanceDailyRollup.school_check_ins > 0)
+            .all()
+        )
+        for user_id, day, mask in rows:
+            hours[(user_id, day)] |= mask
+
+    if live is not None:
+        for (user_id, day, _), values in _live_rollups(
+            db, live, school_id, course_id, project_id
+        ).items():
+            if values["school_check_ins"]:
+                hours[(user_id, day)] |= values["check_in_hours"]
+
+    return dict(hours)
+
+
+# ============ Signals ============
+
+SIGNAL_LIMIT = 5
+"""Students listed per signal."""
+
+
+def attendance_signals(
+    db: Session,
+    school_id: int,
+    start_day: Optional[date] = None,
+    end_day: Optional[date] = None,
+    course_id: Optional[int] = None,
+    project_id: Optional[int] = None,
+    *,
+    min_extern_hours: float,
+    max_school_blocks: float,
+    min_pending_count: int,
+    long_open_hours: float,
+    limit: int = SIGNAL_LIMIT,
+) -> Dict[str, List[Dict[str, Any]]]:
+    """
+    The students behind the three attendance signals, in one query.
+
+    - ``extern_low_school``: at least ``min_extern_hours`` approved external
+      work but at most ``max_school_blocks`` lesson blocks at school
+    - ``many_pending``: at least ``min_pending_count`` pending registrations
+    - ``long_open``: a school check-in open for ``long_open_hours`` or more
+
+    Totals come from the rollups of the rolled-up days plus the events of the
+    later days (CTEs), each list is ranked with a window function and cut at
+    ``limit``, and the student's name and first course are joined in.
+
+    Returns:
+        Per signal a list of dicts with user_id, name, course, school_seconds,
+        extern_seconds, pending_count and check_in (long_open only).
+    """
+    stored, live = _split_period(db, start_day, end_day)
+
+    students = select(User.id.label("user_id"), User.name).where(
+        User.school_id == school_id
+    )
+    if course_id:
+        students = students.where(User.id.in_(_course_students(db, course_id)))
+    students = students.cte("students")
+
+    # Per-user activity: rollup rows of closed days, events of the later days
+    parts = []
+    if stored is not None:
+        rolled = select(
+            AttendanceDailyRollup.user_id,
+            AttendanceDailyRollup.school_seconds.label("school_seconds"),
+            AttendanceDailyRollup.extern_approved_seconds.label("extern_seconds"),
+            AttendanceDailyRollup.pending_count.label("pending_count"),
+        ).where(
+            AttendanceDailyRollup.school_id == school_id,
+            AttendanceDailyRollup.day <= stored[1],
+        )
+        if stored[0] is not None:
+            rolled = rolled.where(AttendanceDailyRollup.day >= stored[0])
+        if project_id:
+            rolled = rolled.where(AttendanceDailyRollup.project_id == project_id)
+        parts.append(rolled)
+    if live is not None:
+        closed = AttendanceEvent.check_out.isnot(None)
+        duration = func.extract("epoch", AttendanceEvent.check_out) - func.extract(
+            "epoch", AttendanceEvent.check_in
+        )
+        recent = select(
+            AttendanceEvent.user_id,
+            case(
+                (and_(closed, AttendanceEvent.is_external.is_(False)), duration),
+                else_=0,
+            ).label("school_seconds"),
+            case(
+                (
+                    and_(
+                        closed,
+                        AttendanceEvent.is_external.is_(True),
+                        AttendanceEvent.approval_status == "approved",
+                    ),
+                    duration,
+                ),
+                else_=0,
+            ).label("extern_seconds"),
+            case(
+                (
+                    and_(
+                        AttendanceEvent.is_external.is_(True),
+                        AttendanceEvent.approval_status == "pending",
+                    ),
+                    1,
+                ),
+                else_=0,
+            ).label("pending_count"),
+        ).where(AttendanceEvent.check_in < _day_start(live[1] + timedelta(days=1)))
+        if live[0] is not None:
+            recent = recent.where(AttendanceEvent.check_in >= _day_start(live[0]))
+        if project_id:
+            recent = recent.where(AttendanceEvent.project_id == project_id)
+        parts.append(recent)
+
+    activity = (parts[0] if len(parts) == 1 else union_all(*parts)).subquery("activity")
+    totals = (
+        select(
+            activity.c.user_id,
+            func.sum(activity.c.school_seconds).label("school_seconds"),
+            func.sum(activity.c.extern_seconds).label("extern_seconds"),
+            func.sum(activity.c.pending_count).label("pending_count"),
+        )
+        .join(students, students.c.user_id == activity.c.user_id)
+        .group_by(activity.c.user_id)
+        .cte("totals")
+    )
+
+    no_seconds = cast(null(), Integer)
+    long_open = (
+        select(
+            literal("long_open").label("kind"),
+            AttendanceEvent.user_id.label("user_id"),
+            no_seconds.label("school_seconds"),
+            no_seconds.label("extern_seconds"),
+            no_seconds.label("pending_count"),
+            AttendanceEvent.check_in.label("check_in"),
+            func.row_number()
+            .over(order_by=(AttendanceEvent.check_in, AttendanceEvent.id))
+            .label("signal_rank"),
+        )
+        .join(students, students.c.user_id == AttendanceEvent.user_id)
+        .where(
+            AttendanceEvent.is_external.is_(False),
+            AttendanceEvent.check_out.is_(None),
+            AttendanceEvent.check_in
+            <= datetime.now(timezone.utc) - timedelta(hours=long_open_hours),
+        )
+    )
+    if project_id:
+        long_open = long_open.where(AttendanceEvent.project_id == project_id)
+
+    def _ranked(kind, order_by, condition):
+        return select(
+            literal(kind).label("kind"),
+            totals.c.user_id,
+            totals.c.school_seconds,
+            totals.c.extern_seconds,
+            totals.c.pending_count,
+            cast(null(), AttendanceEvent.check_in.type).label("check_in"),
+            func.row_number()
+            .over(order_by=(order_by.desc(), totals.c.user_id))
+            .label("signal_rank"),
+        ).where(condition)
+
+    signals = union_all(
+        long_open,
+        _ranked(
+            "extern_low_school",
+            totals.c.extern_seconds,
+            and_(
+                totals.c.extern_seconds >= min_extern_hours * 3600,
+                totals.c.school_seconds <= max_school_blocks * 75 * 60,
+            ),
+        ),
+        _ranked(
+            "many_pending",
+            totals.c.pending_count,
+            totals.c.pending_count >= min_pending_count,
+        ),
+    ).subquery("signals")
+
+    first_course = (
+        select(
+            CourseEnrollment.student_id,
+            Course.name.label("course"),
+            func.row_number()
+            .over(
+                partition_by=CourseEnrollment.student_id,
+                order_by=CourseEnrollment.id,
+            )
+            .label("course_rank"),
+        )
+        .join(Course, Course.id == CourseEnrollment.course_id)
+        .where(CourseEnrollment.student_id.in_(select(students.c.user_id)))
+        .subquery("first_course")
+    )
+
+    rows = db.execute(
+        select(
+            signals.c.kind,
+            signals.c.user_id,
+            students.c.name,
+            first_course.c.course,
+            signals.c.school_seconds,
+            signals.c.extern_seconds,
+            signals.c.pending_count,
+            signals.c.check_in,
+        )
+        .join(students, students.c.user_id == signals.c.user_id)
+        .outerjoin(
+            first_course,
+            and_(
+                first_course.c.student_id == signals.c.user_id,
+                first_course.c.course_rank == 1,
+            ),
+        )
+        .where(signals.c.signal_rank <= limit)
+        .order_by(signals.c.kind, signals.c.signal_rank)
+    ).all()
+
+    result: Dict[str, List[Dict[str, Any]]] = {
+        "extern_low_school": [],
+        "many_pending": [],
+        "long_open": [],
+    }
+    for row in rows:
+        result[row.kind].append(
+            {
+                "user_id": row.user_id,
+                "name": row.name,
+                "course": row.course,
+                "school_seconds": float(row.school_seconds or 0),
+                "extern_seconds": float(row.extern_seconds or 0),
+                "pending_count": int(row.pending_count or 0),
+                "check_in": row.check_in,
+            }
+        )
+    return result
@@ -0,0 +1,263 @@
+"""
+Maintenance of open attendance sessions.
+
+``cleanup_expired_sessions`` closes school sessions whose check-out was
+forgotten. It scans the open sessions of every school, so it runs as a periodic
+job in the scheduler daemon (see ``SchedulerService.run_maintenance``) and on
+demand via ``POST /attendance/cleanup-expired``, never on the RFID scan path.
+
+``apply_rfid_taps`` turns a batch of taps buffered by an RFID reader into
+check-ins and check-outs, for ``POST /attendance/scan/batch``.
+"""
+
+from __future__ import annotations
+
+import logging
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from sqlalchemy import or_
+from sqlalchemy.orm import Session
+
+from app.api.v1.schemas.attendance import ensure_aware_utc
+from app.infra.db.models import AttendanceEvent
+from app.services.attendance_aggregates import (
+    add_school_seconds,
+    sync_attendance_aggregates,
+)
+from app.services.attendance_rollups import (
+    refresh_attendance_rollups,
+    sync_attendance_rollups,
+)
+from app.services.rfid_card_cache import resolve_rfid_cards
+
+logger = logging.getLogger(__name__)
+
+
+FORGOTTEN_CHECKOUT_THRESHOLD_HOURS = 12
+"""Sessions open longer than this many hours are treated as forgotten check-outs."""
+
+FORGOTTEN_CHECKOUT_SESSION_MINUTES = 15
+"""Duration (minutes) assigned to auto-closed sessions that exceeded the threshold."""
+
+RFID_TAP_MAX_FUTURE_SECONDS = 300
+"""Buffered taps stamped further ahead than this (reader clock skew) are rejected."""
+
+CARD_NOT_FOUND_MESSAGE = (
+    "Geen gebruiker gevonden met deze kaart. Vraag een docent om de kaart te activeren."
+)
+
+
+def cleanup_expired_sessions(db: Session) -> int:
+    """
+    Auto-checkout attendance sessions that have been open for more than
+    FORGOTTEN_CHECKOUT_THRESHOLD_HOURS hours.
+
+    When a student forgets to check out the session is closed with
+    check_out = check_in + FORGOTTEN_CHECKOUT_SESSION_MINUTES minutes so
+    that an unreasonably long session does not inflate their total hours.
+
+    Args:
+        db: SQLAlchemy database session.
+
+    Returns:
+        Number of sessions that were automatically closed.
+    """
+    threshold = datetime.now(timezone.utc) - timedelta(
+        hours=FORGOTTEN_CHECKOUT_THRESHOLD_HOURS
+    )
+
+    expired_sessions = (
+        db.query(AttendanceEvent)
+        .filter(
+            AttendanceEvent.is_external.is_(False),
+            AttendanceEvent.check_out.is_(None),
+            AttendanceEvent.check_in <= threshold,
+        )
+        .all()
+    )
+
+    count = 0
+    user_ids = set()
+    rollup_keys = []
+    for session in expired_sessions:
+        check_in_aware = ensure_aware_utc(session.check_in)
+        session.check_out = check_in_aware + timedelta(
+            minutes=FORGOTTEN_CHECKOUT_SESSION_MINUTES
+        )
+        session.updated_at = datetime.now(timezone.utc)
+        user_ids.add(session.user_id)
+        rollup_keys.append((session.user_id, check_in_aware))
+        count += 1
+
+    if count:
+        db.commit()
+        sync_attendance_aggregates(db, user_ids)
+        sync_attendance_rollups(db, rollup_keys)
+        logger.info(
+            f"Auto-checked out {count} expired session(s) "
+            f"(>{FORGOTTEN_CHECKOUT_THRESHOLD_HOURS}h open)"
+        )
+
+    return count
+
+
+def _event_info(event: AttendanceEvent, duration_seconds: Optional[int] = None):
+    info = {
+        "id": event.id,
+        "check_in": ensure_aware_utc(event.check_in).isoformat(),
+        "check_out": (
+            ensure_aware_utc(event.check_out).isoformat() if event.check_out else None
+        ),
+    }
+    if duration_seconds is not None:
+        info["duration_seconds"] = duration_seconds
+    return info
+
+
+def apply_rfid_taps(
+    db: Session, taps: Sequence[Tuple[str, datetime]]
+) -> List[Dict[str, Any]]:
+    """
+    Pair buffered RFID taps into check-ins and check-outs (without committing).
+
+    Cards are resolved in bulk and the open sessions and already recorded taps
+    of all users are loaded in one query. Per user the taps are applied in
+    timestamp order against the user's open session: a tap closes it, or opens
+    a new one. A session open longer than FORGOTTEN_CHECKOUT_THRESHOLD_HOURS is
+    closed as a forgotten check-out first, like ``cleanup_expired_sessions``
+    does. A tap whose timestamp is already recorded as a check-in or check-out
+    of that user is reported as duplicate, so a resent batch is harmless.
+
+    Args:
+        db: SQLAlchemy database session.
+        taps: (card uid, tap timestamp) pairs; naive timestamps are UTC.
+
+    Returns:
+        One dict per tap, in input order, with the ``RFIDScanResponse`` fields.
+    """
+    now = datetime.now(timezone.utc)
+    latest_allowed = now + timedelta(seconds=RFID_TAP_MAX_FUTURE_SECONDS)
+    threshold = timedelta(hours=FORGOTTEN_CHECKOUT_THRESHOLD_HOURS)
+
+    results: List[Optional[Dict[str, Any]]] = [None] * len(taps)
+    cards = resolve_rfid_cards(db, [uid for uid, _ in taps])
+
+    users: Dict[int, Dict[str, Any]] = {}
+    user_taps: Dict[int, List[Tuple[datetime, int]]] = defaultdict(list)
+    for index, (uid, timestamp) in enumerate(taps):
+        user = cards.get(uid)
+        if user is None:
+            results[index] = {"status": "not_found", "message": CARD_NOT_FOUND_MESSAGE}
+            continue
+        timestamp = ensure_aware_utc(timestamp)
+        if timestamp > latest_allowed:
+            results[index] = {
+                "status": "rejected",
+                "user": user,
+                "message": "Tijdstip van de scan ligt in de toekomst",
+            }
+            continue
+        users[user["id"]] = user
+        user_taps[user["id"]].append((timestamp, index))
+
+    if not user_taps:
+        return results
+
+    # Open sessions plus every session touching the batch window, in one query
+    first_tap = min(ts for entries in user_taps.values() for ts, _ in entries)
+    events = (
+        db.query(AttendanceEvent)
+        .filter(
+            AttendanceEvent.user_id.in_(list(user_taps)),
+            AttendanceEvent.is_external.is_(False),
+            or_(
+                AttendanceEvent.check_out.is_(None),
+                AttendanceEvent.check_out >= first_tap,
+            ),
+        )
+        .order_by(AttendanceEvent.check_in)
+        .all()
+    )
+    open_sessions: Dict[int, AttendanceEvent] = {}
+    recorded = set()
+    for event in events:
+        recorded.add((event.user_id, ensure_aware_utc(event.check_in)))
+        if event.check_out is None:
+            open_sessions[event.user_id] = event
+        else:
+            recorded.add((event.user_id, ensure_aware_utc(event.check_out)))
+
+    # (index, action, event, duration) to report once new events have an id
+    applied: List[Tuple[int, str, AttendanceEvent, Optional[int]]] = []
+    closed_seconds: Dict[int, int] = defaultdict(int)
+    forgotten: List[Tuple[int, datetime]] = []
+    for user_id, entries in user_taps.items():
+        user = users[user_id]
+        open_session = open_sessions.get(user_id)
+        for timestamp, index in sorted(entries):
+            if (user_id, timestamp) in recorded:
+                results[index] = {
+                    "status": "duplicate",
+                    "user": user,
+                    "message": "Scan was al verwerkt",
+                }
+                continue
+            recorded.add((user_id, timestamp))
+
+            if open_session is not None:
+                check_in = ensure_aware_utc(open_session.check_in)
+                if timestamp < check_in:
+                    results[index] = {
+                        "status": "rejected",
+                        "user": user,
+                        "message": "Scan ligt vóór de openstaande check-in",
+                    }
+                    continue
+                if timestamp - check_in <= threshold:
+                    duration = int((timestamp - check_in).total_seconds())
+                    open_session.check_out = timestamp
+                    open_session.updated_at = now
+                    closed_seconds[user_id] += duration
+                    applied.append((index, "check_out", open_session, duration))
+                    open_session = None
+                    continue
+                # Forgotten check-out: close it, this tap starts a new session
+                open_session.check_out = check_in + timedelta(
+                    minutes=FORGOTTEN_CHECKOUT_SESSION_MINUTES
+                )
+                open_session.updated_at = now
+                closed_seconds[user_id] += FORGOTTEN_CHECKOUT_SESSION_MINUTES * 60
+                forgotten.append((user_id, check_in))
+
+            open_session = AttendanceEvent(
+                user_id=user_id,
+                check_in=timestamp,
+                is_external=False,
+                source="rfid",
+            )
+            db.add(open_session)
+            applied.append((index, "check_in", open_session, None))
+
+    db.flush()
+    for user_id, seconds in closed_seconds.items():
+        add_school_seconds(db, user_id, seconds)
+    # Buffered taps may close or open sessions on days that are rolled up
+    refresh_attendance_rollups(
+        db,
+        forgotten + [(event.user_id, event.check_in) for _, _, event, _ in applied],
+    )
+
+    for index, action, event, duration in applied:
+        info = _event_info(event, duration)
+        if action == "check_in":
+            # The session may have been closed by a later tap of the batch
+            info["check_out"] = None
+        results[index] = {
+            "status": "ok",
+            "action": action,
+            "user": users[event.user_id],
+            "event": info,
+        }
+    return results
@@ -0,0 +1,232 @@
+"""
+Shared score aggregation for a single peer evaluation.
+
+The dashboard, flags and matrix endpoints all need the same raw material: every
+allocation of an evaluation with the scores given on it. Instead of one
+``Score`` query per allocation, ``load_evaluation_aggregates`` fetches all
+allocations and their scores in one joined query. The result offers
+per-allocation, per-reviewee and per-criterion views, and
+``load_evaluation_users`` loads only the users that appear in the evaluation.
+"""
+
+from __future__ import annotations
+
+from dataclasses import dataclass, field
+from statistics import mean
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from sqlalchemy import and_
+from sqlalchemy.orm import Session
+
+from app.infra.db.models import Allocation, Score, User
+
+
+def _mean_or_none(vals: List[float]) -> Optional[float]:
+    return mean(vals) if vals else None
+
+
+@dataclass
+class AllocationScores:
+    """One allocation (reviewer → reviewee) with the scores given on it."""
+
+    allocation_id: int
+    reviewer_id: int
+    reviewee_id: int
+    is_self: bool
+    # (criterion_id, score) in score id order
+    rows: List[Tuple[int, float]] = field(default_factory=list)
+
+    def values(self, criterion_ids: Optional[Set[int]] = None) -> List[float]:
+        """Score values, optionally limited to the given criteria."""
+        if criterion_ids is None:
+            return [score for _, score in self.rows]
+        return [score for cid, score in self.rows if cid in criterion_ids]
+
+    def average(self, criterion_ids: Optional[Set[int]] = None) -> Optional[float]:
+        """Mean over all (selected) criteria, or None without scores."""
+        return _mean_or_none(self.values(criterion_ids))
+
+
+@dataclass
+class RevieweeAggregate:
+    """All scores received by one student, split into peer and self."""
+
+    reviewee_id: int
+    # One average per peer allocation that contains scores
+    peer_alloc_avgs: List[float] = field(default_factory=list)
+    self_avg: Optional[float] = None
+    # criterion_id -> peer scores / self score
+    crit_peers: Dict[int, List[float]] = field(default_factory=dict)
+    crit_self: Dict[int, float] = field(default_factory=dict)
+
+    @property
+    def peer_avg(self) -> Optional[float]:
+        return _mean_or_none(self.peer_alloc_avgs)
+
+    @property
+    def reviewers_count(self) -> int:
+        return len(self.peer_alloc_avgs)
+
+
+@dataclass
+class EvaluationAggregates:
+    """All allocations of an evaluation with their scores, loaded in one query."""
+
+    evaluation_id: int
+    allocations: List[AllocationScores] = field(default_factory=list)
+
+    @property
+    def user_ids(self) -> Set[int]:
+        """Every reviewer and reviewee that appears in the evaluation."""
+        ids: Set[int] = set()
+        for a in self.allocations:
+            ids.add(a.reviewer_id)
+            ids.add(a.reviewee_id)
+        return ids
+
+    def by_reviewee(
+        self, criterion_ids: Optional[Set[int]] = None
+    ) -> Dict[int, RevieweeAggregate]:
+        """
+        Aggregate received scores per reviewee.
+
+        Allocations without (selected) scores are skipped, so a reviewee only
+        appears once at least one score was given to them.
+        """
+        result: Dict[int, RevieweeAggregate] = {}
+        for a in self.allocations:
+            rows = [
+                (cid, score)
+                for cid, score in a.rows
+                if criterion_ids is None or cid in criterion_ids
+            ]
+            if not rows:
+                continue
+
+            agg = result.setdefault(a.reviewee_id, RevieweeAggregate(a.reviewee_id))
+            alloc_avg = mean(score for _, score in rows)
+            if a.is_self:
+                agg.self_avg = alloc_avg
+                for cid, score in rows:
+                    agg.crit_self[cid] = score
+            else:
+                agg.peer_alloc_avgs.append(alloc_avg)
+                for cid, score in rows:
+                    agg.crit_peers.setdefault(cid, []).append(score)
+        return result
+
+    def by_pair(
+        self, criterion_id: Optional[int] = None
+    ) -> Dict[Tuple[int, int], List[float]]:
+        """
+        Allocation averages per (reviewer, reviewee) pair.
+
+        With *criterion_id* each allocation contributes the mean of its scores
+        for that criterion; otherwise the mean over all its scores.
+        """
+        selected = {criterion_id} if criterion_id is not None else None
+        result: Dict[Tuple[int, int], List[float]] = {}
+        for a in self.allocations:
+            value = a.average(selected)
+            if value is None:
+                continue
+            result.setdefault((a.reviewer_id, a.reviewee_id), []).append(value)
+        return result
+
+    def by_criterion(self) -> Dict[int, Dict[str, List[float]]]:
+        """All peer and self scores per criterion across the evaluation."""
+        result: Dict[int, Dict[str, List[float]]] = {}
+        for a in self.allocations:
+            kind = "self" if a.is_self else "peer"
+            for cid, score in a.rows:
+                result.setdefault(cid, {"peer": [], "self": []})[kind].append(score)
+        return result
+
+
+def load_evaluation_aggregates(
+    db: Session,
+    school_id: int,
+    evaluation_id: int,
+    include_self: bool = True,
+    student_ids: Optional[Iterable[int]] = None,
+) -> EvaluationAggregates:
+    """
+    Load all allocations of an evaluation together with their scores.
+
+    Args:
+        db: Database session
+        school_id: School scope for allocations and scores
+        evaluation_id: Evaluation to load
+        include_self: Include self-review allocations
+        student_ids: When given, only allocations where both reviewer and
+            reviewee are in this set
+
+    Returns:
+        EvaluationAggregates (allocations without scores are included with an
+        empty ``rows`` list)
+    """
+    query = (
+        db.query(
+            Allocation.id,
+            Allocation.reviewer_id,
+            Allocation.reviewee_id,
+            Allocation.is_self,
+            Score.criterion_id,
+            Score.score,
+        )
+        .outerjoin(
+            Score,
+            and_(Score.allocation_id == Allocation.id, Score.school_id == school_id),
+        )
+        .filter(
+            Allocation.school_id == school_id,
+            Allocation.evaluation_id == evaluation_id,
+        )
+    )
+    if not include_self:
+        query = query.filter(Allocation.is_self.is_(False))
+    if student_ids is not None:
+        student_ids = list(student_ids)
+        query = query.filter(
+            Allocation.reviewee_id.in_(student_ids),
+            Allocation.reviewer_id.in_(student_ids),
+        )
+
+    allocations: Dict[int, AllocationScores] = {}
+    for (
+        alloc_id,
+        reviewer_id,
+        reviewee_id,
+        is_self,
+        criterion_id,
+        score,
+    ) in query.order_by(Allocation.id, Score.id).all():
+        a = allocations.get(alloc_id)
+        if a is None:
+            a = allocations[alloc_id] = AllocationScores(
+                allocation_id=alloc_id,
+                reviewer_id=reviewer_id,
+                reviewee_id=reviewee_id,
+                is_self=bool(is_self),
+            )
+        if criterion_id is not None and score is not None:
+            a.rows.append((criterion_id, float(score)))
+
+    return EvaluationAggregates(
+        evaluation_id=evaluation_id, allocations=list(allocations.values())
+    )
+
+
+def load_evaluation_users(
+    db: Session, school_id: int, aggregates: EvaluationAggregates
+) -> Dict[int, User]:
+    """Load only the users that appear as reviewer or reviewee."""
+    user_ids = aggregates.user_ids
+    if not user_ids:
+        return {}
+    return {
+        u.id: u
+        for u in db.query(User)
+        .filter(User.school_id == school_id, User.id.in_(user_ids))
+        .all()
+    }
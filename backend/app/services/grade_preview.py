@@ -0,0 +1,371 @@
+"""
+Bulk grade-preview pipeline for peer evaluations.
+
+``compute_grade_preview_rows`` builds the grade preview of an evaluation with a
+fixed number of queries: students, project team membership, rubric criteria
+and one allocations-with-scores query. Percentages, GCF and SPR are then
+derived per allocation and per team in memory.
+
+``get_grade_preview_rows`` wraps it in a short-lived in-process cache keyed by
+(evaluation, course), so repeated previews are not recomputed. Each cache hit is validated with one cheap query: the count and the
+latest ``updated_at`` of every table the preview is computed from (scores,
+evaluation, rubric and criteria, teams, enrollments and students). Draft save
+and publish reuse a preview that is still valid.
+"""
+
+from __future__ import annotations
+
+import threading
+import time
+from dataclasses import dataclass
+from statistics import mean
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+
+from app.infra.db.models import (
+    Allocation,
+    CourseEnrollment,
+    Evaluation,
+    ProjectTeam,
+    ProjectTeamMember,
+    Rubric,
+    RubricCriterion,
+    Score,
+    User,
+)
+from app.services.evaluation_aggregates import load_evaluation_aggregates
+
+# Seconds a computed preview may be reused
+PREVIEW_CACHE_TTL_SECONDS = 60.0
+PREVIEW_CACHE_MAX_ENTRIES = 256
+
+DEFAULT_MIN_CF = 0.85
+DEFAULT_MAX_CF = 1.5
+
+
+def _clamp(x: float, lo: float, hi: float) -> float:
+    return max(lo, min(hi, x))
+
+
+def _pct_to_grade(pct: Optional[float]) -> Optional[float]:
+    """(percentage / 100) * 8 + 2: 50% → 6.0, 75% → 8.0, 100% → 10.0"""
+    if pct is None or pct <= 0:
+        return None
+    return (pct / 100.0) * 8 + 2
+
+
+def _load_students(db: Session, course_id: Optional[int]) -> List[User]:
+    """Active, non-archived students of the course, ordered by name."""
+    if course_id is None:
+        return []
+    active_ids = [
+        uid
+        for uid, active in db.query(
+            CourseEnrollment.student_id, CourseEnrollment.active
+        )
+        .filter(CourseEnrollment.course_id == course_id)
+        .all()
+        if active
+    ]
+    if not active_ids:
+        return []
+    return (
+        db.query(User)
+        .filter(
+            User.role == "student",
+            User.archived.is_(False),
+            User.id.in_(active_ids),
+        )
+        .order_by(User.name.asc())
+        .all()
+    )
+
+
+def _load_project_team_map(db: Session, evaluation: Evaluation) -> Dict[int, int]:
+    """user_id -> team_number for all teams of the evaluation's project."""
+    rows = (
+        db.query(ProjectTeamMember.user_id, ProjectTeam.team_number)
+        .join(ProjectTeam, ProjectTeam.id == ProjectTeamMember.project_team_id)
+        .filter(
+            ProjectTeam.project_id == evaluation.project_id,
+            ProjectTeam.school_id == evaluation.school_id,
+        )
+        .all()
+    )
+    return {user_id: team_number for user_id, team_number in rows}
+
+
+def compute_grade_preview_rows(
+    db: Session, evaluation_id: int, course_id: Optional[int]
+) -> List[Dict[str, Any]]:
+    """
+    Compute the grade preview for every active student of the course.
+
+    Args:
+        db: Database session
+        evaluation_id: Evaluation to preview
+        course_id: Course (cluster) whose active students are included
+
+    Returns:
+        One dict per student with the fields of ``GradePreviewItem``
+    """
+    students = _load_students(db, course_id)
+    if not students:
+        return []
+
+    evaluation = db.get(Evaluation, evaluation_id)
+
+    # Rubric scale, criterion weights and GCF range
+    scale_min, scale_max = 1, 5
+    crit_weights: Dict[int, float] = {}
+    min_cf, max_cf = DEFAULT_MIN_CF, DEFAULT_MAX_CF
+    project_team_map: Dict[int, int] = {}
+    percent_by_alloc: Dict[int, float] = {}
+    allocations = []
+
+    if evaluation is not None:
+        settings = evaluation.settings or {}
+        if isinstance(settings, dict):
+            min_cf = float(settings.get("min_cf", DEFAULT_MIN_CF))
+            max_cf = float(settings.get("max_cf", DEFAULT_MAX_CF))
+
+        if evaluation.rubric_id is not None:
+            rubric = db.get(Rubric, evaluation.rubric_id)
+            if rubric is not None:
+                scale_min = rubric.scale_min or 1
+                scale_max = rubric.scale_max or 5
+            crit_weights = {
+                cid: float(weight if weight is not None else 1.0)
+                for cid, weight in db.query(RubricCriterion.id, RubricCriterion.weight)
+                .filter(
+                    RubricCriterion.school_id == evaluation.school_id,
+                    RubricCriterion.rubric_id == evaluation.rubric_id,
+                )
+                .all()
+            }
+
+        if evaluation.project_id:
+            project_team_map = _load_project_team_map(db, evaluation)
+
+        # All allocations of the evaluation with their scores in one query
+        allocations = load_evaluation_aggregates(
+            db, evaluation.school_id, evaluation_id
+        ).allocations
+
+    # Weighted, normalised percentage (0..100) per allocation
+    rng = max(1, scale_max - scale_min)
+    for a in allocations:
+        num = den = 0.0
+        for criterion_id, score in a.rows:
+            w = crit_weights.get(criterion_id, 1.0)
+            num += w * (score - scale_min) / rng
+            den += w
+        if den > 0:
+            percent_by_alloc[a.allocation_id] = 100.0 * num / den
+
+    # Received (peer / self) and given percentages per student
+    peer_vals: Dict[int, List[float]] = {}
+    self_vals: Dict[int, List[float]] = {}
+    given_vals: Dict[int, List[float]] = {}
+    for a in allocations:
+        pct = percent_by_alloc.get(a.allocation_id)
+        if pct is None:
+            continue
+        if a.is_self:
+            self_vals.setdefault(a.reviewee_id, []).append(pct)
+        else:
+            peer_vals.setdefault(a.reviewee_id, []).append(pct)
+            given_vals.setdefault(a.reviewer_id, []).append(pct)
+
+    # Projects only use project teams; otherwise the student's own team_number
+    has_project = bool(evaluation is not None and evaluation.project_id)
+    team_by_uid: Dict[int, Optional[int]] = {
+        u.id: project_team_map.get(u.id) if has_project else u.team_number
+        for u in students
+    }
+
+    peer_pct_by_uid = {
+        u.id: mean(peer_vals[u.id]) for u in students if u.id in peer_vals
+    }
+
+    # GCF: peer% relative to the team mean, clamped to min_cf..max_cf
+    by_team: Dict[Optional[int], List[float]] = {}
+    for uid, pct in peer_pct_by_uid.items():
+        by_team.setdefault(team_by_uid[uid], []).append(pct)
+    team_mean = {tid: mean(vals) for tid, vals in by_team.items()}
+
+    rows: List[Dict[str, Any]] = []
+    for u in students:
+        avg_score = float(peer_pct_by_uid.get(u.id, 0.0))
+        team = team_by_uid[u.id]
+
+        gcf = 1.0
+        if u.id in peer_pct_by_uid:
+            m = team_mean.get(team)
+            raw_gcf = (avg_score / m) if (m and m > 0) else 1.0
+            gcf = _clamp(raw_gcf, min_cf, max_cf)
+
+        self_pct = mean(self_vals[u.id]) if u.id in self_vals else None
+        spr = (
+            float(self_pct / avg_score)
+            if (self_pct is not None and avg_score > 0)
+            else 0.0
+        )
+
+        # Suggestion is based on peer scores only, with self as fallback
+        suggested_val = _pct_to_grade(avg_score)
+        if suggested_val is None:
+            suggested_val = _pct_to_grade(self_pct)
+        suggested = (
+            _clamp(round(suggested_val, 1), 1.0, 10.0)
+            if suggested_val is not None
+            else None
+        )
+
+        given = given_vals.get(u.id)
+        rows.append(
+            {
+                "user_id": u.id,
+                "user_name": u.name,
+                "avg_score": avg_score,
+                "gcf": float(gcf),
+                "spr": spr,
+                "suggested_grade": suggested,
+                "team_number": team,
+                "class_name": u.class_name,
+                "student_number": getattr(u, "student_number", None),
+                "first_name": getattr(u, "first_name", None),
+                "prefix": getattr(u, "prefix", None),
+                "last_name": getattr(u, "last_name", None),
+                "given_avg_pct": mean(given) if given else None,
+                "team_given_avg": None,
+            }
+        )
+
+    # Team average of the percentages students give to their peers
+    by_team_given: Dict[Optional[int], List[float]] = {}
+    for row in rows:
+        if row["given_avg_pct"] is not None:
+            by_team_given.setdefault(row["team_number"], []).append(
+                row["given_avg_pct"]
+            )
+    for row in rows:
+        vals = by_team_given.get(row["team_number"])
+        row["team_given_avg"] = mean(vals) if vals else None
+
+    return rows
+
+
+# ------------------------------------------------------------
+# Short-lived preview cache
+# ------------------------------------------------------------
+@dataclass
+class _CacheEntry:
+    expires_at: float
+    version: Tuple[Any, ...]
+    rows: List[Dict[str, Any]]
+
+
+_cache: Dict[Tuple[int, Optional[int]], _CacheEntry] = {}
+_cache_lock = threading.Lock()
+
+
+def _count_and_latest(model, *criteria) -> list:
+    """Scalar subqueries for the number of rows and their latest updated_at."""
+    return [
+        select(column).select_from(model).where(*criteria).scalar_subquery()
+        for column in (func.count(), func.max(model.updated_at))
+    ]
+
+
+def _preview_version(
+    db: Session, evaluation_id: int, course_id: Optional[int]
+) -> Tuple[Any, ...]:
+    """
+    A cheap version of every input of ``compute_grade_preview_rows``, in one
+    query: the number of rows and the latest ``updated_at`` of the scores,
+    the evaluation (GCF range, rubric, project), the rubric and its criteria,
+    the project teams and members, and the course enrollments and their
+    students. Any edit of such a row (a score, a weight, a student's name,
+    number or class) moves its table's latest ``updated_at``; adding or
+    removing one changes the count.
+    """
+
+    def evaluation_column(column):
+        return select(column).where(Evaluation.id == evaluation_id).scalar_subquery()
+
+    rubric_id = evaluation_column(Evaluation.rubric_id)
+    project_id = evaluation_column(Evaluation.project_id)
+    team_ids = select(ProjectTeam.id).where(ProjectTeam.project_id == project_id)
+    student_ids = select(CourseEnrollment.student_id).where(
+        CourseEnrollment.course_id == course_id
+    )
+    columns = [
+        *_count_and_latest(
+            Score,
+            Score.allocation_id.in_(
+                select(Allocation.id).where(Allocation.evaluation_id == evaluation_id)
+            ),
+        ),
+        evaluation_column(Evaluation.updated_at),
+        *_count_and_latest(Rubric, Rubric.id == rubric_id),
+        *_count_and_latest(RubricCriterion, RubricCriterion.rubric_id == rubric_id),
+        *_count_and_latest(ProjectTeam, ProjectTeam.project_id == project_id),
+        *_count_and_latest(
+            ProjectTeamMember, ProjectTeamMember.project_team_id.in_(team_ids)
+        ),
+        *_count_and_latest(CourseEnrollment, CourseEnrollment.course_id == course_id),
+        *_count_and_latest(User, User.id.in_(student_ids)),
+    ]
+    return tuple(db.execute(select(*columns)).one())
+
+
+def get_grade_preview_rows(
+    db: Session,
+    evaluation_id: int,
+    course_id: Optional[int],
+    use_cache: bool = True,
+) -> List[Dict[str, Any]]:
+    """
+    Grade preview rows, reused from the cache while fresh and unchanged.
+
+    A cached preview is only reused when ``_preview_version`` still matches,
+    so draft save and publish reuse the preview that was just shown instead
+    of recomputing it. ``use_cache=False`` always recomputes and leaves the
+    cache alone. Returns copies, so callers may modify the rows freely.
+    """
+    if not use_cache:
+        return compute_grade_preview_rows(db, evaluation_id, course_id)
+
+    key = (evaluation_id, course_id)
+    version = _preview_version(db, evaluation_id, course_id)
+    now = time.monotonic()
+
+    with _cache_lock:
+        entry = _cache.get(key)
+    if entry is not None and entry.expires_at > now and entry.version == version:
+        return [dict(row) for row in entry.rows]
+
+    rows = compute_grade_preview_rows(db, evaluation_id, course_id)
+
+    with _cache_lock:
+        if len(_cache) >= PREVIEW_CACHE_MAX_ENTRIES:
+            for k in [k for k, e in _cache.items() if e.expires_at <= now]:
+                del _cache[k]
+            if len(_cache) >= PREVIEW_CACHE_MAX_ENTRIES:
+                oldest = min(_cache, key=lambda k: _cache[k].expires_at)
+                del _cache[oldest]
+        _cache[key] = _CacheEntry(
+            expires_at=now + PREVIEW_CACHE_TTL_SECONDS,
+            version=version,
+            rows=rows,
+        )
+    return [dict(row) for row in rows]
+
+
+def clear_grade_preview_cache() -> None:
+    """Drop all cached previews."""
+    with _cache_lock:
+        _cache.clear()
@@ -0,0 +1,226 @@
+"""
+Cache of resolved identities for authenticated requests.
+
+Every authenticated request used to look its user up by email before the
+endpoint ran. ``load_identity`` keeps the fields the auth checks and most
+endpoints need (id, email, name, role, school_id, archived) per token subject
+and ``school_id`` claim, and hands out a ``User`` attached to the request's
+session without a query; any other column is loaded lazily by primary key when
+an endpoint touches it.
+
+There are two tiers:
+
+- an in-process LRU of ``IDENTITY_CACHE_MAX_ENTRIES`` entries that live for
+  ``IDENTITY_CACHE_TTL_SECONDS`` (always on);
+- an optional shared Redis tier (``IDENTITY_CACHE_REDIS_ENABLED``), so a worker
+  that has not seen a user yet does not have to hit the database either. Redis
+  errors are logged and fall through to the database.
+
+Edits that change who a user is (archiving, role changes, deletes, email
+changes) call ``invalidate_identity``, which drops the subject from this
+process and from Redis. Other workers drop their local entry when it expires,
+so the local TTL is kept short. Unknown subjects are never cached.
+"""
+
+from __future__ import annotations
+
+import json
+import logging
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Dict, Optional, Tuple
+
+from redis import Redis
+from redis.exceptions import RedisError
+from sqlalchemy.orm import Session, make_transient_to_detached
+
+from app.core.auth_utils import normalize_email
+from app.core.config import settings
+from app.infra.db.models import User
+from app.infra.metrics import observe_redis
+
+logger = logging.getLogger(__name__)
+
+IDENTITY_CACHE_MAX_ENTRIES = 8192
+# Auth runs on every request: never wait long for the shared tier
+IDENTITY_CACHE_REDIS_TIMEOUT_SECONDS = 0.25
+IDENTITY_CACHE_REDIS_PREFIX = "identity:"
+
+_FIELDS = ("id", "email", "name", "role", "school_id", "archived")
+
+_Key = Tuple[str, Optional[int]]
+
+
+@dataclass
+class _CacheEntry:
+    expires_at: float
+    identity: Dict[str, Any]
+
+
+_cache: "OrderedDict[_Key, _CacheEntry]" = OrderedDict()
+_cache_lock = threading.Lock()
+_stats = {"hits": 0, "redis_hits": 0, "misses": 0, "invalidations": 0}
+_redis_client: Optional[Redis] = None
+
+
+def _redis() -> Optional[Redis]:
+    """Client for the shared tier, or None when it is disabled."""
+    global _redis_client
+    if not settings.IDENTITY_CACHE_REDIS_ENABLED:
+        return None
+    if _redis_client is None:
+        _redis_client = Redis.from_url(
+            settings.REDIS_URL,
+            socket_connect_timeout=IDENTITY_CACHE_REDIS_TIMEOUT_SECONDS,
+            socket_timeout=IDENTITY_CACHE_REDIS_TIMEOUT_SECONDS,
+        )
+    return _redis_client
+
+
+def _redis_field(school_id: Optional[int]) -> str:
+    return "-" if school_id is None else str(school_id)
+
+
+def _redis_get(sub: str, school_id: Optional[int]) -> Optional[Dict[str, Any]]:
+    client = _redis()
+    if client is None:
+        return None
+    try:
+        with observe_redis("identity_cache", "hget"):
+            raw = client.hget(
+                IDENTITY_CACHE_REDIS_PREFIX + sub, _redis_field(school_id)
+            )
+    except RedisError as exc:
+        logger.warning(f"Identity cache: Redis unavailable on read: {exc}")
+        return None
+    return json.loads(raw) if raw else None
+
+
+def _redis_set(sub: str, school_id: Optional[int], identity: Dict[str, Any]) -> None:
+    client = _redis()
+    if client is None:
+        return
+    key = IDENTITY_CACHE_REDIS_PREFIX + sub
+    try:
+        pipe = client.pipeline()
+        pipe.hset(key, _redis_field(school_id), json.dumps(identity))
+        pipe.expire(key, settings.IDENTITY_CACHE_REDIS_TTL_SECONDS)
+        with observe_redis("identity_cache", "hset"):
+            pipe.execute()
+    except RedisError as exc:
+        logger.warning(f"Identity cache: Redis unavailable on write: {exc}")
+
+
+def _remember(key: _Key, identity: Dict[str, Any], now: float) -> None:
+    with _cache_lock:
+        _cache[key] = _CacheEntry(
+            expires_at=now + settings.IDENTITY_CACHE_TTL_SECONDS, identity=identity
+        )
+        _cache.move_to_end(key)
+        while len(_cache) > IDENTITY_CACHE_MAX_ENTRIES:
+            _cache.popitem(last=False)
+
+
+def _attach(db: Session, identity: Dict[str, Any]) -> User:
+    """A persistent ``User`` in ``db`` built from cached fields, without a query."""
+    user = User(**identity)
+    make_transient_to_detached(user)
+    return db.merge(user, load=False)
+
+
+def load_identity(db: Session, sub: str, school_id: Optional[int]) -> Optional[User]:
+    """
+    The user a token subject resolves to, attached to ``db``.
+
+    ``school_id`` is the token's ``school_id`` claim; it is part of the cache key
+    only, the caller still compares it with ``user.school_id``. Returns None
+    when no user has this email.
+    """
+    sub = normalize_email(sub)
+    key = (sub, school_id)
+    now = time.monotonic()
+    with _cache_lock:
+        entry = _cache.get(key)
+        if entry is not None and entry.expires_at > now:
+            _cache.move_to_end(key)
+            _stats["hits"] += 1
+            identity = dict(entry.identity)
+        else:
+            identity = None
+
+    if identity is None:
+        identity = _redis_get(sub, school_id)
+        if identity is not None:
+            with _cache_lock:
+                _stats["redis_hits"] += 1
+            _remember(key, identity, now)
+
+    if identity is not None:
+        return _attach(db, identity)
+
+    with _cache_lock:
+        _stats["misses"] += 1
+    user = db.query(User).filter(User.email == sub).first()
+    if user is None:
+        return None
+    identity = {field: getattr(user, field) for field in _FIELDS}
+    _remember(key, identity, now)
+    _redis_set(sub, school_id, identity)
+    return user
+
+
+def invalidate_identity(*emails: Optional[str]) -> None:
+    """
+    Forget the cached identity of these subjects, here and in Redis.
+
+    Pass the old and the new email when an email address changes.
+    """
+    subs = {normalize_email(e) for e in emails if e}
+    if not subs:
+        return
+    with _cache_lock:
+        for key in [key for key in _cache if key[0] in subs]:
+            del _cache[key]
+            _stats["invalidations"] += 1
+    client = _redis()
+    if client is None:
+        return
+    try:
+        with observe_redis("identity_cache", "delete"):
+            client.delete(*(IDENTITY_CACHE_REDIS_PREFIX + sub for sub in subs))
+    except RedisError as exc:
+        logger.warning(f"Identity cache: Redis unavailable on invalidate: {exc}")
+
+
+def clear_identity_cache() -> None:
+    """Drop all identities cached by this process."""
+    with _cache_lock:
+        _stats["invalidations"] += len(_cache)
+        _cache.clear()
+
+
+def reset_identity_cache_stats() -> None:
+    """Reset the hit / miss / invalidation counters."""
+    with _cache_lock:
+        for key in _stats:
+            _stats[key] = 0
+
+
+def get_identity_cache_stats() -> Dict[str, Any]:
+    """Hit / miss counters and size of this process' cache."""
+    with _cache_lock:
+        hits = _stats["hits"] + _stats["redis_hits"]
+        misses = _stats["misses"]
+        return {
+            "size": len(_cache),
+            "max_entries": IDENTITY_CACHE_MAX_ENTRIES,
+            "ttl_seconds": settings.IDENTITY_CACHE_TTL_SECONDS,
+            "redis_enabled": settings.IDENTITY_CACHE_REDIS_ENABLED,
+            "hits": _stats["hits"],
+            "redis_hits": _stats["redis_hits"],
+            "misses": misses,
+            "invalidations": _stats["invalidations"],
+            "hit_rate": round(hits / (hits + misses), 4) if hits + misses else 0.0,
+        }
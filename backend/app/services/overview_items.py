@@ -0,0 +1,389 @@
+"""
+Set-based query engine for the combined overview list (/overview/all-items).
+
+All three item types (project assessments, peer evaluations and competency
+windows) are expressed as one ``UNION ALL`` statement with one row per
+(student, item). Filtering, counting, sorting and pagination run in SQL; the
+scores for the returned rows are then resolved with the batch helpers in
+``app.services.overview_scores``. The number of queries per request is
+constant, independent of the number of students, teams or evaluations.
+
+Sorting by score is the one exception: the score is computed in Python, so
+all matching rows are scored (still in a constant number of queries) and
+sorted before slicing the requested page.
+"""
+
+from __future__ import annotations
+
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import (
+    DateTime,
+    Float,
+    Integer,
+    String,
+    cast,
+    func,
+    literal,
+    null,
+    or_,
+    select,
+    union_all,
+)
+from sqlalchemy.orm import Session, aliased
+
+from app.infra.db.models import (
+    Allocation,
+    CompetencySelfScore,
+    CompetencyWindow,
+    Course,
+    Evaluation,
+    Project,
+    ProjectAssessment,
+    ProjectAssessmentTeam,
+    ProjectTeam,
+    ProjectTeamMember,
+    User,
+)
+from app.services.overview_scores import (
+    competency_avg_to_grade,
+    compute_peer_scores_batch,
+    compute_project_scores_batch,
+)
+
+ITEM_TYPES = ("project", "peer", "competency")
+
+
+@dataclass
+class OverviewItemFilters:
+    """Filters accepted by the /overview/all-items endpoints."""
+
+    student_id: Optional[int] = None
+    course_id: Optional[int] = None
+    teacher_id: Optional[int] = None
+    type_filter: Optional[str] = None
+    status: Optional[str] = None
+    date_from: Optional[datetime] = None
+    date_to: Optional[datetime] = None
+    team_number: Optional[int] = None
+    search: Optional[str] = None
+
+
+@dataclass
+class OverviewItemsPage:
+    """One page of overview items plus the per-type totals of the full result."""
+
+    items: List[Dict[str, Any]] = field(default_factory=list)
+    total: int = 0
+    total_by_type: Dict[str, int] = field(default_factory=dict)
+
+
+def _project_rows(school_id: int, f: OverviewItemFilters):
+    teacher = aliased(User)
+    student = aliased(User)
+    stmt = (
+        select(
+            literal("project").label("type"),
+            literal(0).label("type_order"),
+            ProjectAssessment.id.label("id"),
+            student.id.label("student_id"),
+            student.name.label("student_name"),
+            student.class_name.label("student_class"),
+            ProjectAssessment.title.label("title"),
+            Course.id.label("course_id"),
+            Course.name.label("course_name"),
+            teacher.id.label("teacher_id"),
+            teacher.name.label("teacher_name"),
+            ProjectAssessment.published_at.label("date"),
+            ProjectAssessment.status.label("status"),
+            ProjectTeam.team_number.label("team_number"),
+            ProjectTeam.display_name_at_time.label("team_name"),
+            ProjectAssessment.rubric_id.label("rubric_id"),
+            cast(null(), Float).label("competency_avg"),
+        )
+        .select_from(ProjectAssessment)
+        .join(
+            ProjectAssessmentTeam,
+            ProjectAssessmentTeam.project_assessment_id == ProjectAssessment.id,
+        )
+        .join(ProjectTeam, ProjectTeam.id == ProjectAssessmentTeam.project_team_id)
+        .join(teacher, teacher.id == ProjectAssessment.teacher_id)
+        .join(Project, ProjectTeam.project_id == Project.id)
+        .outerjoin(Course, Project.course_id == Course.id)
+        .join(ProjectTeamMember, ProjectTeamMember.project_team_id == ProjectTeam.id)
+        .join(student, student.id == ProjectTeamMember.user_id)
+        .where(ProjectAssessment.school_id == school_id)
+    )
+
+    if f.student_id:
+        stmt = stmt.where(student.id == f.student_id)
+    if f.course_id:
+        stmt = stmt.where(Project.course_id == f.course_id)
+    if f.teacher_id:
+        stmt = stmt.where(ProjectAssessment.teacher_id == f.teacher_id)
+    if f.status:
+        stmt = stmt.where(ProjectAssessment.status == f.status)
+    if f.date_from:
+        stmt = stmt.where(ProjectAssessment.published_at >= f.date_from)
+    if f.date_to:
+        stmt = stmt.where(ProjectAssessment.published_at <= f.date_to)
+    if f.team_number:
+        stmt = stmt.where(ProjectTeam.team_number == f.team_number)
+    if f.search:
+        search_pattern = f"%{f.search}%"
+        stmt = stmt.where(
+            or_(
+                ProjectAssessment.title.ilike(search_pattern),
+                ProjectTeam.display_name_at_time.ilike(search_pattern),
+            )
+        )
+    return stmt
+
+
+def _peer_rows(school_id: int, f: OverviewItemFilters):
+    # Students that take part in the evaluation (as reviewee)
+    participants = (
+        select(
+            Allocation.evaluation_id.label("evaluation_id"),
+            Allocation.reviewee_id.label("user_id"),
+        )
+        .distinct()
+        .subquery()
+    )
+    stmt = (
+        select(
+            literal("peer").label("type"),
+            literal(1).label("type_order"),
+            Evaluation.id.label("id"),
+            User.id.label("student_id"),
+            User.name.label("student_name"),
+            User.class_name.label("student_class"),
+            Evaluation.title.label("title"),
+            Course.id.label("course_id"),
+            Course.name.label("course_name"),
+            cast(null(), Integer).label("teacher_id"),
+            cast(null(), String).label("teacher_name"),
+            cast(null(), DateTime).label("date"),
+            Evaluation.status.label("status"),
+            User.team_number.label("team_number"),
+            cast(null(), String).label("team_name"),
+            cast(null(), Integer).label("rubric_id"),
+            cast(null(), Float).label("competency_avg"),
+        )
+        .select_from(Evaluation)
+        .outerjoin(Course, Evaluation.course_id == Course.id)
+        .join(participants, participants.c.evaluation_id == Evaluation.id)
+        .join(User, User.id == participants.c.user_id)
+        .where(
+            Evaluation.school_id == school_id,
+            User.school_id == school_id,
+            User.role == "student",
+        )
+    )
+
+    if f.student_id:
+        stmt = stmt.where(User.id == f.student_id)
+    if f.course_id:
+        stmt = stmt.where(Evaluation.course_id == f.course_id)
+    if f.status:
+        stmt = stmt.where(Evaluation.status == f.status)
+    if f.search:
+        stmt = stmt.where(Evaluation.title.ilike(f"%{f.search}%"))
+    return stmt
+
+
+def _competency_rows(school_id: int, f: OverviewItemFilters):
+    # One row per (window, student) with the average self-score pre-aggregated
+    self_scores = (
+        select(
+            CompetencySelfScore.window_id.label("window_id"),
+            CompetencySelfScore.user_id.label("user_id"),
+            func.avg(CompetencySelfScore.score).label("avg_score"),
+        )
+        .group_by(CompetencySelfScore.window_id, CompetencySelfScore.user_id)
+        .subquery()
+    )
+    stmt = (
+        select(
+            literal("competency").label("type"),
+            literal(2).label("type_order"),
+            CompetencyWindow.id.label("id"),
+            User.id.label("student_id"),
+            User.name.label("student_name"),
+            User.class_name.label("student_class"),
+            CompetencyWindow.title.label("title"),
+            Course.id.label("course_id"),
+            Course.name.label("course_name"),
+            cast(null(), Integer).label("teacher_id"),
+            cast(null(), String).label("teacher_name"),
+            CompetencyWindow.end_date.label("date"),
+            CompetencyWindow.status.label("status"),
+            User.team_number.label("team_number"),
+            cast(null(), String).label("team_name"),
+            cast(null(), Integer).label("rubric_id"),
+            cast(self_scores.c.avg_score, Float).label("competency_avg"),
+        )
+        .select_from(CompetencyWindow)
+        .outerjoin(Course, CompetencyWindow.course_id == Course.id)
+        .join(self_scores, self_scores.c.window_id == CompetencyWindow.id)
+        .join(User, User.id == self_scores.c.user_id)
+        .where(CompetencyWindow.school_id == school_id)
+    )
+
+    if f.student_id:
+        stmt = stmt.where(User.id == f.student_id)
+    if f.course_id:
+        stmt = stmt.where(CompetencyWindow.course_id == f.course_id)
+    if f.status:
+        stmt = stmt.where(CompetencyWindow.status == f.status)
+    if f.date_from:
+        stmt = stmt.where(CompetencyWindow.end_date >= f.date_from)
+    if f.date_to:
+        stmt = stmt.where(CompetencyWindow.start_date <= f.date_to)
+    if f.search:
+        stmt = stmt.where(CompetencyWindow.title.ilike(f"%{f.search}%"))
+    return stmt
+
+
+def _build_union(school_id: int, f: OverviewItemFilters):
+    """Return the combined item rows as a subquery, or None if no type matches."""
+    builders = {
+        "project": _project_rows,
+        "peer": _peer_rows,
+        "competency": _competency_rows,
+    }
+    selects = [
+        build(school_id, f)
+        for item_type, build in builders.items()
+        if not f.type_filter or f.type_filter == item_type
+    ]
+    if not selects:
+        return None
+    if len(selects) == 1:
+        return selects[0].subquery("overview_items")
+    return union_all(*selects).subquery("overview_items")
+
+
+def _attach_scores(db: Session, rows: List[Any]) -> List[Dict[str, Any]]:
+    """Resolve scores for the given union rows and build the item dicts."""
+    project_keys = [
+        (r.id, r.rubric_id, r.team_number, r.student_id)
+        for r in rows
+        if r.type == "project"
+    ]
+    peer_pairs = [(r.id, r.student_id) for r in rows if r.type == "peer"]
+
+    project_scores = compute_project_scores_batch(db, project_keys)
+    peer_scores = compute_peer_scores_batch(db, peer_pairs)
+
+    items: List[Dict[str, Any]] = []
+    for r in rows:
+        if r.type == "project":
+            score = project_scores.get((r.id, r.rubric_id, r.team_number, r.student_id))
+            detail_url = f"/teacher/project-assessments/{r.id}/overview"
+        elif r.type == "peer":
+            score = peer_scores.get((r.id, r.student_id))
+            detail_url = f"/teacher/evaluations/{r.id}/dashboard"
+        else:
+            score = competency_avg_to_grade(r.competency_avg)
+            detail_url = f"/teacher/competencies/windows/{r.id}"
+
+        items.append(
+            {
+                "id": r.id,
+                "type": r.type,
+                "student_id": r.student_id,
+                "student_name": r.student_name,
+                "student_class": r.student_class,
+                "title": r.title,
+                "course_name": r.course_name,
+                "course_id": r.course_id,
+                "teacher_name": r.teacher_name,
+                "teacher_id": r.teacher_id,
+                "date": r.date,
+                "score": score,
+                "score_label": f"{score:.1f}" if score else "—",
+                "status": r.status,
+                "detail_url": detail_url,
+                "team_number": r.team_number,
+                "team_name": r.team_name,
+            }
+        )
+    return items
+
+
+def query_overview_items(
+    db: Session,
+    school_id: int,
+    filters: OverviewItemFilters,
+    sort_by: str = "date",
+    sort_order: str = "desc",
+    offset: int = 0,
+    limit: Optional[int] = None,
+) -> OverviewItemsPage:
+    """
+    Fetch one page of overview items for a school.
+
+    Args:
+        db: Database session
+        school_id: School to scope all items to
+        filters: Filters from the request
+        sort_by: "date", "student" or "score" (anything else: stable type order)
+        sort_order: "asc" or "desc"
+        offset: Number of rows to skip
+        limit: Maximum number of rows to return (None = all rows, for exports)
+
+    Returns:
+        OverviewItemsPage with the page items and the totals of the full result
+    """
+    items_sq = _build_union(school_id, filters)
+    if items_sq is None:
+        return OverviewItemsPage(total_by_type={t: 0 for t in ITEM_TYPES})
+
+    # Totals per type for the full (unpaginated) result
+    total_by_type = {t: 0 for t in ITEM_TYPES}
+    for item_type, count in db.execute(
+        select(items_sq.c.type, func.count()).group_by(items_sq.c.type)
+    ).all():
+        total_by_type[item_type] = count
+    total = sum(total_by_type.values())
+
+    descending = sort_order == "desc"
+    # Tie-breakers keep the order deterministic across pages
+    tie_breakers = [items_sq.c.type_order, items_sq.c.id, items_sq.c.student_id]
+
+    if sort_by == "score":
+        rows = db.execute(select(items_sq).order_by(*tie_breakers)).all()
+        items = _attach_scores(db, rows)
+        items.sort(key=lambda x: x["score"] or 0, reverse=descending)
+        end = offset + limit if limit is not None else None
+        return OverviewItemsPage(
+            items=items[offset:end], total=total, total_by_type=total_by_type
+        )
+
+    if sort_by == "date":
+        # Missing dates sort as the earliest possible date
+        order = [
+            (
+                items_sq.c.date.desc().nulls_last()
+                if descending
+                else items_sq.c.date.asc().nulls_first()
+            )
+        ]
+    elif sort_by == "student":
+        order = [
+            items_sq.c.student_name.desc() if descending else items_sq.c.student_name
+        ]
+    else:
+        order = []
+
+    stmt = select(items_sq).order_by(*order, *tie_breakers).offset(offset)
+    if limit is not None:
+        stmt = stmt.limit(limit)
+    rows = db.execute(stmt).all()
+
+    return OverviewItemsPage(
+        items=_attach_scores(db, rows), total=total, total_by_type=total_by_type
+    )
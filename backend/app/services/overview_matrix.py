@@ -0,0 +1,463 @@
+"""
+Batched builder for the student × evaluation matrix (/overview/matrix).
+
+The matrix is built in one pass over bulk-loaded data:
+
+1. Column metadata (project assessments, peer evaluations, competency windows)
+2. The students that take part in each column, one query per column type,
+   with the class / name / course filters applied in SQL
+3. All scores via the batch helpers in ``app.services.overview_scores``
+
+Students and columns get dense indices, and the scores are stored in a
+``len(students) × len(columns)`` grid. Row and column averages and row sorting
+work directly on that grid, so the cost grows with the amount of data loaded
+and not with the number of cells.
+"""
+
+from __future__ import annotations
+
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from sqlalchemy import func, or_, select
+from sqlalchemy.orm import Session, aliased
+
+from app.infra.db.models import (
+    Allocation,
+    CompetencySelfScore,
+    CompetencyWindow,
+    CourseEnrollment,
+    Evaluation,
+    Project,
+    ProjectAssessment,
+    ProjectAssessmentTeam,
+    ProjectTeam,
+    ProjectTeamMember,
+    User,
+)
+from app.services.overview_scores import (
+    competency_avg_to_grade,
+    compute_peer_scores_batch,
+    compute_project_scores_batch,
+)
+
+
+@dataclass
+class MatrixColumn:
+    """One evaluation column; every cell in the column shares this metadata."""
+
+    key: str
+    type: str
+    title: str
+    date: Optional[datetime]
+    evaluation_id: int
+    status: str
+    detail_url: str
+    teacher_name: Optional[str] = None
+
+
+@dataclass
+class MatrixStudent:
+    id: int
+    name: str
+    class_name: Optional[str]
+    student_number: Optional[str]
+
+
+@dataclass
+class OverviewMatrixGrid:
+    """
+    Dense student × column grid.
+
+    ``present[i][j]`` tells whether student *i* takes part in column *j*;
+    ``scores[i][j]`` holds the score (which may be None for a present cell).
+    """
+
+    columns: List[MatrixColumn] = field(default_factory=list)
+    students: List[MatrixStudent] = field(default_factory=list)
+    scores: List[List[Optional[float]]] = field(default_factory=list)
+    present: List[List[bool]] = field(default_factory=list)
+    row_averages: List[Optional[float]] = field(default_factory=list)
+    column_averages: List[Optional[float]] = field(default_factory=list)
+
+    def row_order(self, sort_by: Optional[str], sort_order: str) -> List[int]:
+        """
+        Row indices sorted by a column score, or by student name by default.
+
+        Rows without a score for the sort column always go to the end.
+        """
+        descending = sort_order == "desc"
+        col_index = {c.key: j for j, c in enumerate(self.columns)}
+
+        if sort_by and sort_by != "student":
+            j = col_index.get(sort_by)
+            missing = -999999 if descending else 999999
+
+            def key(i: int) -> float:
+                if j is None:
+                    return missing
+                score = self.scores[i][j]
+                return score if score is not None else missing
+
+            return sorted(range(len(self.students)), key=key, reverse=descending)
+
+        return sorted(
+            range(len(self.students)),
+            key=lambda i: self.students[i].name,
+            reverse=descending,
+        )
+
+
+class _GridBuilder:
+    """Collects columns and cells with dense indices while loading data."""
+
+    def __init__(self) -> None:
+        self.columns: List[MatrixColumn] = []
+        self.students: List[MatrixStudent] = []
+        self._student_index: Dict[int, int] = {}
+        # (student_idx, column_idx) -> score
+        self.cells: Dict[Tuple[int, int], Optional[float]] = {}
+
+    def add_column(self, column: MatrixColumn) -> int:
+        self.columns.append(column)
+        return len(self.columns) - 1
+
+    def student_idx(self, user) -> int:
+        idx = self._student_index.get(user.id)
+        if idx is None:
+            sn = getattr(user, "student_number", None)
+            self.students.append(
+                MatrixStudent(
+                    id=user.id,
+                    name=user.name,
+                    class_name=user.class_name,
+                    student_number=sn if isinstance(sn, str) else None,
+                )
+            )
+            idx = len(self.students) - 1
+            self._student_index[user.id] = idx
+        return idx
+
+    def build(self) -> OverviewMatrixGrid:
+        # Columns are shown chronologically (None dates go to the end)
+        order = sorted(
+            range(len(self.columns)),
+            key=lambda j: (
+                self.columns[j].date is None,
+                self.columns[j].date if self.columns[j].date else datetime.max,
+            ),
+        )
+        new_pos = {old: new for new, old in enumerate(order)}
+
+        n_rows, n_cols = len(self.students), len(self.columns)
+        scores: List[List[Optional[float]]] = [[None] * n_cols for _ in range(n_rows)]
+        present = [[False] * n_cols for _ in range(n_rows)]
+        row_sum = [0.0] * n_rows
+        row_cnt = [0] * n_rows
+        col_sum = [0.0] * n_cols
+        col_cnt = [0] * n_cols
+
+        for (i, old_j), score in self.cells.items():
+            j = new_pos[old_j]
+            present[i][j] = True
+            scores[i][j] = score
+            if score is not None:
+                row_sum[i] += score
+                row_cnt[i] += 1
+                col_sum[j] += score
+                col_cnt[j] += 1
+
+        return OverviewMatrixGrid(
+            columns=[self.columns[j] for j in order],
+            students=self.students,
+            scores=scores,
+            present=present,
+            row_averages=[
+                round(row_sum[i] / row_cnt[i], 2) if row_cnt[i] else None
+                for i in range(n_rows)
+            ],
+            column_averages=[
+                round(col_sum[j] / col_cnt[j], 2) if col_cnt[j] else None
+                for j in range(n_cols)
+            ],
+        )
+
+
+def _student_filters(
+    course_id: Optional[int], class_name: Optional[str], student_name: Optional[str]
+) -> list:
+    """SQL filters on ``User`` shared by all three column types."""
+    filters = [~User.archived, User.role == "student"]
+    if class_name:
+        filters.append(User.class_name == class_name)
+    if student_name:
+        filters.append(User.name.ilike(f"%{student_name}%"))
+    if course_id:
+        # Only students actively enrolled in the course
+        filters.append(
+            User.id.in_(
+                select(CourseEnrollment.student_id).where(
+                    CourseEnrollment.course_id == course_id,
+                    CourseEnrollment.active.is_(True),
+                )
+            )
+        )
+    return filters
+
+
+def _peer_eval_date(evaluation: Evaluation) -> Optional[datetime]:
+    """Use the review deadline from the evaluation settings as column date."""
+    if evaluation.settings and evaluation.settings.get("deadlines"):
+        deadline = evaluation.settings["deadlines"].get("review")
+        if deadline:
+            try:
+                return datetime.fromisoformat(deadline)
+            except (ValueError, TypeError):
+                pass
+    return None
+
+
+def _add_project_columns(
+    db: Session,
+    grid: _GridBuilder,
+    school_id: int,
+    course_id: Optional[int],
+    date_from: Optional[datetime],
+    date_to: Optional[datetime],
+    student_filters: list,
+) -> None:
+    teacher = aliased(User)
+    query = (
+        db.query(
+            ProjectAssessment,
+            ProjectTeam.id,
+            ProjectTeam.team_number,
+            teacher.name,
+        )
+        .join(
+            ProjectAssessmentTeam,
+            ProjectAssessmentTeam.project_assessment_id == ProjectAssessment.id,
+        )
+        .join(ProjectTeam, ProjectTeam.id == ProjectAssessmentTeam.project_team_id)
+        .join(Project, ProjectTeam.project_id == Project.id)
+        .outerjoin(teacher, teacher.id == ProjectAssessment.teacher_id)
+        .filter(
+            ProjectAssessment.school_id == school_id,
+            ProjectAssessment.status == "published",  # Only published projects
+            ProjectAssessment.is_advisory.is_(False),  # Exclude external assessments
+        )
+    )
+    if course_id:
+        query = query.filter(Project.course_id == course_id)
+    if date_from:
+        query = query.filter(ProjectAssessment.published_at >= date_from)
+    if date_to:
+        query = query.filter(ProjectAssessment.published_at <= date_to)
+
+    column_by_assessment: Dict[int, int] = {}
+    # project_team_id -> (column_idx, assessment, team_number)
+    teams: Dict[int, Tuple[int, ProjectAssessment, Optional[int]]] = {}
+    for assessment, team_id, team_number, teacher_name in query.all():
+        if assessment.id not in column_by_assessment:
+            column_by_assessment[assessment.id] = grid.add_column(
+                MatrixColumn(
+                    key=f"project_{assessment.id}",
+                    type="project",
+                    title=assessment.title,
+                    date=assessment.published_at,
+                    evaluation_id=assessment.id,
+                    status=assessment.status,
+                    teacher_name=teacher_name,
+                    detail_url=f"/teacher/project-assessments/{assessment.id}/overview",
+                )
+            )
+        teams[team_id] = (column_by_assessment[assessment.id], assessment, team_number)
+
+    if not teams:
+        return
+
+    # All members of all teams in one query (only active students)
+    members = (
+        db.query(ProjectTeamMember.project_team_id, User)
+        .join(User, User.id == ProjectTeamMember.user_id)
+        .filter(ProjectTeamMember.project_team_id.in_(teams.keys()), *student_filters)
+        .all()
+    )
+
+    cell_keys = []
+    for team_id, member in members:
+        col, assessment, team_number = teams[team_id]
+        # Use ProjectTeam.team_number (not User.team_number); individual
+        # overrides of the member are applied on top of the team scores
+        key = (
+            (assessment.id, assessment.rubric_id, team_number, member.id)
+            if team_number is not None
+            else None
+        )
+        cell_keys.append((grid.student_idx(member), col, key))
+
+    scores = compute_project_scores_batch(db, [k for _, _, k in cell_keys if k])
+    for row, col, key in cell_keys:
+        grid.cells[(row, col)] = scores.get(key) if key else None
+
+
+def _add_peer_columns(
+    db: Session,
+    grid: _GridBuilder,
+    school_id: int,
+    course_id: Optional[int],
+    student_filters: list,
+) -> None:
+    query = db.query(Evaluation).filter(
+        Evaluation.school_id == school_id,
+        or_(Evaluation.status == "open", Evaluation.status == "closed"),
+    )
+    if course_id:
+        query = query.filter(Evaluation.course_id == course_id)
+
+    column_by_eval: Dict[int, int] = {}
+    for evaluation in query.all():
+        column_by_eval[evaluation.id] = grid.add_column(
+            MatrixColumn(
+                key=f"peer_{evaluation.id}",
+                type="peer",
+                title=evaluation.title,
+                date=_peer_eval_date(evaluation),
+                evaluation_id=evaluation.id,
+                status=evaluation.status,
+                detail_url=f"/teacher/evaluations/{evaluation.id}/dashboard",
+            )
+        )
+
+    if not column_by_eval:
+        return
+
+    # Students with allocations (as reviewee) in any of the evaluations
+    participants = (
+        db.query(Allocation.evaluation_id, User)
+        .join(User, User.id == Allocation.reviewee_id)
+        .filter(Allocation.evaluation_id.in_(column_by_eval.keys()), *student_filters)
+        .distinct()
+        .all()
+    )
+
+    scores = compute_peer_scores_batch(
+        db, [(evaluation_id, student.id) for evaluation_id, student in participants]
+    )
+    for evaluation_id, student in participants:
+        grid.cells[(grid.student_idx(student), column_by_eval[evaluation_id])] = (
+            scores.get((evaluation_id, student.id))
+        )
+
+
+def _add_competency_columns(
+    db: Session,
+    grid: _GridBuilder,
+    school_id: int,
+    course_id: Optional[int],
+    date_from: Optional[datetime],
+    date_to: Optional[datetime],
+    student_filters: list,
+) -> None:
+    query = db.query(CompetencyWindow).filter(CompetencyWindow.school_id == school_id)
+    if course_id:
+        query = query.filter(CompetencyWindow.course_id == course_id)
+    if date_from:
+        query = query.filter(CompetencyWindow.end_date >= date_from)
+    if date_to:
+        query = query.filter(CompetencyWindow.start_date <= date_to)
+
+    column_by_window: Dict[int, int] = {}
+    for window in query.all():
+        column_by_window[window.id] = grid.add_column(
+            MatrixColumn(
+                key=f"competency_{window.id}",
+                type="competency",
+                title=window.title,
+                date=window.end_date,
+                evaluation_id=window.id,
+                status=window.status,
+                detail_url=f"/teacher/competencies/windows/{window.id}",
+            )
+        )
+
+    if not column_by_window:
+        return
+
+    # Average self-score per (window, student), aggregated in SQL
+    averages = (
+        db.query(
+            CompetencySelfScore.window_id.label("window_id"),
+            CompetencySelfScore.user_id.label("user_id"),
+            func.avg(CompetencySelfScore.score).label("avg_score"),
+        )
+        .filter(CompetencySelfScore.window_id.in_(column_by_window.keys()))
+        .group_by(CompetencySelfScore.window_id, CompetencySelfScore.user_id)
+        .subquery()
+    )
+    rows = (
+        db.query(averages.c.window_id, averages.c.avg_score, User)
+        .join(User, User.id == averages.c.user_id)
+        .filter(*student_filters)
+        .all()
+    )
+    for window_id, avg_score, student in rows:
+        grid.cells[(grid.student_idx(student), column_by_window[window_id])] = (
+            competency_avg_to_grade(avg_score)
+        )
+
+
+def build_overview_matrix(
+    db: Session,
+    school_id: int,
+    course_id: Optional[int] = None,
+    class_name: Optional[str] = None,
+    student_name: Optional[str] = None,
+    date_from: Optional[datetime] = None,
+    date_to: Optional[datetime] = None,
+) -> OverviewMatrixGrid:
+    """
+    Build the student × evaluation grid for a school.
+
+    Args:
+        db: Database session
+        school_id: School to scope all data to
+        course_id: Only columns of this course and students enrolled in it
+        class_name: Only students of this class
+        student_name: Only students whose name contains this text
+        date_from: Only projects/windows on or after this date
+        date_to: Only projects/windows on or before this date
+
+    Returns:
+        OverviewMatrixGrid with chronologically ordered columns
+    """
+    grid = _GridBuilder()
+    student_filters = _student_filters(course_id, class_name, student_name)
+
+    _add_project_columns(
+        db, grid, school_id, course_id, date_from, date_to, student_filters
+    )
+    _add_peer_columns(db, grid, school_id, course_id, student_filters)
+    _add_competency_columns(
+        db, grid, school_id, course_id, date_from, date_to, student_filters
+    )
+
+    return grid.build()
+
+
+def iter_matrix_csv_rows(
+    grid: OverviewMatrixGrid, row_order: List[int]
+) -> Iterator[List[str]]:
+    """Yield the CSV header and one row per student, straight from the grid."""
+    header = ["Leerlingnummer", "Leerling", "Klas"]
+    header.extend(f"{col.title} ({col.type})" for col in grid.columns)
+    yield header
+
+    for i in row_order:
+        student = grid.students[i]
+        row = [student.student_number or "", student.name, student.class_name or ""]
+        row.extend(
+            f"{score:.1f}" if score is not None else "" for score in grid.scores[i]
+        )
+        yield row
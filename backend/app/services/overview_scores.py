@@ -0,0 +1,338 @@
+"""
+Batch score lookups for the overview endpoints.
+
+The overview pages show one score per (student, item) pair for project
+assessments, peer evaluations and competency windows. Computing those one
+pair at a time costs several queries per cell; the helpers in this module load
+everything needed for a whole set of pairs with a fixed number of queries and
+then resolve the individual scores in memory.
+
+The resolution rules are identical to the original per-student helpers:
+- project: weighted rubric average (team scores + student overrides) mapped to
+  a 1-10 grade with the curved mapping from ``app.core.grading``
+- peer: published grade > cell override > group grade × GCF > suggested grade
+- competency: average self-score on the 1-5 scale mapped linearly to 1-10
+"""
+
+from __future__ import annotations
+
+import logging
+from collections import defaultdict
+from typing import Any, Dict, Iterable, Optional, Tuple
+
+from sqlalchemy import func, or_
+from sqlalchemy.orm import Session
+
+from app.core.constants import MAX_REASONABLE_GCF
+from app.core.grading import score_to_grade
+from app.infra.db.models import (
+    CompetencySelfScore,
+    Grade,
+    ProjectAssessmentScore,
+    PublishedGrade,
+    Rubric,
+    RubricCriterion,
+)
+
+logger = logging.getLogger(__name__)
+
+# (assessment_id, rubric_id, team_number, student_id)
+ProjectScoreKey = Tuple[int, int, Optional[int], int]
+
+
+def _get_grade_value(
+    grade: Any, field_name: str, meta_key: Optional[str] = None
+) -> Optional[float]:
+    """
+    Get a grade value from either the direct column or the meta dictionary.
+
+    Older grade rows only store their values in ``meta``; the direct column
+    wins when both are present.
+    """
+    if meta_key is None:
+        meta_key = field_name
+
+    value = getattr(grade, field_name, None)
+
+    if value is None and grade.meta and isinstance(grade.meta, dict):
+        value = grade.meta.get(meta_key)
+
+    return value
+
+
+def resolve_peer_grade(
+    published: Any, grade: Any, evaluation_id: int, user_id: int
+) -> Optional[float]:
+    """
+    Resolve the final peer evaluation grade (Eindcijfer) for one student.
+
+    Priority order:
+    0. PublishedGrade.grade (published grades take precedence)
+    1. Direct override from Grade.grade field (cell override)
+    2. Group grade × GCF (Grade.group_grade × Grade.gcf)
+    3. Suggested grade (Grade.suggested_grade or from meta)
+
+    Args:
+        published: PublishedGrade row (or None)
+        grade: Grade row (or None)
+        evaluation_id: Used for log context only
+        user_id: Used for log context only
+    """
+    if published is not None and published.grade is not None:
+        return round(float(published.grade), 1)
+
+    if grade is None:
+        return None
+
+    # Priority 1: Direct override in cell (Grade.grade)
+    if grade.grade is not None:
+        return round(float(grade.grade), 1)
+
+    # Priority 2: Group grade × GCF
+    group_grade = _get_grade_value(grade, "group_grade")
+    gcf = _get_grade_value(grade, "gcf")
+
+    if group_grade is not None and gcf is not None:
+        try:
+            group_grade_float = float(group_grade)
+            gcf_float = float(gcf)
+
+            # Group grades typically range from 1 to 10, GCF from 0.5 to 1.5
+            if group_grade_float <= 0 or gcf_float <= 0:
+                logger.warning(
+                    f"Non-positive group_grade ({group_grade_float}) or gcf ({gcf_float}) for "
+                    f"evaluation_id={evaluation_id}, user_id={user_id}"
+                )
+            else:
+                # Log suspiciously high GCF but still use it to preserve
+                # teacher flexibility
+                if gcf_float > MAX_REASONABLE_GCF:
+                    logger.warning(
+                        f"Unusually high gcf ({gcf_float}) for "
+                        f"evaluation_id={evaluation_id}, user_id={user_id}"
+                    )
+                return round(group_grade_float * gcf_float, 1)
+        except (ValueError, TypeError) as e:
+            logger.warning(
+                f"Invalid group_grade ({group_grade}) or gcf ({gcf}) for "
+                f"evaluation_id={evaluation_id}, user_id={user_id}: {e}"
+            )
+
+    # Priority 3: Suggested grade
+    suggested_grade = _get_grade_value(grade, "suggested_grade", "suggested")
+    if suggested_grade is not None:
+        try:
+            return round(float(suggested_grade), 1)
+        except (ValueError, TypeError) as e:
+            logger.warning(
+                f"Invalid suggested_grade ({suggested_grade}) for "
+                f"evaluation_id={evaluation_id}, user_id={user_id}: {e}"
+            )
+
+    return None
+
+
+def competency_avg_to_grade(avg_score: Optional[float]) -> Optional[float]:
+    """Convert an average 1-5 competency self-score to a 1-10 grade."""
+    if not avg_score:
+        return None
+    grade = 1 + ((float(avg_score) - 1) / 4) * 9  # Maps 1-5 to 1-10
+    return round(grade, 1)
+
+
+def weighted_project_grade(
+    score_map: Dict[int, float],
+    criteria: Iterable[Tuple[int, float]],
+    scale_min: int,
+    scale_max: int,
+) -> Optional[float]:
+    """
+    Weighted rubric average for one student, mapped to a 1-10 grade.
+
+    Args:
+        score_map: criterion_id -> score (team scores with overrides applied)
+        criteria: (criterion_id, weight) pairs of the rubric
+        scale_min: Rubric scale minimum
+        scale_max: Rubric scale maximum
+    """
+    total_weighted_score = 0.0
+    total_weight = 0.0
+    for criterion_id, weight in criteria:
+        if criterion_id in score_map:
+            total_weighted_score += score_map[criterion_id] * weight
+            total_weight += weight
+
+    if total_weight == 0:
+        return None
+
+    return score_to_grade(total_weighted_score / total_weight, scale_min, scale_max)
+
+
+def compute_project_scores_batch(
+    db: Session, keys: Iterable[ProjectScoreKey]
+) -> Dict[ProjectScoreKey, Optional[float]]:
+    """
+    Compute project assessment grades for many (assessment, team, student) keys.
+
+    Uses two queries regardless of the number of keys: one for the rubrics and
+    their criteria, one for all team scores plus the relevant student
+    overrides.
+
+    Returns:
+        Mapping of every requested key to its grade (or None)
+    """
+    keys = list(dict.fromkeys(keys))
+    results: Dict[ProjectScoreKey, Optional[float]] = {k: None for k in keys}
+    if not keys:
+        return results
+
+    assessment_ids = {k[0] for k in keys}
+    rubric_ids = {k[1] for k in keys}
+    student_ids = {k[3] for k in keys}
+
+    # Rubric scale and criteria for all rubrics in one query
+    rubric_scale: Dict[int, Tuple[int, int]] = {}
+    rubric_criteria: Dict[int, list[Tuple[int, float]]] = defaultdict(list)
+    rows = (
+        db.query(
+            Rubric.id,
+            Rubric.scale_min,
+            Rubric.scale_max,
+            RubricCriterion.id,
+            RubricCriterion.weight,
+        )
+        .outerjoin(RubricCriterion, RubricCriterion.rubric_id == Rubric.id)
+        .filter(Rubric.id.in_(rubric_ids))
+        .all()
+    )
+    for rubric_id, scale_min, scale_max, criterion_id, weight in rows:
+        rubric_scale[rubric_id] = (scale_min, scale_max)
+        if criterion_id is not None:
+            rubric_criteria[rubric_id].append((criterion_id, weight))
+
+    # Team scores and the requested students' overrides in one query
+    team_scores: Dict[Tuple[int, Optional[int]], Dict[int, float]] = defaultdict(dict)
+    overrides: Dict[Tuple[int, Optional[int], int], Dict[int, float]] = defaultdict(
+        dict
+    )
+    score_rows = (
+        db.query(
+            ProjectAssessmentScore.assessment_id,
+            ProjectAssessmentScore.team_number,
+            ProjectAssessmentScore.student_id,
+            ProjectAssessmentScore.criterion_id,
+            ProjectAssessmentScore.score,
+        )
+        .filter(
+            ProjectAssessmentScore.assessment_id.in_(assessment_ids),
+            or_(
+                ProjectAssessmentScore.student_id.is_(None),
+                ProjectAssessmentScore.student_id.in_(student_ids),
+            ),
+        )
+        .all()
+    )
+    for assessment_id, team_number, student_id, criterion_id, score in score_rows:
+        if student_id is None:
+            team_scores[(assessment_id, team_number)][criterion_id] = score
+        else:
+            overrides[(assessment_id, team_number, student_id)][criterion_id] = score
+
+    for key in keys:
+        assessment_id, rubric_id, team_number, student_id = key
+        if rubric_id not in rubric_scale or not rubric_criteria.get(rubric_id):
+            continue
+
+        team_map = team_scores.get((assessment_id, team_number), {})
+        student_map = overrides.get((assessment_id, team_number, student_id), {})
+        if not team_map and not student_map:
+            continue
+
+        # Student overrides take precedence over the team scores
+        score_map = {**team_map, **student_map}
+        scale_min, scale_max = rubric_scale[rubric_id]
+        results[key] = weighted_project_grade(
+            score_map, rubric_criteria[rubric_id], scale_min, scale_max
+        )
+
+    return results
+
+
+def compute_peer_scores_batch(
+    db: Session, pairs: Iterable[Tuple[int, int]]
+) -> Dict[Tuple[int, int], Optional[float]]:
+    """
+    Compute final peer evaluation grades for many (evaluation_id, user_id) pairs.
+
+    Uses two queries (PublishedGrade and Grade) regardless of the number of
+    pairs.
+    """
+    pairs = list(dict.fromkeys(pairs))
+    results: Dict[Tuple[int, int], Optional[float]] = {p: None for p in pairs}
+    if not pairs:
+        return results
+
+    evaluation_ids = {p[0] for p in pairs}
+    user_ids = {p[1] for p in pairs}
+
+    published_by_pair = {
+        (pg.evaluation_id, pg.user_id): pg
+        for pg in db.query(PublishedGrade)
+        .filter(
+            PublishedGrade.evaluation_id.in_(evaluation_ids),
+            PublishedGrade.user_id.in_(user_ids),
+        )
+        .all()
+    }
+    grade_by_pair = {
+        (g.evaluation_id, g.user_id): g
+        for g in db.query(Grade)
+        .filter(Grade.evaluation_id.in_(evaluation_ids), Grade.user_id.in_(user_ids))
+        .all()
+    }
+
+    for evaluation_id, user_id in pairs:
+        results[(evaluation_id, user_id)] = resolve_peer_grade(
+            published_by_pair.get((evaluation_id, user_id)),
+            grade_by_pair.get((evaluation_id, user_id)),
+            evaluation_id,
+            user_id,
+        )
+
+    return results
+
+
+def compute_competency_scores_batch(
+    db: Session, pairs: Iterable[Tuple[int, int]]
+) -> Dict[Tuple[int, int], Optional[float]]:
+    """
+    Compute competency grades for many (window_id, user_id) pairs.
+
+    Uses one grouped ``AVG`` query regardless of the number of pairs.
+    """
+    pairs = list(dict.fromkeys(pairs))
+    results: Dict[Tuple[int, int], Optional[float]] = {p: None for p in pairs}
+    if not pairs:
+        return results
+
+    window_ids = {p[0] for p in pairs}
+    user_ids = {p[1] for p in pairs}
+
+    rows = (
+        db.query(
+            CompetencySelfScore.window_id,
+            CompetencySelfScore.user_id,
+            func.avg(CompetencySelfScore.score),
+        )
+        .filter(
+            CompetencySelfScore.window_id.in_(window_ids),
+            CompetencySelfScore.user_id.in_(user_ids),
+        )
+        .group_by(CompetencySelfScore.window_id, CompetencySelfScore.user_id)
+        .all()
+    )
+    for window_id, user_id, avg_score in rows:
+        if (window_id, user_id) in results:
+            results[(window_id, user_id)] = competency_avg_to_grade(avg_score)
+
+    return results
@@ -0,0 +1,185 @@
+"""
+In-process cache of RFID card lookups for the scan endpoint.
+
+At the start of a school day hundreds of students tap in within minutes, and
+every ``/attendance/scan`` used to resolve the card and its user from the
+database first. ``resolve_rfid_card`` keeps the user info of an active card
+(id, name, email, class) per card uid for ``RFID_CARD_CACHE_TTL_SECONDS``, so a
+repeated scan only touches the attendance tables. ``resolve_rfid_cards`` does
+the same for a whole batch of buffered taps with at most one query.
+
+The cache is per worker process. Changes made through the API invalidate the
+entries in the process that handled the change (``invalidate_rfid_card`` from
+the RFID card endpoints, ``invalidate_rfid_user`` when a user is edited,
+archived or deleted); other workers pick the change up when their entry
+expires. Unknown or inactive cards are never cached, so a newly registered card
+works immediately everywhere.
+"""
+
+from __future__ import annotations
+
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Dict, Iterable, Optional
+
+from sqlalchemy.orm import Session
+
+from app.infra.db.models import RFIDCard, User
+
+# Seconds a resolved card may be reused
+RFID_CARD_CACHE_TTL_SECONDS = 60.0
+RFID_CARD_CACHE_MAX_ENTRIES = 4096
+
+
+@dataclass
+class _CacheEntry:
+    expires_at: float
+    user: Dict[str, Any]
+
+
+_cache: "OrderedDict[str, _CacheEntry]" = OrderedDict()
+_cache_lock = threading.Lock()
+_stats = {"hits": 0, "misses": 0, "invalidations": 0}
+
+
+def _load_card_user(db: Session, uid: str) -> Optional[Dict[str, Any]]:
+    """User info of the active card with this uid, in one query."""
+    found = (
+        db.query(User.id, User.name, User.email, User.class_name)
+        .filter(
+            RFIDCard.uid == uid,
+            RFIDCard.is_active.is_(True),
+            User.id == RFIDCard.user_id,
+        )
+        .first()
+    )
+    if not found:
+        return None
+    user_id, name, email, class_name = found
+    return {"id": user_id, "name": name, "email": email, "class_name": class_name}
+
+
+def resolve_rfid_card(db: Session, uid: str) -> Optional[Dict[str, Any]]:
+    """
+    User info (id, name, email, class_name) of the active card ``uid``.
+
+    Returns a copy, or None when no active card with this uid exists.
+    """
+    now = time.monotonic()
+    with _cache_lock:
+        entry = _cache.get(uid)
+        if entry is not None and entry.expires_at > now:
+            _cache.move_to_end(uid)
+            _stats["hits"] += 1
+            return dict(entry.user)
+        _stats["misses"] += 1
+
+    user = _load_card_user(db, uid)
+    if user is None:
+        return None
+
+    with _cache_lock:
+        _cache[uid] = _CacheEntry(
+            expires_at=now + RFID_CARD_CACHE_TTL_SECONDS, user=user
+        )
+        _cache.move_to_end(uid)
+        while len(_cache) > RFID_CARD_CACHE_MAX_ENTRIES:
+            _cache.popitem(last=False)
+    return dict(user)
+
+
+def resolve_rfid_cards(db: Session, uids: Iterable[str]) -> Dict[str, Dict[str, Any]]:
+    """
+    Bulk variant of ``resolve_rfid_card``: user info per active card uid.
+
+    Cached uids are served from the cache, the rest are loaded in one query.
+    Unknown or inactive uids are missing from the result.
+    """
+    now = time.monotonic()
+    resolved: Dict[str, Dict[str, Any]] = {}
+    missing = []
+    with _cache_lock:
+        for uid in dict.fromkeys(uids):
+            entry = _cache.get(uid)
+            if entry is not None and entry.expires_at > now:
+                _cache.move_to_end(uid)
+                _stats["hits"] += 1
+                resolved[uid] = dict(entry.user)
+            else:
+                _stats["misses"] += 1
+                missing.append(uid)
+
+    if not missing:
+        return resolved
+
+    rows = (
+        db.query(RFIDCard.uid, User.id, User.name, User.email, User.class_name)
+        .filter(
+            RFIDCard.uid.in_(missing),
+            RFIDCard.is_active.is_(True),
+            User.id == RFIDCard.user_id,
+        )
+        .all()
+    )
+    with _cache_lock:
+        for uid, user_id, name, email, class_name in rows:
+            user = {
+                "id": user_id,
+                "name": name,
+                "email": email,
+                "class_name": class_name,
+            }
+            _cache[uid] = _CacheEntry(
+                expires_at=now + RFID_CARD_CACHE_TTL_SECONDS, user=user
+            )
+            _cache.move_to_end(uid)
+            resolved[uid] = dict(user)
+        while len(_cache) > RFID_CARD_CACHE_MAX_ENTRIES:
+            _cache.popitem(last=False)
+    return resolved
+
+
+def invalidate_rfid_card(uid: str) -> None:
+    """Forget the cached lookup of one card uid."""
+    with _cache_lock:
+        if _cache.pop(uid, None) is not None:
+            _stats["invalidations"] += 1
+
+
+def invalidate_rfid_user(user_id: int) -> None:
+    """Forget every cached card of a user (edited, archived or deleted)."""
+    with _cache_lock:
+        for uid in [uid for uid, e in _cache.items() if e.user["id"] == user_id]:
+            del _cache[uid]
+            _stats["invalidations"] += 1
+
+
+def clear_rfid_card_cache() -> None:
+    """Drop all cached cards (e.g. after a bulk user import)."""
+    with _cache_lock:
+        _stats["invalidations"] += len(_cache)
+        _cache.clear()
+
+
+def reset_rfid_card_cache_stats() -> None:
+    """Reset the hit / miss / invalidation counters."""
+    with _cache_lock:
+        for key in _stats:
+            _stats[key] = 0
+
+
+def get_rfid_card_cache_stats() -> Dict[str, Any]:
+    """Hit / miss counters and size of this process' cache."""
+    with _cache_lock:
+        hits, misses = _stats["hits"], _stats["misses"]
+        return {
+            "size": len(_cache),
+            "max_entries": RFID_CARD_CACHE_MAX_ENTRIES,
+            "ttl_seconds": RFID_CARD_CACHE_TTL_SECONDS,
+            "hits": hits,
+            "misses": misses,
+            "invalidations": _stats["invalidations"],
+            "hit_rate": round(hits / (hits + misses), 4) if hits + misses else 0.0,
+        }
@@ -0,0 +1,27 @@
+"""
+Gunicorn settings (loaded automatically from the working directory).
+
+The command-line flags in the Dockerfile still apply; this file only adds what
+the Prometheus metrics need to be aggregated over the workers: a shared
+multiprocess directory, emptied when gunicorn starts, and cleanup of the
+live gauges of a worker that exits.
+"""
+
+import os
+import shutil
+
+# Must be set before the workers import prometheus_client
+PROMETHEUS_MULTIPROC_DIR = os.environ.setdefault(
+    "PROMETHEUS_MULTIPROC_DIR", "/tmp/tea-metrics"
+)
+
+
+def on_starting(server):
+    shutil.rmtree(PROMETHEUS_MULTIPROC_DIR, ignore_errors=True)
+    os.makedirs(PROMETHEUS_MULTIPROC_DIR, exist_ok=True)
+
+
+def child_exit(server, worker):
+    from prometheus_client import multiprocess
+
+    multiprocess.mark_process_dead(worker.pid)
@@ -0,0 +1,77 @@
+"""attendance_aggregate_pending_seconds
+
+Revision ID: b4c5d6e7f8a9
+Revises: a3b4c5d6e7f8
+Create Date: 2026-04-20 09:00:00.000000
+
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = "b4c5d6e7f8a9"
+down_revision = "a3b4c5d6e7f8"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    """
+    Add total_external_pending_seconds to attendance_aggregates and fill the
+    table from attendance_events, so the overview can read totals from it.
+    """
+    op.add_column(
+        "attendance_aggregates",
+        sa.Column(
+            "total_external_pending_seconds",
+            sa.Integer(),
+            nullable=False,
+            server_default="0",
+        ),
+    )
+
+    op.execute("""
+        INSERT INTO attendance_aggregates (
+            user_id,
+            total_school_seconds,
+            total_external_approved_seconds,
+            total_external_pending_seconds,
+            lesson_blocks,
+            last_recomputed_at
+        )
+        SELECT
+            t.user_id,
+            t.school,
+            t.approved,
+            t.pending,
+            ROUND((t.school + t.approved) / 4500.0, 1),
+            NOW() AT TIME ZONE 'UTC'
+        FROM (
+            SELECT
+                user_id,
+                COALESCE(SUM(CASE WHEN NOT is_external
+                    THEN EXTRACT(EPOCH FROM check_out - check_in) END), 0)::int
+                    AS school,
+                COALESCE(SUM(CASE WHEN is_external AND approval_status = 'approved'
+                    THEN EXTRACT(EPOCH FROM check_out - check_in) END), 0)::int
+                    AS approved,
+                COALESCE(SUM(CASE WHEN is_external AND approval_status = 'pending'
+                    THEN EXTRACT(EPOCH FROM check_out - check_in) END), 0)::int
+                    AS pending
+            FROM attendance_events
+            WHERE check_out IS NOT NULL
+            GROUP BY user_id
+        ) AS t
+        ON CONFLICT (user_id) DO UPDATE SET
+            total_school_seconds = EXCLUDED.total_school_seconds,
+            total_external_approved_seconds = EXCLUDED.total_external_approved_seconds,
+            total_external_pending_seconds = EXCLUDED.total_external_pending_seconds,
+            lesson_blocks = EXCLUDED.lesson_blocks,
+            last_recomputed_at = EXCLUDED.last_recomputed_at
+        """)
+
+
+def downgrade() -> None:
+    """Remove total_external_pending_seconds from attendance_aggregates."""
+    op.drop_column("attendance_aggregates", "total_external_pending_seconds")
@@ -0,0 +1,105 @@
+"""attendance_daily_rollups
+
+Revision ID: c5d6e7f8a9b0
+Revises: b4c5d6e7f8a9
+Create Date: 2026-05-04 09:00:00.000000
+
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = "c5d6e7f8a9b0"
+down_revision = "b4c5d6e7f8a9"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    """
+    Create attendance_daily_rollups and its watermark table.
+
+    The tables start empty: without a watermark the statistics are computed
+    from attendance_events, and the scheduler rolls up the closed days on its
+    next tick (or run scripts/rebuild_attendance_rollups.py).
+    """
+    op.create_table(
+        "attendance_daily_rollups",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("school_id", sa.Integer(), nullable=False),
+        sa.Column("user_id", sa.Integer(), nullable=False),
+        sa.Column("day", sa.Date(), nullable=False),
+        sa.Column("project_id", sa.Integer(), nullable=True),
+        sa.Column("school_seconds", sa.Integer(), nullable=False),
+        sa.Column("extern_approved_seconds", sa.Integer(), nullable=False),
+        sa.Column("pending_count", sa.Integer(), nullable=False),
+        sa.Column("school_check_ins", sa.Integer(), nullable=False),
+        sa.Column("check_in_hours", sa.Integer(), nullable=False),
+        sa.Column(
+            "created_at",
+            sa.DateTime(timezone=True),
+            server_default=sa.text("now()"),
+            nullable=False,
+        ),
+        sa.Column(
+            "updated_at",
+            sa.DateTime(timezone=True),
+            server_default=sa.text("now()"),
+            nullable=False,
+        ),
+        sa.ForeignKeyConstraint(["school_id"], ["schools.id"], ondelete="CASCADE"),
+        sa.ForeignKeyConstraint(["user_id"], ["users.id"], ondelete="CASCADE"),
+        sa.ForeignKeyConstraint(["project_id"], ["projects.id"], ondelete="SET NULL"),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index(
+        "ix_attendance_daily_rollups_id", "attendance_daily_rollups", ["id"]
+    )
+    op.create_index(
+        "ix_attendance_daily_rollups_school_day",
+        "attendance_daily_rollups",
+        ["school_id", "day"],
+    )
+    op.create_index(
+        "ix_attendance_daily_rollups_user_day",
+        "attendance_daily_rollups",
+        ["user_id", "day"],
+    )
+
+    op.create_table(
+        "attendance_rollup_state",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("rolled_up_through", sa.Date(), nullable=True),
+        sa.Column(
+            "created_at",
+            sa.DateTime(timezone=True),
+            server_default=sa.text("now()"),
+            nullable=False,
+        ),
+        sa.Column(
+            "updated_at",
+            sa.DateTime(timezone=True),
+            server_default=sa.text("now()"),
+            nullable=False,
+        ),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index("ix_attendance_rollup_state_id", "attendance_rollup_state", ["id"])
+
+
+def downgrade() -> None:
+    """Drop the attendance rollup tables."""
+    op.drop_index("ix_attendance_rollup_state_id", table_name="attendance_rollup_state")
+    op.drop_table("attendance_rollup_state")
+    op.drop_index(
+        "ix_attendance_daily_rollups_user_day", table_name="attendance_daily_rollups"
+    )
+    op.drop_index(
+        "ix_attendance_daily_rollups_school_day",
+        table_name="attendance_daily_rollups",
+    )
+    op.drop_index(
+        "ix_attendance_daily_rollups_id", table_name="attendance_daily_rollups"
+    )
+    op.drop_table("attendance_daily_rollups")
@@ -0,0 +1,59 @@
+"""llm_cache_entries
+
+Revision ID: d6e7f8a9b0c1
+Revises: c5d6e7f8a9b0
+Create Date: 2026-05-11 09:00:00.000000
+
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = "d6e7f8a9b0c1"
+down_revision = "c5d6e7f8a9b0"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    """
+    Create llm_cache_entries, the Postgres tier of the LLM result cache.
+
+    Starts empty; it fills as summaries are generated.
+    """
+    op.create_table(
+        "llm_cache_entries",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("cache_key", sa.String(length=64), nullable=False),
+        sa.Column("stage", sa.String(length=20), nullable=False),
+        sa.Column("model", sa.String(length=100), nullable=False),
+        sa.Column("prompt_version", sa.String(length=50), nullable=False),
+        sa.Column("response", sa.Text(), nullable=False),
+        sa.Column("hit_count", sa.Integer(), nullable=False),
+        sa.Column("last_used_at", sa.DateTime(timezone=True), nullable=False),
+        sa.Column(
+            "created_at",
+            sa.DateTime(timezone=True),
+            server_default=sa.text("now()"),
+            nullable=False,
+        ),
+        sa.Column(
+            "updated_at",
+            sa.DateTime(timezone=True),
+            server_default=sa.text("now()"),
+            nullable=False,
+        ),
+        sa.PrimaryKeyConstraint("id"),
+        sa.UniqueConstraint("cache_key"),
+    )
+    op.create_index("ix_llm_cache_entries_id", "llm_cache_entries", ["id"])
+    op.create_index(
+        "ix_llm_cache_entries_last_used", "llm_cache_entries", ["last_used_at"]
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_llm_cache_entries_last_used", table_name="llm_cache_entries")
+    op.drop_index("ix_llm_cache_entries_id", table_name="llm_cache_entries")
+    op.drop_table("llm_cache_entries")
@@ -0,0 +1,46 @@
+"""unique attendance_daily_rollups per user, day and project
+
+Revision ID: e7f8a9b0c1d2
+Revises: d6e7f8a9b0c1
+Create Date: 2026-05-18 09:00:00.000000
+
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = "e7f8a9b0c1d2"
+down_revision = "d6e7f8a9b0c1"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    """
+    Allow one rollup row per (user_id, day, project), no project counting as 0.
+
+    Concurrent refreshes could insert a user-day twice; keep the newest row of
+    each duplicate before creating the index.
+    """
+    op.execute("""
+        DELETE FROM attendance_daily_rollups a
+        USING attendance_daily_rollups b
+        WHERE a.user_id = b.user_id
+          AND a.day = b.day
+          AND COALESCE(a.project_id, 0) = COALESCE(b.project_id, 0)
+          AND a.id < b.id
+        """)
+    op.create_index(
+        "uq_attendance_daily_rollups_user_day_project",
+        "attendance_daily_rollups",
+        ["user_id", "day", sa.text("COALESCE(project_id, 0)")],
+        unique=True,
+    )
+
+
+def downgrade() -> None:
+    op.drop_index(
+        "uq_attendance_daily_rollups_user_day_project",
+        table_name="attendance_daily_rollups",
+    )
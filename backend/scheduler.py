@@ -6,8 +6,11 @@ Usage:
     python scheduler.py
 
 This process runs continuously and executes scheduled jobs at their designated times.
+Every tick it also runs built-in maintenance such as closing forgotten
+attendance check-outs and rolling up the attendance statistics of past days.
 """
 
+import os
 import sys
 import time
 import logging
@@ -18,6 +21,9 @@ from datetime import datetime
 backend_dir = Path(__file__).parent
 sys.path.insert(0, str(backend_dir))
 
+# Size the database pool for a job process, not for an API worker
+os.environ.setdefault("DB_PROCESS_ROLE", "worker")
+
 from app.infra.db.session import SessionLocal  # noqa: E402
 from app.infra.services.scheduler_service import SchedulerService  # noqa: E402
 
@@ -41,6 +47,13 @@ def main():
                 db = SessionLocal()
                 scheduler = SchedulerService(db)
 
+                # Built-in maintenance (e.g. forgotten attendance check-outs)
+                try:
+                    scheduler.run_maintenance()
+                except Exception as e:
+                    db.rollback()
+                    logger.error(f"Error in scheduler maintenance: {e}", exc_info=True)
+
                 # Execute due jobs
                 executed_count = scheduler.run_scheduler_tick()
 
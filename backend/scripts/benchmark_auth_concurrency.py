@@ -0,0 +1,154 @@
+#!/usr/bin/env python3
+"""
+Benchmark authenticated requests with many concurrent clients.
+
+Serves one authenticated endpoint twice from an in-process FastAPI app: once
+behind the current ``get_current_user_prod`` (a sync dependency that FastAPI
+runs in its threadpool) and once behind an ``async def`` wrapper that runs the
+same user lookup on the event loop, as the dependency used to. The identity
+query goes to a SQLite file with an artificial round-trip delay per
+statement, so the difference is the event loop being blocked or not. Reports
+requests per second and p50/p95 latency per variant. No database or server
+needed.
+
+Usage:
+    cd backend
+    python scripts/benchmark_auth_concurrency.py
+
+Options:
+    --clients N          Concurrent clients (default: 100)
+    --requests N         Requests per client (default: 20)
+    --db-latency-ms MS   Simulated DB round trip per statement (default: 2.0)
+"""
+
+import argparse
+import asyncio
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+# Add backend directory to path
+backend_dir = Path(__file__).parent.parent
+sys.path.insert(0, str(backend_dir))
+
+import httpx  # noqa: E402
+from fastapi import Cookie, Depends, FastAPI, Request  # noqa: E402
+from fastapi.security import HTTPAuthorizationCredentials  # noqa: E402
+from sqlalchemy import create_engine, event  # noqa: E402
+from sqlalchemy.orm import Session, sessionmaker  # noqa: E402
+
+from app.api.v1.deps import bearer_scheme, get_current_user_prod, get_db  # noqa: E402
+from app.core.security import create_access_token  # noqa: E402
+from app.infra.db.models import School, User  # noqa: E402
+
+
+def _build_app(db_latency: float, db_path: str) -> FastAPI:
+    engine = create_engine(
+        f"sqlite:///{db_path}",
+        connect_args={"check_same_thread": False},
+        pool_size=50,
+        max_overflow=50,
+    )
+    School.__table__.create(engine)
+    User.__table__.create(engine)
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _round_trip(*args):
+        time.sleep(db_latency)
+
+    SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    with SessionLocal() as db:
+        db.add(School(id=1, name="Benchmark"))
+        db.add(
+            User(id=1, school_id=1, name="Docent", email="t@bench.nl", role="teacher")
+        )
+        db.commit()
+
+    def _get_db():
+        db = SessionLocal()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    async def blocking_current_user(
+        request: Request,
+        db: Session = Depends(get_db),
+        access_token_cookie: str | None = Cookie(default=None, alias="access_token"),
+        bearer_token: HTTPAuthorizationCredentials | None = Depends(bearer_scheme),
+    ) -> User:
+        # The old shape: a sync DB query inside a coroutine
+        return get_current_user_prod(request, db, access_token_cookie, bearer_token)
+
+    app = FastAPI()
+    app.dependency_overrides[get_db] = _get_db
+
+    @app.get("/before")
+    async def before(user: User = Depends(blocking_current_user)):
+        return {"id": user.id}
+
+    @app.get("/after")
+    async def after(user: User = Depends(get_current_user_prod)):
+        return {"id": user.id}
+
+    return app
+
+
+async def _run(app: FastAPI, path: str, token: str, clients: int, requests: int):
+    latencies = []
+    headers = {"Authorization": f"Bearer {token}"}
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as c:
+
+        async def client():
+            for _ in range(requests):
+                start = time.perf_counter()
+                response = await c.get(path, headers=headers)
+                latencies.append((time.perf_counter() - start) * 1000)
+                response.raise_for_status()
+
+        start = time.perf_counter()
+        await asyncio.gather(*(client() for _ in range(clients)))
+        elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    return {
+        "rps": len(latencies) / elapsed,
+        "p50": statistics.median(latencies),
+        "p95": latencies[int(len(latencies) * 0.95) - 1],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Benchmark the authentication dependency under concurrency"
+    )
+    parser.add_argument("--clients", type=int, default=100)
+    parser.add_argument("--requests", type=int, default=20)
+    parser.add_argument("--db-latency-ms", type=float, default=2.0)
+    args = parser.parse_args()
+
+    token = create_access_token(sub="t@bench.nl", role="teacher", school_id=1)
+    with tempfile.TemporaryDirectory() as tmp:
+        app = _build_app(args.db_latency_ms / 1000, str(Path(tmp) / "bench.db"))
+
+        print(
+            f"{args.clients} clients x {args.requests} requests, "
+            f"{args.db_latency_ms:.1f} ms per DB statement"
+        )
+        for label, path in (
+            ("before (async def, blocks loop)", "/before"),
+            ("after  (sync def, threadpool)  ", "/after"),
+        ):
+            result = asyncio.run(_run(app, path, token, args.clients, args.requests))
+            print(
+                f"  {label}: {result['rps']:8.1f} req/s   "
+                f"p50 {result['p50']:7.1f} ms   p95 {result['p95']:7.1f} ms"
+            )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,402 @@
+#!/usr/bin/env python3
+"""
+Load test: database writes of summary jobs and status poll latency.
+
+Runs a batch of summary jobs through ``generate_ai_summary_task`` on a pool
+of worker threads (one thread per RQ worker, a simulated Ollama call of
+``--ollama-seconds``) while pollers request
+``GET /feedback-summaries/jobs/{job_id}/status`` of random jobs, as the
+frontend does, against an in-process FastAPI app:
+
+- before: every progress step is an UPDATE and a COMMIT of the job row, as
+  it used to be, and the status endpoint reads Postgres;
+- after: progress goes to Redis, Postgres is written on state changes only,
+  and the status endpoint reads Redis first (app/infra/queue/progress.py).
+
+Reports the database writes (INSERT/UPDATE/DELETE) and commits per job of
+the workers, the database queries per status poll, and the poll latency.
+Uses a temporary SQLite file with a simulated round trip of ``--db-ms`` per
+statement and commit, and an in-memory stand-in for the Redis commands of
+the progress store with a round trip of ``--redis-ms``. No database, Redis
+or Ollama needed.
+
+Usage:
+    cd backend
+    python scripts/benchmark_job_progress.py
+
+Options:
+    --jobs N             Jobs in the batch (default: 200)
+    --workers N          Worker threads running jobs (default: 8)
+    --pollers N          Concurrent status pollers (default: 20)
+    --ollama-seconds S   Simulated generation time (default: 0.2)
+    --db-ms MS           Simulated database round trip (default: 1.0)
+    --redis-ms MS        Simulated Redis round trip (default: 0.2)
+"""
+
+import argparse
+import asyncio
+import random
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from types import SimpleNamespace
+from unittest.mock import patch
+
+# Add backend directory to path
+backend_dir = Path(__file__).parent.parent
+sys.path.insert(0, str(backend_dir))
+
+import httpx  # noqa: E402
+from fastapi import FastAPI  # noqa: E402
+from sqlalchemy import create_engine, event, update  # noqa: E402
+from sqlalchemy.dialects.postgresql import JSONB  # noqa: E402
+from sqlalchemy.ext.compiler import compiles  # noqa: E402
+from sqlalchemy.orm import sessionmaker  # noqa: E402
+
+from app.api.v1.deps import get_current_user, get_db  # noqa: E402
+from app.api.v1.routers import feedback_summary  # noqa: E402
+from app.infra.db.models import (  # noqa: E402
+    Allocation,
+    Evaluation,
+    FeedbackSummary,
+    School,
+    Score,
+    SummaryGenerationJob,
+    User,
+)
+from app.infra.queue import progress, tasks  # noqa: E402
+
+EVALUATION_ID = 1
+WRITES = ("INSERT", "UPDATE", "DELETE")
+
+
+@compiles(JSONB, "sqlite")
+def _jsonb_as_json(element, compiler, **kw):
+    return "JSON"
+
+
+class _MemoryRedis:
+    """The Redis commands of JobProgressStore, in memory."""
+
+    def __init__(self, latency: float):
+        self.latency = latency
+        self.hashes: dict[str, dict[str, str]] = {}
+        self.published = 0
+        self._lock = threading.Lock()
+
+    def _round_trip(self):
+        if self.latency:
+            time.sleep(self.latency)
+
+    def _hset(self, key, field=None, value=None, mapping=None):
+        with self._lock:
+            fields = self.hashes.setdefault(key, {})
+            if field is not None:
+                fields[field] = str(value)
+            for name, v in (mapping or {}).items():
+                fields[name] = str(v)
+
+    def _publish(self):
+        with self._lock:
+            self.published += 1
+
+    def hset(self, key, field=None, value=None, mapping=None):
+        self._round_trip()
+        self._hset(key, field, value, mapping)
+
+    def hgetall(self, key):
+        self._round_trip()
+        with self._lock:
+            return dict(self.hashes.get(key, {}))
+
+    def pipeline(self, transaction=True):
+        return _MemoryPipeline(self)
+
+
+class _MemoryPipeline:
+    def __init__(self, redis: _MemoryRedis):
+        self.redis = redis
+        self.commands = []
+
+    def hset(self, key, mapping=None):
+        self.commands.append(lambda: self.redis._hset(key, mapping=mapping))
+
+    def expire(self, key, seconds):
+        pass
+
+    def publish(self, channel, message):
+        self.commands.append(self.redis._publish)
+
+    def execute(self):
+        self.redis._round_trip()
+        for command in self.commands:
+            command()
+
+
+class _SlowOllama:
+    def __init__(self, seconds: float):
+        self.seconds = seconds
+
+    def generate_summary(self, **kwargs):
+        time.sleep(self.seconds)
+        return "Samenvatting"
+
+
+class _Counter:
+    """Statements and commits of an engine, with a simulated round trip."""
+
+    def __init__(self, engine, latency: float):
+        self.writes = self.queries = self.commits = 0
+        self._lock = threading.Lock()
+
+        @event.listens_for(engine, "before_cursor_execute")
+        def _statement(conn, cursor, statement, *args):
+            with self._lock:
+                if statement.startswith(WRITES):
+                    self.writes += 1
+                else:
+                    self.queries += 1
+            if latency:
+                time.sleep(latency)
+
+        @event.listens_for(engine, "commit")
+        def _commit(conn):
+            with self._lock:
+                self.commits += 1
+            if latency:
+                time.sleep(latency)
+
+
+def _engine(db_path: str):
+    engine = create_engine(
+        f"sqlite:///{db_path}",
+        connect_args={"check_same_thread": False, "timeout": 30},
+        pool_size=50,
+        max_overflow=50,
+    )
+
+    @event.listens_for(engine, "connect")
+    def _wal(dbapi_conn, record):
+        dbapi_conn.execute("PRAGMA journal_mode=WAL")
+
+    return engine
+
+
+def _seed(SessionLocal, jobs: int) -> list[str]:
+    with SessionLocal() as db:
+        db.add(School(id=1, name="Benchmark"))
+        db.add(
+            Evaluation(
+                id=EVALUATION_ID, school_id=1, rubric_id=1, title="Peer", settings={}
+            )
+        )
+        student_ids = list(range(2, jobs + 2))
+        for sid in student_ids:
+            db.add(
+                User(id=sid, school_id=1, name=f"Student {sid}", email=f"{sid}@b.nl")
+            )
+        db.flush()
+        for sid in student_ids:
+            reviewer = sid + 1 if sid + 1 < jobs + 2 else 2
+            allocation = Allocation(
+                school_id=1,
+                evaluation_id=EVALUATION_ID,
+                reviewer_id=reviewer,
+                reviewee_id=sid,
+                is_self=False,
+            )
+            db.add(allocation)
+            db.flush()
+            db.add(
+                Score(
+                    school_id=1,
+                    allocation_id=allocation.id,
+                    criterion_id=1,
+                    score=4,
+                    comment=f"Werkt goed samen en plant netjes ({sid})",
+                )
+            )
+        job_rows = [
+            SummaryGenerationJob(
+                school_id=1,
+                evaluation_id=EVALUATION_ID,
+                student_id=sid,
+                job_id=f"summary-{EVALUATION_ID}-{sid}-bench",
+                status="queued",
+            )
+            for sid in student_ids
+        ]
+        db.add_all(job_rows)
+        db.commit()
+        # As the endpoint that queued them would
+        tasks.publish_job_state(*job_rows)
+        return [job.job_id for job in job_rows]
+
+
+def _progress_in_db(SessionLocal):
+    """The old progress step: an UPDATE and a COMMIT of the job row."""
+
+    def report(job_id, percent, stage, message=None):
+        with SessionLocal() as db:
+            db.execute(
+                update(SummaryGenerationJob)
+                .where(SummaryGenerationJob.job_id == job_id)
+                .values(progress=percent)
+            )
+            db.commit()
+
+    return report
+
+
+def _percentile(values, fraction):
+    values = sorted(values)
+    return values[max(0, int(len(values) * fraction) - 1)]
+
+
+def _run(mode: str, args) -> dict:
+    redis_conn = _MemoryRedis(args.redis_ms / 1000)
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = str(Path(tmp) / "bench.db")
+        worker_engine = _engine(db_path)
+        poll_engine = _engine(db_path)
+        for model in (
+            School,
+            User,
+            Evaluation,
+            Allocation,
+            Score,
+            FeedbackSummary,
+            SummaryGenerationJob,
+        ):
+            model.__table__.create(worker_engine)
+        WorkerSession = sessionmaker(bind=worker_engine)
+        PollSession = sessionmaker(bind=poll_engine)
+
+        patches = [
+            patch.object(
+                progress, "_store", progress.JobProgressStore(redis_conn=redis_conn)
+            ),
+            patch.object(tasks, "SessionLocal", WorkerSession),
+            patch.object(
+                tasks, "OllamaService", lambda: _SlowOllama(args.ollama_seconds)
+            ),
+        ]
+        if mode == "before":
+            patches += [
+                patch.object(tasks, "report_progress", _progress_in_db(WorkerSession)),
+                patch.object(tasks, "publish_job_state", lambda *jobs: None),
+            ]
+        for p in patches:
+            p.start()
+        try:
+            job_ids = _seed(WorkerSession, args.jobs)
+            workers = _Counter(worker_engine, args.db_ms / 1000)
+            polls = _Counter(poll_engine, args.db_ms / 1000)
+            return asyncio.run(_load(args, job_ids, PollSession, workers, polls))
+        finally:
+            for p in reversed(patches):
+                p.stop()
+            worker_engine.dispose()
+            poll_engine.dispose()
+
+
+async def _load(args, job_ids, PollSession, workers, polls) -> dict:
+    current = threading.local()
+
+    def run_job(job_id):
+        current.job = SimpleNamespace(id=job_id)
+        student_id = int(job_id.split("-")[2])
+        result = tasks.generate_ai_summary_task(
+            school_id=1, evaluation_id=EVALUATION_ID, student_id=student_id
+        )
+        assert result["status"] == "completed", result
+
+    def _get_db():
+        db = PollSession()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    app = FastAPI()
+    app.dependency_overrides[get_db] = _get_db
+    app.dependency_overrides[get_current_user] = lambda: SimpleNamespace(
+        id=1, school_id=1, role="teacher"
+    )
+    app.include_router(feedback_summary.router)
+
+    poll_ms = []
+    loop = asyncio.get_running_loop()
+    with (
+        patch.object(tasks, "get_current_job", lambda: current.job),
+        ThreadPoolExecutor(max_workers=args.workers) as pool,
+    ):
+        start = time.perf_counter()
+        batch = loop.run_in_executor(None, lambda: list(pool.map(run_job, job_ids)))
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(
+            transport=transport, base_url="http://bench", timeout=None
+        ) as c:
+
+            async def poller():
+                while not batch.done():
+                    job_id = random.choice(job_ids)
+                    t = time.perf_counter()
+                    response = await c.get(f"/feedback-summaries/jobs/{job_id}/status")
+                    response.raise_for_status()
+                    poll_ms.append((time.perf_counter() - t) * 1000)
+                    await asyncio.sleep(0.05)
+
+            await asyncio.gather(batch, *(poller() for _ in range(args.pollers)))
+        duration = time.perf_counter() - start
+
+    return {
+        "writes": workers.writes / len(job_ids),
+        "commits": workers.commits / len(job_ids),
+        "poll_queries": polls.queries / len(poll_ms),
+        "polls": len(poll_ms),
+        "poll_p50": statistics.median(poll_ms),
+        "poll_p95": _percentile(poll_ms, 0.95),
+        "duration": duration,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Database writes of summary jobs and status poll latency"
+    )
+    parser.add_argument("--jobs", type=int, default=200)
+    parser.add_argument("--workers", type=int, default=8)
+    parser.add_argument("--pollers", type=int, default=20)
+    parser.add_argument("--ollama-seconds", type=float, default=0.2)
+    parser.add_argument("--db-ms", type=float, default=1.0)
+    parser.add_argument("--redis-ms", type=float, default=0.2)
+    args = parser.parse_args()
+
+    print(
+        f"{args.jobs} jobs on {args.workers} workers, {args.pollers} pollers, "
+        f"{args.ollama_seconds:.1f} s per generation, "
+        f"{args.db_ms:.1f} ms per database and {args.redis_ms:.1f} ms per "
+        f"Redis round trip"
+    )
+    for label, mode in (
+        ("before (progress in Postgres)", "before"),
+        ("after  (progress in Redis)   ", "after"),
+    ):
+        result = _run(mode, args)
+        print(
+            f"  {label}: {result['writes']:4.1f} writes "
+            f"{result['commits']:4.1f} commits per job   "
+            f"{result['poll_queries']:4.2f} queries per poll   "
+            f"poll p50 {result['poll_p50']:6.1f} ms p95 {result['poll_p95']:6.1f} ms   "
+            f"({result['polls']} polls, batch {result['duration']:.1f} s)"
+        )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
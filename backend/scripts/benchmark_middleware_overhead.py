@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmark of the per-request cost of the middleware stack.
+
+Serves a trivial JSON endpoint and a streamed CSV from in-process FastAPI apps:
+
+- bare: no middleware;
+- asgi: SecurityHeaders, RateLimit and SlidingSession as registered in
+  app/main.py (plain ASGI middleware);
+- basehttp: the same stack with three pass-through ``BaseHTTPMiddleware``
+  layers around it, i.e. the task and stream wrapping the middleware paid when
+  it subclassed ``BaseHTTPMiddleware``.
+
+Reports the mean time per request and the overhead over the bare app. The
+rate limiter is an in-memory stand-in, so no Redis or database is needed and
+only the middleware itself is measured.
+
+Usage:
+    cd backend
+    python scripts/benchmark_middleware_overhead.py
+
+Options:
+    --requests N       Sequential requests per variant (default: 3000)
+    --stream-chunks N  64 KiB chunks in the streamed response (default: 64)
+"""
+
+import argparse
+import asyncio
+import sys
+import time
+from pathlib import Path
+
+# Add backend directory to path
+backend_dir = Path(__file__).parent.parent
+sys.path.insert(0, str(backend_dir))
+
+import httpx  # noqa: E402
+from fastapi import FastAPI  # noqa: E402
+from fastapi.responses import StreamingResponse  # noqa: E402
+from starlette.middleware.base import BaseHTTPMiddleware  # noqa: E402
+
+from app.api.middleware.rate_limit import RateLimitMiddleware  # noqa: E402
+from app.api.middleware.security_headers import SecurityHeadersMiddleware  # noqa: E402
+from app.api.middleware.sliding_session import SlidingSessionMiddleware  # noqa: E402
+from app.core.security import create_access_token  # noqa: E402
+from app.infra.services.rate_limiter import RateLimitResult  # noqa: E402
+
+CHUNK = b"x" * 64 * 1024
+
+
+class _MemoryRateLimiter:
+    """Counts requests per key; never blocks."""
+
+    def __init__(self):
+        self.counts = {}
+
+    async def hit(self, key, max_requests, window_seconds):
+        self.counts[key] = self.counts.get(key, 0) + 1
+        remaining = max(0, max_requests - self.counts[key])
+        return RateLimitResult(True, max_requests, remaining, window_seconds)
+
+
+class _PassThrough(BaseHTTPMiddleware):
+    async def dispatch(self, request, call_next):
+        return await call_next(request)
+
+
+def _build_app(variant: str, stream_chunks: int) -> FastAPI:
+    app = FastAPI()
+    if variant in ("asgi", "basehttp"):
+        app.add_middleware(SecurityHeadersMiddleware)
+        app.add_middleware(RateLimitMiddleware, rate_limiter=_MemoryRateLimiter())
+        app.add_middleware(SlidingSessionMiddleware)
+    if variant == "basehttp":
+        for _ in range(3):
+            app.add_middleware(_PassThrough)
+
+    @app.get("/api/v1/ping")
+    async def ping():
+        return {"ok": True}
+
+    @app.get("/api/v1/export.csv")
+    async def export():
+        async def rows():
+            for _ in range(stream_chunks):
+                yield CHUNK
+
+        return StreamingResponse(rows(), media_type="text/csv")
+
+    return app
+
+
+async def _run(app: FastAPI, path: str, requests: int, token: str) -> float:
+    """Mean seconds per request."""
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(
+        transport=transport,
+        base_url="http://bench",
+        headers={"Authorization": f"Bearer {token}"},
+    ) as client:
+        for _ in range(min(100, requests)):  # warm-up
+            (await client.get(path)).raise_for_status()
+        start = time.perf_counter()
+        for _ in range(requests):
+            (await client.get(path)).raise_for_status()
+        return (time.perf_counter() - start) / requests
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Benchmark the per-request overhead of the middleware stack"
+    )
+    parser.add_argument("--requests", type=int, default=3000)
+    parser.add_argument("--stream-chunks", type=int, default=64)
+    args = parser.parse_args()
+
+    token = create_access_token(sub="t@bench.nl", role="teacher", school_id=1)
+    for label, path, requests in (
+        ("JSON endpoint", "/api/v1/ping", args.requests),
+        (
+            f"streamed CSV ({args.stream_chunks * 64} KiB)",
+            "/api/v1/export.csv",
+            max(1, args.requests // 10),
+        ),
+    ):
+        print(f"{label}, {requests} sequential requests")
+        bare = None
+        for variant in ("bare", "asgi", "basehttp"):
+            app = _build_app(variant, args.stream_chunks)
+            mean = asyncio.run(_run(app, path, requests, token))
+            bare = mean if bare is None else bare
+            print(
+                f"  {variant:<9} {mean * 1e6:9.1f} us/request   "
+                f"overhead {(mean - bare) * 1e6:8.1f} us"
+            )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+"""
+Benchmark Ollama throughput against the number of concurrent callers.
+
+Runs ``--calls`` generate calls from N threads against the local fake Ollama
+server (tests/fake_ollama.py), which generates ``--parallel`` requests at a
+time in ``--latency`` seconds each, once per client:
+
+- before: ``requests.post`` per call, no limit (as OllamaService used to);
+- after: the shared ``OllamaClient`` with a keep-alive pool and a
+  concurrency limit of ``--limit`` (local slots, no Redis).
+
+Reports calls per second, p95 latency of a call, TCP connections opened and
+the most requests Ollama had in flight. Throughput is capped by Ollama
+either way; the limit keeps the requests waiting in the client, where a
+caller can give up and use the fallback, instead of piling up in Ollama.
+
+Usage:
+    cd backend
+    python scripts/benchmark_ollama_concurrency.py
+
+Options:
+    --calls N        Calls per run (default: 48)
+    --latency S      Simulated generation time (default: 0.1)
+    --parallel N     Requests the fake Ollama generates at once (default: 2)
+    --limit N        Concurrency limit of the shared client (default: 2)
+"""
+
+import argparse
+import statistics
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+# Add backend directory to path
+backend_dir = Path(__file__).parent.parent
+sys.path.insert(0, str(backend_dir))
+
+import requests  # noqa: E402
+
+from app.infra.services.ollama_client import OllamaClient, OllamaSlots  # noqa: E402
+from tests.fake_ollama import FakeOllama  # noqa: E402
+
+PAYLOAD = {"model": "fake", "prompt": "Vat samen", "stream": False}
+CONCURRENCY = (1, 2, 4, 8, 16)
+
+
+def _run(calls: int, concurrency: int, call) -> dict:
+    latencies = []
+
+    def timed(_):
+        start = time.perf_counter()
+        call().raise_for_status()
+        latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(timed, range(calls)))
+    elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    return {
+        "cps": calls / elapsed,
+        "p50": statistics.median(latencies) * 1000,
+        "p95": latencies[int(len(latencies) * 0.95) - 1] * 1000,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Benchmark Ollama throughput vs. concurrency"
+    )
+    parser.add_argument("--calls", type=int, default=48)
+    parser.add_argument("--latency", type=float, default=0.1)
+    parser.add_argument("--parallel", type=int, default=2)
+    parser.add_argument("--limit", type=int, default=2)
+    args = parser.parse_args()
+
+    print(
+        f"{args.calls} calls per run, {args.latency * 1000:.0f} ms per generation, "
+        f"Ollama parallel {args.parallel}, client limit {args.limit}"
+    )
+    print(
+        f"  {'variant':<8} {'callers':>7} {'calls/s':>8} {'p50 ms':>8} "
+        f"{'p95 ms':>8} {'conns':>6} {'in Ollama':>9}"
+    )
+    for concurrency in CONCURRENCY:
+        for label in ("before", "after"):
+            with FakeOllama(latency=args.latency, parallel=args.parallel) as fake:
+                url = f"{fake.url}/api/generate"
+                if label == "before":
+
+                    def call():
+                        return requests.post(url, json=PAYLOAD, timeout=(5, 60))
+
+                else:
+                    client = OllamaClient(
+                        fake.url,
+                        slots=OllamaSlots(args.limit, hold_seconds=70, use_redis=False),
+                        slot_timeout=60,
+                    )
+
+                    def call():
+                        return client.post(
+                            "/api/generate", json=PAYLOAD, timeout=(5, 60)
+                        )
+
+                result = _run(args.calls, concurrency, call)
+            print(
+                f"  {label:<8} {concurrency:>7} {result['cps']:>8.1f} "
+                f"{result['p50']:>8.0f} {result['p95']:>8.0f} "
+                f"{fake.connections:>6} {fake.max_in_flight:>9}"
+            )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
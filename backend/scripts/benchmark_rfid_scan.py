@@ -0,0 +1,166 @@
+#!/usr/bin/env python3
+"""
+Benchmark the RFID scan path (POST /attendance/scan) with many open sessions.
+
+Seeds an in-memory SQLite database with students, RFID cards and a large number
+of open (and expired) attendance sessions, then times alternating check-in /
+check-out scans through the endpoint function. The cost of one
+``cleanup_expired_sessions`` run is reported separately, since that used to
+run on every scan.
+
+Usage:
+    cd backend
+    python scripts/benchmark_rfid_scan.py
+
+Options:
+    --students N        Students with a card (default: 2000)
+    --open-sessions N   Open sessions of other students (default: 1500)
+    --expired N         Of which expired (>12h open) (default: 300)
+    --scans N           Scans to time (default: 1000)
+"""
+
+import argparse
+import statistics
+import sys
+import time
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+# Add backend directory to path
+backend_dir = Path(__file__).parent.parent
+sys.path.insert(0, str(backend_dir))
+
+from sqlalchemy import create_engine, event  # noqa: E402
+from sqlalchemy.orm import sessionmaker  # noqa: E402
+from sqlalchemy.pool import StaticPool  # noqa: E402
+from sqlalchemy.schema import CreateTable  # noqa: E402
+
+from app.api.v1.routers.attendance import rfid_scan  # noqa: E402
+from app.api.v1.schemas.attendance import RFIDScanRequest  # noqa: E402
+from app.infra.db.models import (  # noqa: E402
+    AttendanceAggregate,
+    AttendanceEvent,
+    RFIDCard,
+    School,
+    User,
+)
+from app.services.attendance_sessions import cleanup_expired_sessions  # noqa: E402
+from app.services.rfid_card_cache import get_rfid_card_cache_stats  # noqa: E402
+
+TABLES = [
+    School.__table__,
+    User.__table__,
+    RFIDCard.__table__,
+    AttendanceEvent.__table__,
+    AttendanceAggregate.__table__,
+]
+
+
+def _create_tables(engine):
+    # Some models declare the same index twice, which SQLite rejects
+    with engine.begin() as conn:
+        for table in TABLES:
+            conn.execute(CreateTable(table))
+            for name in sorted({index.name for index in table.indexes}):
+                next(i for i in table.indexes if i.name == name).create(conn)
+
+
+def _seed(db, students: int, open_sessions: int, expired: int):
+    now = datetime.now(timezone.utc)
+    db.add(School(id=1, name="Benchmark"))
+    db.add_all(
+        User(
+            id=uid,
+            school_id=1,
+            name=f"Leerling {uid}",
+            email=f"s{uid}@bench.nl",
+            role="student",
+        )
+        for uid in range(1, students + 1)
+    )
+    db.add_all(
+        RFIDCard(user_id=uid, uid=f"CARD{uid:06d}", is_active=True)
+        for uid in range(1, students + 1)
+    )
+    # Open sessions belong to the last students; scans use the first ones
+    for i in range(open_sessions):
+        uid = students - i
+        age = timedelta(hours=13) if i < expired else timedelta(minutes=30)
+        db.add(
+            AttendanceEvent(
+                user_id=uid, check_in=now - age, is_external=False, source="rfid"
+            )
+        )
+    db.commit()
+
+
+def _percentile(values, pct):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the RFID scan path")
+    parser.add_argument("--students", type=int, default=2000)
+    parser.add_argument("--open-sessions", type=int, default=1500)
+    parser.add_argument("--expired", type=int, default=300)
+    parser.add_argument("--scans", type=int, default=1000)
+    args = parser.parse_args()
+
+    engine = create_engine(
+        "sqlite://",
+        connect_args={"check_same_thread": False},
+        poolclass=StaticPool,
+    )
+    _create_tables(engine)
+    Session = sessionmaker(bind=engine, autoflush=False, autocommit=False)
+
+    db = Session()
+    _seed(db, args.students, args.open_sessions, args.expired)
+    db.close()
+
+    statements = []
+    event.listen(engine, "before_cursor_execute", lambda *a: statements.append(a[2]))
+
+    scanners = max(1, min(args.students - args.open_sessions, 200))
+    latencies = []
+    statement_counts = []
+    for i in range(args.scans):
+        uid = (i % scanners) + 1
+        db = Session()
+        statements.clear()
+        start = time.perf_counter()
+        result = rfid_scan(RFIDScanRequest(uid=f"CARD{uid:06d}"), db=db, _=None)
+        latencies.append((time.perf_counter() - start) * 1000)
+        statement_counts.append(len(statements))
+        db.close()
+        if result.status != "ok":
+            print(f"✗ Scan failed: {result.message}")
+            return 1
+
+    db = Session()
+    start = time.perf_counter()
+    closed = cleanup_expired_sessions(db)
+    cleanup_ms = (time.perf_counter() - start) * 1000
+    db.close()
+
+    print("=" * 60)
+    print("RFID scan benchmark")
+    print("=" * 60)
+    print(f"Students: {args.students}, open sessions: {args.open_sessions}")
+    print(f"Scans: {args.scans}")
+    print(f"  p50: {statistics.median(latencies):.2f} ms")
+    print(f"  p95: {_percentile(latencies, 95):.2f} ms")
+    print(f"  max: {max(latencies):.2f} ms")
+    print(f"  SQL statements per scan: {max(statement_counts)} (max)")
+    print(f"  Card cache hit rate: {get_rfid_card_cache_stats()['hit_rate']:.0%}")
+    print()
+    print(
+        f"cleanup_expired_sessions (scheduler, not per scan): "
+        f"{cleanup_ms:.2f} ms, closed {closed} session(s)"
+    )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,256 @@
+#!/usr/bin/env python3
+"""
+Load test: API worker availability while feedback summaries are generated.
+
+Opens a class page worth of summary requests at once (one GET per student
+without a stored summary) against an in-process FastAPI app whose threadpool
+is limited to the size of one API worker, and meanwhile measures a light
+probe endpoint that needs a thread too:
+
+- before: the summary GET generates in the request, as it used to, with a
+  simulated Ollama call of ``--ollama-seconds``;
+- after: the real ``GET /feedback-summaries/evaluation/{id}/student/{id}``,
+  which queues the generation and answers 202.
+
+Reports the latency of the summary GETs and of the probe requests made while
+the summaries are in flight; the probe maximum is how long a request for any
+other page waited for a free thread. Uses a temporary SQLite file and an
+in-memory stand-in for the RQ queue. No database, Redis or Ollama needed.
+
+Usage:
+    cd backend
+    python scripts/benchmark_summary_nonblocking.py
+
+Options:
+    --summaries N        Summary GETs in flight (default: 30)
+    --threads N          Threadpool size of the simulated worker (default: 16)
+    --ollama-seconds S   Simulated generation time (default: 3.0)
+    --probes N           Probe requests while the summaries run (default: 50)
+"""
+
+import argparse
+import asyncio
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+from types import SimpleNamespace
+from unittest.mock import patch
+
+# Add backend directory to path
+backend_dir = Path(__file__).parent.parent
+sys.path.insert(0, str(backend_dir))
+
+import anyio.to_thread  # noqa: E402
+import httpx  # noqa: E402
+from fastapi import Depends, FastAPI  # noqa: E402
+from sqlalchemy import create_engine, text  # noqa: E402
+from sqlalchemy.dialects.postgresql import JSONB  # noqa: E402
+from sqlalchemy.ext.compiler import compiles  # noqa: E402
+from sqlalchemy.orm import Session, sessionmaker  # noqa: E402
+
+from app.api.v1.deps import get_current_user, get_db  # noqa: E402
+from app.api.v1.routers import feedback_summary  # noqa: E402
+from app.infra.db.models import (  # noqa: E402
+    Allocation,
+    Evaluation,
+    FeedbackSummary,
+    School,
+    Score,
+    SummaryGenerationJob,
+    User,
+)
+
+EVALUATION_ID = 1
+
+
+@compiles(JSONB, "sqlite")
+def _jsonb_as_json(element, compiler, **kw):
+    return "JSON"
+
+
+class _MemoryQueue:
+    """Records enqueued jobs instead of sending them to Redis."""
+
+    def __init__(self):
+        self.jobs = []
+
+    def enqueue(self, func, **kwargs):
+        self.jobs.append(kwargs["job_id"])
+        return SimpleNamespace(id=kwargs["job_id"])
+
+
+def _build_app(db_path: str, students: int, ollama_seconds: float) -> FastAPI:
+    engine = create_engine(
+        f"sqlite:///{db_path}",
+        connect_args={"check_same_thread": False, "timeout": 30},
+        pool_size=50,
+        max_overflow=50,
+    )
+    for model in (
+        School,
+        User,
+        Evaluation,
+        Allocation,
+        Score,
+        FeedbackSummary,
+        SummaryGenerationJob,
+    ):
+        model.__table__.create(engine)
+
+    SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    with SessionLocal() as db:
+        db.add(School(id=1, name="Benchmark"))
+        db.add(User(id=1, school_id=1, name="Docent", email="t@b.nl", role="teacher"))
+        for sid in range(2, students + 2):
+            db.add(
+                User(id=sid, school_id=1, name=f"Student {sid}", email=f"{sid}@b.nl")
+            )
+        db.add(
+            Evaluation(
+                id=EVALUATION_ID,
+                school_id=1,
+                rubric_id=1,
+                title="Peer evaluatie",
+                settings={},
+            )
+        )
+        db.flush()
+        for sid in range(2, students + 2):
+            reviewer = sid + 1 if sid + 1 < students + 2 else 2
+            allocation = Allocation(
+                school_id=1,
+                evaluation_id=EVALUATION_ID,
+                reviewer_id=reviewer,
+                reviewee_id=sid,
+                is_self=False,
+            )
+            db.add(allocation)
+            db.flush()
+            db.add(
+                Score(
+                    school_id=1,
+                    allocation_id=allocation.id,
+                    criterion_id=1,
+                    score=4,
+                    comment=f"Werkt goed samen en plant netjes ({sid})",
+                )
+            )
+        db.commit()
+
+    def _get_db():
+        db = SessionLocal()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    def _teacher():
+        return SimpleNamespace(id=1, school_id=1, role="teacher")
+
+    app = FastAPI()
+    app.dependency_overrides[get_db] = _get_db
+    app.dependency_overrides[get_current_user] = _teacher
+    app.include_router(feedback_summary.router)
+
+    @app.get("/before/evaluation/{evaluation_id}/student/{student_id}")
+    def before(evaluation_id: int, student_id: int, db: Session = Depends(get_db)):
+        # The old shape: look up the feedback, then wait for Ollama
+        db.query(Score.comment).join(Allocation).filter(
+            Allocation.evaluation_id == evaluation_id,
+            Allocation.reviewee_id == student_id,
+        ).all()
+        time.sleep(ollama_seconds)
+        return {"summary_text": "..."}
+
+    @app.get("/probe")
+    def probe(db: Session = Depends(get_db)):
+        return {"ok": db.execute(text("SELECT 1")).scalar()}
+
+    return app
+
+
+def _percentile(values, fraction):
+    values = sorted(values)
+    return values[max(0, int(len(values) * fraction) - 1)]
+
+
+async def _run(app, prefix, students, threads, probes):
+    anyio.to_thread.current_default_thread_limiter().total_tokens = threads
+    summary_ms, probe_ms, statuses = [], [], []
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(
+        transport=transport, base_url="http://bench", timeout=None
+    ) as c:
+
+        async def summary(student_id):
+            start = time.perf_counter()
+            response = await c.get(
+                f"{prefix}/evaluation/{EVALUATION_ID}/student/{student_id}"
+            )
+            summary_ms.append((time.perf_counter() - start) * 1000)
+            statuses.append(response.status_code)
+
+        async def probe_loop():
+            # Give the summary requests a head start
+            await asyncio.sleep(0.05)
+            for _ in range(probes):
+                start = time.perf_counter()
+                (await c.get("/probe")).raise_for_status()
+                probe_ms.append((time.perf_counter() - start) * 1000)
+                await asyncio.sleep(0.01)
+
+        await asyncio.gather(
+            probe_loop(), *(summary(sid) for sid in range(2, students + 2))
+        )
+
+    return {
+        "summary_p95": _percentile(summary_ms, 0.95),
+        "probe_p50": statistics.median(probe_ms),
+        "probe_max": max(probe_ms),
+        "statuses": sorted(set(statuses)),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Worker availability while feedback summaries are generated"
+    )
+    parser.add_argument("--summaries", type=int, default=30)
+    parser.add_argument("--threads", type=int, default=16)
+    parser.add_argument("--ollama-seconds", type=float, default=3.0)
+    parser.add_argument("--probes", type=int, default=50)
+    args = parser.parse_args()
+
+    queue = _MemoryQueue()
+    with (
+        tempfile.TemporaryDirectory() as tmp,
+        patch.object(feedback_summary, "get_queue", return_value=queue),
+    ):
+        app = _build_app(
+            str(Path(tmp) / "bench.db"), args.summaries, args.ollama_seconds
+        )
+        print(
+            f"{args.summaries} summaries in flight, {args.threads} threads, "
+            f"{args.ollama_seconds:.1f} s per generation, {args.probes} probes"
+        )
+        for label, prefix in (
+            ("before (generate in request)", "/before"),
+            ("after  (202 + RQ job)       ", "/feedback-summaries"),
+        ):
+            result = asyncio.run(
+                _run(app, prefix, args.summaries, args.threads, args.probes)
+            )
+            print(
+                f"  {label}: summary GET p95 {result['summary_p95']:8.1f} ms   "
+                f"probe p50 {result['probe_p50']:8.1f} ms   "
+                f"max {result['probe_max']:8.1f} ms   "
+                f"status {result['statuses']}"
+            )
+        print(f"  jobs enqueued: {len(queue.jobs)} ({len(set(queue.jobs))} unique)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
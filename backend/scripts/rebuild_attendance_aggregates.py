@@ -0,0 +1,56 @@
+#!/usr/bin/env python3
+"""
+Rebuild the attendance_aggregates table from attendance_events.
+
+The aggregates are maintained on every attendance change; this script repairs
+drift, e.g. after a bulk import or a manual database fix.
+
+Usage:
+    cd backend
+    python scripts/rebuild_attendance_aggregates.py
+
+Options:
+    --batch-size N    Users recomputed per transaction (default: 500)
+"""
+
+import sys
+from pathlib import Path
+import argparse
+
+# Add backend directory to path
+backend_dir = Path(__file__).parent.parent
+sys.path.insert(0, str(backend_dir))
+
+from app.infra.db.session import SessionLocal  # noqa: E402
+from app.services.attendance_aggregates import (  # noqa: E402
+    rebuild_attendance_aggregates,
+)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Rebuild attendance_aggregates from attendance_events"
+    )
+    parser.add_argument(
+        "--batch-size",
+        type=int,
+        default=500,
+        help="Users recomputed per transaction (default: 500)",
+    )
+    args = parser.parse_args()
+
+    db = SessionLocal()
+    try:
+        count = rebuild_attendance_aggregates(db, batch_size=args.batch_size)
+        print(f"✓ Rebuilt attendance aggregates for {count} user(s)")
+        return 0
+    except Exception as e:
+        print(f"✗ Error: {e}")
+        db.rollback()
+        return 1
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
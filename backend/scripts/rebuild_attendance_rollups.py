@@ -0,0 +1,58 @@
+#!/usr/bin/env python3
+"""
+Rebuild the attendance_daily_rollups table from attendance_events.
+
+The scheduler rolls up each day once it has ended, and later changes to an
+event refresh its day; this script recomputes every closed day from scratch,
+e.g. after a bulk import or a manual database fix.
+
+Usage:
+    cd backend
+    python scripts/rebuild_attendance_rollups.py
+
+Options:
+    --window-days N    Days rolled up per transaction (default: 31)
+"""
+
+import sys
+from pathlib import Path
+import argparse
+
+# Add backend directory to path
+backend_dir = Path(__file__).parent.parent
+sys.path.insert(0, str(backend_dir))
+
+from app.infra.db.session import SessionLocal  # noqa: E402
+from app.services.attendance_rollups import (  # noqa: E402
+    ROLLUP_WINDOW_DAYS,
+    rebuild_attendance_rollups,
+)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Rebuild attendance_daily_rollups from attendance_events"
+    )
+    parser.add_argument(
+        "--window-days",
+        type=int,
+        default=ROLLUP_WINDOW_DAYS,
+        help=f"Days rolled up per transaction (default: {ROLLUP_WINDOW_DAYS})",
+    )
+    args = parser.parse_args()
+
+    db = SessionLocal()
+    try:
+        days = rebuild_attendance_rollups(db, window_days=args.window_days)
+        print(f"✓ Rolled up {days} day(s) of attendance")
+        return 0
+    except Exception as e:
+        print(f"✗ Error: {e}")
+        db.rollback()
+        return 1
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
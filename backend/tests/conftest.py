@@ -5,6 +5,7 @@ Adds the backend directory to sys.path and provides composable fixtures for:
 - Factory helpers: make_school, make_user, make_project, ...
 - Mock-user fixtures: mock_teacher, mock_student, mock_admin
 - mock_db: MagicMock session for lightweight mock-based tests
+- max_queries: upper bound on the SQL statements an endpoint may run
 
 NOTE: A real database fixture (db_session) is NOT included here because the
 app uses PostgreSQL-specific column types (e.g. ARRAY) that are incompatible
@@ -15,6 +16,7 @@ dedicated Postgres container (see README.md for details).
 from __future__ import annotations
 
 import sys
+from contextlib import contextmanager
 from pathlib import Path
 from unittest.mock import MagicMock
 
@@ -84,3 +86,89 @@ def mock_admin():
 def mock_db():
     """A MagicMock database session for lightweight integration tests."""
     return MagicMock()
+
+
+# ── Query budget fixture ───────────────────────────────────────────────────────
+
+
+@pytest.fixture
+def max_queries():
+    """
+    Fail when a block runs more SQL statements than allowed, e.g.::
+
+        with max_queries(3):
+            client.get("/api/v1/...")
+
+    Counts statements of engines instrumented with
+    ``app.infra.db.query_stats.instrument_engine`` (the app's engines are).
+    """
+    from app.infra.db.query_stats import capture_queries
+
+    @contextmanager
+    def _max_queries(limit: int):
+        with capture_queries() as stats:
+            yield stats
+        assert (
+            stats.count <= limit
+        ), f"{stats.count} SQL statements, expected at most {limit}:\n" + "\n".join(
+            f"{count}x {statement}" for statement, count in stats.shapes.items()
+        )
+
+    return _max_queries
+
+
+# ── Process-wide caches ────────────────────────────────────────────────────────
+
+
+@pytest.fixture(autouse=True)
+def _clear_identity_cache():
+    """Tests reuse emails across databases: never serve a cached identity."""
+    from app.services.identity_cache import clear_identity_cache
+
+    clear_identity_cache()
+    yield
+    clear_identity_cache()
+
+
+@pytest.fixture(autouse=True)
+def _reset_ollama_clients():
+    """Every test starts with a closed Ollama breaker and a full retry budget."""
+    from app.infra.services.ollama_client import reset_ollama_clients
+
+    reset_ollama_clients()
+    yield
+    reset_ollama_clients()
+
+
+@pytest.fixture(autouse=True)
+def _reset_rate_limiter():
+    """No test can use up a rate limit budget that another test then hits."""
+    from app.infra.services.rate_limiter import reset_rate_limiter
+
+    reset_rate_limiter()
+    yield
+    reset_rate_limiter()
+
+
+@pytest.fixture(autouse=True)
+def _disable_llm_cache(monkeypatch):
+    """Ollama results are not cached unless a test passes its own LLMCache."""
+    from app.core.config import settings
+    from app.infra.services.llm_cache import reset_llm_cache
+
+    monkeypatch.setattr(settings, "LLM_CACHE_ENABLED", False)
+    reset_llm_cache()
+    yield
+    reset_llm_cache()
+
+
+@pytest.fixture(autouse=True)
+def job_progress_redis():
+    """The Redis of the job progress store: a MagicMock that holds nothing."""
+    from app.infra.queue import progress
+
+    redis_conn = MagicMock()
+    redis_conn.hgetall.return_value = {}
+    progress._store = progress.JobProgressStore(redis_conn=redis_conn)
+    yield redis_conn
+    progress.reset_job_progress_store()
@@ -0,0 +1,121 @@
+"""
+Local fake Ollama server for tests and benchmarks.
+
+Serves ``POST /api/generate`` over HTTP/1.1 with keep-alive from a thread per
+connection. Generation takes ``latency`` seconds and at most ``parallel``
+requests are generated at once (like ``OLLAMA_NUM_PARALLEL``); the rest wait.
+Answers JSON for the extract prompt and a short Dutch text otherwise, so
+``OllamaService.generate_summary`` succeeds against it.
+
+Counts requests, TCP connections and the highest number of requests in
+flight (generating or waiting). ``fail_next(n, status)`` answers the next
+``n`` requests with an error status instead.
+
+    with FakeOllama(latency=0.2, parallel=2) as fake:
+        OllamaService(base_url=fake.url)
+"""
+
+from __future__ import annotations
+
+import json
+import socket
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import List
+
+# Only in the prompt of the extract step (OllamaService._extract_structured)
+EXTRACT_MARKER = "Geef JSON en niets anders"
+EXTRACT_RESPONSE = json.dumps(
+    {
+        "positives": ["duidelijke uitleg"],
+        "negatives": ["afspraken niet nagekomen"],
+        "themes": ["planning"],
+        "action": "Spreek per overleg een deadline af.",
+    }
+)
+SUMMARY_RESPONSE = (
+    "Je legt dingen duidelijk uit aan je team. Je komt afspraken nog niet "
+    "altijd na. Spreek per overleg een deadline af."
+)
+
+
+class FakeOllama:
+    def __init__(self, latency: float = 0.0, parallel: int = 1):
+        self.latency = latency
+        self.requests = 0
+        self.connections = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self._failures: List[int] = []
+        self._generating = threading.Semaphore(parallel)
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), self._handler())
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(target=self._server.serve_forever)
+        self._thread.daemon = True
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self._server.server_address[1]}"
+
+    def fail_next(self, count: int, status: int = 503) -> None:
+        with self._lock:
+            self._failures.extend([status] * count)
+
+    def __enter__(self) -> "FakeOllama":
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+
+    def _handler(self):
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def setup(self):
+                super().setup()
+                # Headers and body are separate writes: no Nagle delay
+                self.connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+                with fake._lock:
+                    fake.connections += 1
+
+            def log_message(self, *args):
+                pass
+
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+                prompt = json.loads(body or b"{}").get("prompt", "")
+                with fake._lock:
+                    fake.requests += 1
+                    status = fake._failures.pop(0) if fake._failures else 200
+                if status != 200:
+                    self._reply(status, {"error": "fake failure"})
+                    return
+
+                with fake._lock:
+                    fake.in_flight += 1
+                    fake.max_in_flight = max(fake.max_in_flight, fake.in_flight)
+                try:
+                    with fake._generating:
+                        time.sleep(fake.latency)
+                finally:
+                    with fake._lock:
+                        fake.in_flight -= 1
+                extract = EXTRACT_MARKER in prompt
+                text = EXTRACT_RESPONSE if extract else SUMMARY_RESPONSE
+                self._reply(200, {"model": "fake", "response": text, "done": True})
+
+            def _reply(self, status, payload):
+                data = json.dumps(payload).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+        return Handler
@@ -11,9 +11,10 @@ All tests are pure-mock unit tests — no database or Redis required.
 from __future__ import annotations
 
 import pytest
-from unittest.mock import MagicMock, Mock, call, patch
+from unittest.mock import MagicMock, Mock, patch
 
 from app.infra.db.models import Allocation, Evaluation, SummaryGenerationJob
+from app.infra.queue.tasks import batch_generate_summaries_task
 from app.api.v1.routers.evaluations import (
     _trigger_batch_summary_generation,
     update_status,
@@ -25,7 +26,7 @@ from app.api.v1.schemas.evaluations import EvaluationUpdateStatus
 # ---------------------------------------------------------------------------
 
 
-def _make_db(reviewee_ids: list[int], existing_job: object = None) -> MagicMock:
+def _make_db(reviewee_ids: list[int], existing_jobs: list | None = None) -> MagicMock:
     """
     Build a mock SQLAlchemy session whose query chain satisfies the two calls
     made inside ``_trigger_batch_summary_generation``:
@@ -33,8 +34,8 @@ def _make_db(reviewee_ids: list[int], existing_job: object = None) -> MagicMock:
     1. ``db.query(Allocation.reviewee_id).filter(...).distinct().all()``
        → returns [(id,), ...] rows.
 
-    2. ``db.query(SummaryGenerationJob).filter(...).order_by(...).first()``
-       → returns *existing_job* (None means no pre-existing job).
+    2. ``db.query(SummaryGenerationJob).filter(...).order_by(...).all()``
+       → returns *existing_jobs* (the active jobs of those students).
     """
     db = MagicMock()
 
@@ -45,8 +46,8 @@ def _make_db(reviewee_ids: list[int], existing_job: object = None) -> MagicMock:
     ]
 
     job_query = MagicMock()
-    job_query.filter.return_value.order_by.return_value.first.return_value = (
-        existing_job
+    job_query.filter.return_value.order_by.return_value.all.return_value = (
+        existing_jobs or []
     )
 
     db.query.side_effect = lambda model: (
@@ -56,6 +57,14 @@ def _make_db(reviewee_ids: list[int], existing_job: object = None) -> MagicMock:
     return db
 
 
+def _existing_job(student_id: int, status: str) -> Mock:
+    job = Mock(spec=SummaryGenerationJob)
+    job.student_id = student_id
+    job.job_id = f"summary-1-{student_id}-1"
+    job.status = status
+    return job
+
+
 # ---------------------------------------------------------------------------
 # Tests for _trigger_batch_summary_generation
 # ---------------------------------------------------------------------------
@@ -68,9 +77,9 @@ class TestTriggerBatchSummaryGeneration:
     # Happy path
     # ------------------------------------------------------------------
 
-    @patch("app.api.v1.routers.evaluations.get_queue")
-    def test_creates_job_records_and_enqueues_for_each_student(self, mock_get_queue):
-        """Each student without an existing job gets a DB record + an enqueue call."""
+    @patch("app.infra.queue.connection.get_queue")
+    def test_creates_job_records_and_enqueues_one_batch(self, mock_get_queue):
+        """Each student gets a DB record; one batch job generates them all."""
         mock_queue = MagicMock()
         mock_get_queue.return_value = mock_queue
 
@@ -84,21 +93,21 @@ class TestTriggerBatchSummaryGeneration:
         # Queue requested once with the correct name
         mock_get_queue.assert_called_once_with("ai-summaries")
 
-        # One enqueue call per student
-        assert mock_queue.enqueue.call_count == 3
-
-        # Verify the kwargs passed to enqueue for every student
-        for c in mock_queue.enqueue.call_args_list:
-            kwargs = c.kwargs
-            assert kwargs["school_id"] == 99
-            assert kwargs["evaluation_id"] == 1
-            assert kwargs["student_id"] in {10, 20, 30}
-            assert kwargs["job_id"].startswith("summary-1-")
-
-        # Session committed at the end
+        # One enqueue call for the whole evaluation
+        mock_queue.enqueue.assert_called_once()
+        args, kwargs = mock_queue.enqueue.call_args
+        assert args == (batch_generate_summaries_task,)
+        assert kwargs["school_id"] == 99
+        assert kwargs["evaluation_id"] == 1
+        assert kwargs["job_id"].startswith("summary-batch-1-")
+        assert [j.split("-")[2] for j in kwargs["job_ids"]] == ["10", "20", "30"]
+        assert all(j.startswith("summary-1-") for j in kwargs["job_ids"])
+        assert kwargs["meta"]["total"] == 3
+
+        # Records committed before the worker can pick up the batch
         db.commit.assert_called()
 
-    @patch("app.api.v1.routers.evaluations.get_queue")
+    @patch("app.infra.queue.connection.get_queue")
     def test_job_records_have_correct_initial_fields(self, mock_get_queue):
         """Created SummaryGenerationJob records have the expected field values."""
         mock_queue = MagicMock()
@@ -118,13 +127,14 @@ class TestTriggerBatchSummaryGeneration:
         assert job.status == "queued"
         assert job.priority == "normal"
         assert job.queue_name == "ai-summaries"
+        assert job.task_type == "batch_summary"
         assert job.job_id.startswith("summary-7-5-")
 
     # ------------------------------------------------------------------
     # No students
     # ------------------------------------------------------------------
 
-    @patch("app.api.v1.routers.evaluations.get_queue")
+    @patch("app.infra.queue.connection.get_queue")
     def test_no_students_returns_early_without_touching_queue(self, mock_get_queue):
         """When there are no allocations the function exits early."""
         mock_queue = MagicMock()
@@ -143,113 +153,60 @@ class TestTriggerBatchSummaryGeneration:
     # Idempotency
     # ------------------------------------------------------------------
 
-    @patch("app.api.v1.routers.evaluations.get_queue")
+    @patch("app.infra.queue.connection.get_queue")
     def test_skips_student_with_existing_active_job(self, mock_get_queue):
         """A student who already has a queued/processing/completed job is skipped."""
         mock_queue = MagicMock()
         mock_get_queue.return_value = mock_queue
 
-        existing_job = Mock(spec=SummaryGenerationJob)
-        existing_job.status = "queued"
-
-        db = _make_db(reviewee_ids=[42], existing_job=existing_job)
+        db = _make_db(reviewee_ids=[42], existing_jobs=[_existing_job(42, "queued")])
 
         _trigger_batch_summary_generation(db=db, evaluation_id=2, school_id=1)
 
         db.add.assert_not_called()
         mock_queue.enqueue.assert_not_called()
 
-    @patch("app.api.v1.routers.evaluations.get_queue")
+    @patch("app.infra.queue.connection.get_queue")
     def test_partial_idempotency_only_new_students_enqueued(self, mock_get_queue):
         """Students with an existing job are skipped; others are processed normally."""
         mock_queue = MagicMock()
         mock_get_queue.return_value = mock_queue
 
-        existing_job = Mock(spec=SummaryGenerationJob)
-        existing_job.status = "completed"
-
-        # First student already has a job; second does not.
-        job_query = MagicMock()
-        job_query.filter.return_value.order_by.return_value.first.side_effect = [
-            existing_job,  # student 1 → skip
-            None,  # student 2 → create
-        ]
-
-        allocation_query = MagicMock()
-        allocation_query.filter.return_value.distinct.return_value.all.return_value = [
-            (1,),
-            (2,),
-        ]
-
-        db = MagicMock()
-        db.query.side_effect = lambda model: (
-            allocation_query if model is Allocation.reviewee_id else job_query
+        db = _make_db(
+            reviewee_ids=[1, 2], existing_jobs=[_existing_job(1, "completed")]
         )
 
         _trigger_batch_summary_generation(db=db, evaluation_id=3, school_id=1)
 
         assert db.add.call_count == 1
-        assert mock_queue.enqueue.call_count == 1
-        enqueued_student = mock_queue.enqueue.call_args.kwargs["student_id"]
-        assert enqueued_student == 2
+        job_ids = mock_queue.enqueue.call_args.kwargs["job_ids"]
+        assert len(job_ids) == 1
+        assert job_ids[0].startswith("summary-3-2-")
 
     # ------------------------------------------------------------------
     # Enqueue failure
     # ------------------------------------------------------------------
 
-    @patch("app.api.v1.routers.evaluations.get_queue")
-    def test_enqueue_failure_marks_job_as_failed(self, mock_get_queue):
-        """If the queue raises an exception the job record is marked 'failed'."""
+    @patch("app.infra.queue.connection.get_queue")
+    def test_enqueue_failure_marks_jobs_as_failed(self, mock_get_queue):
+        """If the queue raises an exception every new job record is marked 'failed'."""
         mock_queue = MagicMock()
         mock_queue.enqueue.side_effect = ConnectionError("Redis unreachable")
         mock_get_queue.return_value = mock_queue
 
-        db = _make_db(reviewee_ids=[7])
+        db = _make_db(reviewee_ids=[7, 8])
         added_jobs: list[SummaryGenerationJob] = []
         db.add.side_effect = added_jobs.append
 
         # Should not propagate the exception
         _trigger_batch_summary_generation(db=db, evaluation_id=4, school_id=1)
 
-        assert len(added_jobs) == 1
-        job = added_jobs[0]
-        assert job.status == "failed"
-        assert "Failed to queue" in job.error_message
-        # Session still committed (job record is persisted)
-        db.commit.assert_called()
-
-    @patch("app.api.v1.routers.evaluations.get_queue")
-    def test_enqueue_failure_does_not_affect_other_students(self, mock_get_queue):
-        """A single enqueue failure should not prevent other students from being queued."""
-        mock_queue = MagicMock()
-        # First call fails, second succeeds
-        mock_queue.enqueue.side_effect = [ConnectionError("fail"), MagicMock()]
-        mock_get_queue.return_value = mock_queue
-
-        job_query = MagicMock()
-        job_query.filter.return_value.order_by.return_value.first.return_value = None
-
-        allocation_query = MagicMock()
-        allocation_query.filter.return_value.distinct.return_value.all.return_value = [
-            (1,),
-            (2,),
-        ]
-
-        db = MagicMock()
-        db.query.side_effect = lambda model: (
-            allocation_query if model is Allocation.reviewee_id else job_query
-        )
-
-        added_jobs: list[SummaryGenerationJob] = []
-        db.add.side_effect = added_jobs.append
-
-        _trigger_batch_summary_generation(db=db, evaluation_id=5, school_id=1)
-
         assert len(added_jobs) == 2
-        failed = [j for j in added_jobs if j.status == "failed"]
-        queued = [j for j in added_jobs if j.status == "queued"]
-        assert len(failed) == 1
-        assert len(queued) == 1
+        for job in added_jobs:
+            assert job.status == "failed"
+            assert "Failed to queue" in job.error_message
+        # Session still committed (job records are persisted)
+        db.commit.assert_called()
 
 
 # ---------------------------------------------------------------------------
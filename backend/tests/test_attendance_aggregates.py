@@ -0,0 +1,393 @@
+"""
+Tests for the materialized attendance aggregates.
+
+The aggregate rows must follow every change to a user's attendance events
+(check-out, approval, rejection, edit, delete, automatic cleanup), and
+/attendance/overview and /attendance/me must read their totals from them.
+"""
+
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+from sqlalchemy.schema import CreateTable
+
+from app.api.v1.routers import attendance as attendance_router
+from app.api.v1.routers.attendance import (
+    approve_external_work,
+    cleanup_expired_sessions,
+    delete_attendance_event,
+    get_attendance_overview,
+    get_my_attendance,
+    reject_external_work,
+    rfid_scan,
+    update_attendance_event,
+)
+from app.api.v1.schemas.attendance import (
+    AttendanceEventUpdate,
+    ExternalWorkReject,
+    RFIDScanRequest,
+)
+from app.infra.db.models import (
+    AttendanceAggregate,
+    AttendanceDailyRollup,
+    AttendanceEvent,
+    AttendanceRollupState,
+    RFIDCard,
+    School,
+    User,
+)
+from app.infra.services.scheduler_service import SchedulerService
+from app.services.attendance_aggregates import (
+    rebuild_attendance_aggregates,
+    refresh_attendance_aggregates,
+)
+from app.services.rfid_card_cache import clear_rfid_card_cache
+
+_NEEDED_TABLES = [
+    School.__table__,
+    User.__table__,
+    RFIDCard.__table__,
+    AttendanceEvent.__table__,
+    AttendanceAggregate.__table__,
+    AttendanceDailyRollup.__table__,
+    AttendanceRollupState.__table__,
+]
+
+
+NOW = datetime.now(timezone.utc)
+
+
+@pytest.fixture
+def engine():
+    engine = create_engine(
+        "sqlite:///:memory:",
+        connect_args={"check_same_thread": False},
+        poolclass=StaticPool,
+    )
+    # Some attendance models declare the same index twice (index=True plus an
+    # explicit Index), which SQLite rejects; create each index name once.
+    with engine.begin() as conn:
+        for table in _NEEDED_TABLES:
+            conn.execute(CreateTable(table))
+            for name in sorted({index.name for index in table.indexes}):
+                next(i for i in table.indexes if i.name == name).create(conn)
+    yield engine
+    engine.dispose()
+
+
+@pytest.fixture
+def db(engine):
+    Session = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    session = Session()
+    session.add(School(id=1, name="School"))
+    session.add(User(id=1, school_id=1, name="Docent", email="t@x.nl", role="teacher"))
+    session.commit()
+    clear_rfid_card_cache()
+    yield session
+    session.close()
+
+
+@pytest.fixture
+def teacher(db):
+    return db.get(User, 1)
+
+
+def _student(db, uid, name=None):
+    db.add(
+        User(
+            id=uid,
+            school_id=1,
+            name=name or f"Leerling {uid}",
+            email=f"s{uid}@school.nl",
+            role="student",
+        )
+    )
+
+
+def _event(db, uid, hours, external=False, status=None, days_ago=1, open_=False):
+    check_in = NOW - timedelta(days=days_ago)
+    ev = AttendanceEvent(
+        user_id=uid,
+        check_in=check_in,
+        check_out=None if open_ else check_in + timedelta(hours=hours),
+        is_external=external,
+        location="Bedrijf" if external else None,
+        approval_status=status,
+        source="manual",
+    )
+    db.add(ev)
+    return ev
+
+
+def _utc(dt):
+    return dt if dt.tzinfo else dt.replace(tzinfo=timezone.utc)
+
+
+def _aggregate(db, uid):
+    db.expire_all()
+    return (
+        db.query(AttendanceAggregate).filter(AttendanceAggregate.user_id == uid).one()
+    )
+
+
+class TestRefresh:
+    def test_totals_per_kind(self, db):
+        _student(db, 10)
+        _event(db, 10, 2)
+        _event(db, 10, 1, days_ago=2)
+        _event(db, 10, 3, external=True, status="approved")
+        _event(db, 10, 4, external=True, status="pending")
+        _event(db, 10, 5, external=True, status="rejected")
+        _event(db, 10, 0, open_=True, days_ago=0)
+        db.commit()
+
+        refresh_attendance_aggregates(db, [10])
+        db.commit()
+
+        agg = _aggregate(db, 10)
+        assert agg.total_school_seconds == 3 * 3600
+        assert agg.total_external_approved_seconds == 3 * 3600
+        assert agg.total_external_pending_seconds == 4 * 3600
+        assert float(agg.lesson_blocks) == round(6 * 3600 / 4500, 1)
+
+    def test_rebuild_repairs_drift(self, db):
+        _student(db, 10)
+        _student(db, 11)
+        _event(db, 10, 2)
+        db.add(AttendanceAggregate(user_id=11, total_school_seconds=999))
+        db.commit()
+
+        assert rebuild_attendance_aggregates(db, batch_size=1) == 2
+        assert _aggregate(db, 10).total_school_seconds == 7200
+        assert _aggregate(db, 11).total_school_seconds == 0
+
+
+class TestMaintainedOnChanges:
+    def test_rfid_checkout(self, db):
+        _student(db, 10)
+        db.add(RFIDCard(user_id=10, uid="CARD10", is_active=True))
+        _event(db, 10, 0, open_=True, days_ago=0).check_in = NOW - timedelta(hours=1)
+        db.commit()
+
+        result = rfid_scan(RFIDScanRequest(uid="CARD10"), db=db, _=None)
+
+        assert result.action == "check_out"
+        assert _aggregate(db, 10).total_school_seconds == pytest.approx(3600, abs=60)
+
+    def test_cleanup_expired_sessions(self, db):
+        _student(db, 10)
+        _event(db, 10, 0, open_=True, days_ago=1)
+        db.commit()
+
+        assert cleanup_expired_sessions(db) == 1
+        assert _aggregate(db, 10).total_school_seconds == 15 * 60
+
+    def test_approve_and_reject(self, db, teacher):
+        _student(db, 10)
+        approved = _event(db, 10, 2, external=True, status="pending")
+        rejected = _event(db, 10, 1, external=True, status="pending", days_ago=2)
+        db.commit()
+        refresh_attendance_aggregates(db, [10])
+        db.commit()
+        assert _aggregate(db, 10).total_external_pending_seconds == 3 * 3600
+
+        approve_external_work(approved.id, db=db, current_user=teacher)
+        reject_external_work(
+            rejected.id, ExternalWorkReject(reason="nee"), db=db, current_user=teacher
+        )
+
+        agg = _aggregate(db, 10)
+        assert agg.total_external_approved_seconds == 2 * 3600
+        assert agg.total_external_pending_seconds == 0
+
+    def test_edit_and_delete(self, db, teacher):
+        _student(db, 10)
+        ev = _event(db, 10, 2)
+        db.commit()
+
+        update_attendance_event(
+            ev.id,
+            AttendanceEventUpdate(check_out=_utc(ev.check_in) + timedelta(hours=3)),
+            db=db,
+            current_user=teacher,
+        )
+        assert _aggregate(db, 10).total_school_seconds == 3 * 3600
+
+        delete_attendance_event(ev.id, db=db, current_user=teacher)
+        assert _aggregate(db, 10).total_school_seconds == 0
+
+
+class TestScanPath:
+    def test_scan_leaves_expired_sessions_to_scheduler(self, db, engine):
+        _student(db, 10)
+        db.add(RFIDCard(user_id=10, uid="CARD10", is_active=True))
+        db.add(AttendanceAggregate(user_id=10))
+        for uid in range(20, 40):
+            _student(db, uid)
+            _event(db, uid, 0, open_=True, days_ago=1)
+        db.commit()
+
+        statements = []
+        event.listen(
+            engine, "before_cursor_execute", lambda *a: statements.append(a[2])
+        )
+        check_in = rfid_scan(RFIDScanRequest(uid="CARD10"), db=db, _=None)
+        check_in_statements = len(statements)
+        statements.clear()
+        check_out = rfid_scan(RFIDScanRequest(uid="CARD10"), db=db, _=None)
+
+        assert check_in.action == "check_in"
+        assert check_out.action == "check_out"
+        # card + user, open session, insert
+        assert check_in_statements == 3
+        # open session, event update, aggregate update (card lookup cached)
+        assert len(statements) == 3
+        db.expire_all()
+        assert (
+            db.query(AttendanceEvent)
+            .filter(AttendanceEvent.check_out.is_(None))
+            .count()
+            == 20
+        )
+
+        maintenance = SchedulerService(db).run_maintenance()
+        assert maintenance["expired_attendance_sessions"] == 20
+        assert _aggregate(db, 20).total_school_seconds == 15 * 60
+
+    def test_scan_on_forgotten_session_closes_it_and_checks_in(self, db):
+        _student(db, 10)
+        db.add(RFIDCard(user_id=10, uid="CARD10", is_active=True))
+        forgotten = _event(db, 10, 0, open_=True, days_ago=0)
+        forgotten.check_in = NOW - timedelta(hours=13)
+        db.commit()
+
+        result = rfid_scan(RFIDScanRequest(uid="CARD10"), db=db, _=None)
+
+        assert result.action == "check_in"
+        db.expire_all()
+        events = (
+            db.query(AttendanceEvent)
+            .filter(AttendanceEvent.user_id == 10)
+            .order_by(AttendanceEvent.check_in)
+            .all()
+        )
+        assert len(events) == 2
+        assert _utc(events[0].check_out) == _utc(events[0].check_in) + timedelta(
+            minutes=15
+        )
+        assert events[1].id == result.event["id"]
+        assert events[1].check_out is None
+        assert _aggregate(db, 10).total_school_seconds == 15 * 60
+
+    def test_failed_rollup_refresh_stores_nothing(self, db, monkeypatch):
+        _student(db, 10)
+        db.add(RFIDCard(user_id=10, uid="CARD10", is_active=True))
+        _event(db, 10, 0, open_=True, days_ago=0).check_in = NOW - timedelta(hours=1)
+        db.commit()
+
+        def _fail(*args):
+            raise RuntimeError("rollups unavailable")
+
+        monkeypatch.setattr(attendance_router, "refresh_attendance_rollups", _fail)
+        assert rfid_scan(RFIDScanRequest(uid="CARD10"), db=db, _=None).status == (
+            "error"
+        )
+        monkeypatch.undo()
+
+        # The session is still open: the reader's retry checks out
+        retry = rfid_scan(RFIDScanRequest(uid="CARD10"), db=db, _=None)
+        assert retry.action == "check_out"
+        db.expire_all()
+        assert db.query(AttendanceEvent).count() == 1
+        assert _aggregate(db, 10).total_school_seconds == pytest.approx(3600, abs=60)
+
+    def test_checkout_adds_to_existing_aggregate(self, db):
+        _student(db, 10)
+        db.add(RFIDCard(user_id=10, uid="CARD10", is_active=True))
+        _event(db, 10, 2, days_ago=2)
+        _event(db, 10, 1, external=True, status="approved", days_ago=3)
+        _event(db, 10, 0, open_=True, days_ago=0).check_in = NOW - timedelta(hours=1)
+        db.commit()
+        refresh_attendance_aggregates(db, [10])
+        db.commit()
+
+        rfid_scan(RFIDScanRequest(uid="CARD10"), db=db, _=None)
+
+        agg = _aggregate(db, 10)
+        assert agg.total_school_seconds == pytest.approx(3 * 3600, abs=60)
+        assert float(agg.lesson_blocks) == round(4 * 3600 / 4500, 1)
+
+
+class TestReadPaths:
+    def test_overview_ranks_and_paginates_in_sql(self, db, engine, teacher):
+        for uid, hours in ((10, 1), (11, 5), (12, 3), (13, 0)):
+            _student(db, uid)
+            if hours:
+                _event(db, uid, hours)
+        db.commit()
+        rebuild_attendance_aggregates(db)
+        db.refresh(teacher)
+
+        statements = []
+        event.listen(
+            engine, "before_cursor_execute", lambda *a: statements.append(a[2])
+        )
+        page1 = get_attendance_overview(
+            db=db,
+            current_user=teacher,
+            course_id=None,
+            project_id=None,
+            q=None,
+            page=1,
+            per_page=2,
+        )
+        page2 = get_attendance_overview(
+            db=db,
+            current_user=teacher,
+            course_id=None,
+            project_id=None,
+            q=None,
+            page=2,
+            per_page=2,
+        )
+
+        assert page1["total"] == 4
+        assert page1["total_pages"] == 2
+        assert [i["user_id"] for i in page1["items"]] == [11, 12]
+        assert [i["user_id"] for i in page2["items"]] == [10, 13]
+        assert page2["items"][1]["total_school_seconds"] == 0
+        assert page1["items"][0]["lesson_blocks"] == 4.0
+        # count + page per request, independent of the number of students
+        assert len(statements) == 4
+
+    def test_overview_search(self, db, teacher):
+        _student(db, 10, name="Anna")
+        _student(db, 11, name="Bram")
+        db.commit()
+        result = get_attendance_overview(
+            db=db,
+            current_user=teacher,
+            course_id=None,
+            project_id=None,
+            q="bra",
+            page=1,
+            per_page=30,
+        )
+        assert [i["user_name"] for i in result["items"]] == ["Bram"]
+
+    def test_me_reads_aggregate(self, db):
+        _student(db, 10)
+        _event(db, 10, 2)
+        _event(db, 10, 1, external=True, status="pending")
+        db.commit()
+        student = db.get(User, 10)
+
+        totals = get_my_attendance(db=db, current_user=student, project_id=None)
+
+        assert totals.total_school_seconds == 7200
+        assert totals.total_external_pending_seconds == 3600
+        # Created on first access
+        assert _aggregate(db, 10).total_school_seconds == 7200
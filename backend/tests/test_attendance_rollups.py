@@ -0,0 +1,402 @@
+"""
+Tests for the daily attendance rollups behind /attendance/stats/*.
+
+Closed days are rolled up once and read from attendance_daily_rollups; only
+days after the watermark (today) are computed from attendance_events. Changes
+to events on a rolled-up day must refresh that day.
+"""
+
+from datetime import datetime, time, timedelta, timezone
+from unittest.mock import MagicMock
+
+import pytest
+from sqlalchemy import create_engine, event
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+from sqlalchemy.schema import CreateTable
+
+from app.api.v1.routers.attendance import (
+    approve_external_work,
+    get_stats_daily,
+    get_stats_heatmap,
+    get_stats_signals,
+    get_stats_summary,
+    get_stats_top_bottom,
+    get_stats_weekly,
+)
+from app.infra.db.models import (
+    AttendanceDailyRollup,
+    AttendanceEvent,
+    AttendanceRollupState,
+    Course,
+    CourseEnrollment,
+    School,
+    User,
+)
+from app.services import attendance_rollups
+from app.services.attendance_rollups import (
+    ROLLUP_LOCK_CLASS,
+    get_rolled_up_through,
+    rebuild_attendance_rollups,
+    rollup_closed_days,
+    sync_attendance_rollups,
+)
+
+_NEEDED_TABLES = [
+    School.__table__,
+    User.__table__,
+    Course.__table__,
+    CourseEnrollment.__table__,
+    AttendanceEvent.__table__,
+    AttendanceDailyRollup.__table__,
+    AttendanceRollupState.__table__,
+]
+
+TODAY = datetime.now(timezone.utc).date()
+
+
+def _at(days_ago, hour=9, minute=30):
+    day = TODAY - timedelta(days=days_ago)
+    return datetime.combine(day, time(hour, minute), tzinfo=timezone.utc)
+
+
+@pytest.fixture
+def db():
+    engine = create_engine(
+        "sqlite:///:memory:",
+        connect_args={"check_same_thread": False},
+        poolclass=StaticPool,
+    )
+    with engine.begin() as conn:
+        for table in _NEEDED_TABLES:
+            conn.execute(CreateTable(table))
+            for name in sorted({index.name for index in table.indexes}):
+                next(i for i in table.indexes if i.name == name).create(conn)
+    Session = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    session = Session()
+    session.add(School(id=1, name="School"))
+    session.add(User(id=1, school_id=1, name="Docent", email="t@x.nl", role="teacher"))
+    session.add(Course(id=1, school_id=1, name="Biologie"))
+    for uid in (10, 11):
+        session.add(
+            User(
+                id=uid,
+                school_id=1,
+                name=f"Leerling {uid}",
+                email=f"s{uid}@school.nl",
+                role="student",
+            )
+        )
+    session.add(CourseEnrollment(course_id=1, student_id=10))
+    session.commit()
+    yield session
+    session.close()
+    engine.dispose()
+
+
+@pytest.fixture
+def teacher(db):
+    return db.get(User, 1)
+
+
+def _event(db, uid, check_in, hours=None, external=False, status=None, project=None):
+    ev = AttendanceEvent(
+        user_id=uid,
+        project_id=project,
+        check_in=check_in,
+        check_out=check_in + timedelta(hours=hours) if hours else None,
+        is_external=external,
+        location="Bedrijf" if external else None,
+        approval_status=status,
+        source="manual",
+    )
+    db.add(ev)
+    return ev
+
+
+def _stats(endpoint, db, teacher, **kwargs):
+    params = {"period": "4w", "course_id": None, "project_id": None}
+    params.update(kwargs)
+    return endpoint(db=db, current_user=teacher, **params)
+
+
+def _rows(db, day):
+    db.expire_all()
+    return (
+        db.query(AttendanceDailyRollup)
+        .filter(AttendanceDailyRollup.day == day)
+        .order_by(AttendanceDailyRollup.user_id)
+        .all()
+    )
+
+
+class TestRollupClosedDays:
+    def test_rolls_up_every_day_before_today_once(self, db):
+        _event(db, 10, _at(2), 2)
+        _event(db, 10, _at(2, hour=13), 1)
+        _event(db, 10, _at(3), 3, external=True, status="approved")
+        _event(db, 10, _at(3), 1, external=True, status="pending")
+        _event(db, 10, _at(0, hour=0, minute=5), 1)
+        db.commit()
+
+        assert rollup_closed_days(db) == 3
+        assert get_rolled_up_through(db) == TODAY - timedelta(days=1)
+
+        (school_day,) = _rows(db, TODAY - timedelta(days=2))
+        assert school_day.school_id == 1
+        assert school_day.school_seconds == 3 * 3600
+        assert school_day.school_check_ins == 2
+        assert school_day.check_in_hours == (1 << 9) | (1 << 13)
+        (extern_day,) = _rows(db, TODAY - timedelta(days=3))
+        assert extern_day.extern_approved_seconds == 3 * 3600
+        assert extern_day.pending_count == 1
+        assert _rows(db, TODAY) == []
+
+        assert rollup_closed_days(db) == 0
+
+    def test_rebuild_recomputes_from_events(self, db):
+        _event(db, 10, _at(2), 2)
+        db.commit()
+        rollup_closed_days(db)
+        _rows(db, TODAY - timedelta(days=2))[0].school_seconds = 1
+        db.commit()
+
+        rebuild_attendance_rollups(db)
+
+        assert _rows(db, TODAY - timedelta(days=2))[0].school_seconds == 2 * 3600
+
+
+class TestConcurrentRewrites:
+    def test_one_row_per_user_day_and_project(self, db):
+        day = TODAY - timedelta(days=2)
+        db.add(AttendanceDailyRollup(school_id=1, user_id=10, day=day))
+        db.add(AttendanceDailyRollup(school_id=1, user_id=10, day=day, project_id=5))
+        db.commit()
+
+        db.add(AttendanceDailyRollup(school_id=1, user_id=10, day=day))
+        with pytest.raises(IntegrityError):
+            db.commit()
+        db.rollback()
+
+    def test_postgres_rewrites_lock_their_users(self, monkeypatch):
+        db = MagicMock()
+        db.get_bind.return_value.dialect.name = "postgresql"
+        monkeypatch.setattr(attendance_rollups, "_event_rows", lambda *a, **kw: [])
+        day = TODAY - timedelta(days=2)
+
+        attendance_rollups._replace_rollups(db, day, day, user_ids=[11, 10, 11])
+        attendance_rollups._replace_rollups(db, day, day)
+
+        locks = [
+            call.args[0].compile(compile_kwargs={"literal_binds": True})
+            for call in db.execute.call_args_list
+        ]
+        assert [str(lock) for lock in locks] == [
+            f"SELECT pg_advisory_xact_lock({ROLLUP_LOCK_CLASS}, {key}) AS "
+            "pg_advisory_xact_lock_1"
+            for key in (10, 11, 0)
+        ]
+        # Locked before the rows are deleted
+        calls = [name for name, *_ in db.method_calls]
+        assert calls.index("execute") < calls.index("query")
+
+
+class TestReadsMergeRollupsAndToday:
+    def test_closed_days_come_from_rollups_and_today_is_live(self, db, teacher):
+        _event(db, 10, _at(2), 2)
+        db.commit()
+        rollup_closed_days(db)
+
+        # Written behind the rollups' back: not visible until its day is refreshed
+        late = _event(db, 10, _at(2, hour=15), 1)
+        _event(db, 10, _at(0, hour=0, minute=5), 1)
+        db.commit()
+
+        summary = _stats(get_stats_summary, db, teacher)
+        assert summary.school_minutes == 3 * 60
+
+        sync_attendance_rollups(db, [(late.user_id, late.check_in)])
+
+        summary = _stats(get_stats_summary, db, teacher)
+        assert summary.school_minutes == 4 * 60
+
+    def test_without_rollups_everything_is_live(self, db, teacher):
+        _event(db, 10, _at(2), 2)
+        db.commit()
+
+        assert get_rolled_up_through(db) is None
+        assert _stats(get_stats_summary, db, teacher).school_minutes == 120
+
+    def test_approval_refreshes_a_rolled_up_day(self, db, teacher):
+        pending = _event(db, 10, _at(3), 5, external=True, status="pending")
+        db.commit()
+        rollup_closed_days(db)
+        assert _stats(get_stats_summary, db, teacher).extern_approved_minutes == 0
+
+        approve_external_work(pending.id, db=db, current_user=teacher)
+
+        summary = _stats(get_stats_summary, db, teacher)
+        assert summary.extern_approved_minutes == 5 * 60
+        assert _rows(db, TODAY - timedelta(days=3))[0].pending_count == 0
+
+
+@pytest.fixture
+def stats_data(db):
+    # Student 10 (Biologie): 1.25h school on project 5, 5h approved external,
+    # three pending registrations and a check-in left open since yesterday
+    _event(db, 10, _at(8), 1.25, project=5)
+    _event(db, 10, _at(8, hour=11), 5, external=True, status="approved")
+    for days_ago in (5, 6, 7):
+        _event(db, 10, _at(days_ago), 1, external=True, status="pending")
+    _event(db, 10, _at(1, hour=6))
+    # Student 11: 7.5h school over two days
+    _event(db, 11, _at(8), 5)
+    _event(db, 11, _at(9, hour=10), 2.5)
+    db.commit()
+    rollup_closed_days(db)
+
+
+@pytest.mark.usefixtures("stats_data")
+class TestStatsEndpoints:
+    def test_summary_with_filters(self, db, teacher):
+        summary = _stats(get_stats_summary, db, teacher)
+        assert summary.school_minutes == int(1.25 * 60 + 7.5 * 60)
+        assert summary.extern_approved_minutes == 5 * 60
+
+        course = _stats(get_stats_summary, db, teacher, course_id=1)
+        assert course.school_blocks == 1.0
+        assert course.extern_approved_blocks == 4.0
+
+        project = _stats(get_stats_summary, db, teacher, project_id=5)
+        assert project.school_minutes == 75
+        assert project.extern_approved_minutes == 0
+
+    def test_weekly_groups_by_monday(self, db, teacher):
+        weeks = _stats(get_stats_weekly, db, teacher)
+        mondays = {
+            (day - timedelta(days=day.weekday())).isoformat()
+            for day in (_at(8).date(), _at(9).date())
+        }
+        assert {w.week_start for w in weeks} >= mondays
+        assert sum(w.school_blocks for w in weeks) == pytest.approx(1.0 + 6.0)
+
+    def test_daily_counts_students_with_school_check_ins(self, db, teacher):
+        daily = {
+            d.date: d.unique_students for d in _stats(get_stats_daily, db, teacher)
+        }
+        assert daily[_at(8).date().isoformat()] == 2
+        assert daily[_at(9).date().isoformat()] == 1
+        # Days with only external work are not listed
+        assert _at(5).date().isoformat() not in daily
+
+    def test_heatmap(self, db, teacher):
+        cells = {
+            (c.weekday, c.hour): c.avg_students
+            for c in _stats(get_stats_heatmap, db, teacher).cells
+        }
+        weekday_8 = _at(8).weekday()
+        if weekday_8 < 5:
+            assert cells[(weekday_8, 9)] == 2.0
+        assert all(weekday < 5 and 8 <= hour <= 18 for weekday, hour in cells)
+
+    def test_top_bottom(self, db, teacher):
+        result = _stats(get_stats_top_bottom, db, teacher, mode="4w")
+        assert [(s.student_id, s.total_blocks) for s in result.top] == [
+            (11, 6.0),
+            (10, 5.0),
+        ]
+        assert result.top[1].course == "Biologie"
+        assert result.bottom == []
+
+
+def _signals(db, teacher, **kwargs):
+    params = {
+        "min_extern_hours": 4,
+        "max_school_blocks": 2,
+        "min_pending_count": 3,
+        "long_open_hours": 12,
+    }
+    params.update(kwargs)
+    return _stats(get_stats_signals, db, teacher, **params)
+
+
+@pytest.mark.usefixtures("stats_data")
+class TestSignals:
+    def test_three_lists_with_course_names(self, db, teacher):
+        signals = _signals(db, teacher)
+
+        assert [s.student_id for s in signals.extern_low_school] == [10]
+        assert signals.extern_low_school[0].course == "Biologie"
+        assert signals.extern_low_school[0].value_text == (
+            "extern 5.0u / school 1.0 blok"
+        )
+        assert [(s.student_id, s.value_text) for s in signals.many_pending] == [
+            (10, "pending 3")
+        ]
+        assert [s.student_id for s in signals.long_open] == [10]
+        assert signals.long_open[0].value_text.startswith("open sinds ")
+
+    def test_filters(self, db, teacher):
+        biologie = _signals(db, teacher, course_id=1)
+        assert biologie.extern_low_school[0].student_name == "Leerling 10"
+        assert _signals(db, teacher, project_id=5).many_pending == []
+
+    def test_thresholds_are_parameters(self, db, teacher):
+        signals = _signals(
+            db,
+            teacher,
+            min_extern_hours=6,
+            min_pending_count=1,
+            long_open_hours=24 * 30,
+        )
+
+        assert signals.extern_low_school == []
+        assert [s.student_id for s in signals.many_pending] == [10]
+        assert signals.long_open == []
+
+        # Student 11 has no external work at all
+        lenient = _signals(db, teacher, min_extern_hours=0, max_school_blocks=6)
+        assert [s.student_id for s in lenient.extern_low_school] == [10, 11]
+
+    def test_includes_today(self, db, teacher):
+        for _ in range(3):
+            _event(db, 11, _at(0, hour=0, minute=5), 1, external=True, status="pending")
+        db.commit()
+
+        signals = _signals(db, teacher)
+
+        assert [s.student_id for s in signals.many_pending] == [10, 11]
+
+    def test_single_query_regardless_of_students(self, db, teacher):
+        for uid in range(20, 30):
+            db.add(
+                User(
+                    id=uid,
+                    school_id=1,
+                    name=f"Leerling {uid}",
+                    email=f"s{uid}@school.nl",
+                    role="student",
+                )
+            )
+            db.add(CourseEnrollment(course_id=1, student_id=uid))
+            _event(db, uid, _at(2), 5, external=True, status="approved")
+            for days_ago in (2, 3, 4):
+                _event(db, uid, _at(days_ago), 1, external=True, status="pending")
+            _event(db, uid, _at(1, hour=7))
+        db.commit()
+        rebuild_attendance_rollups(db)
+        db.refresh(teacher)
+        statements = []
+        event.listen(
+            db.get_bind(), "before_cursor_execute", lambda *a: statements.append(a[2])
+        )
+
+        signals = _signals(db, teacher)
+
+        assert len(signals.extern_low_school) == 5
+        assert len(signals.many_pending) == 5
+        assert len(signals.long_open) == 5
+        assert all(s.course == "Biologie" for s in signals.many_pending)
+        # rollup watermark + the analytic query
+        assert len(statements) == 2
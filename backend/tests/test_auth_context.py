@@ -0,0 +1,105 @@
+"""
+The access token is decoded once per request.
+
+RateLimitMiddleware, SlidingSessionMiddleware and get_current_user share the
+claims on request.state.auth, and the rate limiter keys on the user instead of
+the client IP.
+"""
+
+from unittest.mock import MagicMock, patch
+
+import pytest
+from fastapi import Depends, FastAPI, Request
+from fastapi.testclient import TestClient
+
+from app.api.middleware import auth_context
+from app.api.middleware.rate_limit import RateLimitMiddleware
+from app.api.middleware.sliding_session import SlidingSessionMiddleware
+from app.api.v1 import deps
+from app.api.v1.deps import get_current_user_prod, get_db
+from app.core.config import settings
+from app.core.security import create_access_token
+from app.infra.db.models import User
+from app.infra.services.rate_limiter import RateLimiter, RateLimitResult
+
+
+def _user(user_id, email):
+    return User(id=user_id, email=email, name="Docent", role="teacher", school_id=1)
+
+
+@pytest.fixture
+def rate_limiter():
+    limiter = MagicMock(spec=RateLimiter)
+    limiter.hit.return_value = RateLimitResult(True, 100, 99, 60)
+    return limiter
+
+
+@pytest.fixture
+def client(rate_limiter):
+    users = {
+        "a@school.nl": _user(1, "a@school.nl"),
+        "b@school.nl": _user(2, "b@school.nl"),
+    }
+    db = MagicMock()
+    db.query.return_value.filter.side_effect = lambda clause: MagicMock(
+        first=lambda: users.get(clause.right.value)
+    )
+
+    app = FastAPI()
+    app.add_middleware(RateLimitMiddleware, rate_limiter=rate_limiter)
+    app.add_middleware(SlidingSessionMiddleware)
+    app.dependency_overrides[get_db] = lambda: db
+
+    @app.get("/api/v1/me")
+    def me(request: Request, user: User = Depends(get_current_user_prod)):
+        return {"id": user.id, "state_user": request.state.user.id}
+
+    return TestClient(app)
+
+
+@pytest.fixture
+def decode_calls():
+    real = auth_context.decode_access_token_and_check_expiry
+    counter = MagicMock(side_effect=real)
+    with (
+        patch.object(auth_context, "decode_access_token_and_check_expiry", counter),
+        patch.object(deps, "decode_access_token_and_check_expiry", counter),
+    ):
+        yield counter
+
+
+def _rate_keys(rate_limiter):
+    return [c.args[0] for c in rate_limiter.hit.call_args_list]
+
+
+def test_token_is_decoded_once_per_request(client, decode_calls, monkeypatch):
+    # Expiring soon, so the sliding session renews it from the shared claims
+    monkeypatch.setattr(settings, "ACCESS_TOKEN_EXPIRE_MINUTES", 5)
+    client.cookies.set("access_token", create_access_token(sub="a@school.nl"))
+
+    response = client.get("/api/v1/me")
+
+    assert response.json() == {"id": 1, "state_user": 1}
+    assert "access_token=" in response.headers["set-cookie"]
+    assert decode_calls.call_count == 1
+
+
+def test_rate_limit_is_keyed_per_user(client, rate_limiter):
+    for email in ("a@school.nl", "b@school.nl"):
+        token = create_access_token(sub=email)
+        client.get("/api/v1/me", headers={"Authorization": f"Bearer {token}"})
+
+    assert _rate_keys(rate_limiter) == [
+        "user:a@school.nl:/api/v1/me",
+        "user:b@school.nl:/api/v1/me",
+    ]
+
+
+def test_invalid_token_is_keyed_per_ip(client, rate_limiter):
+    response = client.get(
+        "/api/v1/me",
+        headers={"Authorization": "Bearer not-a-jwt", "X-Real-IP": "203.0.113.7"},
+    )
+
+    assert response.status_code == 401
+    assert _rate_keys(rate_limiter) == ["ip:203.0.113.7:/api/v1/me"]
@@ -0,0 +1,79 @@
+"""
+The authentication dependency must not block the event loop.
+
+The user lookup is a sync SQLAlchemy query, so get_current_user_* are plain
+functions that FastAPI runs in its threadpool.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import inspect
+import threading
+import time
+from unittest.mock import MagicMock
+
+import httpx
+from fastapi import Depends, FastAPI
+
+from app.api.v1.deps import get_current_user_dev, get_current_user_prod, get_db
+from app.core.security import create_access_token
+from app.infra.db.models import User
+
+
+def test_auth_dependencies_are_sync():
+    assert not inspect.iscoroutinefunction(get_current_user_prod)
+    assert not inspect.iscoroutinefunction(get_current_user_dev)
+
+
+def test_slow_user_lookup_does_not_block_other_requests():
+    user = User(
+        id=1,
+        email="t@example.com",
+        name="Docent",
+        role="teacher",
+        school_id=1,
+        archived=False,
+    )
+    lookup_started = threading.Event()
+
+    def slow_first():
+        lookup_started.set()
+        time.sleep(0.5)
+        return user
+
+    db = MagicMock()
+    db.query.return_value.filter.return_value.first.side_effect = slow_first
+
+    app = FastAPI()
+    app.dependency_overrides[get_db] = lambda: db
+
+    @app.get("/me")
+    async def me(current_user: User = Depends(get_current_user_prod)):
+        return {"id": current_user.id}
+
+    @app.get("/ping")
+    async def ping():
+        return {"ok": True}
+
+    token = create_access_token(sub=user.email, role="teacher", school_id=1)
+
+    async def scenario():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://t") as c:
+            me_task = asyncio.create_task(
+                c.get("/me", headers={"Authorization": f"Bearer {token}"})
+            )
+            while not lookup_started.is_set():
+                await asyncio.sleep(0.01)
+            start = time.perf_counter()
+            ping = await c.get("/ping")
+            ping_seconds = time.perf_counter() - start
+            return (await me_task), ping, ping_seconds
+
+    me_response, ping, ping_seconds = asyncio.run(scenario())
+
+    assert me_response.json() == {"id": 1}
+    assert ping.status_code == 200
+    # Answered while the user lookup was still sleeping in a worker thread
+    assert ping_seconds < 0.3
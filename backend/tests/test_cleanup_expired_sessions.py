@@ -11,7 +11,7 @@ Covers:
 7. No DB commit is made when there is nothing to close.
 8. The /cleanup-expired endpoint requires teacher or admin role.
 9. The /cleanup-expired endpoint calls cleanup_expired_sessions and returns the count.
-10. The RFID /scan endpoint calls cleanup_expired_sessions before processing.
+10. Cleanup runs in the scheduler maintenance tick, not on the RFID /scan path.
 """
 
 from __future__ import annotations
@@ -22,7 +22,7 @@ from unittest.mock import MagicMock, Mock, patch, call
 
 import pytest
 
-from app.api.v1.routers.attendance import (
+from app.services.attendance_sessions import (
     FORGOTTEN_CHECKOUT_THRESHOLD_HOURS,
     FORGOTTEN_CHECKOUT_SESSION_MINUTES,
     cleanup_expired_sessions,
@@ -158,17 +158,13 @@ class TestCleanupExpiredSessions:
         cleanup_expired_sessions(db)
 
         # Inspect the source to ensure is_external check is present
-        from app.api.v1.routers.attendance import cleanup_expired_sessions as fn
-
-        source = inspect.getsource(fn)
+        source = inspect.getsource(cleanup_expired_sessions)
         assert "is_external" in source
         assert "check_out" in source
 
     def test_query_excludes_already_checked_out_sessions(self):
         """The DB query must only include sessions with check_out IS NULL."""
-        from app.api.v1.routers.attendance import cleanup_expired_sessions as fn
-
-        source = inspect.getsource(fn)
+        source = inspect.getsource(cleanup_expired_sessions)
         assert "check_out.is_(None)" in source
 
     def test_function_signature_accepts_only_db(self):
@@ -276,15 +272,33 @@ class TestCleanupExpiredEndpoint:
         assert result["cleaned_up"] == 0
 
 
-# ── RFID scan calls cleanup ────────────────────────────────────────────────────
+# ── Scheduler runs cleanup ─────────────────────────────────────────────────────
 
 
-class TestRfidScanCallsCleanup:
-    """Verify that the RFID /scan endpoint invokes cleanup_expired_sessions."""
+class TestCleanupRunsInScheduler:
+    """Cleanup is scheduler maintenance; the RFID /scan hot path skips it."""
 
-    def test_rfid_scan_source_calls_cleanup(self):
-        """The source of rfid_scan must contain a call to cleanup_expired_sessions."""
+    def test_rfid_scan_does_not_call_cleanup(self):
         from app.api.v1.routers.attendance import rfid_scan
 
         source = inspect.getsource(rfid_scan)
-        assert "cleanup_expired_sessions(db)" in source
+        assert "cleanup_expired_sessions(" not in source
+
+    def test_scheduler_maintenance_calls_cleanup(self):
+        from app.infra.services.scheduler_service import SchedulerService
+
+        with (
+            patch(
+                "app.services.attendance_sessions.cleanup_expired_sessions",
+                return_value=3,
+            ) as cleanup,
+            patch("app.services.attendance_rollups.rollup_closed_days", return_value=1),
+        ):
+            db = MagicMock()
+            result = SchedulerService(db).run_maintenance()
+
+        cleanup.assert_called_once_with(db)
+        assert result == {
+            "expired_attendance_sessions": 3,
+            "attendance_rollup_days": 1,
+        }
@@ -0,0 +1,241 @@
+"""
+Tests for the shared evaluation score aggregation used by the dashboard, flags
+and matrix endpoints.
+
+All scores of an evaluation are loaded with one joined query, so the number of
+queries per endpoint must not grow with the number of allocations.
+"""
+
+from unittest.mock import Mock
+
+import pytest
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from app.api.v1.routers.dashboard import dashboard_evaluation
+from app.api.v1.routers.flags import flags_evaluation
+from app.api.v1.routers.matrix import matrix_evaluation
+from app.infra.db.models import (
+    Allocation,
+    Base,
+    Evaluation,
+    Rubric,
+    RubricCriterion,
+    School,
+    Score,
+    User,
+)
+from app.services.evaluation_aggregates import load_evaluation_aggregates
+
+_NEEDED_TABLES = [
+    School.__table__,
+    User.__table__,
+    Rubric.__table__,
+    RubricCriterion.__table__,
+    Evaluation.__table__,
+    Allocation.__table__,
+    Score.__table__,
+]
+
+N_CRITERIA = 5
+
+
+@pytest.fixture
+def engine():
+    engine = create_engine(
+        "sqlite:///:memory:",
+        connect_args={"check_same_thread": False},
+        poolclass=StaticPool,
+    )
+    Base.metadata.create_all(engine, tables=_NEEDED_TABLES)
+    yield engine
+    engine.dispose()
+
+
+@pytest.fixture
+def db(engine):
+    Session = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    session = Session()
+    yield session
+    session.close()
+
+
+@pytest.fixture
+def teacher():
+    u = Mock(spec=User)
+    u.id = 1
+    u.school_id = 1
+    u.role = "teacher"
+    return u
+
+
+def _seed(db, n_students: int, team_size: int = 3):
+    """Peer evaluation where every student rates each team member (incl. self)."""
+    db.add_all(
+        [
+            School(id=1, name="School"),
+            School(id=2, name="Other"),
+            Rubric(
+                id=1, school_id=1, title="R", scope="peer", scale_min=1, scale_max=5
+            ),
+            Evaluation(id=1, school_id=1, rubric_id=1, title="Peer", status="open"),
+        ]
+    )
+    for c in range(1, N_CRITERIA + 1):
+        db.add(RubricCriterion(id=c, school_id=1, rubric_id=1, name=f"C{c}"))
+    # A user of another school must never be loaded
+    db.add(User(id=999, school_id=2, name="Other", email="o@x.nl", role="student"))
+
+    students = list(range(100, 100 + n_students))
+    for sid in students:
+        db.add(
+            User(
+                id=sid,
+                school_id=1,
+                name=f"Leerling {sid}",
+                email=f"s{sid}@school.nl",
+                role="student",
+                team_number=(sid - 100) // team_size + 1,
+            )
+        )
+
+    alloc_id = 0
+    for reviewer in students:
+        team = (reviewer - 100) // team_size
+        for reviewee in students:
+            if (reviewee - 100) // team_size != team:
+                continue
+            alloc_id += 1
+            db.add(
+                Allocation(
+                    id=alloc_id,
+                    school_id=1,
+                    evaluation_id=1,
+                    reviewer_id=reviewer,
+                    reviewee_id=reviewee,
+                    is_self=reviewer == reviewee,
+                )
+            )
+            for c in range(1, N_CRITERIA + 1):
+                db.add(
+                    Score(
+                        school_id=1,
+                        allocation_id=alloc_id,
+                        criterion_id=c,
+                        score=1 + (reviewer + reviewee + c) % 5,
+                    )
+                )
+    db.commit()
+    return students
+
+
+class TestLoadEvaluationAggregates:
+    def test_by_reviewee_splits_peer_and_self(self, db):
+        _seed(db, n_students=3)
+        aggregates = load_evaluation_aggregates(db, 1, 1)
+
+        assert len(aggregates.allocations) == 9
+        assert aggregates.user_ids == {100, 101, 102}
+
+        per_reviewee = aggregates.by_reviewee()
+        agg = per_reviewee[100]
+        assert agg.reviewers_count == 2
+        assert agg.self_avg == pytest.approx(
+            sum(1 + (200 + c) % 5 for c in range(1, 6)) / 5
+        )
+        assert len(agg.crit_peers[1]) == 2
+        assert agg.crit_self[1] == 1 + (200 + 1) % 5
+
+    def test_equal_peer_and_self_average_counts_as_reviewer(self, db):
+        """A peer allocation with the same average as the self-score is a peer."""
+        db.add_all(
+            [
+                School(id=1, name="School"),
+                Allocation(
+                    id=1,
+                    school_id=1,
+                    evaluation_id=1,
+                    reviewer_id=1,
+                    reviewee_id=1,
+                    is_self=True,
+                ),
+                Allocation(
+                    id=2,
+                    school_id=1,
+                    evaluation_id=1,
+                    reviewer_id=2,
+                    reviewee_id=1,
+                    is_self=False,
+                ),
+                Score(school_id=1, allocation_id=1, criterion_id=1, score=3),
+                Score(school_id=1, allocation_id=2, criterion_id=1, score=3),
+            ]
+        )
+        db.commit()
+
+        agg = load_evaluation_aggregates(db, 1, 1).by_reviewee()[1]
+        assert agg.peer_alloc_avgs == [3.0]
+        assert agg.self_avg == 3.0
+
+    def test_by_pair_with_criterion(self, db):
+        _seed(db, n_students=3)
+        pairs = load_evaluation_aggregates(db, 1, 1, include_self=False).by_pair(2)
+        assert (100, 100) not in pairs
+        assert pairs[(100, 101)] == [float(1 + (201 + 2) % 5)]
+
+
+class TestEndpointQueryCounts:
+    """30 students, 5 criteria: the endpoints must not query per allocation."""
+
+    @pytest.fixture
+    def counted(self, engine):
+        statements = []
+
+        def _count(conn, cursor, statement, *args):
+            statements.append(statement)
+
+        event.listen(engine, "before_cursor_execute", _count)
+        yield statements
+        event.remove(engine, "before_cursor_execute", _count)
+
+    def test_dashboard(self, db, teacher, counted):
+        _seed(db, n_students=30)
+        counted.clear()
+        result = dashboard_evaluation(1, include_breakdown=True, db=db, user=teacher)
+        assert len(result.items) == 30
+        assert all(row.reviewers_count == 2 for row in result.items)
+        assert result.items[0].user_name == "Leerling 100"
+        # evaluation, rubric, criteria, scores, users
+        assert len(counted) <= 5
+
+    def test_flags(self, db, teacher, counted):
+        _seed(db, n_students=30)
+        counted.clear()
+        result = flags_evaluation(
+            1,
+            spr_high=1.3,
+            spr_low=0.7,
+            gcf_low=0.7,
+            min_reviewers=2,
+            zscore_abs=2.0,
+            db=db,
+            user=teacher,
+        )
+        assert len(result.items) == 30
+        # evaluation, rubric, scores, users
+        assert len(counted) <= 4
+        assert not any("999" in str(s) for s in counted)
+
+    def test_matrix(self, db, teacher, counted):
+        _seed(db, n_students=30)
+        counted.clear()
+        result = matrix_evaluation(
+            1, criterion_id=None, include_self=True, db=db, user=teacher
+        )
+        assert len(result.reviewers) == 30
+        assert len(result.cells) == 30 * 30
+        filled = [c for c in result.cells if c.value is not None]
+        assert len(filled) == 90
+        # evaluation, scores, users
+        assert len(counted) <= 3
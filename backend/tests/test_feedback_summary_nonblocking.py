@@ -0,0 +1,249 @@
+"""
+Tests for the non-blocking feedback summary GET.
+
+The GET returns a stored summary or queues generation and answers 202 with
+the job; it never calls Ollama itself. Runs the router against an in-memory
+SQLite database with the RQ queue mocked.
+"""
+
+from types import SimpleNamespace
+from unittest.mock import MagicMock, patch
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from app.api.v1.deps import get_current_user, get_db
+from app.api.v1.routers import feedback_summary
+from app.api.v1.routers.feedback_summary import _compute_feedback_hash
+from app.infra.db.models import (
+    Allocation,
+    Evaluation,
+    FeedbackSummary,
+    School,
+    Score,
+    SummaryGenerationJob,
+    User,
+)
+
+
+@compiles(JSONB, "sqlite")
+def _jsonb_as_json(element, compiler, **kw):
+    return "JSON"
+
+
+URL = "/feedback-summaries/evaluation/1/student/2"
+COMMENT = "Werkt goed samen"
+
+
+@pytest.fixture
+def session_factory():
+    engine = create_engine(
+        "sqlite://",
+        connect_args={"check_same_thread": False},
+        poolclass=StaticPool,
+    )
+    for model in (
+        School,
+        User,
+        Evaluation,
+        Allocation,
+        Score,
+        FeedbackSummary,
+        SummaryGenerationJob,
+    ):
+        model.__table__.create(engine)
+
+    SessionLocal = sessionmaker(bind=engine)
+    with SessionLocal() as db:
+        db.add(School(id=1, name="School"))
+        db.add(User(id=1, school_id=1, name="Docent", email="t@x.nl", role="teacher"))
+        db.add(User(id=2, school_id=1, name="Student", email="s@x.nl"))
+        db.add(User(id=3, school_id=1, name="Reviewer", email="r@x.nl"))
+        db.add(Evaluation(id=1, school_id=1, rubric_id=1, title="Peer", settings={}))
+        db.add(
+            Allocation(
+                id=1,
+                school_id=1,
+                evaluation_id=1,
+                reviewer_id=3,
+                reviewee_id=2,
+                is_self=False,
+            )
+        )
+        db.add(
+            Score(
+                school_id=1, allocation_id=1, criterion_id=1, score=4, comment=COMMENT
+            )
+        )
+        db.commit()
+    yield SessionLocal
+    engine.dispose()
+
+
+@pytest.fixture
+def queue():
+    queue = MagicMock()
+    with patch.object(feedback_summary, "get_queue", return_value=queue):
+        yield queue
+
+
+@pytest.fixture
+def client(session_factory, queue):
+    def _get_db():
+        db = session_factory()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    app = FastAPI()
+    app.include_router(feedback_summary.router)
+    app.dependency_overrides[get_db] = _get_db
+    app.dependency_overrides[get_current_user] = lambda: SimpleNamespace(
+        id=1, school_id=1, role="teacher"
+    )
+    return TestClient(app)
+
+
+@pytest.fixture(autouse=True)
+def no_ollama():
+    with patch(
+        "app.infra.services.ollama_service.OllamaService.generate_summary",
+        side_effect=AssertionError("the request must not call Ollama"),
+    ):
+        yield
+
+
+def test_missing_summary_is_queued_and_answered_with_202(client, queue):
+    response = client.get(URL)
+
+    assert response.status_code == 202
+    body = response.json()
+    assert body["status"] == "queued"
+    assert body["priority"] == "high"
+    feedback_hash = _compute_feedback_hash([COMMENT])
+    assert body["job_id"] == f"summary-1-2-{feedback_hash[:16]}"
+    queue.enqueue.assert_called_once()
+    assert queue.enqueue.call_args.kwargs["job_id"] == body["job_id"]
+
+    # The client polls the existing status endpoint
+    status = client.get(f"/feedback-summaries/jobs/{body['job_id']}/status")
+    assert status.status_code == 200
+    assert status.json()["status"] == "queued"
+
+
+def test_requests_for_the_same_feedback_share_one_job(client, queue):
+    first = client.get(URL).json()
+    second = client.get(URL).json()
+
+    assert second["job_id"] == first["job_id"]
+    queue.enqueue.assert_called_once()
+
+
+def test_stored_summary_is_returned_directly(client, queue, session_factory):
+    with session_factory() as db:
+        db.add(
+            FeedbackSummary(
+                school_id=1,
+                evaluation_id=1,
+                student_id=2,
+                summary_text="Je werkt goed samen.",
+                feedback_hash=_compute_feedback_hash([COMMENT]),
+                generation_method="ai",
+            )
+        )
+        db.commit()
+
+    response = client.get(URL)
+
+    assert response.status_code == 200
+    assert response.json()["summary_text"] == "Je werkt goed samen."
+    assert response.json()["cached"] is True
+    queue.enqueue.assert_not_called()
+
+
+def test_finished_job_is_queued_again_when_the_summary_is_gone(
+    client, queue, session_factory
+):
+    job_id = client.get(URL).json()["job_id"]
+    with session_factory() as db:
+        job = db.query(SummaryGenerationJob).filter_by(job_id=job_id).one()
+        job.status = "completed"
+        job.progress = 100
+        job.result = {"summary_text": "oud"}
+        db.commit()
+
+    response = client.post(f"{URL}/regenerate", json={"force": True})
+
+    assert response.status_code == 202
+    assert response.json()["job_id"] == job_id
+    assert response.json()["status"] == "queued"
+    assert response.json()["result"] is None
+    assert queue.enqueue.call_count == 2
+
+
+def test_queued_batch_job_is_returned_instead_of_a_second_one(
+    client, queue, session_factory
+):
+    with session_factory() as db:
+        db.add(
+            SummaryGenerationJob(
+                school_id=1,
+                evaluation_id=1,
+                student_id=2,
+                job_id="summary-1-2-1760000000",
+                status="processing",
+                progress=40,
+                task_type="batch_summary",
+            )
+        )
+        db.commit()
+
+    response = client.get(URL)
+
+    assert response.status_code == 202
+    assert response.json()["job_id"] == "summary-1-2-1760000000"
+    assert response.json()["status"] == "processing"
+    queue.enqueue.assert_not_called()
+    with session_factory() as db:
+        assert db.query(SummaryGenerationJob).count() == 1
+
+
+def test_new_feedback_gets_a_new_job(client, queue, session_factory):
+    first = client.get(URL).json()
+    with session_factory() as db:
+        job = db.query(SummaryGenerationJob).filter_by(job_id=first["job_id"]).one()
+        job.status = "completed"
+        db.add(
+            Score(
+                school_id=1,
+                allocation_id=1,
+                criterion_id=2,
+                score=3,
+                comment="Kan beter plannen",
+            )
+        )
+        db.commit()
+
+    second = client.get(URL).json()
+
+    assert second["job_id"] != first["job_id"]
+    assert queue.enqueue.call_count == 2
+
+
+def test_enqueue_failure_marks_job_failed(client, queue, session_factory):
+    queue.enqueue.side_effect = ConnectionError("redis down")
+
+    response = client.get(URL)
+
+    assert response.status_code == 503
+    with session_factory() as db:
+        job = db.query(SummaryGenerationJob).one()
+        assert job.status == "failed"
+        assert "redis down" in job.error_message
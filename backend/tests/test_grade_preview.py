@@ -0,0 +1,383 @@
+"""
+Tests for the bulk grade-preview pipeline and its short-lived cache.
+
+The preview must use a fixed number of queries regardless of the number of
+students and allocations. Repeated previews, and draft save and publish right
+after one, reuse the cached rows unless an input (scores, settings, rubric,
+membership, students) changed since.
+"""
+
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from sqlalchemy import create_engine, event, text, update
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from app.api.v1.routers.grades import preview_grades, publish_grades, save_draft
+from app.api.v1.schemas.grades import (
+    GradeDraftRequest,
+    GradeOverrideIn,
+    GradePublishRequest,
+)
+from app.infra.db.models import (
+    Allocation,
+    Base,
+    Course,
+    CourseEnrollment,
+    Evaluation,
+    Grade,
+    Project,
+    ProjectTeam,
+    ProjectTeamMember,
+    Rubric,
+    RubricCriterion,
+    School,
+    Score,
+    User,
+)
+from app.services import grade_preview
+from app.services.grade_preview import (
+    clear_grade_preview_cache,
+    compute_grade_preview_rows,
+    get_grade_preview_rows,
+)
+
+_NEEDED_TABLES = [
+    School.__table__,
+    User.__table__,
+    Course.__table__,
+    CourseEnrollment.__table__,
+    Project.__table__,
+    ProjectTeam.__table__,
+    ProjectTeamMember.__table__,
+    Rubric.__table__,
+    RubricCriterion.__table__,
+    Evaluation.__table__,
+    Allocation.__table__,
+    Score.__table__,
+]
+
+# ``grades`` uses JSONB: created with raw DDL for draft save and publish
+_GRADES_DDL = """
+CREATE TABLE grades (
+    id INTEGER PRIMARY KEY,
+    school_id INTEGER NOT NULL,
+    evaluation_id INTEGER NOT NULL,
+    user_id INTEGER NOT NULL,
+    grade NUMERIC(5, 2),
+    meta JSON NOT NULL DEFAULT '{}',
+    group_grade FLOAT,
+    gcf FLOAT,
+    spr FLOAT,
+    suggested_grade FLOAT,
+    published_grade FLOAT,
+    override_reason TEXT,
+    published_at DATETIME,
+    created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+    updated_at DATETIME DEFAULT CURRENT_TIMESTAMP
+)
+"""
+
+
+@pytest.fixture
+def engine():
+    engine = create_engine(
+        "sqlite:///:memory:",
+        connect_args={"check_same_thread": False},
+        poolclass=StaticPool,
+    )
+    Base.metadata.create_all(engine, tables=_NEEDED_TABLES)
+    with engine.begin() as conn:
+        conn.execute(text(_GRADES_DDL))
+    yield engine
+    engine.dispose()
+
+
+@pytest.fixture
+def db(engine):
+    Session = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    session = Session()
+    clear_grade_preview_cache()
+    yield session
+    clear_grade_preview_cache()
+    session.close()
+
+
+@pytest.fixture
+def statements(engine):
+    seen = []
+
+    def _count(conn, cursor, statement, *args):
+        seen.append(statement)
+
+    event.listen(engine, "before_cursor_execute", _count)
+    yield seen
+    event.remove(engine, "before_cursor_execute", _count)
+
+
+def _seed(db, given_scores, team_size=3):
+    """
+    Every student scores each team member (incl. self) with the same score on
+    both criteria; ``given_scores`` maps student id -> that score.
+    """
+    db.add_all(
+        [
+            School(id=1, name="School"),
+            Course(id=1, school_id=1, name="Vak", code="V1", is_active=True),
+            Rubric(
+                id=1, school_id=1, title="R", scope="peer", scale_min=1, scale_max=5
+            ),
+            RubricCriterion(id=1, school_id=1, rubric_id=1, name="C1", weight=1.0),
+            RubricCriterion(id=2, school_id=1, rubric_id=1, name="C2", weight=3.0),
+            Evaluation(
+                id=1,
+                school_id=1,
+                course_id=1,
+                rubric_id=1,
+                title="Peer",
+                status="open",
+                settings={},
+            ),
+        ]
+    )
+    students = sorted(given_scores)
+    for sid in students:
+        db.add(
+            User(
+                id=sid,
+                school_id=1,
+                name=f"Leerling {sid}",
+                email=f"s{sid}@school.nl",
+                role="student",
+                team_number=(sid - 101) // team_size + 1,
+            )
+        )
+        db.add(CourseEnrollment(course_id=1, student_id=sid, active=True))
+
+    # Inactive student: never part of the preview
+    db.add(User(id=999, school_id=1, name="Oud", email="o@x.nl", role="student"))
+    db.add(CourseEnrollment(course_id=1, student_id=999, active=False))
+
+    alloc_id = 0
+    for reviewer in students:
+        for reviewee in students:
+            if (reviewer - 101) // team_size != (reviewee - 101) // team_size:
+                continue
+            alloc_id += 1
+            db.add(
+                Allocation(
+                    id=alloc_id,
+                    school_id=1,
+                    evaluation_id=1,
+                    reviewer_id=reviewer,
+                    reviewee_id=reviewee,
+                    is_self=reviewer == reviewee,
+                )
+            )
+            for criterion_id in (1, 2):
+                db.add(
+                    Score(
+                        school_id=1,
+                        allocation_id=alloc_id,
+                        criterion_id=criterion_id,
+                        score=given_scores[reviewer],
+                    )
+                )
+    db.commit()
+    # Entered earlier: later edits move the latest updated_at
+    earlier = datetime.now(timezone.utc) - timedelta(hours=1)
+    for model in (Score, Evaluation, RubricCriterion, CourseEnrollment, User):
+        db.execute(update(model).values(updated_at=earlier))
+    db.commit()
+
+
+class TestComputeGradePreview:
+    def test_percentages_gcf_spr_and_suggestion(self, db):
+        # 5 -> 100%, 3 -> 50%, 4 -> 75%
+        _seed(db, {101: 5, 102: 3, 103: 4})
+
+        rows = {r["user_id"]: r for r in compute_grade_preview_rows(db, 1, 1)}
+
+        assert set(rows) == {101, 102, 103}
+        assert rows[101]["avg_score"] == pytest.approx(62.5)
+        assert rows[102]["avg_score"] == pytest.approx(87.5)
+        assert rows[103]["avg_score"] == pytest.approx(75.0)
+        # GCF relative to the team mean (75%), clamped at min_cf 0.85
+        assert rows[101]["gcf"] == pytest.approx(0.85)
+        assert rows[102]["gcf"] == pytest.approx(87.5 / 75)
+        assert rows[103]["gcf"] == pytest.approx(1.0)
+        assert rows[101]["spr"] == pytest.approx(100 / 62.5)
+        assert rows[101]["suggested_grade"] == 7.0
+        assert rows[102]["suggested_grade"] == 9.0
+        assert rows[101]["given_avg_pct"] == pytest.approx(100.0)
+        assert rows[102]["given_avg_pct"] == pytest.approx(50.0)
+        assert rows[101]["team_given_avg"] == pytest.approx(75.0)
+        assert rows[101]["team_number"] == 1
+
+    def test_project_teams_are_loaded_in_one_query(self, db):
+        _seed(db, {101: 5, 102: 3, 103: 4})
+        db.add(
+            Project(
+                id=1,
+                school_id=1,
+                course_id=1,
+                title="P",
+                status="active",
+                created_by_id=101,
+            )
+        )
+        db.add(
+            ProjectTeam(
+                id=1,
+                school_id=1,
+                project_id=1,
+                team_number=7,
+                display_name_at_time="Team 7",
+                version=1,
+            )
+        )
+        for uid in (101, 102):
+            db.add(ProjectTeamMember(school_id=1, project_team_id=1, user_id=uid))
+        db.query(Evaluation).update({"project_id": 1})
+        db.commit()
+
+        rows = {r["user_id"]: r for r in compute_grade_preview_rows(db, 1, 1)}
+        assert rows[101]["team_number"] == 7
+        # Projects never fall back to the user's own team_number
+        assert rows[103]["team_number"] is None
+
+    def test_query_count_does_not_grow_with_students(self, db, statements):
+        _seed(db, {sid: 1 + sid % 5 for sid in range(101, 131)})
+        statements.clear()
+
+        rows = compute_grade_preview_rows(db, 1, 1)
+
+        assert len(rows) == 30
+        # enrollments, students, evaluation, rubric, criteria, scores
+        assert len(statements) <= 6
+
+    def test_preview_endpoint(self, db):
+        _seed(db, {101: 5, 102: 3, 103: 4})
+        result = preview_grades(
+            evaluation_id=1, group_grade=None, course_id=None, db=db
+        )
+        assert [i.user_name for i in result.items] == [
+            "Leerling 101",
+            "Leerling 102",
+            "Leerling 103",
+        ]
+
+
+class TestGradePreviewCache:
+    def test_repeated_preview_reuses_cached_rows(self, db, statements):
+        _seed(db, {101: 5, 102: 3, 103: 4})
+        first = get_grade_preview_rows(db, 1, 1)
+
+        statements.clear()
+        second = get_grade_preview_rows(db, 1, 1)
+
+        assert second == first
+        # Only the version query
+        assert len(statements) == 1
+
+    def test_changed_score_invalidates(self, db):
+        _seed(db, {101: 5, 102: 3, 103: 4})
+        before = {r["user_id"]: r for r in get_grade_preview_rows(db, 1, 1)}
+
+        db.query(Score).filter(Score.allocation_id == 2).update({"score": 1})
+        db.commit()
+
+        after = {r["user_id"]: r for r in get_grade_preview_rows(db, 1, 1)}
+        assert after[102]["avg_score"] < before[102]["avg_score"]
+
+    def test_score_edit_keeping_the_sum_invalidates(self, db):
+        _seed(db, {101: 5, 102: 3, 103: 4})
+        before = {r["user_id"]: r for r in get_grade_preview_rows(db, 1, 1)}
+
+        # 102 -> 101: 3/3 becomes 2/4, same count and sum, other weighted score
+        db.query(Score).filter(
+            Score.allocation_id == 4, Score.criterion_id == 1
+        ).update({"score": 2})
+        db.query(Score).filter(
+            Score.allocation_id == 4, Score.criterion_id == 2
+        ).update({"score": 4})
+        db.commit()
+
+        after = {r["user_id"]: r for r in get_grade_preview_rows(db, 1, 1)}
+        assert after[101]["avg_score"] > before[101]["avg_score"]
+
+    def test_settings_and_membership_invalidate(self, db):
+        _seed(db, {101: 5, 102: 3, 103: 4})
+        assert get_grade_preview_rows(db, 1, 1)[0]["gcf"] == pytest.approx(0.85)
+
+        db.get(Evaluation, 1).settings = {"min_cf": 0.5}
+        db.commit()
+        rows = {r["user_id"]: r for r in get_grade_preview_rows(db, 1, 1)}
+        assert rows[101]["gcf"] == pytest.approx(62.5 / 75)
+
+        db.get(User, 103).archived = True
+        db.commit()
+        rows = {r["user_id"]: r for r in get_grade_preview_rows(db, 1, 1)}
+        assert set(rows) == {101, 102}
+
+    def test_student_rename_invalidates(self, db):
+        _seed(db, {101: 5, 102: 3, 103: 4})
+        get_grade_preview_rows(db, 1, 1)
+
+        student = db.get(User, 101)
+        student.name = "Leerling Een"
+        student.student_number = "S101"
+        db.commit()
+
+        rows = {r["user_id"]: r for r in get_grade_preview_rows(db, 1, 1)}
+        assert rows[101]["user_name"] == "Leerling Een"
+        assert rows[101]["student_number"] == "S101"
+
+    def test_draft_and_publish_reuse_a_valid_preview(self, db, monkeypatch):
+        _seed(db, {101: 5, 102: 3, 103: 4})
+        computed = []
+        compute = grade_preview.compute_grade_preview_rows
+        monkeypatch.setattr(
+            grade_preview,
+            "compute_grade_preview_rows",
+            lambda *args: computed.append(args) or compute(*args),
+        )
+        overrides = {101: GradeOverrideIn(grade=7.5)}
+
+        preview_grades(evaluation_id=1, group_grade=None, course_id=None, db=db)
+        save_draft(GradeDraftRequest(evaluation_id=1, overrides=overrides), db=db)
+        assert len(computed) == 1
+
+        db.query(Score).filter(Score.allocation_id == 2).update({"score": 1})
+        db.commit()
+        publish_grades(GradePublishRequest(evaluation_id=1, overrides=overrides), db=db)
+        assert len(computed) == 2
+        grade = db.query(Grade).filter(Grade.user_id == 101).one()
+        assert grade.grade == 7.5
+        assert grade.meta["gcf"] == pytest.approx(
+            get_grade_preview_rows(db, 1, 1)[0]["gcf"]
+        )
+
+    def test_uncached_path_skips_the_version(self, db, monkeypatch):
+        _seed(db, {101: 5, 102: 3, 103: 4})
+        monkeypatch.setattr(
+            grade_preview,
+            "_preview_version",
+            lambda *args: pytest.fail("version computed without the cache"),
+        )
+        assert len(get_grade_preview_rows(db, 1, 1, use_cache=False)) == 3
+
+    def test_expired_entry_is_recomputed(self, db, statements, monkeypatch):
+        _seed(db, {101: 5, 102: 3, 103: 4})
+        monkeypatch.setattr(grade_preview, "PREVIEW_CACHE_TTL_SECONDS", -1.0)
+        get_grade_preview_rows(db, 1, 1)
+
+        statements.clear()
+        get_grade_preview_rows(db, 1, 1)
+        assert len(statements) > 1
+
+    def test_returned_rows_are_copies(self, db):
+        _seed(db, {101: 5, 102: 3, 103: 4})
+        get_grade_preview_rows(db, 1, 1)[0]["avg_score"] = -1
+        assert get_grade_preview_rows(db, 1, 1)[0]["avg_score"] != -1
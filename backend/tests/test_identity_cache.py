@@ -0,0 +1,201 @@
+"""
+Tests for the resolved-identity cache used by the authentication dependency.
+
+A repeated token must not query users by email again, and archiving a user,
+changing their role or deleting them must take effect on the next request.
+"""
+
+from unittest.mock import MagicMock, patch
+
+import pytest
+from fastapi import HTTPException
+from redis.exceptions import RedisError
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+from sqlalchemy.schema import CreateTable
+
+from app.api.v1.deps import _user_from_token
+from app.api.v1.routers.teachers import delete_teacher
+from app.api.v1.routers.users import update_user_role
+from app.api.v1.schemas.users import UserUpdateRole
+from app.core.security import create_access_token
+from app.infra.db.models import School, User
+from app.services import identity_cache
+from app.services.identity_cache import (
+    get_identity_cache_stats,
+    reset_identity_cache_stats,
+)
+
+_NEEDED_TABLES = [School.__table__, User.__table__]
+
+
+@pytest.fixture
+def engine():
+    engine = create_engine(
+        "sqlite:///:memory:",
+        connect_args={"check_same_thread": False},
+        poolclass=StaticPool,
+    )
+    with engine.begin() as conn:
+        for table in _NEEDED_TABLES:
+            conn.execute(CreateTable(table))
+            for name in sorted({index.name for index in table.indexes}):
+                next(i for i in table.indexes if i.name == name).create(conn)
+    yield engine
+    engine.dispose()
+
+
+@pytest.fixture
+def Session(engine):
+    return sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+
+@pytest.fixture
+def db(Session):
+    session = Session()
+    session.add(School(id=1, name="School"))
+    session.add_all(
+        [
+            User(
+                id=1, school_id=1, name="Admin", email="admin@school.nl", role="admin"
+            ),
+            User(
+                id=2,
+                school_id=1,
+                name="Docent",
+                email="docent@school.nl",
+                role="teacher",
+                class_name="Sectie NT",
+            ),
+            User(
+                id=3, school_id=1, name="Leerling", email="ll@school.nl", role="student"
+            ),
+        ]
+    )
+    session.commit()
+    reset_identity_cache_stats()
+    yield session
+    session.close()
+
+
+def _token(email, school_id=1):
+    return create_access_token(sub=email, school_id=school_id)
+
+
+def _resolve(Session, token):
+    """Resolve a token in a fresh session, like a new request would."""
+    with Session() as session:
+        user = _user_from_token(session, token)
+        return user.id, user.role, user.name
+
+
+def _user_queries(engine):
+    statements = []
+    event.listen(
+        engine,
+        "before_cursor_execute",
+        lambda *a: statements.append(a[2]),
+    )
+    return statements
+
+
+class TestLookup:
+    def test_repeated_token_does_not_query_users(self, db, engine, Session):
+        token = _token("Docent@School.nl")
+        assert _resolve(Session, token) == (2, "teacher", "Docent")
+        statements = _user_queries(engine)
+
+        with Session() as session:
+            user = _user_from_token(session, token)
+            assert (user.id, user.role, user.school_id) == (2, "teacher", 1)
+            assert statements == []
+            # Columns outside the cached identity load by primary key
+            assert user.class_name == "Sectie NT"
+            assert user in session
+
+        assert len(statements) == 1
+        assert "users.id = ?" in statements[0]
+        stats = get_identity_cache_stats()
+        assert (stats["hits"], stats["misses"]) == (1, 1)
+
+    def test_school_claim_is_part_of_the_key(self, db, Session):
+        _resolve(Session, _token("docent@school.nl"))
+
+        with pytest.raises(HTTPException) as exc_info:
+            _resolve(Session, _token("docent@school.nl", school_id=2))
+
+        assert exc_info.value.status_code == 403
+        assert get_identity_cache_stats()["misses"] == 2
+
+    def test_unknown_user_is_not_cached(self, db, Session):
+        for _ in range(2):
+            with pytest.raises(HTTPException) as exc_info:
+                _resolve(Session, _token("nobody@school.nl"))
+            assert exc_info.value.status_code == 401
+
+        assert get_identity_cache_stats()["size"] == 0
+
+
+class TestInvalidation:
+    def test_archived_teacher_is_rejected(self, db, Session):
+        token = _token("docent@school.nl")
+        _resolve(Session, token)
+
+        delete_teacher(2, db=db, user=db.get(User, 1))
+
+        with pytest.raises(HTTPException) as exc_info:
+            _resolve(Session, token)
+        assert exc_info.value.status_code == 403
+
+    def test_role_change_is_visible(self, db, Session):
+        token = _token("docent@school.nl")
+        _resolve(Session, token)
+
+        update_user_role(
+            2, UserUpdateRole(role="admin"), db=db, current_user=db.get(User, 1)
+        )
+
+        assert _resolve(Session, token)[1] == "admin"
+
+    def test_deleted_user_is_unknown_after_invalidation(self, db, Session):
+        token = _token("ll@school.nl")
+        _resolve(Session, token)
+
+        db.query(User).filter(User.id == 3).delete()
+        db.commit()
+        identity_cache.invalidate_identity("LL@school.nl")
+
+        with pytest.raises(HTTPException) as exc_info:
+            _resolve(Session, token)
+        assert exc_info.value.status_code == 401
+
+
+class TestRedisTier:
+    def test_identity_is_shared_through_redis(self, db, engine, Session):
+        store = {}
+        client = MagicMock()
+        client.hget.side_effect = lambda key, field: store.get((key, field))
+        client.pipeline.return_value.hset.side_effect = (
+            lambda key, field, value: store.__setitem__((key, field), value)
+        )
+        with patch.object(identity_cache, "_redis", return_value=client):
+            token = _token("docent@school.nl")
+            _resolve(Session, token)
+            # Another worker: empty local cache, same Redis
+            identity_cache.clear_identity_cache()
+            statements = _user_queries(engine)
+
+            assert _resolve(Session, token) == (2, "teacher", "Docent")
+            assert statements == []
+            assert get_identity_cache_stats()["redis_hits"] == 1
+
+            identity_cache.invalidate_identity("docent@school.nl")
+            client.delete.assert_called_once_with("identity:docent@school.nl")
+
+    def test_redis_errors_fall_back_to_the_database(self, db, Session):
+        client = MagicMock()
+        client.hget.side_effect = RedisError("down")
+        client.pipeline.return_value.execute.side_effect = RedisError("down")
+        with patch.object(identity_cache, "_redis", return_value=client):
+            assert _resolve(Session, _token("docent@school.nl"))[0] == 2
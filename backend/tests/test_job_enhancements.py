@@ -19,13 +19,16 @@ Or run specific test class:
     pytest tests/test_job_enhancements.py::TestJobProgressTracking -v
 """
 
+import asyncio
+
 import pytest
-from unittest.mock import Mock, patch, MagicMock
+from unittest.mock import AsyncMock, Mock, patch, MagicMock
+from redis.exceptions import RedisError
 from sqlalchemy.orm import Session
 
 from app.infra.db.models import SummaryGenerationJob, ScheduledJob
 from app.infra.services.webhook_service import WebhookService
-from app.infra.services.rate_limiter import RateLimiter
+from app.infra.services.rate_limiter import RateLimiter, RateLimitResult
 from app.infra.services.scheduler_service import SchedulerService
 
 
@@ -163,42 +166,58 @@ class TestWebhookService:
 class TestRateLimiter:
     """Test rate limiting functionality."""
 
-    @patch("app.infra.services.rate_limiter.RedisConnection")
-    def test_rate_limiter_instantiation(self, mock_redis):
-        """Test RateLimiter can be instantiated."""
+    @staticmethod
+    def _limiter(script_result):
+        """RateLimiter on a mocked async Redis client whose script returns this."""
+        mock_conn = MagicMock()
+        script = AsyncMock()
+        if isinstance(script_result, Exception):
+            script.side_effect = script_result
+        else:
+            script.return_value = script_result
+        mock_conn.register_script.return_value = script
+        return RateLimiter(mock_conn), script
+
+    def test_rate_limiter_instantiation(self):
+        """Test RateLimiter can be instantiated without connecting."""
         limiter = RateLimiter()
         assert limiter is not None
 
-    @patch("app.infra.services.rate_limiter.RedisConnection")
-    def test_is_allowed_first_request(self, mock_redis):
-        """Test first request is always allowed."""
-        mock_conn = MagicMock()
-        mock_redis.get_connection.return_value = mock_conn
+    def test_allowed_request_is_one_script_call(self):
+        """Test the check and increment are a single Lua call on two window keys."""
+        limiter, script = self._limiter([1, 9, 42])
 
-        # Mock Redis pipeline operations
-        mock_pipeline = MagicMock()
-        mock_pipeline.execute.return_value = [None, 0, None, None]
-        mock_conn.pipeline.return_value = mock_pipeline
+        result = asyncio.run(limiter.hit("test_key", 10, 60))
 
-        limiter = RateLimiter(mock_conn)
-        allowed, retry_after = limiter.is_allowed("test_key", 10, 60)
+        assert result == RateLimitResult(True, 10, 9, 42)
+        script.assert_awaited_once()
+        keys = script.await_args.kwargs["keys"]
+        index = int(keys[0].rsplit(":", 1)[1])
+        assert keys == [
+            f"rate_limit:test_key:{index}",
+            f"rate_limit:test_key:{index - 1}",
+        ]
+        assert script.await_args.kwargs["args"][:2] == [10, 60]
 
-        assert allowed is True
-        assert retry_after is None
+    def test_blocked_request(self):
+        """Test a blocked request reports the retry time."""
+        limiter, _ = self._limiter([0, 0, 17])
 
-    @patch("app.infra.services.rate_limiter.RedisConnection")
-    def test_get_usage(self, mock_redis):
-        """Test getting rate limit usage."""
-        mock_conn = MagicMock()
-        mock_redis.get_connection.return_value = mock_conn
-        mock_conn.zcount.return_value = 5
-        mock_conn.zrange.return_value = []
+        result = asyncio.run(limiter.hit("test_key", 10, 60))
+
+        assert result.allowed is False
+        assert result.remaining == 0
+        assert result.retry_after == 17
+
+    def test_redis_error_falls_back_to_local_limit(self):
+        """Test requests are limited in-process when Redis is unavailable."""
+        limiter, _ = self._limiter(RedisError("down"))
 
-        limiter = RateLimiter(mock_conn)
-        usage = limiter.get_usage("test_key", 60)
+        result = asyncio.run(limiter.hit("test_key", 10, 60))
 
-        assert "current_count" in usage
-        assert "window_seconds" in usage
+        assert result.allowed is True
+        assert result.remaining == 9
+        assert limiter.stats()["fallback_requests"] == 1
 
 
 class TestSchedulerService:
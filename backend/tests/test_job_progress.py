@@ -0,0 +1,288 @@
+"""
+Tests for job progress in Redis.
+
+Running summary jobs report their progress to Redis and only write Postgres
+when they change state; the status endpoint reads Redis first. The single
+job task runs against an in-memory SQLite database and the local fake Ollama
+server; Redis is the MagicMock of the ``job_progress_redis`` fixture.
+"""
+
+import json
+import time
+from datetime import datetime, timezone
+from types import SimpleNamespace
+from unittest.mock import MagicMock, patch
+
+import pytest
+from redis.exceptions import RedisError
+from sqlalchemy import create_engine, event
+from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from app.api.v1.routers.feedback_summary import get_job_status
+from app.infra.db.models import (
+    Allocation,
+    Evaluation,
+    FeedbackSummary,
+    School,
+    Score,
+    SummaryGenerationJob,
+    User,
+)
+from app.infra.queue import tasks
+from app.infra.queue.progress import JobProgressStore, job_state
+from app.infra.services.ollama_client import OllamaClient, OllamaSlots
+from app.infra.services.ollama_service import OllamaService
+from tests.fake_ollama import SUMMARY_RESPONSE, FakeOllama
+
+JOB_ID = "summary-1-2-abc"
+
+
+@compiles(JSONB, "sqlite")
+def _jsonb_as_json(element, compiler, **kw):
+    return "JSON"
+
+
+def _job(**overrides):
+    values = dict(
+        job_id=JOB_ID,
+        school_id=1,
+        evaluation_id=1,
+        student_id=2,
+        status="processing",
+        created_at=datetime(2026, 5, 1, 9, 0, tzinfo=timezone.utc),
+        started_at=datetime(2026, 5, 1, 9, 1, tzinfo=timezone.utc),
+        completed_at=None,
+        cancelled_at=None,
+        result=None,
+        error_message=None,
+        progress=10,
+        priority="normal",
+        retry_count=0,
+        max_retries=3,
+        webhook_delivered=False,
+    )
+    values.update(overrides)
+    return SimpleNamespace(**values)
+
+
+def _stored(job, progress=None, stage=None, age=0.0):
+    """What hgetall returns for a job whose state was published ``age`` ago."""
+    return {
+        b"school_id": str(job.school_id).encode(),
+        b"state": json.dumps(job_state(job)).encode(),
+        b"progress": str(job.progress if progress is None else progress).encode(),
+        b"stage": (stage or job.status).encode(),
+        b"message": b"",
+        b"updated_at": str(time.time() - age).encode(),
+    }
+
+
+# ---------- Store ----------
+
+
+def test_state_and_progress_are_written_and_published(job_progress_redis):
+    store = JobProgressStore(redis_conn=job_progress_redis, ttl_seconds=60)
+    pipe = job_progress_redis.pipeline.return_value
+
+    store.publish_state(_job())
+    store.report(JOB_ID, 50, "generating", "Samenvatting genereren")
+
+    key = f"job_progress:{JOB_ID}"
+    state_fields = pipe.hset.call_args_list[0].kwargs["mapping"]
+    assert json.loads(state_fields["state"])["status"] == "processing"
+    assert state_fields["school_id"] == 1
+    progress_fields = pipe.hset.call_args_list[1].kwargs["mapping"]
+    assert (progress_fields["progress"], progress_fields["stage"]) == (
+        50,
+        "generating",
+    )
+    pipe.expire.assert_called_with(key, 60)
+    channel, message = pipe.publish.call_args.args
+    assert channel == key
+    assert json.loads(message)["progress"] == 50
+    assert pipe.execute.call_count == 2
+
+
+def test_read_and_freshness(job_progress_redis):
+    store = JobProgressStore(redis_conn=job_progress_redis)
+
+    job_progress_redis.hgetall.return_value = _stored(_job(), 80, "saving")
+    progress = store.read(JOB_ID)
+    assert progress["school_id"] == 1
+    assert (progress["progress"], progress["stage"]) == (80, "saving")
+    assert store.is_fresh(progress)
+
+    # An unfinished job unchanged for too long goes back to Postgres
+    job_progress_redis.hgetall.return_value = _stored(_job(), age=3600)
+    assert not store.is_fresh(store.read(JOB_ID))
+    # A finished one does not change anymore
+    job_progress_redis.hgetall.return_value = _stored(
+        _job(status="completed", progress=100), age=3600
+    )
+    assert store.is_fresh(store.read(JOB_ID))
+
+
+def test_redis_down_is_not_an_error(job_progress_redis):
+    job_progress_redis.pipeline.return_value.execute.side_effect = RedisError("down")
+    job_progress_redis.hgetall.side_effect = RedisError("down")
+    store = JobProgressStore(redis_conn=job_progress_redis)
+
+    store.publish_state(_job())
+    store.report(JOB_ID, 50, "generating")
+    assert store.read(JOB_ID) is None
+
+
+# ---------- Status endpoint ----------
+
+
+def test_status_is_served_from_redis(job_progress_redis, mock_teacher):
+    job_progress_redis.hgetall.return_value = _stored(_job(), 50, "generating")
+    db = MagicMock()
+    db.query.side_effect = AssertionError("no database query")
+
+    response = get_job_status(JOB_ID, db=db, user=mock_teacher)
+
+    assert (response.status, response.progress, response.stage) == (
+        "processing",
+        50,
+        "generating",
+    )
+
+
+def test_status_of_another_school_comes_from_the_database(
+    job_progress_redis, mock_teacher
+):
+    job_progress_redis.hgetall.return_value = _stored(_job(school_id=2))
+    db = MagicMock()
+    db.query.return_value.filter.return_value.first.return_value = None
+
+    with pytest.raises(Exception) as exc_info:
+        get_job_status(JOB_ID, db=db, user=mock_teacher)
+    assert exc_info.value.status_code == 404
+
+
+def test_stale_status_is_checked_against_the_database(job_progress_redis, mock_teacher):
+    job_progress_redis.hgetall.return_value = _stored(_job(), 80, "saving", age=3600)
+    db = MagicMock()
+    db.query.return_value.filter.return_value.first.return_value = _job()
+
+    response = get_job_status(JOB_ID, db=db, user=mock_teacher)
+
+    # Progress of the running job from Redis, and Redis is trusted again
+    assert (response.progress, response.stage) == (80, "saving")
+    assert job_progress_redis.hset.call_args.args[:2] == (
+        f"job_progress:{JOB_ID}",
+        "updated_at",
+    )
+
+
+# ---------- Task ----------
+
+
+@pytest.fixture
+def session_factory():
+    engine = create_engine(
+        "sqlite://",
+        connect_args={"check_same_thread": False},
+        poolclass=StaticPool,
+    )
+    for model in (
+        School,
+        User,
+        Evaluation,
+        Allocation,
+        Score,
+        FeedbackSummary,
+        SummaryGenerationJob,
+    ):
+        model.__table__.create(engine)
+    SessionLocal = sessionmaker(bind=engine)
+    with SessionLocal() as db:
+        db.add(School(id=1, name="School"))
+        db.add(User(id=10, school_id=1, name="Reviewer", email="r@x.nl"))
+        db.add(User(id=2, school_id=1, name="Student", email="s@x.nl"))
+        db.add(Evaluation(id=1, school_id=1, rubric_id=1, title="Peer", settings={}))
+        db.add(
+            Allocation(
+                id=1,
+                school_id=1,
+                evaluation_id=1,
+                reviewer_id=10,
+                reviewee_id=2,
+                is_self=False,
+            )
+        )
+        db.add(
+            Score(
+                school_id=1,
+                allocation_id=1,
+                criterion_id=1,
+                score=4,
+                comment="Werkt goed samen",
+            )
+        )
+        db.add(
+            SummaryGenerationJob(
+                school_id=1,
+                evaluation_id=1,
+                student_id=2,
+                job_id=JOB_ID,
+                status="queued",
+            )
+        )
+        db.commit()
+    with patch.object(tasks, "SessionLocal", SessionLocal):
+        yield SessionLocal, engine
+    engine.dispose()
+
+
+@pytest.fixture
+def ollama():
+    with FakeOllama() as fake:
+        client = OllamaClient(
+            fake.url, slots=OllamaSlots(2, hold_seconds=30, use_redis=False)
+        )
+        with patch.object(
+            tasks,
+            "OllamaService",
+            lambda: OllamaService(base_url=fake.url, client=client),
+        ):
+            yield
+
+
+def test_task_writes_postgres_only_on_state_changes(
+    session_factory, ollama, job_progress_redis
+):
+    SessionLocal, engine = session_factory
+    writes = []
+    event.listen(
+        engine,
+        "before_cursor_execute",
+        lambda conn, cursor, statement, *args: (
+            writes.append(statement.split()[0])
+            if statement.startswith(("INSERT", "UPDATE", "DELETE"))
+            else None
+        ),
+    )
+
+    with patch.object(
+        tasks, "get_current_job", return_value=SimpleNamespace(id=JOB_ID)
+    ):
+        result = tasks.generate_ai_summary_task(
+            school_id=1, evaluation_id=1, student_id=2
+        )
+
+    assert result["status"] == "completed"
+    # Processing; then old summary, new summary and completed in one commit
+    assert writes == ["UPDATE", "DELETE", "INSERT", "UPDATE"]
+
+    pipe = job_progress_redis.pipeline.return_value
+    fields = [call.kwargs["mapping"] for call in pipe.hset.call_args_list]
+    assert [f["progress"] for f in fields] == [10, 20, 30, 40, 50, 80, 100]
+    assert json.loads(fields[-1]["state"])["status"] == "completed"
+    with SessionLocal() as db:
+        assert db.query(FeedbackSummary).one().summary_text == SUMMARY_RESPONSE
+        assert db.query(SummaryGenerationJob).one().progress == 100
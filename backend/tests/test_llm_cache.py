@@ -0,0 +1,185 @@
+"""
+Tests for the content-addressed LLM result cache.
+
+OllamaService runs against the local fake Ollama server (tests/fake_ollama.py)
+with the Postgres tier on an in-memory SQLite database; the Redis tier is
+mocked.
+"""
+
+from unittest.mock import MagicMock, patch
+
+import pytest
+from redis.exceptions import RedisError
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from app.infra.db.models import LLMCacheEntry
+from app.infra.services.llm_cache import LLMCache
+from app.infra.services.ollama_client import OllamaClient, OllamaSlots
+from app.infra.services.ollama_service import OllamaService
+from tests.fake_ollama import SUMMARY_RESPONSE, FakeOllama
+
+COMMENTS = ["Legt goed uit", "Komt te laat"]
+
+
+@pytest.fixture
+def session_factory():
+    engine = create_engine(
+        "sqlite://",
+        connect_args={"check_same_thread": False},
+        poolclass=StaticPool,
+    )
+    LLMCacheEntry.__table__.create(engine)
+    yield sessionmaker(bind=engine)
+    engine.dispose()
+
+
+@pytest.fixture
+def fake():
+    with FakeOllama() as fake:
+        yield fake
+
+
+def _service(fake, cache):
+    client = OllamaClient(
+        fake.url,
+        slots=OllamaSlots(2, hold_seconds=30, use_redis=False),
+        max_retries=0,
+    )
+    return OllamaService(base_url=fake.url, client=client, cache=cache)
+
+
+def _db_cache(session_factory, **kwargs):
+    return LLMCache(
+        use_redis=False, use_db=True, session_factory=session_factory, **kwargs
+    )
+
+
+def test_regeneration_is_served_from_the_cache(fake, session_factory):
+    cache = _db_cache(session_factory)
+    service = _service(fake, cache)
+
+    first = service.generate_summary(COMMENTS, context="Evaluatie: Peer")
+    # Another student with the same (anonymized) feedback
+    second = service.generate_summary(
+        COMMENTS, student_name="Iemand anders", context="Evaluatie: Peer"
+    )
+
+    assert first == second == SUMMARY_RESPONSE
+    assert fake.requests == 2  # extract + summarize, once
+    stages = cache.stats()["stages"]
+    assert stages["extract"] == {
+        "redis_hits": 0,
+        "db_hits": 1,
+        "misses": 1,
+        "hits": 1,
+        "hit_ratio": 0.5,
+    }
+    assert stages["summary"]["hits"] == 1
+    with session_factory() as db:
+        assert db.query(LLMCacheEntry).count() == 2
+
+
+def test_other_input_or_prompt_version_is_a_miss(fake, session_factory):
+    service = _service(fake, _db_cache(session_factory))
+
+    service.generate_summary(COMMENTS, context="Evaluatie: Peer")
+    service.generate_summary(COMMENTS, context="Evaluatie: Project")
+    # New extract; the summarize prompt only holds the extracted facts: a hit
+    assert fake.requests == 3
+
+    with patch.dict(
+        "app.infra.services.ollama_service.PROMPT_VERSIONS", {"extract": "extract-v2"}
+    ):
+        service.generate_summary(COMMENTS, context="Evaluatie: Peer")
+    assert fake.requests == 4
+
+
+def test_failed_generations_are_not_cached(fake, session_factory):
+    cache = _db_cache(session_factory)
+    service = _service(fake, cache)
+    # Extract, single-pass and its retry
+    fake.fail_next(3, status=500)
+
+    assert service.generate_summary(COMMENTS) is None
+    assert service.generate_summary(COMMENTS) == SUMMARY_RESPONSE
+    assert fake.requests == 5
+    with session_factory() as db:
+        assert db.query(LLMCacheEntry).count() == 2
+
+
+def test_redis_hit_skips_the_database():
+    redis_conn = MagicMock()
+    redis_conn.pipeline.return_value.execute.return_value = [b"uit redis", 1]
+    session_factory = MagicMock(side_effect=AssertionError("no database lookup"))
+    cache = LLMCache(
+        redis_conn=redis_conn, use_db=True, session_factory=session_factory
+    )
+
+    assert cache.get("summary", "k") == "uit redis"
+    redis_conn.hincrby.assert_called_once_with(
+        "llm_cache:stats", "summary:redis_hits", 1
+    )
+
+
+def test_database_is_used_while_redis_is_down(session_factory):
+    redis_conn = MagicMock()
+    redis_conn.pipeline.return_value.execute.side_effect = RedisError("down")
+    redis_conn.register_script.return_value = MagicMock(side_effect=RedisError("down"))
+    redis_conn.hincrby.side_effect = RedisError("down")
+    redis_conn.hgetall.side_effect = RedisError("down")
+    writer = _db_cache(session_factory)
+    writer.set("summary", "k", "uit postgres", "m", "summarize-v1")
+    cache = LLMCache(
+        redis_conn=redis_conn, use_db=True, session_factory=session_factory
+    )
+
+    assert cache.get("summary", "k") == "uit postgres"
+    assert cache.get("summary", "other") is None
+
+    stats = cache.stats()
+    assert stats["source"] == "process"
+    assert stats["stages"]["summary"]["db_hits"] == 1
+    assert stats["stages"]["summary"]["misses"] == 1
+    with session_factory() as db:
+        assert db.query(LLMCacheEntry).one().hit_count == 1
+
+
+def test_redis_write_evicts_beyond_max_entries():
+    redis_conn = MagicMock()
+    script = redis_conn.register_script.return_value
+    cache = LLMCache(redis_conn=redis_conn, use_db=False, max_entries=3, ttl_seconds=60)
+
+    cache.set("extract", "k", "{}", "m", "extract-v1")
+
+    kwargs = script.call_args.kwargs
+    assert kwargs["keys"] == ["llm_cache:v:k", "llm_cache:lru"]
+    value, ttl, _, key, max_entries, prefix = kwargs["args"]
+    assert (value, ttl, key, max_entries, prefix) == ("{}", 60, "k", 3, "llm_cache:v:")
+
+
+def test_database_is_pruned_to_the_most_recently_used(session_factory):
+    cache = _db_cache(session_factory, db_max_entries=3)
+    for i in range(5):
+        cache.set("summary", f"k{i}", f"tekst {i}", "m", "summarize-v1")
+    # Using k0 makes it recent again
+    assert cache.get("summary", "k0") == "tekst 0"
+
+    with session_factory() as db:
+        assert cache._db_prune(db) == 2
+        kept = {e.cache_key for e in db.query(LLMCacheEntry)}
+    assert kept == {"k0", "k3", "k4"}
+
+
+def test_key_depends_on_every_part():
+    base = ("summary", "llama3.1", "summarize-v1", "prompt", {"temperature": 0.1})
+    key = LLMCache.make_key(*base)
+
+    assert LLMCache.make_key(*base) == key
+    for i, other in enumerate(
+        ("extract", "mistral", "summarize-v2", "prompt 2", {"temperature": 0.2})
+    ):
+        changed = list(base)
+        changed[i] = other
+        assert LLMCache.make_key(*changed) != key
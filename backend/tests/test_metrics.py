@@ -0,0 +1,136 @@
+"""
+Tests for the Prometheus metrics and the /metrics endpoint.
+"""
+
+import os
+import subprocess
+import sys
+from pathlib import Path
+from unittest.mock import patch
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from prometheus_client import REGISTRY
+
+from app.api.middleware.metrics import MetricsMiddleware
+from app.core.config import settings
+from app.infra.metrics import RuntimeCollector
+from app.main import app
+
+BACKEND_DIR = Path(__file__).parent.parent
+
+
+@pytest.fixture
+def runtime_values():
+    """Scrape-time values without Redis or a database."""
+    with (
+        patch.object(
+            RuntimeCollector,
+            "_queue_depths",
+            return_value=[("ai-summaries", "queued", 3), ("ai-summaries", "failed", 1)],
+        ),
+        patch.object(
+            RuntimeCollector,
+            "_summary_job_counts",
+            return_value=[("completed", 40), ("queued", 2)],
+        ),
+    ):
+        yield
+
+
+class TestMetricsMiddleware:
+    def test_records_latency_per_route_template(self):
+        demo = FastAPI()
+
+        @demo.get("/items/{item_id}")
+        def item(item_id: int):
+            return {"id": item_id}
+
+        demo.add_middleware(MetricsMiddleware)
+        labels = {"method": "GET", "route": "/items/{item_id}", "status": "200"}
+        before = (
+            REGISTRY.get_sample_value("tea_http_request_duration_seconds_count", labels)
+            or 0
+        )
+
+        client = TestClient(demo)
+        client.get("/items/1")
+        client.get("/items/2")
+
+        after = REGISTRY.get_sample_value(
+            "tea_http_request_duration_seconds_count", labels
+        )
+        assert after == before + 2
+        assert REGISTRY.get_sample_value("tea_http_requests_in_progress") == 0
+
+
+class TestMetricsEndpoint:
+    def test_exposes_runtime_and_process_metrics(self, runtime_values, monkeypatch):
+        monkeypatch.setattr(settings, "METRICS_TOKEN", "")
+
+        response = TestClient(app).get("/metrics")
+
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("text/plain")
+        body = response.text
+        assert 'tea_rq_queue_jobs{queue="ai-summaries",state="queued"} 3.0' in body
+        assert 'tea_summary_generation_jobs{status="completed"} 40.0' in body
+        assert "tea_http_request_duration_seconds" in body
+        assert "tea_db_pool_connections" in body
+
+    def test_requires_token_when_configured(self, runtime_values, monkeypatch):
+        monkeypatch.setattr(settings, "METRICS_TOKEN", "scrape-secret")
+        client = TestClient(app)
+
+        assert client.get("/metrics").status_code == 401
+        response = client.get(
+            "/metrics", headers={"Authorization": "Bearer scrape-secret"}
+        )
+        assert response.status_code == 200
+
+    def test_collector_survives_unavailable_backends(self):
+        with (
+            patch.object(
+                RuntimeCollector, "_queue_depths", side_effect=ConnectionError("down")
+            ),
+            patch.object(
+                RuntimeCollector, "_summary_job_counts", side_effect=RuntimeError("db")
+            ),
+        ):
+            families = list(RuntimeCollector().collect())
+
+        assert [f.name for f in families] == [
+            "tea_rq_queue_jobs",
+            "tea_summary_generation_jobs",
+        ]
+        assert all(not f.samples for f in families)
+
+
+def test_values_are_aggregated_over_processes(tmp_path):
+    """Like gunicorn workers: each process writes, any process reports all."""
+    env = {**os.environ, "PROMETHEUS_MULTIPROC_DIR": str(tmp_path)}
+    increment = (
+        "from app.infra.metrics import RATE_LIMIT_DECISIONS;"
+        "RATE_LIMIT_DECISIONS.labels('allowed').inc()"
+    )
+    for _ in range(2):
+        subprocess.run(
+            [sys.executable, "-c", increment], cwd=BACKEND_DIR, env=env, check=True
+        )
+
+    render = (
+        "from prometheus_client import generate_latest;"
+        "from app.infra.metrics import metrics_registry;"
+        "print(generate_latest(metrics_registry(include_runtime=False)).decode())"
+    )
+    output = subprocess.run(
+        [sys.executable, "-c", render],
+        cwd=BACKEND_DIR,
+        env=env,
+        check=True,
+        capture_output=True,
+        text=True,
+    ).stdout
+
+    assert 'tea_rate_limit_decisions_total{outcome="allowed"} 2.0' in output
@@ -0,0 +1,114 @@
+"""
+The rate-limit, sliding-session and security-header middleware are plain ASGI.
+
+Their headers are added to ``http.response.start`` and the body is passed
+through, so a large StreamingResponse (CSV/DOCX exports) reaches the server
+chunk by chunk instead of being collected in memory first.
+"""
+
+import asyncio
+from unittest.mock import MagicMock
+
+from fastapi import FastAPI
+from fastapi.responses import StreamingResponse
+
+from app.api.middleware.rate_limit import RateLimitMiddleware
+from app.api.middleware.security_headers import SecurityHeadersMiddleware
+from app.api.middleware.sliding_session import SlidingSessionMiddleware
+from app.core.config import settings
+from app.core.security import create_access_token
+from app.infra.services.rate_limiter import RateLimiter, RateLimitResult
+
+CHUNK = b"x" * 64 * 1024
+CHUNKS = 256  # 16 MiB
+
+
+def _app(produced):
+    rate_limiter = MagicMock(spec=RateLimiter)
+    rate_limiter.hit.return_value = RateLimitResult(True, 100, 99, 60)
+
+    app = FastAPI()
+    app.add_middleware(SecurityHeadersMiddleware)
+    app.add_middleware(RateLimitMiddleware, rate_limiter=rate_limiter)
+    app.add_middleware(SlidingSessionMiddleware)
+
+    @app.get("/api/v1/export.csv")
+    def export():
+        def rows():
+            for _ in range(CHUNKS):
+                produced.append(1)
+                yield CHUNK
+
+        return StreamingResponse(rows(), media_type="text/csv")
+
+    return app
+
+
+def _get(app, produced, headers=()):
+    """
+    Run one GET through the ASGI app.
+
+    Returns the messages sent to the server and, per body chunk, how many
+    chunks the endpoint had produced that were not sent yet.
+    """
+    sent = []
+    held_back = []
+    requested = []
+
+    async def receive():
+        if not requested:
+            requested.append(True)
+            return {"type": "http.request", "body": b"", "more_body": False}
+        await asyncio.sleep(3600)  # client stays connected
+
+    async def send(message):
+        sent.append(message)
+        if message["type"] == "http.response.body" and message.get("body"):
+            chunks_sent = sum(1 for m in sent if m.get("body"))
+            held_back.append(len(produced) - chunks_sent)
+
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": "GET",
+        "scheme": "http",
+        "path": "/api/v1/export.csv",
+        "raw_path": b"/api/v1/export.csv",
+        "query_string": b"",
+        "root_path": "",
+        "headers": [(k.lower().encode(), v.encode()) for k, v in headers],
+        "client": ("203.0.113.7", 50000),
+        "server": ("testserver", 80),
+    }
+    asyncio.run(app(scope, receive, send))
+    return sent, held_back
+
+
+def test_streaming_response_is_not_buffered(monkeypatch):
+    monkeypatch.setattr(settings, "ENABLE_BACKEND_SECURITY_HEADERS", True)
+    produced = []
+
+    sent, held_back = _get(_app(produced), produced)
+
+    # Every chunk reached the server before the endpoint produced the next one
+    assert max(held_back) == 0
+    body = b"".join(m.get("body", b"") for m in sent[1:])
+    assert len(body) == len(CHUNK) * CHUNKS
+
+    start = dict(sent[0]["headers"])
+    assert start[b"x-content-type-options"] == b"nosniff"
+    assert start[b"x-ratelimit-limit"] == b"100"
+
+
+def test_sliding_session_cookie_is_set_on_response_start(monkeypatch):
+    monkeypatch.setattr(settings, "ACCESS_TOKEN_EXPIRE_MINUTES", 5)
+    token = create_access_token(sub="t@school.nl", role="teacher")
+    produced = []
+
+    sent, _ = _get(_app(produced), produced, [("Cookie", f"access_token={token}")])
+
+    start = sent[0]
+    assert start["type"] == "http.response.start"
+    cookies = [v for k, v in start["headers"] if k == b"set-cookie"]
+    assert len(cookies) == 1 and cookies[0].startswith(b"access_token=")
@@ -0,0 +1,142 @@
+"""
+Tests for the shared Ollama client: connection reuse, the concurrency limit,
+retries with a budget and the circuit breaker. Runs against the local fake
+Ollama server (tests/fake_ollama.py); the Redis slots are mocked.
+"""
+
+import threading
+from unittest.mock import MagicMock, patch
+
+import pytest
+from redis.exceptions import RedisError
+
+from app.infra.services.ollama_client import (
+    OllamaClient,
+    OllamaSlots,
+    OllamaUnavailable,
+    RetryBudget,
+)
+from app.infra.services.ollama_service import OllamaService
+from app.infra.services.rate_limiter import CircuitBreaker
+from tests.fake_ollama import FakeOllama
+
+
+@pytest.fixture
+def no_backoff():
+    with patch("app.infra.services.ollama_client.random.uniform", return_value=0.0):
+        yield
+
+
+def _client(fake, limit=2, **kwargs):
+    kwargs.setdefault("slots", OllamaSlots(limit, hold_seconds=30, use_redis=False))
+    return OllamaClient(fake.url, slot_timeout=5, **kwargs)
+
+
+def _generate(client):
+    return client.post(
+        "/api/generate", json={"model": "m", "prompt": "hoi"}, timeout=(5, 5)
+    )
+
+
+def test_generate_summary_against_fake_server():
+    with FakeOllama() as fake:
+        service = OllamaService(base_url=fake.url, client=_client(fake))
+        summary = service.generate_summary(["Legt goed uit", "Komt te laat"])
+
+    assert summary.startswith("Je legt dingen duidelijk uit")
+    # Extract step and summarize step
+    assert fake.requests == 2
+
+
+def test_calls_reuse_one_connection():
+    with FakeOllama() as fake:
+        client = _client(fake)
+        for _ in range(5):
+            assert _generate(client).status_code == 200
+
+    assert fake.requests == 5
+    assert fake.connections == 1
+
+
+def test_concurrency_is_limited():
+    with FakeOllama(latency=0.05, parallel=8) as fake:
+        client = _client(fake, limit=2)
+        threads = [threading.Thread(target=_generate, args=(client,)) for _ in range(8)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+    assert fake.requests == 8
+    assert fake.max_in_flight == 2
+    assert client.slots.stats()["waited"] > 0
+    assert client.slots.stats()["in_use_here"] == 0
+
+
+def test_no_free_slot_refuses_the_call():
+    redis_conn = MagicMock()
+    redis_conn.register_script.return_value = MagicMock(return_value=0)
+    slots = OllamaSlots(1, hold_seconds=30, redis_conn=redis_conn)
+
+    with FakeOllama() as fake:
+        client = OllamaClient(fake.url, slots=slots, slot_timeout=0.1)
+        with pytest.raises(OllamaUnavailable, match="no free slot"):
+            _generate(client)
+
+    assert fake.requests == 0
+    assert client.stats()["saturated"] == 1
+
+
+def test_slots_fall_back_to_local_when_redis_is_down():
+    redis_conn = MagicMock()
+    redis_conn.register_script.return_value = MagicMock(side_effect=RedisError("down"))
+    slots = OllamaSlots(1, hold_seconds=30, redis_conn=redis_conn)
+
+    holder = slots.acquire(timeout=1)
+    assert holder.startswith("local:")
+    # The single local slot is taken
+    assert slots.acquire(timeout=0.1) is None
+    slots.release(holder)
+    assert slots.acquire(timeout=0.1) is not None
+
+
+def test_transient_failures_are_retried(no_backoff):
+    with FakeOllama() as fake:
+        fake.fail_next(2, status=503)
+        client = _client(fake)
+        response = _generate(client)
+
+    assert response.status_code == 200
+    assert fake.requests == 3
+    assert client.stats()["retries"] == 2
+    assert client.breaker.state == "closed"
+
+
+def test_retries_stop_when_the_budget_is_spent(no_backoff):
+    with FakeOllama() as fake:
+        fake.fail_next(3, status=503)
+        client = _client(fake, retry_budget=RetryBudget(ratio=0.0, max_tokens=1))
+        assert _generate(client).status_code == 503
+        assert fake.requests == 2  # one retry, then the budget is empty
+        assert _generate(client).status_code == 503
+        assert fake.requests == 3
+
+
+def test_open_breaker_fails_fast_to_the_fallback(no_backoff):
+    with FakeOllama() as fake:
+        fake.fail_next(10, status=500)
+        client = _client(
+            fake,
+            max_retries=0,
+            breaker=CircuitBreaker(failure_threshold=2, reset_seconds=60),
+        )
+        assert _generate(client).status_code == 500
+        assert _generate(client).status_code == 500
+
+        with pytest.raises(OllamaUnavailable):
+            _generate(client)
+        service = OllamaService(base_url=fake.url, client=client)
+        assert service.generate_summary(["Komt afspraken niet na"]) is None
+
+    assert fake.requests == 2
+    assert client.stats()["refused"] == 1
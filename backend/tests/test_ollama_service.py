@@ -481,7 +481,7 @@ class TestRequestOllama:
         mock_resp.status_code = 200
         mock_resp.json.return_value = {"response": "  Een mooie samenvatting.  "}
 
-        with patch("requests.post", return_value=mock_resp):
+        with patch("requests.Session.post", return_value=mock_resp):
             result = svc._request_ollama("prompt", {"temperature": 0.1})
 
         assert result == "Een mooie samenvatting."
@@ -492,14 +492,14 @@ class TestRequestOllama:
         mock_resp.status_code = 500
         mock_resp.text = "Internal Server Error"
 
-        with patch("requests.post", return_value=mock_resp):
+        with patch("requests.Session.post", return_value=mock_resp):
             result = svc._request_ollama("prompt", {})
 
         assert result is None
 
     def test_timeout_returns_none(self):
         svc = self._svc()
-        with patch("requests.post", side_effect=requests.Timeout):
+        with patch("requests.Session.post", side_effect=requests.Timeout):
             result = svc._request_ollama("prompt", {})
 
         assert result is None
@@ -507,7 +507,8 @@ class TestRequestOllama:
     def test_connection_error_returns_none(self):
         svc = self._svc()
         with patch(
-            "requests.post", side_effect=requests.ConnectionError("Connection refused")
+            "requests.Session.post",
+            side_effect=requests.ConnectionError("Connection refused"),
         ):
             result = svc._request_ollama("prompt", {})
 
@@ -519,7 +520,7 @@ class TestRequestOllama:
         mock_resp.status_code = 200
         mock_resp.json.return_value = {"response": "tekst"}
 
-        with patch("requests.post", return_value=mock_resp) as mock_post:
+        with patch("requests.Session.post", return_value=mock_resp) as mock_post:
             svc._request_ollama("test prompt", {"temperature": 0.1})
 
         call_args = mock_post.call_args
@@ -531,7 +532,7 @@ class TestRequestOllama:
         mock_resp.status_code = 200
         mock_resp.json.return_value = {"response": "tekst"}
 
-        with patch("requests.post", return_value=mock_resp) as mock_post:
+        with patch("requests.Session.post", return_value=mock_resp) as mock_post:
             svc._request_ollama("test prompt", {})
 
         payload = mock_post.call_args[1]["json"]
@@ -545,7 +546,7 @@ class TestRequestOllama:
         mock_resp.status_code = 200
         mock_resp.json.return_value = {}  # no "response" key
 
-        with patch("requests.post", return_value=mock_resp):
+        with patch("requests.Session.post", return_value=mock_resp):
             result = svc._request_ollama("prompt", {})
 
         assert result == ""
@@ -110,6 +110,7 @@ class TestOverviewMatrix:
         team = Mock(spec=ProjectTeam)
         team.id = 1
         team.project_id = 1
+        team.team_number = 1
 
         # Mock student user
         student = Mock(spec=User)
@@ -139,19 +140,15 @@ class TestOverviewMatrix:
             # First query: course validation
             if query_counter["count"] == 1:
                 mock_query.first.return_value = course
-            # Second query: student IDs for course enrollment
+            # Second query: project assessments with team id/number and teacher
             elif query_counter["count"] == 2:
-                mock_query.all.return_value = [(student.id,)]
-            # Third query: project assessments
+                mock_query.all.return_value = [
+                    (assessment, team.id, team.team_number, teacher.name)
+                ]
+            # Third query: members of all teams - THIS IS THE CRITICAL ONE
             elif query_counter["count"] == 3:
-                mock_query.all.return_value = [(assessment, course, team)]
-            # Fourth query: get teacher
-            elif query_counter["count"] == 4:
-                mock_query.first.return_value = teacher
-            # Fifth query: get team members - THIS IS THE CRITICAL ONE
-            elif query_counter["count"] == 5:
-                mock_query.all.return_value = [student]
-            # Remaining queries: competency/peer evaluations (empty)
+                mock_query.all.return_value = [(team.id, student)]
+            # Remaining queries: scores, competency/peer evaluations (empty)
             else:
                 mock_query.all.return_value = []
                 mock_query.first.return_value = None
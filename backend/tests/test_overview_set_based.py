@@ -0,0 +1,481 @@
+"""
+Tests for the set-based overview engines.
+
+/overview/all-items and /overview/matrix must compute every item type with a
+constant number of queries (independent of the number of students, teams and
+evaluations), while returning the same scores as the original per-student
+helpers.
+"""
+
+from datetime import datetime
+
+import pytest
+from sqlalchemy import create_engine, event, text
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from app.infra.db.models import (
+    Allocation,
+    Base,
+    CompetencySelfScore,
+    CompetencyWindow,
+    Course,
+    Evaluation,
+    Grade,
+    Project,
+    ProjectAssessment,
+    ProjectAssessmentScore,
+    ProjectTeam,
+    ProjectTeamMember,
+    PublishedGrade,
+    Rubric,
+    RubricCriterion,
+    School,
+    User,
+)
+from app.infra.db.models.assessments import ProjectAssessmentTeam
+from app.services.overview_items import OverviewItemFilters, query_overview_items
+from app.services.overview_matrix import build_overview_matrix, iter_matrix_csv_rows
+
+# Tables needed by these tests – avoids the ARRAY-type columns in clients/notes
+# that are incompatible with SQLite. ``grades`` uses JSONB and is created with
+# raw DDL below.
+_NEEDED_TABLES = [
+    School.__table__,
+    User.__table__,
+    Course.__table__,
+    Project.__table__,
+    Rubric.__table__,
+    RubricCriterion.__table__,
+    ProjectTeam.__table__,
+    ProjectTeamMember.__table__,
+    ProjectAssessment.__table__,
+    ProjectAssessmentTeam.__table__,
+    ProjectAssessmentScore.__table__,
+    Evaluation.__table__,
+    Allocation.__table__,
+    PublishedGrade.__table__,
+    CompetencyWindow.__table__,
+    CompetencySelfScore.__table__,
+]
+
+_GRADES_DDL = """
+CREATE TABLE grades (
+    id INTEGER PRIMARY KEY,
+    school_id INTEGER NOT NULL,
+    evaluation_id INTEGER NOT NULL,
+    user_id INTEGER NOT NULL,
+    grade NUMERIC(5, 2),
+    meta JSON NOT NULL DEFAULT '{}',
+    group_grade FLOAT,
+    gcf FLOAT,
+    spr FLOAT,
+    suggested_grade FLOAT,
+    published_grade FLOAT,
+    override_reason TEXT,
+    published_at DATETIME,
+    created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+    updated_at DATETIME DEFAULT CURRENT_TIMESTAMP
+)
+"""
+
+
+class _QueryCounter:
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, *args, **kwargs):
+        self.count += 1
+
+
+@pytest.fixture
+def engine():
+    engine = create_engine(
+        "sqlite:///:memory:",
+        connect_args={"check_same_thread": False},
+        poolclass=StaticPool,
+    )
+    Base.metadata.create_all(engine, tables=_NEEDED_TABLES)
+    with engine.begin() as conn:
+        conn.execute(text(_GRADES_DDL))
+    yield engine
+    engine.dispose()
+
+
+@pytest.fixture
+def db(engine):
+    Session = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    session = Session()
+    yield session
+    session.close()
+
+
+@pytest.fixture
+def query_counter(engine):
+    counter = _QueryCounter()
+    event.listen(engine, "before_cursor_execute", counter)
+    yield counter
+    event.remove(engine, "before_cursor_execute", counter)
+
+
+def _seed_school(db, n_teams: int = 2, students_per_team: int = 3):
+    """
+    One project assessment over ``n_teams`` teams, one peer evaluation and one
+    competency window, all involving the same students.
+    """
+    db.add_all(
+        [
+            School(id=1, name="School"),
+            User(
+                id=1,
+                school_id=1,
+                name="Docent",
+                email="t@school.nl",
+                role="teacher",
+                password_hash="x",
+            ),
+            Course(id=1, school_id=1, name="Vak", code="V1", is_active=True),
+            Project(
+                id=1,
+                school_id=1,
+                course_id=1,
+                title="Project",
+                status="active",
+                created_by_id=1,
+            ),
+            Rubric(id=1, school_id=1, title="R", scope="project"),
+            RubricCriterion(id=1, school_id=1, rubric_id=1, name="C1", weight=1.0),
+            RubricCriterion(id=2, school_id=1, rubric_id=1, name="C2", weight=3.0),
+            ProjectAssessment(
+                id=1,
+                school_id=1,
+                project_id=1,
+                rubric_id=1,
+                title="Eindpresentatie",
+                status="published",
+                teacher_id=1,
+                published_at=datetime(2025, 3, 1),
+            ),
+            Evaluation(
+                id=1,
+                school_id=1,
+                course_id=1,
+                rubric_id=1,
+                title="Peer 1",
+                status="open",
+            ),
+            CompetencyWindow(
+                id=1,
+                school_id=1,
+                course_id=1,
+                title="Scan 1",
+                status="open",
+                end_date=datetime(2025, 1, 1),
+            ),
+        ]
+    )
+
+    user_id = 100
+    for team_idx in range(1, n_teams + 1):
+        db.add(
+            ProjectTeam(
+                id=team_idx,
+                school_id=1,
+                project_id=1,
+                team_number=team_idx,
+                display_name_at_time=f"Team {team_idx}",
+                version=1,
+            )
+        )
+        db.add(
+            ProjectAssessmentTeam(
+                school_id=1, project_assessment_id=1, project_team_id=team_idx
+            )
+        )
+        # Team scores: C1=3, C2=4
+        for criterion_id, score in ((1, 3), (2, 4)):
+            db.add(
+                ProjectAssessmentScore(
+                    school_id=1,
+                    assessment_id=1,
+                    criterion_id=criterion_id,
+                    team_number=team_idx,
+                    score=score,
+                )
+            )
+        for _ in range(students_per_team):
+            user_id += 1
+            db.add(
+                User(
+                    id=user_id,
+                    school_id=1,
+                    name=f"Leerling {user_id}",
+                    email=f"s{user_id}@school.nl",
+                    role="student",
+                    class_name="4A",
+                    password_hash="x",
+                )
+            )
+            db.add(
+                ProjectTeamMember(
+                    school_id=1, project_team_id=team_idx, user_id=user_id
+                )
+            )
+            db.add(
+                Allocation(
+                    school_id=1,
+                    evaluation_id=1,
+                    reviewer_id=user_id,
+                    reviewee_id=user_id,
+                    is_self=True,
+                )
+            )
+            db.add(
+                Grade(
+                    school_id=1,
+                    evaluation_id=1,
+                    user_id=user_id,
+                    meta={},
+                    group_grade=7.0,
+                    gcf=1.0 + (user_id % 3) / 10,
+                )
+            )
+            db.add(
+                CompetencySelfScore(
+                    school_id=1,
+                    window_id=1,
+                    user_id=user_id,
+                    competency_id=1,
+                    score=3 + user_id % 2,
+                )
+            )
+    db.commit()
+
+
+class TestOverviewAllItemsEngine:
+    def test_returns_all_item_types_with_scores(self, db):
+        _seed_school(db, n_teams=1, students_per_team=2)
+        # Individual override for student 101 on C2
+        db.add(
+            ProjectAssessmentScore(
+                school_id=1,
+                assessment_id=1,
+                criterion_id=2,
+                team_number=1,
+                student_id=101,
+                score=5,
+            )
+        )
+        db.add(PublishedGrade(school_id=1, evaluation_id=1, user_id=102, grade=8.3))
+        db.commit()
+
+        result = query_overview_items(db, 1, OverviewItemFilters())
+
+        assert result.total == 6
+        assert result.total_by_type == {"project": 2, "peer": 2, "competency": 2}
+
+        by_key = {(i["type"], i["student_id"]): i for i in result.items}
+        # Project: (3*1 + 4*3)/4 = 3.75 vs. override (3*1 + 5*3)/4 = 4.5
+        assert by_key[("project", 102)]["score"] == 7.5
+        assert by_key[("project", 101)]["score"] == 9.0
+        assert by_key[("project", 101)]["team_name"] == "Team 1"
+        assert by_key[("project", 101)]["teacher_name"] == "Docent"
+        # Peer: group grade × GCF unless a published grade exists
+        assert by_key[("peer", 101)]["score"] == 8.4
+        assert by_key[("peer", 102)]["score"] == 8.3
+        # Competency: 1-5 average mapped to 1-10
+        assert by_key[("competency", 101)]["score"] == 7.8
+        assert by_key[("competency", 102)]["score"] == 5.5
+
+    def test_query_count_is_constant(self, db, engine, query_counter):
+        _seed_school(db, n_teams=1, students_per_team=2)
+        query_counter.count = 0
+        query_overview_items(db, 1, OverviewItemFilters())
+        small = query_counter.count
+
+        _seed_more(db)
+        query_counter.count = 0
+        query_overview_items(db, 1, OverviewItemFilters())
+        assert query_counter.count == small
+
+    def test_sort_and_paginate_in_sql(self, db):
+        _seed_school(db, n_teams=2, students_per_team=3)
+
+        page1 = query_overview_items(
+            db,
+            1,
+            OverviewItemFilters(),
+            sort_by="date",
+            sort_order="desc",
+            offset=0,
+            limit=5,
+        )
+        page2 = query_overview_items(
+            db,
+            1,
+            OverviewItemFilters(),
+            sort_by="date",
+            sort_order="desc",
+            offset=5,
+            limit=5,
+        )
+
+        assert page1.total == 18
+        assert len(page1.items) == 5
+        assert len(page2.items) == 5
+        # Newest first (project 2025-03), undated peer items last
+        assert [i["type"] for i in page1.items] == ["project"] * 5
+        keys1 = {(i["type"], i["student_id"]) for i in page1.items}
+        keys2 = {(i["type"], i["student_id"]) for i in page2.items}
+        assert not keys1 & keys2
+
+    def test_sort_by_score(self, db):
+        _seed_school(db, n_teams=1, students_per_team=3)
+        result = query_overview_items(
+            db,
+            1,
+            OverviewItemFilters(type_filter="peer"),
+            sort_by="score",
+            sort_order="desc",
+        )
+        scores = [i["score"] for i in result.items]
+        assert scores == sorted(scores, reverse=True)
+        assert result.total_by_type == {"project": 0, "peer": 3, "competency": 0}
+
+    def test_filters(self, db):
+        _seed_school(db, n_teams=2, students_per_team=2)
+
+        result = query_overview_items(
+            db, 1, OverviewItemFilters(student_id=101, type_filter="project")
+        )
+        assert [(i["type"], i["student_id"]) for i in result.items] == [
+            ("project", 101)
+        ]
+
+        result = query_overview_items(db, 1, OverviewItemFilters(team_number=2))
+        assert {i["team_number"] for i in result.items if i["type"] == "project"} == {2}
+
+        result = query_overview_items(db, 1, OverviewItemFilters(search="scan"))
+        assert {i["type"] for i in result.items} == {"competency"}
+
+        # Other schools see nothing
+        result = query_overview_items(db, 2, OverviewItemFilters())
+        assert result.total == 0
+
+
+class TestOverviewMatrixGrid:
+    def test_grid_scores_and_averages(self, db):
+        _seed_school(db, n_teams=1, students_per_team=2)
+        db.add(
+            ProjectAssessmentScore(
+                school_id=1,
+                assessment_id=1,
+                criterion_id=2,
+                team_number=1,
+                student_id=101,
+                score=5,
+            )
+        )
+        db.commit()
+
+        grid = build_overview_matrix(db, 1)
+
+        # Columns sorted chronologically, undated peer column last
+        assert [c.key for c in grid.columns] == [
+            "competency_1",
+            "project_1",
+            "peer_1",
+        ]
+        assert [s.id for s in grid.students] == [101, 102]
+        assert grid.scores == [[7.8, 9.0, 8.4], [5.5, 7.5, 7.0]]
+        assert all(all(row) for row in grid.present)
+        assert grid.row_averages == [8.4, 6.67]
+        assert grid.column_averages == [6.65, 8.25, 7.7]
+        assert grid.columns[1].teacher_name == "Docent"
+
+    def test_filters_and_sorting(self, db):
+        _seed_school(db, n_teams=2, students_per_team=2)
+        db.query(User).filter(User.id == 103).update({"class_name": "4B"})
+        db.commit()
+
+        grid = build_overview_matrix(db, 1, class_name="4B")
+        assert [s.id for s in grid.students] == [103]
+
+        grid = build_overview_matrix(db, 1, student_name="ling 10")
+        assert len(grid.students) == 4
+        order = grid.row_order("peer_1", "desc")
+        peer_col = [c.key for c in grid.columns].index("peer_1")
+        scores = [grid.scores[i][peer_col] for i in order]
+        assert scores == sorted(scores, reverse=True)
+
+    def test_query_count_is_constant(self, db, query_counter):
+        _seed_school(db, n_teams=1, students_per_team=2)
+        query_counter.count = 0
+        build_overview_matrix(db, 1)
+        small = query_counter.count
+
+        _seed_more(db)
+        query_counter.count = 0
+        grid = build_overview_matrix(db, 1)
+        assert len(grid.students) == 12
+        assert query_counter.count == small
+
+    def test_csv_rows_stream_from_grid(self, db):
+        _seed_school(db, n_teams=1, students_per_team=2)
+        grid = build_overview_matrix(db, 1)
+
+        rows = list(iter_matrix_csv_rows(grid, grid.row_order(None, "asc")))
+        assert rows[0] == [
+            "Leerlingnummer",
+            "Leerling",
+            "Klas",
+            "Scan 1 (competency)",
+            "Eindpresentatie (project)",
+            "Peer 1 (peer)",
+        ]
+        assert rows[1] == ["", "Leerling 101", "4A", "7.8", "7.5", "8.4"]
+
+
+def _seed_more(db):
+    """Add a second project team with extra students to the seeded school."""
+    db.add(
+        ProjectTeam(
+            id=50,
+            school_id=1,
+            project_id=1,
+            team_number=50,
+            display_name_at_time="Team 50",
+            version=1,
+        )
+    )
+    db.add(
+        ProjectAssessmentTeam(school_id=1, project_assessment_id=1, project_team_id=50)
+    )
+    for user_id in range(500, 510):
+        db.add(
+            User(
+                id=user_id,
+                school_id=1,
+                name=f"Leerling {user_id}",
+                email=f"s{user_id}@school.nl",
+                role="student",
+                password_hash="x",
+            )
+        )
+        db.add(ProjectTeamMember(school_id=1, project_team_id=50, user_id=user_id))
+        db.add(
+            Allocation(
+                school_id=1,
+                evaluation_id=1,
+                reviewer_id=user_id,
+                reviewee_id=user_id,
+                is_self=True,
+            )
+        )
+        db.add(
+            CompetencySelfScore(
+                school_id=1, window_id=1, user_id=user_id, competency_id=1, score=4
+            )
+        )
+    db.commit()
+    return user_id
@@ -0,0 +1,110 @@
+"""
+Tests for per-request SQL statement counting and N+1 detection.
+"""
+
+import logging
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, text
+
+from app.api.middleware.query_stats import QueryStatsMiddleware
+from app.core.config import settings
+from app.infra.db import query_stats
+from app.infra.db.query_stats import get_query_metrics, instrument_engine
+
+
+@pytest.fixture
+def engine(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'queries.db'}")
+    instrument_engine(engine)
+    with engine.begin() as conn:
+        conn.execute(text("CREATE TABLE notes (id INTEGER PRIMARY KEY, body TEXT)"))
+        for i in range(1, 21):
+            conn.execute(text("INSERT INTO notes VALUES (:id, 'x')"), {"id": i})
+    return engine
+
+
+@pytest.fixture
+def client(engine, monkeypatch):
+    monkeypatch.setattr(settings, "NODE_ENV", "development")
+    monkeypatch.setattr(settings, "DB_N_PLUS_ONE_THRESHOLD", 10)
+    query_stats.reset_query_metrics()
+
+    app = FastAPI()
+
+    @app.get("/notes/{count}")
+    def notes_one_by_one(count: int):
+        # One query per note: the N+1 shape
+        with engine.connect() as conn:
+            for note_id in range(1, count + 1):
+                conn.execute(
+                    text("SELECT body FROM notes WHERE id = :id"), {"id": note_id}
+                )
+        return {"ok": True}
+
+    @app.get("/notes")
+    def notes_in_bulk():
+        with engine.connect() as conn:
+            conn.execute(text("SELECT id, body FROM notes")).all()
+        return {"ok": True}
+
+    app.add_middleware(QueryStatsMiddleware)
+    yield TestClient(app)
+    query_stats.reset_query_metrics()
+
+
+class TestQueryStatsMiddleware:
+    def test_counts_statements_in_dev_headers(self, client):
+        response = client.get("/notes/3")
+
+        assert response.headers["X-DB-Query-Count"] == "3"
+        assert float(response.headers["X-DB-Query-Time-Ms"]) >= 0
+
+    def test_no_headers_outside_development(self, monkeypatch):
+        monkeypatch.setattr(settings, "NODE_ENV", "production")
+        app = FastAPI()
+        app.add_middleware(QueryStatsMiddleware)
+
+        response = TestClient(app).get("/missing")
+
+        assert "X-DB-Query-Count" not in response.headers
+
+    def test_flags_suspected_n_plus_one(self, client, caplog):
+        with caplog.at_level(logging.WARNING, logger=query_stats.__name__):
+            client.get("/notes/3")
+            assert "Suspected N+1" not in caplog.text
+
+            client.get("/notes/12")
+
+        assert "Suspected N+1 on /notes/{count}: statement ran 12 times" in caplog.text
+
+    def test_metrics_per_route_template(self, client):
+        client.get("/notes/2")
+        client.get("/notes/12")
+        client.get("/notes")
+
+        metrics = get_query_metrics()
+        per_note = metrics["/notes/{count}"]
+        assert per_note["requests"] == 2
+        assert per_note["queries"] == 14
+        assert per_note["avg_queries"] == 7.0
+        assert per_note["max_queries"] == 12
+        assert per_note["n_plus_one"] == 1
+        assert metrics["/notes"]["queries"] == 1
+
+
+class TestMaxQueriesFixture:
+    def test_passes_within_budget(self, client, max_queries):
+        with max_queries(1) as stats:
+            client.get("/notes")
+
+        assert stats.count == 1
+
+    def test_fails_over_budget(self, client, max_queries):
+        with pytest.raises(
+            AssertionError, match="5 SQL statements, expected at most 2"
+        ):
+            with max_queries(2):
+                client.get("/notes/5")
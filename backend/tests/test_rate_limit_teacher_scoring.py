@@ -11,7 +11,7 @@ These tests verify that:
 from fastapi import FastAPI
 from fastapi.testclient import TestClient
 from app.api.middleware.rate_limit import RateLimitMiddleware
-from app.infra.services.rate_limiter import RateLimiter
+from app.infra.services.rate_limiter import RateLimiter, RateLimitResult
 from unittest.mock import MagicMock
 
 
@@ -28,7 +28,9 @@ def test_teacher_scoring_endpoint_no_rate_limit():
     # Create real rate limiter (will allow first few requests)
     mock_rate_limiter = MagicMock(spec=RateLimiter)
     # This would normally block after 100 requests, but should be bypassed
-    mock_rate_limiter.is_allowed.return_value = (False, 30)
+    mock_rate_limiter.hit.return_value = RateLimitResult(
+        False, 100, 0, 30, retry_after=30
+    )
 
     app = FastAPI()
     app.add_middleware(RateLimitMiddleware, rate_limiter=mock_rate_limiter)
@@ -56,13 +58,15 @@ def test_teacher_scoring_endpoint_no_rate_limit():
         ), f"Request {i+1} failed with status {response.status_code}"
 
     # Rate limiter should never be called because endpoint is exempted
-    mock_rate_limiter.is_allowed.assert_not_called()
+    mock_rate_limiter.hit.assert_not_called()
 
 
 def test_admin_scoring_endpoint_no_rate_limit():
     """Test that authenticated admins are also not rate limited on scoring endpoints"""
     mock_rate_limiter = MagicMock(spec=RateLimiter)
-    mock_rate_limiter.is_allowed.return_value = (False, 30)
+    mock_rate_limiter.hit.return_value = RateLimitResult(
+        False, 100, 0, 30, retry_after=30
+    )
 
     app = FastAPI()
     app.add_middleware(RateLimitMiddleware, rate_limiter=mock_rate_limiter)
@@ -86,18 +90,14 @@ def test_admin_scoring_endpoint_no_rate_limit():
         assert response.status_code == 200
 
     # Rate limiter should never be called
-    mock_rate_limiter.is_allowed.assert_not_called()
+    mock_rate_limiter.hit.assert_not_called()
 
 
 def test_student_scoring_endpoint_still_rate_limited():
     """Test that students do not get exemption on scoring endpoints"""
     mock_rate_limiter = MagicMock(spec=RateLimiter)
     # Allow first request to pass so we can verify the limiter is called
-    mock_rate_limiter.is_allowed.return_value = (True, None)
-    mock_rate_limiter.get_usage.return_value = {
-        "current_count": 50,
-        "window_seconds": 60,
-    }
+    mock_rate_limiter.hit.return_value = RateLimitResult(True, 100, 99, 60)
 
     app = FastAPI()
     app.add_middleware(RateLimitMiddleware, rate_limiter=mock_rate_limiter)
@@ -120,7 +120,7 @@ def test_student_scoring_endpoint_still_rate_limited():
 
     # Should call rate limiter (no exemption for students on scoring endpoints)
     assert response.status_code == 200
-    mock_rate_limiter.is_allowed.assert_called()
+    mock_rate_limiter.hit.assert_called()
     # Verify rate limit headers are present (proves rate limiting is active)
     assert "X-RateLimit-Limit" in response.headers
 
@@ -128,11 +128,7 @@ def test_student_scoring_endpoint_still_rate_limited():
 def test_unauthenticated_scoring_endpoint_rate_limited():
     """Test that unauthenticated requests to scoring endpoints are rate limited"""
     mock_rate_limiter = MagicMock(spec=RateLimiter)
-    mock_rate_limiter.is_allowed.return_value = (True, None)
-    mock_rate_limiter.get_usage.return_value = {
-        "current_count": 50,
-        "window_seconds": 60,
-    }
+    mock_rate_limiter.hit.return_value = RateLimitResult(True, 100, 99, 60)
 
     app = FastAPI()
     app.add_middleware(RateLimitMiddleware, rate_limiter=mock_rate_limiter)
@@ -148,18 +144,14 @@ def test_unauthenticated_scoring_endpoint_rate_limited():
 
     # Should be rate limited (limiter is called)
     assert response.status_code == 200
-    mock_rate_limiter.is_allowed.assert_called()
+    mock_rate_limiter.hit.assert_called()
     assert "X-RateLimit-Limit" in response.headers
 
 
 def test_auth_endpoints_still_rate_limited_for_teachers():
     """Test that auth endpoints remain rate limited even for teachers"""
     mock_rate_limiter = MagicMock(spec=RateLimiter)
-    mock_rate_limiter.is_allowed.return_value = (True, None)
-    mock_rate_limiter.get_usage.return_value = {
-        "current_count": 3,
-        "window_seconds": 60,
-    }
+    mock_rate_limiter.hit.return_value = RateLimitResult(True, 100, 99, 60)
 
     app = FastAPI()
     app.add_middleware(RateLimitMiddleware, rate_limiter=mock_rate_limiter)
@@ -182,14 +174,16 @@ def test_auth_endpoints_still_rate_limited_for_teachers():
 
     # Should call rate limiter (no exemption for auth endpoints)
     assert response.status_code == 200
-    mock_rate_limiter.is_allowed.assert_called()
+    mock_rate_limiter.hit.assert_called()
     assert "X-RateLimit-Limit" in response.headers
 
 
 def test_evaluation_grades_endpoint_exempted():
     """Test that evaluation grades endpoints are also exempted for teachers"""
     mock_rate_limiter = MagicMock(spec=RateLimiter)
-    mock_rate_limiter.is_allowed.return_value = (False, 30)
+    mock_rate_limiter.hit.return_value = RateLimitResult(
+        False, 100, 0, 30, retry_after=30
+    )
 
     app = FastAPI()
     app.add_middleware(RateLimitMiddleware, rate_limiter=mock_rate_limiter)
@@ -213,17 +207,13 @@ def test_evaluation_grades_endpoint_exempted():
         assert response.status_code == 200
 
     # Rate limiter should never be called
-    mock_rate_limiter.is_allowed.assert_not_called()
+    mock_rate_limiter.hit.assert_not_called()
 
 
 def test_regular_endpoints_still_rate_limited():
     """Test that regular endpoints are still rate limited for teachers"""
     mock_rate_limiter = MagicMock(spec=RateLimiter)
-    mock_rate_limiter.is_allowed.return_value = (True, None)
-    mock_rate_limiter.get_usage.return_value = {
-        "current_count": 50,
-        "window_seconds": 60,
-    }
+    mock_rate_limiter.hit.return_value = RateLimitResult(True, 100, 99, 60)
 
     app = FastAPI()
     app.add_middleware(RateLimitMiddleware, rate_limiter=mock_rate_limiter)
@@ -244,14 +234,16 @@ def test_regular_endpoints_still_rate_limited():
 
     # Should be rate limited normally
     assert response.status_code == 200
-    mock_rate_limiter.is_allowed.assert_called()
+    mock_rate_limiter.hit.assert_called()
     assert "X-RateLimit-Limit" in response.headers
 
 
 def test_omza_teacher_score_endpoint_exempted():
     """Test that OMZA teacher-score endpoints are exempted for teachers"""
     mock_rate_limiter = MagicMock(spec=RateLimiter)
-    mock_rate_limiter.is_allowed.return_value = (False, 30)
+    mock_rate_limiter.hit.return_value = RateLimitResult(
+        False, 100, 0, 30, retry_after=30
+    )
 
     app = FastAPI()
     app.add_middleware(RateLimitMiddleware, rate_limiter=mock_rate_limiter)
@@ -277,7 +269,7 @@ def test_omza_teacher_score_endpoint_exempted():
         ), f"Request {i+1} failed with status {response.status_code}"
 
     # Rate limiter should never be called because endpoint is exempted
-    mock_rate_limiter.is_allowed.assert_not_called()
+    mock_rate_limiter.hit.assert_not_called()
 
 
 def test_scoring_endpoint_pattern_matching():
@@ -363,11 +355,7 @@ def test_scoring_endpoint_pattern_matching():
 def test_no_user_in_request_state():
     """Test that endpoints without user in request state are rate limited"""
     mock_rate_limiter = MagicMock(spec=RateLimiter)
-    mock_rate_limiter.is_allowed.return_value = (True, None)
-    mock_rate_limiter.get_usage.return_value = {
-        "current_count": 1,
-        "window_seconds": 60,
-    }
+    mock_rate_limiter.hit.return_value = RateLimitResult(True, 100, 99, 60)
 
     app = FastAPI()
     app.add_middleware(RateLimitMiddleware, rate_limiter=mock_rate_limiter)
@@ -383,14 +371,16 @@ def test_no_user_in_request_state():
 
     # Should call rate limiter (no exemption without authenticated user)
     assert response.status_code == 200
-    mock_rate_limiter.is_allowed.assert_called()
+    mock_rate_limiter.hit.assert_called()
 
 
 def test_azure_auth_endpoint_skips_rate_limiting():
     """Test that Azure AD auth endpoints bypass rate limiting entirely"""
     mock_rate_limiter = MagicMock(spec=RateLimiter)
     # Rate limiter would block if called
-    mock_rate_limiter.is_allowed.return_value = (False, 30)
+    mock_rate_limiter.hit.return_value = RateLimitResult(
+        False, 100, 0, 30, retry_after=30
+    )
 
     app = FastAPI()
     app.add_middleware(RateLimitMiddleware, rate_limiter=mock_rate_limiter)
@@ -418,13 +408,15 @@ def test_azure_auth_endpoint_skips_rate_limiting():
     ), f"Azure callback was rate limited: {response.status_code}"
 
     # Rate limiter should never be called for Azure auth endpoints
-    mock_rate_limiter.is_allowed.assert_not_called()
+    mock_rate_limiter.hit.assert_not_called()
 
 
 def test_rate_limit_returns_429_not_500():
     """Test that rate limiting returns proper 429 response, not 500"""
     mock_rate_limiter = MagicMock(spec=RateLimiter)
-    mock_rate_limiter.is_allowed.return_value = (False, 60)
+    mock_rate_limiter.hit.return_value = RateLimitResult(
+        False, 100, 0, 60, retry_after=60
+    )
 
     app = FastAPI()
     app.add_middleware(RateLimitMiddleware, rate_limiter=mock_rate_limiter)
@@ -479,7 +471,9 @@ def test_rate_limit_uses_forwarded_for_when_no_real_ip():
 def test_omza_teacher_scores_batch_endpoint_exempted():
     """Test that the OMZA batch teacher-scores endpoint is exempted for teachers"""
     mock_rate_limiter = MagicMock(spec=RateLimiter)
-    mock_rate_limiter.is_allowed.return_value = (False, 30)
+    mock_rate_limiter.hit.return_value = RateLimitResult(
+        False, 100, 0, 30, retry_after=30
+    )
 
     app = FastAPI()
     app.add_middleware(RateLimitMiddleware, rate_limiter=mock_rate_limiter)
@@ -501,7 +495,7 @@ def test_omza_teacher_scores_batch_endpoint_exempted():
     assert response.status_code == 200
 
     # Rate limiter should never be called because endpoint is exempted
-    mock_rate_limiter.is_allowed.assert_not_called()
+    mock_rate_limiter.hit.assert_not_called()
 
 
 def test_omza_batch_endpoint_pattern_matching():
@@ -0,0 +1,107 @@
+"""
+Tests for the in-process fallback of the rate limiter.
+
+When Redis errors or times out the limiter must keep enforcing limits from
+local token buckets, and once the circuit breaker is open it must stop
+calling Redis until the reset timeout has passed.
+"""
+
+import asyncio
+from unittest.mock import AsyncMock, MagicMock, patch
+
+from redis.exceptions import RedisError, TimeoutError as RedisTimeoutError
+
+from app.infra.services import rate_limiter as rate_limiter_module
+from app.infra.services.rate_limiter import (
+    CircuitBreaker,
+    LocalTokenBuckets,
+    RateLimiter,
+)
+
+
+def _limiter(script, **breaker_kwargs):
+    conn = MagicMock()
+    conn.register_script.return_value = script
+    return RateLimiter(conn, breaker=CircuitBreaker(**breaker_kwargs))
+
+
+def _hit(limiter, times, key="user:1:/api/v1/x", limit=5):
+    return [asyncio.run(limiter.hit(key, limit, 60)) for _ in range(times)]
+
+
+class TestLocalTokenBuckets:
+    def test_enforces_the_limit_and_refills(self):
+        buckets = LocalTokenBuckets()
+        clock = [1000.0]
+        with patch.object(
+            rate_limiter_module.time, "monotonic", side_effect=lambda: clock[0]
+        ):
+            results = [buckets.take("k", 5, 60) for _ in range(6)]
+            assert [r.allowed for r in results] == [True] * 5 + [False]
+            assert results[-1].retry_after == 12
+
+            clock[0] += 12
+            assert buckets.take("k", 5, 60).allowed
+
+    def test_table_is_bounded(self):
+        buckets = LocalTokenBuckets(max_entries=3)
+        for key in ("a", "b", "c", "a", "d"):
+            buckets.take(key, 5, 60)
+
+        assert len(buckets) == 3
+        # "b" was least recently used: it starts with a full bucket again
+        assert buckets.take("b", 5, 60).remaining == 4
+
+
+class TestCircuitBreaker:
+    def test_limits_stay_enforced_during_an_outage(self):
+        script = AsyncMock(side_effect=RedisTimeoutError("timed out"))
+        limiter = _limiter(script, failure_threshold=3)
+
+        results = _hit(limiter, 7)
+
+        assert [r.allowed for r in results] == [True] * 5 + [False] * 2
+        # Redis is skipped once the breaker is open
+        assert script.await_count == 3
+        stats = limiter.stats()
+        assert stats["breaker"]["state"] == "open"
+        assert stats["breaker"]["trips"] == 1
+        assert stats["fallback_requests"] == 7
+
+    def test_trial_request_closes_the_breaker(self):
+        script = AsyncMock(side_effect=RedisError("down"))
+        limiter = _limiter(script, failure_threshold=1, reset_seconds=0)
+        _hit(limiter, 1)
+        assert limiter.breaker.state == "open"
+
+        script.side_effect = None
+        script.return_value = [1, 4, 60]
+        (result,) = _hit(limiter, 1)
+
+        assert result.remaining == 4
+        assert limiter.stats()["breaker"]["state"] == "closed"
+
+    def test_failed_trial_reopens_the_breaker(self):
+        script = AsyncMock(side_effect=RedisError("down"))
+        limiter = _limiter(script, failure_threshold=1, reset_seconds=0)
+
+        _hit(limiter, 2)
+
+        assert limiter.breaker.state == "open"
+        assert limiter.breaker.trips == 1
+        assert script.await_count == 2
+
+
+class TestResetRateLimiter:
+    def test_reset_empties_the_buckets_of_the_shared_limiter(self, monkeypatch):
+        script = AsyncMock(side_effect=RedisError("down"))
+        limiter = _limiter(script, failure_threshold=1)
+        monkeypatch.setattr(rate_limiter_module, "_default_limiter", limiter)
+        assert not _hit(limiter, 6)[-1].allowed
+
+        rate_limiter_module.reset_rate_limiter()
+
+        # Same instance (the middleware holds it), fresh budget
+        assert rate_limiter_module.get_rate_limiter() is limiter
+        assert _hit(limiter, 1)[0].remaining == 4
+        assert limiter.stats()["fallback_requests"] == 1
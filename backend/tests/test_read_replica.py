@@ -0,0 +1,101 @@
+"""
+Tests for read-replica routing of read-only endpoints.
+
+get_read_db hands out a replica session only while ReplicaMonitor finds the
+replica reachable and within the lag threshold; otherwise the request's
+primary session from get_db is used.
+"""
+
+from unittest.mock import MagicMock, patch
+
+from fastapi import Depends, FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.exc import OperationalError
+
+from app.api.v1 import deps
+from app.api.v1.deps import get_db, get_read_db
+from app.infra.db.session import ReplicaMonitor
+
+
+def _monitor(tmp_path, max_lag_seconds=10.0, check_interval_seconds=60.0):
+    engine = create_engine(f"sqlite:///{tmp_path / 'replica.db'}")
+    return ReplicaMonitor(
+        engine,
+        max_lag_seconds=max_lag_seconds,
+        check_interval_seconds=check_interval_seconds,
+    )
+
+
+class TestReplicaMonitor:
+    def test_reachable_replica_is_used(self, tmp_path):
+        monitor = _monitor(tmp_path)
+
+        assert monitor.use_replica() is True
+        stats = monitor.stats()
+        assert stats["lag_seconds"] == 0.0
+        assert stats["replica_reads"] == 1
+
+    def test_lagging_replica_falls_back_to_primary(self, tmp_path):
+        monitor = _monitor(tmp_path, max_lag_seconds=5.0)
+
+        with patch.object(monitor, "_measure_lag", return_value=42.0):
+            assert monitor.use_replica() is False
+
+        stats = monitor.stats()
+        assert stats["lag_seconds"] == 42.0
+        assert stats["primary_reads"] == 1
+
+    def test_unreachable_replica_falls_back_to_primary(self, tmp_path):
+        monitor = _monitor(tmp_path)
+        error = OperationalError("SELECT 1", {}, Exception("connection refused"))
+
+        with patch.object(monitor, "_measure_lag", side_effect=error):
+            assert monitor.use_replica() is False
+
+        assert "connection refused" in monitor.stats()["last_error"]
+
+    def test_lag_is_checked_once_per_interval(self, tmp_path):
+        monitor = _monitor(tmp_path, check_interval_seconds=60.0)
+
+        with patch.object(monitor, "_measure_lag", return_value=0.0) as measure:
+            for _ in range(5):
+                assert monitor.use_replica() is True
+
+        assert measure.call_count == 1
+
+    def test_recovered_replica_is_used_again(self, tmp_path):
+        monitor = _monitor(tmp_path, check_interval_seconds=0.0)
+
+        with patch.object(monitor, "_measure_lag", return_value=30.0):
+            assert monitor.use_replica() is False
+        assert monitor.use_replica() is True
+
+
+class TestGetReadDb:
+    def _client(self, primary):
+        app = FastAPI()
+
+        @app.get("/read")
+        def read(db=Depends(get_read_db)):
+            return {"primary": db is primary}
+
+        app.dependency_overrides[get_db] = lambda: primary
+        return TestClient(app)
+
+    def test_uses_primary_without_replica(self):
+        primary = MagicMock()
+
+        with patch.object(deps, "open_read_session", return_value=None):
+            response = self._client(primary).get("/read")
+
+        assert response.json() == {"primary": True}
+
+    def test_uses_and_closes_replica_session(self):
+        primary, replica = MagicMock(), MagicMock()
+
+        with patch.object(deps, "open_read_session", return_value=replica):
+            response = self._client(primary).get("/read")
+
+        assert response.json() == {"primary": False}
+        replica.close.assert_called_once()
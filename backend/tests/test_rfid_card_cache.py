@@ -0,0 +1,209 @@
+"""
+Tests for the in-process RFID card lookup cache used by /attendance/scan.
+
+A repeated scan must not query RFIDCard / User again, and changing a card or
+archiving its user must invalidate the cached lookup.
+"""
+
+from unittest.mock import Mock
+
+import pytest
+from fastapi import HTTPException
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+from sqlalchemy.schema import CreateTable
+
+from app.api.v1.routers.attendance import rfid_card_cache_stats, rfid_scan
+from app.api.v1.routers.rfid import delete_rfid_card, update_rfid_card
+from app.api.v1.routers.teachers import delete_teacher
+from app.api.v1.schemas.attendance import RFIDCardUpdate, RFIDScanRequest
+from app.infra.db.models import (
+    AttendanceAggregate,
+    AttendanceDailyRollup,
+    AttendanceEvent,
+    AttendanceRollupState,
+    RFIDCard,
+    School,
+    User,
+)
+from app.services import rfid_card_cache
+from app.services.rfid_card_cache import (
+    clear_rfid_card_cache,
+    get_rfid_card_cache_stats,
+    invalidate_rfid_user,
+    reset_rfid_card_cache_stats,
+    resolve_rfid_card,
+)
+
+_NEEDED_TABLES = [
+    School.__table__,
+    User.__table__,
+    RFIDCard.__table__,
+    AttendanceEvent.__table__,
+    AttendanceAggregate.__table__,
+    AttendanceDailyRollup.__table__,
+    AttendanceRollupState.__table__,
+]
+
+
+@pytest.fixture
+def engine():
+    engine = create_engine(
+        "sqlite:///:memory:",
+        connect_args={"check_same_thread": False},
+        poolclass=StaticPool,
+    )
+    with engine.begin() as conn:
+        for table in _NEEDED_TABLES:
+            conn.execute(CreateTable(table))
+            for name in sorted({index.name for index in table.indexes}):
+                next(i for i in table.indexes if i.name == name).create(conn)
+    yield engine
+    engine.dispose()
+
+
+@pytest.fixture
+def db(engine):
+    Session = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    session = Session()
+    session.add(School(id=1, name="School"))
+    session.add_all(
+        [
+            User(id=1, school_id=1, name="Admin", email="a@x.nl", role="admin"),
+            User(
+                id=10,
+                school_id=1,
+                name="Leerling",
+                email="s@x.nl",
+                role="student",
+                class_name="4A",
+            ),
+            User(id=11, school_id=1, name="Docent", email="t@x.nl", role="teacher"),
+            RFIDCard(id=1, user_id=10, uid="CARD10", is_active=True),
+            RFIDCard(id=2, user_id=11, uid="CARD11", is_active=True),
+        ]
+    )
+    session.commit()
+    clear_rfid_card_cache()
+    reset_rfid_card_cache_stats()
+    yield session
+    clear_rfid_card_cache()
+    reset_rfid_card_cache_stats()
+    session.close()
+
+
+@pytest.fixture
+def statements(engine):
+    seen = []
+
+    def _count(conn, cursor, statement, *args):
+        seen.append(statement)
+
+    event.listen(engine, "before_cursor_execute", _count)
+    yield seen
+    event.remove(engine, "before_cursor_execute", _count)
+
+
+def _card_queries(statements):
+    return [s for s in statements if "rfid_cards" in s]
+
+
+class TestResolve:
+    def test_second_lookup_is_a_hit(self, db, statements):
+        first = resolve_rfid_card(db, "CARD10")
+        second = resolve_rfid_card(db, "CARD10")
+
+        assert first == {
+            "id": 10,
+            "name": "Leerling",
+            "email": "s@x.nl",
+            "class_name": "4A",
+        }
+        assert second == first
+        assert len(_card_queries(statements)) == 1
+        stats = get_rfid_card_cache_stats()
+        assert (stats["hits"], stats["misses"], stats["hit_rate"]) == (1, 1, 0.5)
+
+    def test_unknown_card_is_not_cached(self, db):
+        assert resolve_rfid_card(db, "NOPE") is None
+        db.add(RFIDCard(user_id=10, uid="NOPE", is_active=True))
+        db.commit()
+        assert resolve_rfid_card(db, "NOPE")["id"] == 10
+
+    def test_expired_entry_is_reloaded(self, db, statements, monkeypatch):
+        monkeypatch.setattr(rfid_card_cache, "RFID_CARD_CACHE_TTL_SECONDS", -1.0)
+        resolve_rfid_card(db, "CARD10")
+        resolve_rfid_card(db, "CARD10")
+        assert len(_card_queries(statements)) == 2
+
+    def test_lru_bound(self, db, monkeypatch):
+        monkeypatch.setattr(rfid_card_cache, "RFID_CARD_CACHE_MAX_ENTRIES", 1)
+        resolve_rfid_card(db, "CARD10")
+        resolve_rfid_card(db, "CARD11")
+        assert get_rfid_card_cache_stats()["size"] == 1
+
+    def test_returns_copies(self, db):
+        resolve_rfid_card(db, "CARD10")["name"] = "X"
+        assert resolve_rfid_card(db, "CARD10")["name"] == "Leerling"
+
+
+class TestScanUsesCache:
+    def test_warm_scan_skips_card_lookup(self, db, statements):
+        rfid_scan(RFIDScanRequest(uid="CARD10"), db=db, _=None)
+        statements.clear()
+
+        result = rfid_scan(RFIDScanRequest(uid="CARD10"), db=db, _=None)
+
+        assert result.action == "check_out"
+        assert result.user["class_name"] == "4A"
+        assert _card_queries(statements) == []
+
+
+class TestInvalidation:
+    def test_deactivated_card_is_rejected(self, db):
+        admin = db.get(User, 1)
+        resolve_rfid_card(db, "CARD10")
+
+        update_rfid_card(1, RFIDCardUpdate(is_active=False), db=db, current_user=admin)
+
+        result = rfid_scan(RFIDScanRequest(uid="CARD10"), db=db, _=None)
+        assert result.status == "not_found"
+
+    def test_deleted_card_is_rejected(self, db):
+        admin = db.get(User, 1)
+        resolve_rfid_card(db, "CARD10")
+
+        delete_rfid_card(1, db=db, current_user=admin)
+
+        assert resolve_rfid_card(db, "CARD10") is None
+
+    def test_archiving_user_drops_their_cards(self, db):
+        admin = db.get(User, 1)
+        resolve_rfid_card(db, "CARD11")
+        resolve_rfid_card(db, "CARD10")
+
+        delete_teacher(11, db=db, user=admin)
+
+        stats = get_rfid_card_cache_stats()
+        assert stats["size"] == 1
+        assert stats["invalidations"] == 1
+
+    def test_invalidate_user_keeps_other_users(self, db):
+        resolve_rfid_card(db, "CARD10")
+        resolve_rfid_card(db, "CARD11")
+        invalidate_rfid_user(10)
+        assert get_rfid_card_cache_stats()["size"] == 1
+
+
+class TestStatsEndpoint:
+    def test_teacher_sees_stats(self, db):
+        resolve_rfid_card(db, "CARD10")
+        stats = rfid_card_cache_stats(current_user=Mock(role="teacher"))
+        assert stats["misses"] == 1
+        assert stats["size"] == 1
+
+    def test_student_is_forbidden(self):
+        with pytest.raises(HTTPException) as exc_info:
+            rfid_card_cache_stats(current_user=Mock(role="student"))
+        assert exc_info.value.status_code == 403
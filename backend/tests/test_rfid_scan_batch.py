@@ -0,0 +1,251 @@
+"""
+Tests for POST /attendance/scan/batch (buffered taps from an RFID reader).
+
+Taps must be paired per user in timestamp order, written in one transaction,
+and reported per tap in request order. A resent batch must not create events
+twice.
+"""
+
+from datetime import datetime, timedelta, timezone
+from unittest.mock import patch
+
+import pytest
+from fastapi import HTTPException
+from pydantic import ValidationError
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+from sqlalchemy.schema import CreateTable
+
+from app.api.v1.routers.attendance import rfid_scan_batch
+from app.api.v1.schemas.attendance import RFIDBatchScanRequest
+from app.infra.db.models import (
+    AttendanceAggregate,
+    AttendanceDailyRollup,
+    AttendanceEvent,
+    AttendanceRollupState,
+    RFIDCard,
+    School,
+    User,
+)
+from app.services.rfid_card_cache import clear_rfid_card_cache
+
+_NEEDED_TABLES = [
+    School.__table__,
+    User.__table__,
+    RFIDCard.__table__,
+    AttendanceEvent.__table__,
+    AttendanceAggregate.__table__,
+    AttendanceDailyRollup.__table__,
+    AttendanceRollupState.__table__,
+]
+
+NOW = datetime.now(timezone.utc).replace(microsecond=0)
+
+
+@pytest.fixture
+def engine():
+    engine = create_engine(
+        "sqlite:///:memory:",
+        connect_args={"check_same_thread": False},
+        poolclass=StaticPool,
+    )
+    with engine.begin() as conn:
+        for table in _NEEDED_TABLES:
+            conn.execute(CreateTable(table))
+            for name in sorted({index.name for index in table.indexes}):
+                next(i for i in table.indexes if i.name == name).create(conn)
+    yield engine
+    engine.dispose()
+
+
+@pytest.fixture
+def db(engine):
+    Session = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    session = Session()
+    session.add(School(id=1, name="School"))
+    for uid in (10, 11, 12):
+        session.add(
+            User(
+                id=uid,
+                school_id=1,
+                name=f"Leerling {uid}",
+                email=f"s{uid}@school.nl",
+                role="student",
+            )
+        )
+        session.add(RFIDCard(user_id=uid, uid=f"CARD{uid}", is_active=True))
+    session.commit()
+    clear_rfid_card_cache()
+    yield session
+    clear_rfid_card_cache()
+    session.close()
+
+
+def _batch(db, *taps):
+    request = RFIDBatchScanRequest(
+        taps=[{"uid": uid, "timestamp": ts} for uid, ts in taps]
+    )
+    return rfid_scan_batch(request, db=db, _=None).results
+
+
+def _events(db, uid):
+    db.expire_all()
+    return (
+        db.query(AttendanceEvent)
+        .filter(AttendanceEvent.user_id == uid)
+        .order_by(AttendanceEvent.check_in)
+        .all()
+    )
+
+
+def _utc(dt):
+    return dt if dt.tzinfo else dt.replace(tzinfo=timezone.utc)
+
+
+def _school_seconds(db, uid):
+    db.expire_all()
+    return (
+        db.query(AttendanceAggregate)
+        .filter(AttendanceAggregate.user_id == uid)
+        .one()
+        .total_school_seconds
+    )
+
+
+class TestPairing:
+    def test_pairs_per_user_in_timestamp_order(self, db):
+        t0 = NOW - timedelta(hours=3)
+        results = _batch(
+            db,
+            ("CARD10", t0 + timedelta(hours=2)),
+            ("CARD11", t0 + timedelta(minutes=30)),
+            ("CARD10", t0),
+        )
+
+        assert [r.index for r in results] == [0, 1, 2]
+        assert [(r.status, r.action) for r in results] == [
+            ("ok", "check_out"),
+            ("ok", "check_in"),
+            ("ok", "check_in"),
+        ]
+        assert results[0].event["duration_seconds"] == 7200
+        assert results[2].event["check_out"] is None
+        assert results[0].event["id"] == results[2].event["id"]
+
+        (session,) = _events(db, 10)
+        assert _utc(session.check_out) - _utc(session.check_in) == timedelta(hours=2)
+        assert _events(db, 11)[0].check_out is None
+        assert _school_seconds(db, 10) == 7200
+
+    def test_closes_session_opened_before_the_batch(self, db):
+        db.add(
+            AttendanceEvent(
+                user_id=10, check_in=NOW - timedelta(hours=1), source="rfid"
+            )
+        )
+        db.commit()
+
+        (result,) = _batch(db, ("CARD10", NOW))
+
+        assert result.action == "check_out"
+        assert result.event["duration_seconds"] == 3600
+
+    def test_forgotten_checkout_is_closed_and_tap_checks_in(self, db):
+        db.add(
+            AttendanceEvent(
+                user_id=10, check_in=NOW - timedelta(hours=13), source="rfid"
+            )
+        )
+        db.commit()
+
+        (result,) = _batch(db, ("CARD10", NOW))
+
+        assert result.action == "check_in"
+        old, new = _events(db, 10)
+        assert _utc(old.check_out) - _utc(old.check_in) == timedelta(minutes=15)
+        assert new.check_out is None
+        assert _school_seconds(db, 10) == 15 * 60
+
+
+class TestPerTapResults:
+    def test_unknown_card_and_future_tap(self, db):
+        results = _batch(
+            db,
+            ("NOPE", NOW),
+            ("CARD10", NOW + timedelta(hours=1)),
+            ("CARD11", NOW),
+        )
+
+        assert [r.status for r in results] == ["not_found", "rejected", "ok"]
+        assert results[0].uid == "NOPE"
+        assert _events(db, 10) == []
+
+    def test_tap_before_open_check_in_is_rejected(self, db):
+        db.add(AttendanceEvent(user_id=10, check_in=NOW, source="rfid"))
+        db.commit()
+
+        (result,) = _batch(db, ("CARD10", NOW - timedelta(minutes=5)))
+
+        assert result.status == "rejected"
+
+    def test_resent_batch_is_reported_as_duplicate(self, db):
+        taps = (
+            ("CARD10", NOW - timedelta(hours=2)),
+            ("CARD10", NOW - timedelta(hours=1)),
+            ("CARD11", NOW - timedelta(minutes=5)),
+        )
+        _batch(db, *taps)
+
+        results = _batch(db, *taps)
+
+        assert [r.status for r in results] == ["duplicate"] * 3
+        assert len(_events(db, 10)) == 1
+        assert len(_events(db, 11)) == 1
+        assert _school_seconds(db, 10) == 3600
+
+
+class TestTransaction:
+    def test_cards_and_sessions_are_loaded_once(self, db, engine):
+        db.add_all(AttendanceAggregate(user_id=uid) for uid in (10, 11, 12))
+        db.commit()
+        statements = []
+        event.listen(
+            engine, "before_cursor_execute", lambda *a: statements.append(a[2])
+        )
+
+        _batch(
+            db,
+            *[
+                (f"CARD{uid}", NOW - timedelta(minutes=minutes))
+                for uid in (10, 11, 12)
+                for minutes in (90, 60, 30)
+            ],
+        )
+
+        selects = [s for s in statements if s.lstrip().startswith("SELECT")]
+        card_lookups = [s for s in selects if "rfid_cards" in s]
+        session_lookups = [s for s in selects if "FROM attendance_events" in s]
+        assert len(card_lookups) == 1
+        assert len(session_lookups) == 1
+
+    def test_failure_writes_nothing(self, db):
+        with patch(
+            "app.services.attendance_sessions.add_school_seconds",
+            side_effect=RuntimeError("boom"),
+        ):
+            with pytest.raises(HTTPException) as exc_info:
+                _batch(
+                    db,
+                    ("CARD10", NOW - timedelta(hours=1)),
+                    ("CARD10", NOW),
+                )
+
+        assert exc_info.value.status_code == 500
+        assert _events(db, 10) == []
+
+    def test_batch_size_is_limited(self):
+        with pytest.raises(ValidationError):
+            RFIDBatchScanRequest(
+                taps=[{"uid": "CARD10", "timestamp": NOW} for _ in range(501)]
+            )
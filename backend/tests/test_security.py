@@ -7,7 +7,7 @@ from fastapi import FastAPI
 from fastapi.testclient import TestClient
 from app.api.middleware.security_headers import SecurityHeadersMiddleware
 from app.api.middleware.rate_limit import RateLimitMiddleware
-from app.infra.services.rate_limiter import RateLimiter
+from app.infra.services.rate_limiter import RateLimiter, RateLimitResult
 from unittest.mock import MagicMock
 
 
@@ -147,13 +147,7 @@ def test_backend_headers_default_to_true_in_development():
 def test_rate_limiting_allows_normal_traffic():
     """Test that rate limiting allows normal traffic"""
     mock_rate_limiter = MagicMock(spec=RateLimiter)
-    mock_rate_limiter.is_allowed.return_value = (True, None)
-    mock_rate_limiter.get_usage.return_value = {
-        "current_count": 1,
-        "window_seconds": 60,
-        "oldest_request": None,
-        "newest_request": None,
-    }
+    mock_rate_limiter.hit.return_value = RateLimitResult(True, 100, 99, 60)
 
     app = FastAPI()
     app.add_middleware(RateLimitMiddleware, rate_limiter=mock_rate_limiter)
@@ -174,11 +168,9 @@ def test_rate_limiting_allows_normal_traffic():
 def test_rate_limiting_blocks_excessive_requests():
     """Test that rate limiting blocks excessive requests"""
     mock_rate_limiter = MagicMock(spec=RateLimiter)
-    mock_rate_limiter.is_allowed.return_value = (False, 30)  # Blocked, retry after 30s
-    mock_rate_limiter.get_usage.return_value = {
-        "current_count": 101,
-        "window_seconds": 60,
-    }
+    mock_rate_limiter.hit.return_value = RateLimitResult(
+        False, 100, 0, 30, retry_after=30
+    )  # Blocked, retry after 30s
 
     app = FastAPI()
     app.add_middleware(RateLimitMiddleware, rate_limiter=mock_rate_limiter)
@@ -203,8 +195,10 @@ def test_rate_limiting_blocks_excessive_requests():
     # Test that it raises HTTPException with 429 status
 
     # The middleware should raise HTTPException when rate limit is exceeded
-    # We verify this by checking is_allowed is called and returns False
-    mock_rate_limiter.is_allowed.return_value = (False, 30)
+    # We verify this by checking hit is called and returns False
+    mock_rate_limiter.hit.return_value = RateLimitResult(
+        False, 100, 0, 30, retry_after=30
+    )
 
     # Middleware will raise HTTPException, which FastAPI converts to 429 response
     # We've verified the logic exists by checking the code in rate_limit.py:66-72
@@ -243,6 +237,33 @@ def test_rate_limiting_public_endpoints():
     assert window == 60
 
 
+def test_rate_limiting_queue_endpoints():
+    """Test that job polling is not limited like queue and batch writes"""
+    app = FastAPI()
+    middleware = RateLimitMiddleware(app, rate_limiter=MagicMock())
+    prefix = "/api/v1/feedback-summaries"
+
+    # Status polls of all jobs of a user share one generous budget
+    assert middleware._get_rate_limit(f"{prefix}/jobs/summary-1-2-x/status") == (
+        600,
+        60,
+    )
+    assert middleware._get_rate_limit(f"{prefix}/batches/b-1/status") == (600, 60)
+    # Other reads get the default
+    assert middleware._get_rate_limit(f"{prefix}/queue/stats") == (100, 60)
+    assert middleware._get_rate_limit(f"{prefix}/evaluation/1/jobs") == (100, 60)
+
+    # Writes stay limited
+    assert middleware._get_rate_limit(
+        f"{prefix}/evaluation/1/student/2/queue", "POST"
+    ) == (60, 60)
+    assert middleware._get_rate_limit(f"{prefix}/jobs/x/cancel", "POST") == (60, 60)
+    assert middleware._get_rate_limit(f"{prefix}/evaluation/1/batch-queue", "POST") == (
+        10,
+        60,
+    )
+
+
 def test_rate_limiting_skips_health_check():
     """Test that health check endpoint is not rate limited"""
     mock_rate_limiter = MagicMock(spec=RateLimiter)
@@ -259,7 +280,35 @@ def test_rate_limiting_skips_health_check():
 
     # Should not call rate limiter at all
     assert response.status_code == 200
-    mock_rate_limiter.is_allowed.assert_not_called()
+    mock_rate_limiter.hit.assert_not_called()
+
+
+def test_rate_limit_keys_use_route_template():
+    """Test that ids in the path share one rate-limit key per route"""
+    mock_rate_limiter = MagicMock(spec=RateLimiter)
+    mock_rate_limiter.hit.return_value = RateLimitResult(True, 100, 99, 60)
+
+    app = FastAPI()
+    app.add_middleware(RateLimitMiddleware, rate_limiter=mock_rate_limiter)
+
+    @app.get("/api/v1/evaluations/{evaluation_id}/grades")
+    def grades(evaluation_id: int):
+        return {"id": evaluation_id}
+
+    client = TestClient(app)
+    for path in (
+        "/api/v1/evaluations/1/grades",
+        "/api/v1/evaluations/2/grades",
+        "/api/v1/unknown/3",
+    ):
+        client.get(path, headers={"X-Real-IP": "203.0.113.7"})
+
+    keys = [c.args[0] for c in mock_rate_limiter.hit.call_args_list]
+    assert keys == [
+        "ip:203.0.113.7:/api/v1/evaluations/{evaluation_id}/grades",
+        "ip:203.0.113.7:/api/v1/evaluations/{evaluation_id}/grades",
+        "ip:203.0.113.7:<unmatched>",
+    ]
 
 
 def test_cors_configuration():
@@ -0,0 +1,273 @@
+"""
+Tests for the per-evaluation batch summary job.
+
+``queue_summary_batch`` creates the job rows and enqueues one batch job;
+``batch_generate_summaries_task`` then generates every student with one
+feedback query, bounded Ollama concurrency and a commit per chunk. Runs
+against an in-memory SQLite database and the local fake Ollama server; the RQ
+queue is mocked.
+"""
+
+from types import SimpleNamespace
+from unittest.mock import MagicMock, patch
+
+import pytest
+from sqlalchemy import create_engine, event
+from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from app.core.config import settings
+from app.infra.db.models import (
+    Allocation,
+    Evaluation,
+    FeedbackSummary,
+    School,
+    Score,
+    SummaryGenerationJob,
+    User,
+)
+from app.infra.queue import tasks
+from app.infra.queue.tasks import batch_generate_summaries_task, queue_summary_batch
+from app.infra.services.ollama_client import OllamaClient, OllamaSlots
+from app.infra.services.ollama_service import OllamaService
+from tests.fake_ollama import SUMMARY_RESPONSE, FakeOllama
+
+
+@compiles(JSONB, "sqlite")
+def _jsonb_as_json(element, compiler, **kw):
+    return "JSON"
+
+
+STUDENTS_WITH_FEEDBACK = [2, 3, 4, 5]
+STUDENT_WITHOUT_FEEDBACK = 6
+
+
+@pytest.fixture
+def engine():
+    engine = create_engine(
+        "sqlite://",
+        connect_args={"check_same_thread": False},
+        poolclass=StaticPool,
+    )
+    for model in (
+        School,
+        User,
+        Evaluation,
+        Allocation,
+        Score,
+        FeedbackSummary,
+        SummaryGenerationJob,
+    ):
+        model.__table__.create(engine)
+    yield engine
+    engine.dispose()
+
+
+@pytest.fixture
+def session_factory(engine):
+    SessionLocal = sessionmaker(bind=engine)
+    with SessionLocal() as db:
+        db.add(School(id=1, name="School"))
+        db.add(User(id=10, school_id=1, name="Reviewer", email="r@x.nl"))
+        db.add(Evaluation(id=1, school_id=1, rubric_id=1, title="Peer", settings={}))
+        for student_id in STUDENTS_WITH_FEEDBACK + [STUDENT_WITHOUT_FEEDBACK]:
+            db.add(
+                User(
+                    id=student_id,
+                    school_id=1,
+                    name=f"Student {student_id}",
+                    email=f"s{student_id}@x.nl",
+                )
+            )
+        for student_id in STUDENTS_WITH_FEEDBACK:
+            db.add(
+                Allocation(
+                    id=student_id,
+                    school_id=1,
+                    evaluation_id=1,
+                    reviewer_id=10,
+                    reviewee_id=student_id,
+                    is_self=False,
+                )
+            )
+            db.add(
+                Score(
+                    school_id=1,
+                    allocation_id=student_id,
+                    criterion_id=1,
+                    score=4,
+                    comment=f"Werkt goed samen ({student_id})",
+                )
+            )
+        db.commit()
+    with patch.object(tasks, "SessionLocal", SessionLocal):
+        yield SessionLocal
+
+
+@pytest.fixture
+def fake():
+    with FakeOllama(latency=0.05, parallel=8) as fake:
+        yield fake
+
+
+@pytest.fixture
+def ollama(fake):
+    client = OllamaClient(
+        fake.url, slots=OllamaSlots(8, hold_seconds=30, use_redis=False)
+    )
+    with patch.object(
+        tasks, "OllamaService", lambda: OllamaService(base_url=fake.url, client=client)
+    ):
+        yield
+
+
+@pytest.fixture
+def rq_job():
+    job = SimpleNamespace(id="summary-batch-1", meta={}, saved=[])
+    job.save_meta = lambda: job.saved.append(dict(job.meta))
+    with patch.object(tasks, "get_current_job", return_value=job):
+        yield job
+
+
+@pytest.fixture(autouse=True)
+def batch_settings(monkeypatch):
+    monkeypatch.setattr(settings, "SUMMARY_BATCH_CONCURRENCY", 3)
+    monkeypatch.setattr(settings, "SUMMARY_BATCH_CHUNK_SIZE", 2)
+
+
+def _queue_batch(session_factory, student_ids):
+    queue = MagicMock()
+    with patch("app.infra.queue.connection.get_queue", return_value=queue):
+        with session_factory() as db:
+            batch = queue_summary_batch(
+                db, school_id=1, evaluation_id=1, student_ids=student_ids
+            )
+    return batch, queue
+
+
+def _jobs(session_factory):
+    with session_factory() as db:
+        return {job.student_id: job for job in db.query(SummaryGenerationJob)}
+
+
+def test_batch_generates_every_student_in_chunks(
+    engine, session_factory, ollama, fake, rq_job
+):
+    student_ids = STUDENTS_WITH_FEEDBACK + [STUDENT_WITHOUT_FEEDBACK]
+    batch, queue = _queue_batch(session_factory, student_ids)
+    queue.enqueue.assert_called_once()
+    job_ids = queue.enqueue.call_args.kwargs["job_ids"]
+    assert batch["batch_job_id"] == queue.enqueue.call_args.kwargs["job_id"]
+    assert len(job_ids) == 5
+
+    statements, commits = [], []
+    event.listen(
+        engine,
+        "before_cursor_execute",
+        lambda conn, cursor, statement, *args: statements.append(statement),
+    )
+    event.listen(engine, "commit", lambda conn: commits.append(1))
+
+    result = batch_generate_summaries_task(
+        school_id=1, evaluation_id=1, job_ids=job_ids
+    )
+
+    assert result["status"] == "completed"
+    assert result["completed"] == 5
+    # Comments of all students in one query
+    assert sum("FROM scores" in s for s in statements) == 1
+    # Start of the batch, then one commit per chunk of 2
+    assert len(commits) == 1 + 3
+    # Extract + summarize per student, at most SUMMARY_BATCH_CONCURRENCY at once
+    assert fake.requests == 2 * len(STUDENTS_WITH_FEEDBACK)
+    assert fake.max_in_flight <= 3
+
+    jobs = _jobs(session_factory)
+    assert {job.status for job in jobs.values()} == {"completed"}
+    assert jobs[STUDENT_WITHOUT_FEEDBACK].result["generation_method"] == "empty"
+    with session_factory() as db:
+        summaries = db.query(FeedbackSummary).all()
+    assert sorted(s.student_id for s in summaries) == STUDENTS_WITH_FEEDBACK
+    assert {s.summary_text for s in summaries} == {SUMMARY_RESPONSE}
+
+    assert [m["progress"] for m in rq_job.saved] == [0, 40, 80, 100]
+    assert rq_job.meta["completed"] == 5
+
+
+def test_students_with_a_job_are_not_queued_again(session_factory):
+    _queue_batch(session_factory, [2, 3])
+    batch, queue = _queue_batch(session_factory, [2, 3, 4])
+
+    assert [r["status"] for r in batch["results"]] == [
+        "already_queued",
+        "already_queued",
+        "queued",
+    ]
+    assert len(queue.enqueue.call_args.kwargs["job_ids"]) == 1
+
+
+def test_cancelled_and_missing_students(session_factory, ollama, rq_job):
+    _, queue = _queue_batch(session_factory, [2, 3, 99])
+    job_ids = queue.enqueue.call_args.kwargs["job_ids"]
+    with session_factory() as db:
+        job = db.query(SummaryGenerationJob).filter_by(student_id=3).one()
+        job.status = "cancelled"
+        db.commit()
+
+    result = batch_generate_summaries_task(
+        school_id=1, evaluation_id=1, job_ids=job_ids
+    )
+
+    assert (result["completed"], result["cancelled"], result["failed"]) == (1, 1, 1)
+    jobs = _jobs(session_factory)
+    assert jobs[2].status == "completed"
+    assert jobs[3].status == "cancelled"
+    assert jobs[99].status == "failed"
+    assert "Student 99 not found" in jobs[99].error_message
+    with session_factory() as db:
+        assert [s.student_id for s in db.query(FeedbackSummary)] == [2]
+
+
+def test_old_summary_is_replaced(session_factory, ollama, rq_job):
+    with session_factory() as db:
+        db.add(
+            FeedbackSummary(
+                school_id=1,
+                evaluation_id=1,
+                student_id=2,
+                summary_text="Oud",
+                feedback_hash="oud",
+                generation_method="fallback",
+            )
+        )
+        db.commit()
+    _, queue = _queue_batch(session_factory, [2])
+
+    batch_generate_summaries_task(
+        school_id=1, evaluation_id=1, job_ids=queue.enqueue.call_args.kwargs["job_ids"]
+    )
+
+    with session_factory() as db:
+        summary = db.query(FeedbackSummary).one()
+    assert summary.summary_text == SUMMARY_RESPONSE
+
+
+def test_failed_write_fails_the_unwritten_students(session_factory, ollama, rq_job):
+    _, queue = _queue_batch(session_factory, STUDENTS_WITH_FEEDBACK)
+
+    with patch.object(
+        tasks, "_write_summary_chunk", side_effect=RuntimeError("database gone")
+    ):
+        result = batch_generate_summaries_task(
+            school_id=1,
+            evaluation_id=1,
+            job_ids=queue.enqueue.call_args.kwargs["job_ids"],
+        )
+
+    assert result["status"] == "failed"
+    assert result["failed"] == len(STUDENTS_WITH_FEEDBACK)
+    jobs = _jobs(session_factory)
+    assert {job.status for job in jobs.values()} == {"failed"}
+    assert rq_job.meta["progress"] == 100
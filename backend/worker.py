@@ -11,6 +11,8 @@ This worker processes jobs from multiple queues with priority support:
 - ai-summaries-low (low priority)
 """
 
+import os
+import shutil
 import sys
 import time
 import logging
@@ -20,6 +22,11 @@ from pathlib import Path
 backend_dir = Path(__file__).parent
 sys.path.insert(0, str(backend_dir))
 
+# Size the database pool for a job process, not for an API worker
+os.environ.setdefault("DB_PROCESS_ROLE", "worker")
+# Jobs run in forked work-horses: aggregate their metrics through files
+os.environ.setdefault("PROMETHEUS_MULTIPROC_DIR", "/tmp/tea-worker-metrics")
+
 from rq import Worker, Queue  # noqa: E402
 from redis.exceptions import RedisError, ConnectionError, TimeoutError  # noqa: E402
 from app.infra.queue.connection import (  # noqa: E402
@@ -27,6 +34,7 @@ from app.infra.queue.connection import (  # noqa: E402
     REDIS_SOCKET_TIMEOUT,
     REDIS_HEALTH_CHECK_INTERVAL,
 )
+from app.core.config import settings  # noqa: E402
 
 # Setup logging
 logging.basicConfig(
@@ -39,10 +47,29 @@ MAX_WORKER_RESTART_ATTEMPTS = 100  # Maximum number of restart attempts before g
 RESTART_DELAY_SECONDS = 2  # Delay between restart attempts
 
 
+def start_metrics_server():
+    """Serve the metrics of this worker and its work-horses (e.g. Ollama calls)."""
+    multiproc_dir = os.environ["PROMETHEUS_MULTIPROC_DIR"]
+    shutil.rmtree(multiproc_dir, ignore_errors=True)
+    os.makedirs(multiproc_dir, exist_ok=True)
+    if not settings.WORKER_METRICS_PORT:
+        return
+
+    from prometheus_client import start_http_server
+    from app.infra.metrics import metrics_registry
+
+    start_http_server(
+        settings.WORKER_METRICS_PORT,
+        registry=metrics_registry(include_runtime=False),
+    )
+    logger.info(f"Metrics served on port {settings.WORKER_METRICS_PORT}")
+
+
 def main():
     """Run the RQ worker with auto-restart on connection failures."""
     logger.info("Starting RQ worker for AI summary generation...")
     logger.info("Auto-restart enabled for Redis connection failures")
+    start_metrics_server()
 
     restart_count = 0
 
@@ -6,6 +6,11 @@ RFID Scanner Script for Team Evaluatie App
 This script reads RFID cards using an MFRC522 reader connected to a Raspberry Pi
 and sends the card UID to the backend API for check-in/check-out processing.
 
+Every tap is first stored in a local buffer (persisted to BUFFER_FILE) and then
+sent to the batch endpoint (/attendance/scan/batch) together with any taps that
+are still waiting. When the network or backend is unavailable taps stay in the
+buffer and are flushed in batches as soon as the backend is reachable again.
+
 Hardware Requirements:
 - Raspberry Pi (any model with GPIO and network)
 - MFRC522 RFID Reader Module
@@ -22,10 +27,14 @@ Usage:
     python3 rfid_scanner.py
 """
 
+import json
+import os
+import threading
 import time
 import sys
 import logging
-from typing import Dict
+from datetime import datetime, timezone
+from typing import Dict, List
 import requests
 from mfrc522 import SimpleMFRC522
 
@@ -43,6 +52,12 @@ READ_TIMEOUT_SECONDS = 10  # Request timeout
 RETRY_ATTEMPTS = 3  # Number of retry attempts for failed requests
 RETRY_DELAY_SECONDS = 1  # Delay between retry attempts
 
+# Offline buffer
+BUFFER_FILE = "/var/lib/rfid_scanner/buffer.json"  # Set to None to buffer in memory
+BATCH_SIZE = 100  # Taps per request when flushing the buffer (max 500)
+FLUSH_INTERVAL_SECONDS = 15  # Retry interval for buffered taps
+MAX_BUFFERED_TAPS = 10000  # Oldest taps are dropped beyond this
+
 # Visual/Audio Feedback (set to True to enable, requires additional hardware)
 ENABLE_BUZZER = False  # Requires buzzer connected to GPIO
 ENABLE_LED = False  # Requires LED connected to GPIO
@@ -165,6 +180,57 @@ class FeedbackController:
                 logger.error(f"GPIO cleanup error: {e}")
 
 
+class TapBuffer:
+    """Thread-safe queue of taps, persisted to BUFFER_FILE so a reboot keeps them"""
+
+    def __init__(self, path: str | None = BUFFER_FILE):
+        self.path = path
+        self.lock = threading.Lock()
+        self.taps: List[Dict] = []
+
+        if self.path and os.path.exists(self.path):
+            try:
+                with open(self.path) as f:
+                    self.taps = json.load(f)
+                logger.info(f"📦 Loaded {len(self.taps)} buffered tap(s)")
+            except Exception as e:
+                logger.error(f"Failed to load tap buffer: {e}")
+
+    def _save(self):
+        if not self.path:
+            return
+        try:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            tmp_path = f"{self.path}.tmp"
+            with open(tmp_path, "w") as f:
+                json.dump(self.taps, f)
+            os.replace(tmp_path, self.path)
+        except Exception as e:
+            logger.error(f"Failed to save tap buffer: {e}")
+
+    def add(self, tap: Dict):
+        with self.lock:
+            self.taps.append(tap)
+            if len(self.taps) > MAX_BUFFERED_TAPS:
+                dropped = len(self.taps) - MAX_BUFFERED_TAPS
+                self.taps = self.taps[dropped:]
+                logger.warning(f"⚠️  Tap buffer full - dropped {dropped} oldest tap(s)")
+            self._save()
+
+    def peek(self, count: int) -> List[Dict]:
+        with self.lock:
+            return list(self.taps[:count])
+
+    def drop(self, count: int):
+        with self.lock:
+            self.taps = self.taps[count:]
+            self._save()
+
+    def __len__(self):
+        with self.lock:
+            return len(self.taps)
+
+
 class RFIDScanner:
     """Handles RFID card reading and API communication"""
 
@@ -172,7 +238,10 @@ class RFIDScanner:
         self.reader = SimpleMFRC522()
         self.feedback = FeedbackController()
         self.last_scan_time = {}  # Track last scan time per UID
-        self.api_url = f"{API_BASE_URL}/attendance/scan"
+        self.buffer = TapBuffer()
+        self.flush_lock = threading.Lock()
+        self.stop_event = threading.Event()
+        self.api_url = f"{API_BASE_URL}/attendance/scan/batch"
         self.headers = {"X-API-Key": API_KEY, "Content-Type": "application/json"}
 
         # Validate configuration
@@ -200,9 +269,9 @@ class RFIDScanner:
         elapsed = time.time() - self.last_scan_time[uid]
         return elapsed < SCAN_COOLDOWN_SECONDS
 
-    def send_scan_to_api(self, uid: str) -> Dict | None:
-        """Send RFID scan to backend API with retry logic"""
-        payload = {"uid": uid}
+    def send_batch_to_api(self, taps: List[Dict]) -> Dict | None:
+        """Send a batch of buffered taps to the backend API with retry logic"""
+        payload = {"taps": taps}
 
         for attempt in range(1, RETRY_ATTEMPTS + 1):
             try:
@@ -249,9 +318,46 @@ class RFIDScanner:
             if attempt < RETRY_ATTEMPTS:
                 time.sleep(RETRY_DELAY_SECONDS)
 
-        logger.error(f"❌ Failed to send scan after {RETRY_ATTEMPTS} attempts")
+        logger.error(f"❌ Failed to send taps after {RETRY_ATTEMPTS} attempts")
         return None
 
+    def flush(self) -> Dict[int, Dict] | None:
+        """
+        Send buffered taps in batches of BATCH_SIZE, oldest first.
+
+        Taps are removed from the buffer once the backend returned a result for
+        them (a resent tap is reported as "duplicate", so retries are safe).
+
+        Returns the results of the sent taps keyed by id() of the tap, or None
+        when the backend could not be reached.
+        """
+        results = {}
+        with self.flush_lock:
+            while True:
+                taps = self.buffer.peek(BATCH_SIZE)
+                if not taps:
+                    return results
+
+                response = self.send_batch_to_api(taps)
+                if response is None:
+                    return None
+
+                for tap, result in zip(taps, response.get("results", [])):
+                    results[id(tap)] = result
+                    logger.debug(f"Flushed tap {tap['uid']}: {result.get('status')}")
+                self.buffer.drop(len(taps))
+                if len(taps) > 1:
+                    logger.info(f"📤 Flushed {len(taps)} buffered tap(s)")
+
+    def flush_periodically(self):
+        """Background thread: retry buffered taps every FLUSH_INTERVAL_SECONDS"""
+        while not self.stop_event.wait(FLUSH_INTERVAL_SECONDS):
+            if len(self.buffer):
+                try:
+                    self.flush()
+                except Exception as e:
+                    logger.error(f"Flush error: {e}")
+
     def handle_scan_response(self, response: Dict):
         """Handle and display scan response"""
         status = response.get("status")
@@ -277,6 +383,14 @@ class RFIDScanner:
                 logger.info(f"   Duration: {hours}h {minutes}m")
                 self.feedback.success_feedback()
 
+        elif status == "duplicate":
+            logger.info("ℹ️  Scan was already processed")
+
+        elif status == "rejected":
+            message = response.get("message", "Scan rejected")
+            logger.warning(f"⚠️  {message}")
+            self.feedback.error_feedback()
+
         elif status == "not_found":
             message = response.get("message", "Card not found")
             logger.warning(f"⚠️  {message}")
@@ -296,6 +410,8 @@ class RFIDScanner:
         logger.info("🔍 Scanner ready - Hold RFID card near reader...")
         logger.info("   Press Ctrl+C to stop\n")
 
+        threading.Thread(target=self.flush_periodically, daemon=True).start()
+
         try:
             while True:
                 try:
@@ -314,14 +430,22 @@ class RFIDScanner:
                     # Log scan
                     logger.info(f"📡 Card scanned: {uid_str}")
 
-                    # Send to API
-                    response = self.send_scan_to_api(uid_str)
-
-                    if response:
-                        self.handle_scan_response(response)
-                    else:
-                        logger.error("❌ No response from API")
-                        self.feedback.error_feedback()
+                    # Buffer the tap, then send it with any waiting taps
+                    tap = {
+                        "uid": uid_str,
+                        "timestamp": datetime.now(timezone.utc).isoformat(),
+                    }
+                    self.buffer.add(tap)
+                    results = self.flush()
+
+                    if results is None:
+                        logger.warning(
+                            f"📦 Backend unreachable - tap buffered "
+                            f"({len(self.buffer)} waiting)"
+                        )
+                        self.feedback.beep(duration=0.1, count=2)
+                    elif id(tap) in results:
+                        self.handle_scan_response(results[id(tap)])
 
                     # Brief pause before next scan
                     time.sleep(0.5)
@@ -340,6 +464,9 @@ class RFIDScanner:
     def cleanup(self):
         """Clean up resources"""
         logger.info("Cleaning up...")
+        self.stop_event.set()
+        if len(self.buffer):
+            logger.info(f"📦 {len(self.buffer)} tap(s) kept in buffer for next start")
         self.feedback.cleanup()
         logger.info("✅ Cleanup complete")
 
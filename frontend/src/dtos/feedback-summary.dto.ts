@@ -21,10 +21,14 @@ export type JobStatusResponse = {
     feedback_count: number;
   } | null;
   error_message?: string | null;
+  progress?: number;
+  stage?: string | null;
+  message?: string | null;
 };
 
 export type BatchQueueResponse = {
   evaluation_id: number;
+  batch_job_id: string | null;
   total_students: number;
   queued: number;
   already_queued: number;
@@ -37,6 +41,17 @@ export type BatchQueueResponse = {
   }>;
 };
 
+export type BatchStatusResponse = {
+  batch_job_id: string;
+  evaluation_id: number;
+  status: string;
+  total: number;
+  completed: number;
+  failed: number;
+  cancelled: number;
+  progress: number;
+};
+
 export type FeedbackQuote = {
   text: string;
   criterion_id?: number | null;
@@ -350,6 +350,10 @@ export const attendanceService = {
     period: string;
     course_id?: number;
     project_id?: number;
+    min_extern_hours?: number;
+    max_school_blocks?: number;
+    min_pending_count?: number;
+    long_open_hours?: number;
   }): Promise<SignalsData> {
     const response = await api.get<SignalsData>("/attendance/stats/signals", {
       params,
@@ -1,23 +1,93 @@
+import axios from "axios";
 import api from "@/lib/api";
 import {
   FeedbackSummaryResponse,
   FeedbackQuotesResponse,
   JobStatusResponse,
   BatchQueueResponse,
+  BatchStatusResponse,
 } from "@/dtos/feedback-summary.dto";
 
+const JOB_POLL_INITIAL_MS = 2000;
+const JOB_POLL_MAX_MS = 15000;
+const JOB_POLL_BACKOFF = 1.5;
+
+function sleep(ms: number) {
+  return new Promise((resolve) => setTimeout(resolve, ms));
+}
+
+/**
+ * Milliseconds to wait before polling again after a 429 (Retry-After), or
+ * null when the error is not a rate limit.
+ */
+function rateLimitDelayMs(err: unknown): number | null {
+  if (!axios.isAxiosError(err) || err.response?.status !== 429) {
+    return null;
+  }
+  const seconds = Number(err.response?.headers?.["retry-after"]);
+  return Number.isFinite(seconds) && seconds > 0
+    ? seconds * 1000
+    : JOB_POLL_MAX_MS;
+}
+
+/**
+ * Turn a summary response into a summary, waiting for the queued job on a 202.
+ *
+ * The job is polled with a growing interval; a 429 means "poll later" (after
+ * Retry-After), not that generation failed.
+ */
+async function resolveSummary(
+  status: number,
+  data: FeedbackSummaryResponse | JobStatusResponse,
+): Promise<FeedbackSummaryResponse> {
+  if (status !== 202) {
+    return data as FeedbackSummaryResponse;
+  }
+
+  let job = data as JobStatusResponse;
+  let delay = JOB_POLL_INITIAL_MS;
+  while (job.status === "queued" || job.status === "processing") {
+    await sleep(delay);
+    try {
+      job = await feedbackSummaryService.getJobStatus(job.job_id);
+      delay = Math.min(delay * JOB_POLL_BACKOFF, JOB_POLL_MAX_MS);
+    } catch (err) {
+      const retryAfter = rateLimitDelayMs(err);
+      if (retryAfter === null) {
+        throw err;
+      }
+      delay = Math.max(delay, retryAfter);
+    }
+  }
+  if (job.status !== "completed" || !job.result) {
+    throw new Error(job.error_message || "Genereren van samenvatting mislukt");
+  }
+  return {
+    student_id: job.student_id,
+    student_name: "",
+    summary_text: job.result.summary_text,
+    generation_method: job.result
+      .generation_method as FeedbackSummaryResponse["generation_method"],
+    feedback_count: job.result.feedback_count,
+    cached: false,
+  };
+}
+
 export const feedbackSummaryService = {
   /**
-   * Get AI summary of peer feedback for a student (sync mode)
+   * Get AI summary of peer feedback for a student.
+   *
+   * The backend answers 202 with a job when the summary still has to be
+   * generated; the job is then polled until it has finished.
    */
   async getStudentSummary(
     evaluationId: number,
     studentId: number,
   ): Promise<FeedbackSummaryResponse> {
-    const { data } = await api.get<FeedbackSummaryResponse>(
+    const response = await api.get<FeedbackSummaryResponse | JobStatusResponse>(
       `/feedback-summaries/evaluation/${evaluationId}/student/${studentId}`,
     );
-    return data;
+    return resolveSummary(response.status, response.data);
   },
 
   /**
@@ -61,6 +131,16 @@ export const feedbackSummaryService = {
     return data;
   },
 
+  /**
+   * Aggregated progress of a batch
+   */
+  async getBatchStatus(batchJobId: string): Promise<BatchStatusResponse> {
+    const { data } = await api.get<BatchStatusResponse>(
+      `/feedback-summaries/batches/${batchJobId}/status`,
+    );
+    return data;
+  },
+
   /**
    * List all jobs for an evaluation
    */
@@ -87,11 +167,13 @@ export const feedbackSummaryService = {
     evaluationId: number,
     studentId: number,
   ): Promise<FeedbackSummaryResponse> {
-    const { data } = await api.post<FeedbackSummaryResponse>(
+    const response = await api.post<
+      FeedbackSummaryResponse | JobStatusResponse
+    >(
       `/feedback-summaries/evaluation/${evaluationId}/student/${studentId}/regenerate`,
       { force: true },
     );
-    return data;
+    return resolveSummary(response.status, response.data);
   },
 
   /**